@@ -20,16 +20,19 @@ import uuid
 from datetime import datetime
 from decimal import Decimal
 
-import requests
 from django.conf import settings
 from django.utils import timezone
 
+from apps.core import http_client
+
 from .models import IncomingPayment
 
 log = logging.getLogger(__name__)
 
 _TIMEOUT = 30
 
+http_client.register(http_client.Provider("tbank", timeout=_TIMEOUT))
+
 
 def is_configured(source: str) -> bool:
     if source == IncomingPayment.SOURCE_ACQUIRING:
@@ -46,7 +49,7 @@ def _statement_get(params: dict) -> dict:
         "X-Request-Id": str(uuid.uuid4()),
         "Accept": "application/json",
     }
-    resp = requests.get(url, headers=headers, params=params, timeout=_TIMEOUT)
+    resp = http_client.request("tbank", "GET", url, headers=headers, params=params)
     resp.raise_for_status()
     return resp.json()
 
@@ -5,15 +5,29 @@
 поиск-замена по run'у не сработает. Решение: для каждого абзаца склеиваем
 текст всех run'ов, выполняем замену, и записываем результат в первый run,
 очищая остальные (формат первого run'а сохраняется).
+
+Шаблон компилируется один раз (`compile_template`): разбор .docx, поиск
+абзацев с плейсхолдерами в теле, таблицах и колонтитулах. Рендер правит
+только эти абзацы и пересобирает zip. В zip заново пишутся лишь части с
+плейсхолдерами, остальные копируются как есть. Скомпилированные шаблоны
+из S3 кэшируются в процессе по (bucket, key) файла (`compiled_for`). При
+замене .docx у шаблона создаётся новый StoredFile, так что ключ меняется
+вместе с версией.
 """
+import copy
 import io
 import re
+import threading
+import zipfile
+from collections import OrderedDict
 
 # python-docx импортируется лениво (внутри функций) — чтобы модуль (и весь
 # apps.afd, который тянется из urls) импортировался даже на образе без
 # установленного python-docx (актуально между rebuild'ами на prod).
 
 _PLACEHOLDER_RE = re.compile(r"\{[^{}\n]+\}")
+# Скомпилированных шаблонов в кэше процесса.
+CACHE_SIZE = 32
 
 
 def _iter_paragraphs(container):
@@ -26,16 +40,7 @@ def _iter_paragraphs(container):
                 yield from _iter_paragraphs(cell)
 
 
-def _replace_in_paragraph(paragraph, context):
-    runs = paragraph.runs
-    if not runs:
-        return
-    full = "".join(r.text for r in runs)
-    if "{" not in full:
-        return
-    if not _PLACEHOLDER_RE.search(full):
-        return
-
+def _substitute(text: str, context: dict) -> str:
     def _sub(m):
         key = m.group(0)[1:-1]  # без фигурных скобок
         if key in context:
@@ -43,47 +48,138 @@ def _replace_in_paragraph(paragraph, context):
             return "" if val is None else str(val)
         return m.group(0)  # неизвестный плейсхолдер оставляем как есть
 
-    new_text = _PLACEHOLDER_RE.sub(_sub, full)
-    if new_text == full:
-        return
-    # Записываем всё в первый run, остальные очищаем.
-    runs[0].text = new_text
-    for r in runs[1:]:
-        r.text = ""
+    return _PLACEHOLDER_RE.sub(_sub, text)
+
+
+class CompiledTemplate:
+    """Разобранный .docx-шаблон: рендерится многократно без повторного разбора.
+
+    Рендер временно подменяет абзацы с плейсхолдерами заполненными копиями,
+    сериализует затронутые части и возвращает исходные абзацы на место —
+    поэтому рендеры одного шаблона идут под его lock'ом.
+    """
+
+    def __init__(self, template_bytes: bytes):
+        from docx import Document
+        from docx.blkcntnr import BlockItemContainer
+        from docx.parts.hdrftr import FooterPart, HeaderPart
+
+        with zipfile.ZipFile(io.BytesIO(template_bytes)) as zf:
+            self._entries = [(info, zf.read(info)) for info in zf.infolist()]
+        self._doc = Document(io.BytesIO(template_bytes))
+        self._lock = threading.Lock()
+
+        containers = [(self._doc.part, self._doc)]
+        for part in self._doc.part.package.iter_parts():
+            if isinstance(part, (HeaderPart, FooterPart)):
+                containers.append((part, BlockItemContainer(part.element, part)))
+
+        # (часть, <w:p>, склеенный текст run'ов) — только абзацы с плейсхолдерами.
+        self._slots = []
+        self.placeholders: list[str] = []
+        seen_p, seen_key = set(), set()
+        for part, container in containers:
+            for para in _iter_paragraphs(container):
+                p = para._p  # noqa: SLF001
+                # Объединённые ячейки таблиц python-docx отдаёт несколько раз.
+                if p in seen_p:
+                    continue
+                seen_p.add(p)
+                for m in _PLACEHOLDER_RE.finditer(para.text):
+                    key = m.group(0)[1:-1]
+                    if key not in seen_key:
+                        seen_key.add(key)
+                        self.placeholders.append(key)
+                if not p.r_lst:
+                    continue
+                full = "".join(r.text for r in para.runs)
+                if "{" in full and _PLACEHOLDER_RE.search(full):
+                    self._slots.append((part, p, full))
+        self._parts = {part.partname.lstrip("/"): part for part, _, _ in self._slots}
+
+    def render(self, context: dict) -> bytes:
+        """bytes .docx с подставленными значениями (см. render_docx)."""
+        from docx.opc.oxml import serialize_part_xml
+        from docx.text.paragraph import Paragraph
+
+        with self._lock:
+            swapped = []
+            try:
+                for _part, p, full in self._slots:
+                    new_text = _substitute(full, context)
+                    if new_text == full:
+                        continue
+                    filled = copy.deepcopy(p)
+                    runs = Paragraph(filled, None).runs
+                    # Записываем всё в первый run, остальные очищаем.
+                    runs[0].text = new_text
+                    for r in runs[1:]:
+                        r.text = ""
+                    p.getparent().replace(p, filled)
+                    swapped.append((p, filled))
+                blobs = {
+                    name: serialize_part_xml(part.element)
+                    for name, part in self._parts.items()
+                }
+            finally:
+                for p, filled in swapped:
+                    filled.getparent().replace(filled, p)
+
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+            for info, data in self._entries:
+                zf.writestr(info, blobs.get(info.filename, data))
+        return out.getvalue()
+
+    def render_many(self, contexts) -> list[bytes]:
+        """Рендер нескольких контекстов по одному шаблону (пакетная генерация)."""
+        return [self.render(ctx) for ctx in contexts]
+
+
+def compile_template(template_bytes: bytes) -> CompiledTemplate:
+    return CompiledTemplate(template_bytes)
+
+
+_compiled: OrderedDict = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def compiled_for(stored_file) -> CompiledTemplate:
+    """Скомпилированный шаблон из StoredFile (кэш процесса, LRU на CACHE_SIZE).
+
+    Объект S3 по (bucket, key) не меняется — это и есть версия шаблона.
+    """
+    key = (stored_file.bucket, stored_file.key)
+    with _compiled_lock:
+        hit = _compiled.get(key)
+        if hit is not None:
+            _compiled.move_to_end(key)
+            return hit
+    from apps.files.s3_utils import download_file_from_s3  # лениво — кросс-аппный импорт
+
+    compiled = compile_template(download_file_from_s3(*key))
+    with _compiled_lock:
+        _compiled[key] = compiled
+        while len(_compiled) > CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
 
 
 def render_docx(template_bytes: bytes, context: dict) -> bytes:
     """Возвращает bytes .docx с подставленными значениями.
 
     context: {"placeholder_key": "value", ...} — ключи БЕЗ фигурных скобок.
-    Значение None трактуется как пустая строка.
+    Значение None трактуется как пустая строка. Для шаблона из S3 лучше
+    `compiled_for(stored_file).render(context)` — без повторного разбора.
     """
-    from docx import Document
-    doc = Document(io.BytesIO(template_bytes))
-    for para in _iter_paragraphs(doc):
-        _replace_in_paragraph(para, context)
-    # Заголовки/колонтитулы тоже могут содержать плейсхолдеры.
-    for section in doc.sections:
-        for hf in (section.header, section.footer,
-                   section.first_page_header, section.first_page_footer):
-            for para in getattr(hf, "paragraphs", []):
-                _replace_in_paragraph(para, context)
-
-    out = io.BytesIO()
-    doc.save(out)
-    return out.getvalue()
+    return compile_template(template_bytes).render(context)
+
+
+def render_docx_many(template_bytes: bytes, contexts) -> list[bytes]:
+    """Рендер N контекстов по одному шаблону с однократным разбором."""
+    return compile_template(template_bytes).render_many(contexts)
 
 
 def list_placeholders(template_bytes: bytes) -> list[str]:
     """Возвращает уникальные плейсхолдеры (без скобок) из шаблона — для UI."""
-    from docx import Document
-    doc = Document(io.BytesIO(template_bytes))
-    found = []
-    seen = set()
-    for para in _iter_paragraphs(doc):
-        for m in _PLACEHOLDER_RE.finditer(para.text):
-            key = m.group(0)[1:-1]
-            if key not in seen:
-                seen.add(key)
-                found.append(key)
-    return found
+    return compile_template(template_bytes).placeholders
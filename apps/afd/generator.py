@@ -6,10 +6,10 @@ from django.utils import timezone
 from apps.crm import client_log
 from apps.files.folder_utils import _mk, get_or_create_root
 from apps.files.models import ClientFile, StoredFile
-from apps.files.s3_utils import download_file_from_s3, upload_file_to_s3
+from apps.files.s3_utils import upload_file_to_s3
 
 from . import appendix, contract_bfl
-from .docx_engine import render_docx
+from .docx_engine import compiled_for
 from .models import DocumentTemplate, ExecutorOrg, GeneratedDocument
 from .pdf_utils import docx_to_pdf, merge_pdfs
 
@@ -58,12 +58,9 @@ def generate_bfl_contract(service, employee=None):
     if not ok:
         raise ContractGenerationError("Не все обязательные реквизиты заполнены.")
 
-    # 1. Шаблон из S3 → подстановка → docx
-    template_bytes = download_file_from_s3(
-        template.stored_file.bucket, template.stored_file.key
-    )
+    # 1. Шаблон (S3, кэш скомпилированных) → подстановка → docx
     ctx = contract_bfl.build_context(service)
-    docx_bytes = render_docx(template_bytes, ctx)
+    docx_bytes = compiled_for(template.stored_file).render(ctx)
 
     # 2. Основной PDF + приложения → сводный PDF
     pdf_main = docx_to_pdf(docx_bytes)
@@ -15,7 +15,7 @@ from . import isk_appendices, isk_context
 from .isk_engine import render_isk_docx
 from .isk_seed_data import DEFAULT_APPENDIX
 from .models import GeneratedDocument, IskTemplate
-from .pdf_utils import docx_to_pdf, merge_pdfs
+from .pdf_utils import docx_to_pdf_many, merge_pdfs
 
 log = logging.getLogger(__name__)
 
@@ -89,18 +89,20 @@ def generate_isk(service, employee=None, overrides=None, sro_id=None,
 
     # 1. Тело заявления
     isk_docx = render_isk_docx(template, ctx, flags)
-    chunks = [docx_to_pdf(isk_docx)]
+    parts = [isk_docx]
 
     # 2. Приложения-формы
     sel = overrides.get("appendix_keys")
     def _on(key):
         return sel is None or key in sel
     if _on("creditors_form"):
-        chunks.append(docx_to_pdf(isk_appendices.creditors_form_docx(ctx, creditors)))
+        parts.append(isk_appendices.creditors_form_docx(ctx, creditors))
     if _on("property_form"):
-        chunks.append(docx_to_pdf(isk_appendices.property_form_docx(ctx, overrides)))
+        parts.append(isk_appendices.property_form_docx(ctx, overrides))
     if _on("petition_doc"):
-        chunks.append(docx_to_pdf(isk_appendices.petition_docx(ctx)))
+        parts.append(isk_appendices.petition_docx(ctx))
+    # Части пакета конвертируются параллельно воркерами пула LibreOffice.
+    chunks = docx_to_pdf_many(parts)
 
     final_pdf = merge_pdfs(chunks) if len(chunks) > 1 else chunks[0]
 
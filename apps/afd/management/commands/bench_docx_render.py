@@ -0,0 +1,96 @@
+"""
+Рендер .docx-шаблона: разбор python-docx на каждый вызов (как было в
+render_docx) против скомпилированного шаблона (docx_engine.compile_template).
+
+Генерирует шаблон — --paragraphs абзацев (часть с плейсхолдерами, разбитыми
+на несколько run'ов, как это делает Word), таблица реквизитов и колонтитул —
+и рендерит его --renders раз с разными контекстами:
+  * legacy  — Document(bytes) → обход всех абзацев → save (старый путь);
+  * compile — разбор один раз + render_many.
+
+    python manage.py bench_docx_render
+    python manage.py bench_docx_render --renders 500 --paragraphs 400
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.afd import docx_engine
+
+
+def _make_template(paragraphs: int) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Исх. № {Исх.№} от {Исх.дата}"
+    for i in range(paragraphs):
+        para = doc.add_paragraph()
+        if i % 5 == 0:
+            para.add_run("Должник {ФИО ")
+            para.add_run("должника}, ИНН {ИНН}, адрес: ").bold = True
+            para.add_run("{адрес регистрации}.")
+        else:
+            para.add_run(f"Пункт {i + 1}. Текст без подстановок, обычный абзац письма.")
+    table = doc.add_table(rows=4, cols=2)
+    for row, key in zip(table.rows, ("ФИО должника", "ИНН", "СНИЛС", "номер дела")):
+        row.cells[0].text = key
+        row.cells[1].text = "{" + key + "}"
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def _legacy_render(template_bytes: bytes, context: dict) -> bytes:
+    from docx import Document
+
+    doc = Document(io.BytesIO(template_bytes))
+    paras = list(docx_engine._iter_paragraphs(doc))  # noqa: SLF001
+    for section in doc.sections:
+        for hf in (section.header, section.footer,
+                   section.first_page_header, section.first_page_footer):
+            paras.extend(getattr(hf, "paragraphs", []))
+    for para in paras:
+        runs = para.runs
+        full = "".join(r.text for r in runs)
+        if not runs or "{" not in full:
+            continue
+        new_text = docx_engine._substitute(full, context)  # noqa: SLF001
+        if new_text != full:
+            runs[0].text = new_text
+            for r in runs[1:]:
+                r.text = ""
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark per-call python-docx parsing vs compiled DOCX templates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--renders", type=int, default=200, help="Рендеров на вариант")
+        parser.add_argument("--paragraphs", type=int, default=200, help="Абзацев в шаблоне")
+
+    def handle(self, *args, **options):
+        template = _make_template(options["paragraphs"])
+        contexts = [
+            {
+                "ФИО должника": f"Иванов Иван Иванович {n}", "ИНН": f"{n:012d}",
+                "СНИЛС": f"{n:011d}", "адрес регистрации": f"г. Москва, д. {n}",
+                "номер дела": f"А40-{n}/2026", "Исх.№": n, "Исх.дата": "01.01.2026",
+            }
+            for n in range(options["renders"])
+        ]
+        variants = {
+            "legacy": lambda: [_legacy_render(template, ctx) for ctx in contexts],
+            "compile": lambda: docx_engine.compile_template(template).render_many(contexts),
+        }
+        for name, call in variants.items():
+            started = time.monotonic()
+            docs = call()
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"{name:>8}: {elapsed:7.2f}s  {elapsed / len(docs) * 1000:7.1f} мс/док  "
+                f"{len(docs) / elapsed:7.1f} док/с  ({len(docs[0]) // 1024} КБ)"
+            )
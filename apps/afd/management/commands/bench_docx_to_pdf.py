@@ -0,0 +1,80 @@
+"""
+DOCX → PDF: разовый ``soffice --convert-to`` на документ (как было) против
+пула тёплых LibreOffice (apps/afd/office_pool.py) и кэша по содержимому.
+
+Генерирует --docs разных .docx (python-docx) и конвертирует их:
+  * serial — по одному, старым способом;
+  * pooled — `docx_to_pdf_many` без кэша (воркеры пула параллельно);
+  * cached — тот же набор повторно, из прогретого кэша.
+Печатает общее время и время на документ. Нужны soffice и python3-uno
+(OFFICE_UNO_PYTHON) — гонять в docker-образе web/celery.
+
+    python manage.py bench_docx_to_pdf
+    python manage.py bench_docx_to_pdf --docs 20 --paragraphs 100
+"""
+import io
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.afd import office_pool, pdf_utils
+
+
+def _make_docx(n: int, paragraphs: int) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    doc.add_heading(f"Заявление № {n}", level=1)
+    for i in range(paragraphs):
+        doc.add_paragraph(
+            f"Пункт {i + 1}. Должник № {n} просит признать его несостоятельным "
+            "(банкротом) и ввести процедуру реализации имущества гражданина."
+        )
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Benchmark one-shot soffice vs LibreOffice worker pool for DOCX → PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--docs", type=int, default=50, help="Документов на вариант")
+        parser.add_argument("--paragraphs", type=int, default=40, help="Абзацев в документе")
+        parser.add_argument("--skip-serial", action="store_true",
+                            help="Не гонять медленный вариант «как было»")
+
+    def handle(self, *args, **options):
+        if not office_pool.available():
+            raise CommandError(
+                f"Пул LibreOffice недоступен (OFFICE_POOL_SIZE={settings.OFFICE_POOL_SIZE}, "
+                f"OFFICE_UNO_PYTHON={settings.OFFICE_UNO_PYTHON})"
+            )
+        docs = [_make_docx(n, options["paragraphs"]) for n in range(options["docs"])]
+
+        variants = {
+            "pooled": lambda: pdf_utils.docx_to_pdf_many(docs, use_cache=False),
+            "cached": lambda: pdf_utils.docx_to_pdf_many(docs),
+        }
+        if not options["skip_serial"]:
+            variants = {
+                "serial": lambda: [pdf_utils._convert_oneshot(d) for d in docs],  # noqa: SLF001
+                **variants,
+            }
+        try:
+            # Прогрев: первый старт воркеров не должен попасть в замер.
+            pdf_utils.docx_to_pdf_many(docs[: settings.OFFICE_POOL_SIZE], use_cache=False)
+            for name, call in variants.items():
+                if name == "cached":
+                    pdf_utils.docx_to_pdf_many(docs)  # заполнить кэш вне замера
+                started = time.monotonic()
+                pdfs = call()
+                elapsed = time.monotonic() - started
+                empty = sum(1 for p in pdfs if not p.startswith(b"%PDF"))
+                self.stdout.write(
+                    f"{name:>7}: {elapsed:7.2f}s  {elapsed / len(docs) * 1000:7.0f} мс/док  "
+                    f"битых PDF: {empty}  (пул: {settings.OFFICE_POOL_SIZE})"
+                )
+        finally:
+            office_pool.shutdown()
@@ -0,0 +1,235 @@
+"""Пул долгоживущих LibreOffice для docx_to_pdf.
+
+`soffice --convert-to` на каждый документ — это старт офиса с чистым
+профилем, несколько секунд на документ. Здесь в процессе держится до
+OFFICE_POOL_SIZE воркеров (uno_worker.py под системным python3 с UNO),
+каждый со своим soffice и профилем; конвертация — запрос в уже тёплый
+офис.
+
+  * `convert(docx_bytes)` — берёт свободный воркер (ждёт не дольше
+    QUEUE_TIMEOUT), ответ ждёт не дольше `timeout`;
+  * таймаут или смерть soffice → воркер убивается, следующий запрос
+    поднимет новый; упавший посреди запроса воркер — один повтор на
+    свежем;
+  * воркер, простаивающий дольше OFFICE_POOL_IDLE_SECONDS, гасится
+    (офис — сотни мегабайт на процесс, а конвертации бывают редко).
+
+Пул живёт в процессе (gunicorn/celery worker) и создаётся при первой
+конвертации; `available()` — можно ли им пользоваться здесь (есть
+python с UNO). Если нельзя — pdf_utils конвертирует по-старому.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import selectors
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(__file__), "uno_worker.py")
+STARTUP_TIMEOUT = 60
+QUEUE_TIMEOUT = 120
+
+
+class OfficeError(RuntimeError):
+    pass
+
+
+class OfficeUnavailable(OfficeError):
+    """uno_worker не поднимается (нет python3-uno / soffice) — пул выключается."""
+
+
+class _WorkerDied(OfficeError):
+    pass
+
+
+class _Worker:
+    """uno_worker.py + его soffice. Один запрос за раз."""
+
+    def __init__(self, soffice: str):
+        self.profile = tempfile.mkdtemp(prefix="office_profile_")
+        self.proc = subprocess.Popen(
+            [settings.OFFICE_UNO_PYTHON, WORKER_SCRIPT, soffice, self.profile],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, bufsize=1,
+            # Своя группа процессов: soffice — внук, гасим его вместе с воркером.
+            start_new_session=True,
+        )
+        self.last_used = time.monotonic()
+        try:
+            if not self._read(STARTUP_TIMEOUT).get("ready"):
+                raise OfficeUnavailable("uno_worker не поднялся")
+        except OfficeError as e:
+            self.kill()
+            raise OfficeUnavailable(str(e)) from e
+
+    def _read(self, timeout: float) -> dict:
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.proc.stdout, selectors.EVENT_READ)
+            if not sel.select(timeout):
+                raise OfficeError(f"LibreOffice не ответил за {timeout}с")
+        line = self.proc.stdout.readline()
+        if not line:
+            raise _WorkerDied(f"uno_worker завершился (rc={self.proc.poll()})")
+        return json.loads(line)
+
+    def convert(self, src: str, dst: str, timeout: float) -> None:
+        try:
+            self.proc.stdin.write(json.dumps({"src": src, "dst": dst}) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise _WorkerDied(f"uno_worker недоступен: {e}") from e
+        resp = self._read(timeout)
+        self.last_used = time.monotonic()
+        if not resp.get("ok"):
+            if self.proc.poll() is not None:
+                raise _WorkerDied(resp.get("error", "uno_worker упал"))
+            raise OfficeError(resp.get("error", "ошибка конвертации"))
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def kill(self) -> None:
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        try:
+            self.proc.wait(5)
+        except subprocess.TimeoutExpired:
+            pass
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class OfficePool:
+    def __init__(self, size: int, *, soffice: str, idle_seconds: int):
+        self.size = size
+        self.soffice = soffice
+        self.idle_seconds = idle_seconds
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: queue.LifoQueue[_Worker] = queue.LifoQueue()
+        self._reaper = threading.Thread(target=self._reap, name="office-reaper", daemon=True)
+        self._reaper.start()
+
+    def _checkout(self) -> _Worker:
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                try:
+                    return _Worker(self.soffice)
+                except OfficeUnavailable:
+                    global _broken
+                    _broken = True
+                    raise
+            if worker.alive():
+                return worker
+            worker.kill()
+
+    def _convert_once(self, worker: _Worker, docx_bytes: bytes, timeout: float) -> bytes:
+        with tempfile.TemporaryDirectory(prefix="office_pdf_") as tmp:
+            src = os.path.join(tmp, "doc.docx")
+            dst = os.path.join(tmp, "doc.pdf")
+            with open(src, "wb") as f:
+                f.write(docx_bytes)
+            worker.convert(src, dst, timeout)
+            with open(dst, "rb") as f:
+                return f.read()
+
+    def convert(self, docx_bytes: bytes, *, timeout: float = 120) -> bytes:
+        if not self._slots.acquire(timeout=QUEUE_TIMEOUT):
+            raise OfficeError(f"все {self.size} LibreOffice заняты дольше {QUEUE_TIMEOUT}с")
+        try:
+            for attempt in (1, 2):
+                worker = self._checkout()
+                try:
+                    pdf = self._convert_once(worker, docx_bytes, timeout)
+                except _WorkerDied:
+                    worker.kill()
+                    if attempt == 2:
+                        raise
+                    log.warning("office pool: воркер упал, повтор на новом")
+                    continue
+                except BaseException:
+                    # Таймаут/ошибка документа — офис мог зависнуть, не рискуем.
+                    worker.kill()
+                    raise
+                self._idle.put(worker)
+                return pdf
+        finally:
+            self._slots.release()
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(min(60, max(self.idle_seconds, 1)))
+            keep = []
+            while True:
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if worker.alive() and time.monotonic() - worker.last_used < self.idle_seconds:
+                    keep.append(worker)
+                else:
+                    worker.kill()
+            for worker in reversed(keep):
+                self._idle.put(worker)
+
+    def shutdown(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+_pool: OfficePool | None = None
+_pool_lock = threading.Lock()
+# Воркер не поднялся — до конца жизни процесса конвертируем по-старому.
+_broken = False
+
+
+def available() -> bool:
+    """Пул включён, в системе есть python для UNO и воркеры поднимаются."""
+    return (
+        settings.OFFICE_POOL_SIZE > 0 and not _broken
+        and shutil.which(settings.OFFICE_UNO_PYTHON) is not None
+    )
+
+
+def get_pool(soffice: str) -> OfficePool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficePool(
+                settings.OFFICE_POOL_SIZE, soffice=soffice,
+                idle_seconds=settings.OFFICE_POOL_IDLE_SECONDS,
+            )
+        return _pool
+
+
+def shutdown() -> None:
+    if _pool is not None:
+        _pool.shutdown()
+
+
+def _after_fork() -> None:
+    # Воркеры родителя (их pipe'ы) ребёнку не принадлежат — свой пул с нуля.
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_after_fork)
@@ -1,10 +1,24 @@
-"""Конвертация .docx → .pdf (LibreOffice headless) и склейка PDF (pypdf)."""
+"""Конвертация .docx → .pdf (LibreOffice headless) и склейка PDF (pypdf).
+
+Конвертация идёт через пул тёплых LibreOffice (office_pool.py), если он
+доступен в процессе, иначе — разовым `soffice --convert-to`. Результат
+кэшируется по хэшу содержимого DOCX: повторная генерация неизменившегося
+документа отдаёт PDF из кэша.
+"""
+import hashlib
 import io
 import logging
 import os
 import subprocess
 import tempfile
 import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import office_pool
 
 log = logging.getLogger(__name__)
 
@@ -12,11 +26,97 @@ log = logging.getLogger(__name__)
 _SOFFICE = os.environ.get("SOFFICE_BIN", "soffice")
 
 
+# Большие PDF в Redis не кладём.
+_CACHE_MAX_BYTES = 5 * 1024 * 1024
+
+
 class PdfConvertError(RuntimeError):
     pass
 
 
-def docx_to_pdf(docx_bytes: bytes, *, timeout: int = 120) -> bytes:
+def _cache_key(docx_bytes: bytes) -> str:
+    """Хэш содержимого DOCX без метаданных zip.
+
+    python-docx/docxtpl пишут в zip время сохранения — байты одного и того
+    же документа каждый раз разные. Хэшируем имена и содержимое частей.
+    """
+    h = hashlib.sha256()
+    try:
+        with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+            for name in sorted(zf.namelist()):
+                h.update(name.encode())
+                h.update(b"\0")
+                h.update(zf.read(name))
+    except zipfile.BadZipFile:
+        h = hashlib.sha256(docx_bytes)
+    return f"afd:pdf:{h.hexdigest()}"
+
+
+def _cache_get_many(keys: list[str]) -> dict:
+    try:
+        return cache.get_many(keys)
+    except Exception:  # noqa: BLE001 — без кэша просто конвертируем
+        log.warning("docx_to_pdf: кэш недоступен", exc_info=True)
+        return {}
+
+
+def _cache_set_many(items: dict) -> None:
+    items = {k: v for k, v in items.items() if len(v) <= _CACHE_MAX_BYTES}
+    if not items:
+        return
+    try:
+        cache.set_many(items, settings.OFFICE_PDF_CACHE_TTL)
+    except Exception:  # noqa: BLE001
+        log.warning("docx_to_pdf: не удалось положить PDF в кэш", exc_info=True)
+
+
+def docx_to_pdf(docx_bytes: bytes, *, timeout: int = 120, use_cache: bool = True) -> bytes:
+    """Конвертирует .docx в .pdf (пул LibreOffice или разовый soffice)."""
+    return docx_to_pdf_many([docx_bytes], timeout=timeout, use_cache=use_cache)[0]
+
+
+def docx_to_pdf_many(
+    docs: list[bytes], *, timeout: int = 120, use_cache: bool = True,
+) -> list[bytes]:
+    """Конвертирует несколько .docx за один вызов, порядок сохраняется.
+
+    Уже конвертированные (по хэшу содержимого) берутся из кэша, остальные
+    расходятся по воркерам пула параллельно.
+    """
+    keys = [_cache_key(d) for d in docs] if use_cache else []
+    cached = _cache_get_many(list(set(keys))) if keys else {}
+    todo = {}
+    for i, doc in enumerate(docs):
+        key = keys[i] if keys else i
+        if key not in cached:
+            todo.setdefault(key, doc)
+
+    if todo:
+        workers = settings.OFFICE_POOL_SIZE if office_pool.available() else 1
+        if len(todo) == 1 or workers <= 1:
+            done = {key: _convert(doc, timeout) for key, doc in todo.items()}
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(todo))) as ex:
+                futures = {key: ex.submit(_convert, doc, timeout) for key, doc in todo.items()}
+                done = {key: f.result() for key, f in futures.items()}
+        if use_cache:
+            _cache_set_many(done)
+        cached.update(done)
+    return [cached[keys[i] if keys else i] for i in range(len(docs))]
+
+
+def _convert(docx_bytes: bytes, timeout: int) -> bytes:
+    if office_pool.available():
+        try:
+            return office_pool.get_pool(_SOFFICE).convert(docx_bytes, timeout=timeout)
+        except office_pool.OfficeUnavailable:
+            log.warning("docx_to_pdf: пул LibreOffice недоступен — разовый soffice", exc_info=True)
+        except office_pool.OfficeError as e:
+            raise PdfConvertError(f"LibreOffice: {e}") from e
+    return _convert_oneshot(docx_bytes, timeout=timeout)
+
+
+def _convert_oneshot(docx_bytes: bytes, *, timeout: int = 120) -> bytes:
     """Конвертирует .docx в .pdf через `soffice --headless --convert-to pdf`.
 
     Каждый вызов использует отдельный UserInstallation-профиль, чтобы
@@ -0,0 +1,111 @@
+"""Конвертер DOCX → PDF поверх одного долгоживущего LibreOffice (UNO).
+
+Не Django-модуль: office_pool запускает его отдельным процессом под
+системным python3, в котором есть модуль `uno` (пакет python3-uno):
+
+    /usr/bin/python3 uno_worker.py <soffice> <profile_dir>
+
+Процесс поднимает свой soffice с UNO-листенером на именованном pipe и
+дальше держит его живым. Протокол — JSON-строки:
+  stdout  {"ready": true}                      — офис поднялся, можно слать;
+  stdin   {"src": "/tmp/…/a.docx", "dst": "/tmp/…/a.pdf"}
+  stdout  {"ok": true} | {"ok": false, "error": "…"}
+Если soffice умер — worker отвечает ошибкой и выходит; пул поднимет новый.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import uno  # noqa: I001 — есть только в системном python3 (python3-uno)
+from com.sun.star.beans import PropertyValue
+from com.sun.star.connection import NoConnectException
+
+CONNECT_TIMEOUT = 60
+
+
+def _prop(name, value):
+    prop = PropertyValue()
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+def _start_office(soffice, profile, pipe):
+    return subprocess.Popen(
+        [
+            soffice, "--headless", "--invisible", "--norestore", "--nologo",
+            "--nodefault", "--nolockcheck",
+            f"-env:UserInstallation=file://{profile}",
+            f"--accept=pipe,name={pipe};urp;StarOffice.ComponentContext",
+        ],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def _connect(office, pipe):
+    local = uno.getComponentContext()
+    resolver = local.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local,
+    )
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:pipe,name={pipe};urp;StarOffice.ComponentContext")
+            return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except NoConnectException:
+            if office.poll() is not None or time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+def _convert(desktop, src, dst):
+    doc = desktop.loadComponentFromURL(
+        uno.systemPathToFileUrl(src), "_blank", 0,
+        (_prop("Hidden", True), _prop("ReadOnly", True)),
+    )
+    if doc is None:
+        raise RuntimeError("LibreOffice не открыл документ")
+    try:
+        doc.storeToURL(
+            uno.systemPathToFileUrl(dst), (_prop("FilterName", "writer_pdf_Export"),),
+        )
+    finally:
+        doc.close(True)
+
+
+def _reply(payload):
+    sys.stdout.write(json.dumps(payload) + "\n")
+    sys.stdout.flush()
+
+
+def main():
+    soffice, profile = sys.argv[1], sys.argv[2]
+    pipe = f"siricrm_office_{os.getpid()}"
+    office = _start_office(soffice, profile, pipe)
+    try:
+        desktop = _connect(office, pipe)
+        _reply({"ready": True})
+        for line in sys.stdin:
+            req = json.loads(line)
+            try:
+                _convert(desktop, req["src"], req["dst"])
+            except Exception as exc:  # noqa: BLE001 — ответить и решить, живы ли
+                _reply({"ok": False, "error": f"{type(exc).__name__}: {exc}"})
+                if office.poll() is not None:
+                    return 1
+                continue
+            _reply({"ok": True})
+    finally:
+        if office.poll() is None:
+            office.terminate()
+            try:
+                office.wait(10)
+            except subprocess.TimeoutExpired:
+                office.kill()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Очередь скачивания документов дел с kad (ArbitrAttachment → S3).
+
+Раньше `_parse_one` качал не больше 5 PDF дела прямо в тике парсинга,
+по одному: скачал → залил в S3 → следующий. Хвост нескачанных документов
+копился неделями, а тик парсинга растягивался на минуты.
+
+Теперь парсинг только создаёт ArbitrAttachment (это и есть постановка в
+очередь), а качают отдельные download-тики runner'ов
+(`arbitr.kad_download_tick_<id>`, своя очередь arbitr_dl_<id>):
+
+  * `claim` атомарно (FOR UPDATE SKIP LOCKED) берёт до BATCH готовых
+    документов ОДНОГО дела — карточку на kad открываем один раз — и
+    резервирует их на RESERVE, чтобы другие runner'ы их не взяли;
+  * `take_budget` — лимит скачиваний на outbound IP в час
+    (ARBITR_DOWNLOAD_PER_IP_HOUR), отдельно от пауз парсинга;
+  * `run` качает PDF по очереди, а заливку в S3 отдаёт фоновому потоку
+    (`_Uploader`) — следующий PDF скачивается, пока предыдущий льётся;
+  * ошибка → download_attempts+1, download_error и backoff
+    (BACKOFF_BASE·2^n, не больше BACKOFF_MAX) в download_next_at; после
+    MAX_ATTEMPTS документ выпадает из очереди (виден на /arbitr/downloads/).
+
+Капча не считается попыткой: резерв снимается, документы сразу доступны
+runner'ам на других IP.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import ArbitrAttachment, ArbitrCase
+from .notifications import handle_captcha
+from .parsers.kad import KadCaptchaRequired, KadSession
+
+logger = logging.getLogger("arbitr")
+
+BATCH = getattr(settings, "ARBITR_DOWNLOAD_BATCH", 10)
+PER_IP_HOUR = getattr(settings, "ARBITR_DOWNLOAD_PER_IP_HOUR", 40)
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(minutes=15)
+BACKOFF_MAX = timedelta(hours=24)
+RESERVE = timedelta(minutes=30)
+# Сколько скачанных PDF может ждать заливки — дальше download ждёт upload
+# (тома дел бывают по сотне мегабайт, диск runner'а не резиновый).
+MAX_INFLIGHT_UPLOADS = 2
+
+
+def pending_qs():
+    """Документы, которые ещё предстоит скачать (включая ждущие backoff)."""
+    return ArbitrAttachment.objects.filter(
+        stored_file__isnull=True, is_locked=False,
+        download_attempts__lt=MAX_ATTEMPTS,
+    ).exclude(kad_url="")
+
+
+def ready_qs(now=None):
+    now = now or timezone.now()
+    return pending_qs().filter(
+        Q(download_next_at__isnull=True) | Q(download_next_at__lte=now),
+    )
+
+
+def claim(limit: int, *, now=None) -> list[ArbitrAttachment]:
+    """Забрать до `limit` готовых документов одного дела (самого давнего в очереди)."""
+    now = now or timezone.now()
+    if limit <= 0:
+        return []
+    order = (F("download_next_at").asc(nulls_first=True), "created_at")
+    with transaction.atomic():
+        head = (
+            ready_qs(now).select_for_update(skip_locked=True, of=("self",))
+            .order_by(*order).values_list("event__case_id", flat=True).first()
+        )
+        if head is None:
+            return []
+        atts = list(
+            ready_qs(now).filter(event__case_id=head)
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("event__case")
+            .order_by(*order)[:limit]
+        )
+        ArbitrAttachment.objects.filter(pk__in=[a.pk for a in atts]).update(
+            download_next_at=now + RESERVE,
+        )
+    return atts
+
+
+def release(atts) -> None:
+    """Снять резерв (капча/остановка) — документы снова готовы к скачиванию."""
+    ArbitrAttachment.objects.filter(pk__in=[a.pk for a in atts]).update(download_next_at=None)
+
+
+def _budget_key(ip: str) -> str:
+    return f"arbitr:download_budget:{ip or 'unknown'}:{timezone.now():%Y%m%d%H}"
+
+
+def take_budget(ip: str, n: int) -> int:
+    """Сколько из `n` скачиваний ещё разрешено IP в этом часу (и списать их)."""
+    key = _budget_key(ip)
+    cache.add(key, 0, timeout=3600)
+    used = cache.incr(key, n)
+    granted = max(0, min(n, PER_IP_HOUR - (used - n)))
+    if granted < n:
+        cache.decr(key, n - granted)
+    return granted
+
+
+def refund_budget(ip: str, n: int) -> None:
+    if n > 0:
+        try:
+            cache.decr(_budget_key(ip), n)
+        except ValueError:  # ключ истёк на границе часа
+            pass
+
+
+def mark_failed(att: ArbitrAttachment, error: str) -> None:
+    attempts = att.download_attempts + 1
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    ArbitrAttachment.objects.filter(pk=att.pk).update(
+        download_attempts=attempts,
+        download_error=error[:2000],
+        download_next_at=timezone.now() + delay,
+    )
+
+
+def _safe_name(att: ArbitrAttachment, content_type: str) -> str:
+    # Имя для S3 + StoredFile. Если kad name пустой — используем att.id.
+    ext = "pdf"
+    if "pdf" not in content_type.lower() and ".pdf" not in att.kad_url.lower():
+        ext = "bin"
+    safe_name = (att.name or f"document-{att.id}").strip()
+    if not safe_name.lower().endswith(f".{ext}"):
+        safe_name = f"{safe_name}.{ext}"
+    # StoredFile.filename = CharField(max_length=255). У kad заголовки
+    # документов бывают по 300+ символов («[Подписано] Отложить
+    # судебное разбирательство (ст.157, 158, 225_15 АПК)»+.pdf).
+    if len(safe_name) > 250:
+        head = safe_name[: 250 - len(ext) - 4]
+        safe_name = f"{head}….{ext}"
+    return safe_name
+
+
+def _store(case: ArbitrCase, att: ArbitrAttachment, pdf_path: str, content_type: str) -> bool:
+    """Залить скачанный PDF в S3 и отметить документ скачанным."""
+    from apps.files.dedup import store_stream  # лениво — кросс-аппный импорт
+
+    # Файл стримится с диска multipart-загрузкой — тома судебных дел
+    # бывают по сотне мегабайт, в память воркера их не читаем.
+    try:
+        with open(pdf_path, "rb") as f:
+            stored = store_stream(
+                f,
+                prefix=f"arbitr/{case.id}",
+                filename=_safe_name(att, content_type),
+                content_type=content_type,
+            )
+    except Exception as exc:  # noqa: BLE001
+        logger.exception("kad: S3 upload failed for att %s: %s", att.id, exc)
+        mark_failed(att, f"S3: {exc}")
+        return False
+    finally:
+        try:
+            os.remove(pdf_path)
+        except OSError:
+            pass
+
+    ArbitrAttachment.objects.filter(pk=att.pk).update(
+        stored_file=stored, downloaded_at=timezone.now(),
+        download_error="", download_next_at=None,
+    )
+    ArbitrCase.objects.filter(pk=case.pk).update(
+        attachments_downloaded=F("attachments_downloaded") + 1,
+    )
+    return True
+
+
+class _Uploader:
+    """Заливка в S3 в одном фоновом потоке, пока скачивается следующий PDF.
+
+    Скачанный файл сразу уезжает из папки загрузок Chrome в свою временную
+    папку: download_pdf_file чистит папку загрузок перед каждым скачиванием
+    и удалил бы PDF, ещё ждущие заливки.
+    """
+
+    def __init__(self, case: ArbitrCase):
+        self.case = case
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="arbitr-upload")
+        self._futures = []
+        # Рядом с папкой загрузок KadSession (тоже mkdtemp) — os.replace без копирования.
+        self._dir = tempfile.mkdtemp(prefix="arbitr_upload_")
+
+    def submit(self, att: ArbitrAttachment, pdf_path: str, content_type: str) -> None:
+        inflight = [f for f in self._futures if not f.done()]
+        if len(inflight) >= MAX_INFLIGHT_UPLOADS:
+            wait(inflight, return_when=FIRST_COMPLETED)
+        path = os.path.join(self._dir, f"{att.id}{os.path.splitext(pdf_path)[1]}")
+        os.replace(pdf_path, path)
+        self._futures.append(
+            self._pool.submit(_store, self.case, att, path, content_type),
+        )
+
+    def close(self) -> tuple[int, int]:
+        """Дождаться заливок; вернуть (ok, failed)."""
+        # Соединение с БД у потока своё — закрываем его в том же потоке.
+        self._pool.submit(lambda: connection.close())
+        self._pool.shutdown(wait=True)
+        shutil.rmtree(self._dir, ignore_errors=True)
+        results = [f.result() for f in self._futures]
+        return sum(results), len(results) - sum(results)
+
+
+def run(dl: KadSession, case: ArbitrCase, atts: list, *,
+        source_cookies: list, runner_ip: str = "") -> dict:
+    """Скачать зарезервированные `atts` дела `case` открытой download-сессией.
+
+    Captcha — снимаем резерв с нескачанных, включаем cooldown IP
+    (handle_captcha) и поднимаем выше.
+    Возвращает {'ok': N, 'failed': M}.
+    """
+    if source_cookies:
+        dl.load_kad_cookies(source_cookies)
+    # Активируем kad-trust открытием карточки. В download_mode warmup-
+    # поиск сломан (PDF prefs детектятся anti-bot'ом), но с cookies
+    # main-сессии прямой GET карточки работает.
+    dl.driver.get(case.kad_url)
+    time.sleep(3)
+    try:
+        dl._raise_if_captcha()  # noqa: SLF001
+    except KadCaptchaRequired:
+        release(atts)
+        handle_captcha(case, page_url=case.kad_url, ip=runner_ip)
+        raise
+
+    uploader = _Uploader(case)
+    failed = 0
+    try:
+        for i, att in enumerate(atts):
+            try:
+                pdf_path, content_type = dl.download_pdf_file(
+                    att.kad_url, referer=case.kad_url,
+                )
+            except KadCaptchaRequired:
+                release(atts[i:])
+                handle_captcha(case, page_url=att.kad_url, ip=runner_ip)
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.warning(
+                    "kad: PDF не скачался (att=%s url=%s): %s",
+                    att.id, att.kad_url, exc,
+                )
+                mark_failed(att, str(exc))
+                failed += 1
+                continue
+            try:
+                uploader.submit(att, pdf_path, content_type)
+            except OSError as exc:
+                logger.warning("kad: PDF не перенесён в очередь заливки (att=%s): %s", att.id, exc)
+                mark_failed(att, f"local: {exc}")
+                failed += 1
+    finally:
+        ok, upload_failed = uploader.close()
+    return {"ok": ok, "failed": failed + upload_failed}
+
+
+def backlog() -> dict:
+    """Сводка очереди для /arbitr/downloads/ и панели статуса парсера."""
+    now = timezone.now()
+    since = now - timedelta(hours=24)
+    agg = ArbitrAttachment.objects.aggregate(
+        done=Count("pk", filter=Q(stored_file__isnull=False)),
+        done_24h=Count("pk", filter=Q(downloaded_at__gte=since)),
+        locked=Count("pk", filter=Q(stored_file__isnull=True, is_locked=True)),
+        gave_up=Count("pk", filter=Q(
+            stored_file__isnull=True, is_locked=False,
+            download_attempts__gte=MAX_ATTEMPTS,
+        )),
+    )
+    queue = pending_qs().aggregate(
+        pending=Count("pk"),
+        ready=Count("pk", filter=Q(download_next_at__isnull=True) | Q(download_next_at__lte=now)),
+        retrying=Count("pk", filter=Q(download_attempts__gt=0)),
+    )
+    return {**agg, **queue}
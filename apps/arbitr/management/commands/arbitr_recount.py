@@ -0,0 +1,30 @@
+"""Пересчитать денормализованные счётчики дел (events_count, attachments_*,
+last_log_*) по фактическим данным и обновить снимок статуса парсера.
+
+Нужно после ручных правок событий/документов в админке или удаления
+лога — инкрементальные счётчики в tasks.py об этом не знают.
+
+  python manage.py arbitr_recount                  # все дела
+  python manage.py arbitr_recount --case <uuid>    # одно дело
+"""
+from django.core.management.base import BaseCommand
+
+from apps.arbitr import stats
+from apps.arbitr.models import ArbitrCase
+
+
+class Command(BaseCommand):
+    help = "Пересчитать счётчики арбитражных дел и снимок статуса парсера."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--case", default="",
+            help="UUID дела. Без флага — пересчитать все.",
+        )
+
+    def handle(self, *args, **opts):
+        case_id = opts["case"].strip()
+        qs = ArbitrCase.objects.filter(pk=case_id) if case_id else None
+        n = stats.recount_cases(qs)
+        stats.refresh_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано дел: {n}"))
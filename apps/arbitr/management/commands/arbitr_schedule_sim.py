@@ -0,0 +1,140 @@
+"""Сравнить расписания парсинга kad на истории: «раз в 24ч» против
+адаптивного scheduler.py.
+
+Слоты запросов — реальные обращения runner'ов к карточкам дел из
+ArbitrCheckLog за последние --days дней (успешный парсинг, ошибка,
+капча). В каждый слот политика выбирает одно готовое дело и «парсит» его:
+находит события, которые к этому моменту уже были на kad. Момент
+появления события — event_date (вечер того же дня), но не позже, чем мы
+его реально увидели (parsed_at). Если готовых дел нет — слот простаивает
+(запрос к kad сэкономлен).
+
+Печатает для каждой политики: потраченные запросы, найденные события,
+событий на запрос и задержку обнаружения.
+
+  python manage.py arbitr_schedule_sim
+  python manage.py arbitr_schedule_sim --days 30
+"""
+from datetime import datetime, time as dtime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.arbitr import scheduler
+from apps.arbitr.models import ArbitrCase, ArbitrCheckLog, ArbitrEvent
+
+OLD_INTERVAL = timedelta(hours=24)
+# kad выкладывает события дня к вечеру.
+APPEAR_AT = dtime(18, 0)
+
+
+def _load():
+    """{case_id: [(appear_at, event_date, text), ...]} по делам с kad_url."""
+    case_ids = set(
+        ArbitrCase.objects.exclude(kad_url="").values_list("pk", flat=True)
+    )
+    events: dict = {pk: [] for pk in case_ids}
+    rows = ArbitrEvent.objects.filter(case_id__in=case_ids).values_list(
+        "case_id", "event_date", "parsed_at", "kind", "title", "description",
+    )
+    for case_id, event_date, parsed_at, kind, title, descr in rows.iterator():
+        appear = parsed_at
+        if event_date:
+            appear = min(parsed_at, timezone.make_aware(datetime.combine(event_date, APPEAR_AT)))
+        events[case_id].append((appear, event_date, f"{kind} {title} {descr}"))
+    for items in events.values():
+        items.sort(key=lambda e: e[0])
+    return events
+
+
+def _slots(start, end):
+    return list(
+        ArbitrCheckLog.objects.filter(ts__gte=start, ts__lt=end)
+        .exclude(case__case_number="")
+        .filter(
+            Q(notes__startswith="events=")
+            | Q(state__in=[ArbitrCheckLog.STATE_ERROR, ArbitrCheckLog.STATE_CAPTCHA])
+        )
+        .order_by("ts").values_list("ts", flat=True)
+    )
+
+
+def _simulate(events, slots, start, *, adaptive: bool) -> dict:
+    # Состояние дела: [next_at, priority, сколько событий уже известно].
+    state = {}
+    for case_id, items in events.items():
+        known = sum(1 for appear, _, _ in items if appear < start)
+        state[case_id] = [start, scheduler.UNKNOWN_PRIORITY if adaptive else 0.0, known]
+
+    requests = detected = 0
+    delays = []
+    for ts in slots:
+        ready = [(cid, st) for cid, st in state.items() if st[0] <= ts]
+        if not ready:
+            continue
+        if adaptive:
+            case_id, st = min(ready, key=lambda r: (-r[1][1], r[1][0]))
+        else:
+            case_id, st = min(ready, key=lambda r: r[1][0])
+        items = events[case_id]
+        visible = st[2]
+        while visible < len(items) and items[visible][0] <= ts:
+            delays.append((ts - items[visible][0]).total_seconds() / 3600)
+            visible += 1
+        requests += 1
+        detected += visible - st[2]
+        st[2] = visible
+        if adaptive:
+            today = timezone.localdate(ts)
+            sig = scheduler.signals_from_events(
+                [(d, text) for _, d, text in items[:visible]][-scheduler.EVENTS_LOOKBACK:],
+                today,
+            )
+            st[0], st[1] = scheduler.plan(sig, ts)
+        else:
+            st[0] = ts + OLD_INTERVAL
+
+    end = slots[-1] if slots else start
+    missed = sum(
+        1 for case_id, items in events.items()
+        for appear, _, _ in items[state[case_id][2]:] if start <= appear <= end
+    )
+    delays.sort()
+    return {
+        "requests": requests,
+        "idle": len(slots) - requests,
+        "detected": detected,
+        "missed": missed,
+        "per_request": detected / requests if requests else 0.0,
+        "delay_avg": sum(delays) / len(delays) if delays else 0.0,
+        "delay_p90": delays[int(len(delays) * 0.9)] if delays else 0.0,
+    }
+
+
+class Command(BaseCommand):
+    help = "Симуляция расписания парсинга kad на истории ArbitrCheckLog: 24ч vs адаптивное."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=60, help="Глубина истории, дней")
+
+    def handle(self, *args, **opts):
+        end = timezone.now()
+        start = end - timedelta(days=opts["days"])
+        events = _load()
+        slots = _slots(start, end)
+        self.stdout.write(
+            f"Дел: {len(events)}  слотов запросов: {len(slots)}  "
+            f"событий в окне: {sum(1 for items in events.values() for e in items if e[0] >= start)}"
+        )
+        if not slots:
+            self.stdout.write(self.style.WARNING("В окне нет обращений к kad — нечего воспроизводить."))
+            return
+        for name, adaptive in (("24ч", False), ("адаптивное", True)):
+            r = _simulate(events, slots, start, adaptive=adaptive)
+            self.stdout.write(
+                f"{name:>10}: запросов {r['requests']:>5} (простой {r['idle']:>5})  "
+                f"найдено {r['detected']:>4}  не найдено {r['missed']:>4}  "
+                f"событий/запрос {r['per_request']:.3f}  "
+                f"задержка ср. {r['delay_avg']:.1f}ч p90 {r['delay_p90']:.1f}ч"
+            )
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:29
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(qs, field):
+    return Coalesce(
+        Subquery(qs.values(field).annotate(n=Count("pk")).values("n")[:1],
+                 output_field=IntegerField()),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    """Заполнить счётчики по текущим данным (= stats.recount_cases)."""
+    ArbitrCase = apps.get_model("arbitr", "ArbitrCase")
+    ArbitrEvent = apps.get_model("arbitr", "ArbitrEvent")
+    ArbitrAttachment = apps.get_model("arbitr", "ArbitrAttachment")
+    ArbitrCheckLog = apps.get_model("arbitr", "ArbitrCheckLog")
+    last_log = ArbitrCheckLog.objects.filter(case=OuterRef("pk")).order_by("-ts")
+    atts = ArbitrAttachment.objects.filter(event__case=OuterRef("pk"))
+    ArbitrCase.objects.update(
+        events_count=_count(ArbitrEvent.objects.filter(case=OuterRef("pk")), "case"),
+        attachments_count=_count(atts, "event__case"),
+        attachments_downloaded=_count(atts.filter(stored_file__isnull=False), "event__case"),
+        last_log_state=Coalesce(Subquery(last_log.values("state")[:1]), Value("")),
+        last_log_at=Subquery(last_log.values("ts")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbitr', '0003_arbitrcase_next_parse_at_arbitrcase_next_search_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='attachments_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Документов'),
+        ),
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='attachments_downloaded',
+            field=models.PositiveIntegerField(default=0, verbose_name='Документов скачано'),
+        ),
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='events_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Событий'),
+        ),
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='last_log_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последней записи лога'),
+        ),
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='last_log_state',
+            field=models.CharField(blank=True, max_length=16, verbose_name='Результат последней записи лога'),
+        ),
+        migrations.AddIndex(
+            model_name='arbitrchecklog',
+            index=models.Index(fields=['case', '-ts'], name='arbitr_arbi_case_id_68d561_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='arbitrchecklog',
+            index=models.Index(fields=['ts'], name='arbitr_arbi_ts_757c63_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbitr', '0004_arbitrcase_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arbitrcase',
+            name='parse_priority',
+            field=models.FloatField(default=1.0, verbose_name='Приоритет парсинга'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arbitr', '0005_arbitrcase_parse_priority'),
+        ('files', '0006_storedfile_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arbitrattachment',
+            name='download_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток скачать'),
+        ),
+        migrations.AddField(
+            model_name='arbitrattachment',
+            name='download_error',
+            field=models.TextField(blank=True, verbose_name='Последняя ошибка скачивания'),
+        ),
+        migrations.AddField(
+            model_name='arbitrattachment',
+            name='download_next_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Следующая попытка не раньше'),
+        ),
+        migrations.AddField(
+            model_name='arbitrattachment',
+            name='downloaded_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Скачан'),
+        ),
+        migrations.AddIndex(
+            model_name='arbitrattachment',
+            index=models.Index(condition=models.Q(('is_locked', False), ('stored_file__isnull', True)), fields=['download_next_at', 'created_at'], name='arbitr_att_download_queue'),
+        ),
+    ]
@@ -93,15 +93,29 @@ class ArbitrCase(models.Model):
     )
     # Расписание следующих обращений к kad (для smart-throttle):
     # next_search_at — когда можно следующий раз искать по ФИО (для SEARCHING).
-    #   Заполняется по результату: hit → +24ч, miss → +3ч.
+    #   Заполняется по результату: hit → +24ч, miss → +3ч (+12ч для старых исков).
     # next_parse_at  — когда можно следующий раз парсить карточку (для MONITORING).
-    #   Заполняется после _parse_one: now + 24ч (правило «не чаще 1 раз/сутки»).
+    #   Заполняется после _parse_one по оценке scheduler.plan_parse
+    #   (12ч..7д в зависимости от активности дела и дат заседаний).
     next_search_at = models.DateTimeField(
         "Следующий поиск не раньше", null=True, blank=True,
     )
     next_parse_at = models.DateTimeField(
         "Следующий парсинг не раньше", null=True, blank=True,
     )
+    # λ из scheduler.plan_parse — ожидаемых событий в сутки. Из готовых к
+    # парсингу runner берёт дело с наибольшим; новое дело — первым.
+    parse_priority = models.FloatField("Приоритет парсинга", default=1.0)
+
+    # Денормализованные счётчики для /arbitr/ (раньше — Count(distinct) по
+    # событиям/файлам и check_logs.first() на каждое дело). Ведутся в
+    # tasks._persist_case_info / downloads._store и log_check; пересчёт с нуля —
+    # stats.recount_cases (команда arbitr_recount).
+    events_count = models.PositiveIntegerField("Событий", default=0)
+    attachments_count = models.PositiveIntegerField("Документов", default=0)
+    attachments_downloaded = models.PositiveIntegerField("Документов скачано", default=0)
+    last_log_state = models.CharField("Результат последней записи лога", max_length=16, blank=True)
+    last_log_at = models.DateTimeField("Время последней записи лога", null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -120,6 +134,15 @@ class ArbitrCase(models.Model):
         ident = self.case_number or "(без номера)"
         return f"{ident} · {self.get_status_display()}"
 
+    def log_check(self, state: str, *, duration_ms: int = 0, notes: str = "") -> "ArbitrCheckLog":
+        """Записать ArbitrCheckLog и обновить last_log_* дела (без save() всего дела)."""
+        log = ArbitrCheckLog.objects.create(
+            case=self, state=state, duration_ms=duration_ms, notes=notes,
+        )
+        ArbitrCase.objects.filter(pk=self.pk).update(last_log_state=state, last_log_at=log.ts)
+        self.last_log_state, self.last_log_at = state, log.ts
+        return log
+
 
 class ArbitrEvent(models.Model):
     """Событие/документ в карточке дела на kad.
@@ -192,11 +215,27 @@ class ArbitrAttachment(models.Model):
         "Закрытый файл (требует ЭЦП)", default=False,
         help_text="Если так — файл не скачивался, доступ по запросу",
     )
+    # Состояние в очереди скачивания (downloads.py): парсинг только создаёт
+    # документ, качают download-тики runner'ов. Ошибка → backoff по
+    # download_next_at, после downloads.MAX_ATTEMPTS попыток — не трогаем.
+    download_attempts = models.PositiveSmallIntegerField("Попыток скачать", default=0)
+    download_error = models.TextField("Последняя ошибка скачивания", blank=True)
+    download_next_at = models.DateTimeField(
+        "Следующая попытка не раньше", null=True, blank=True,
+    )
+    downloaded_at = models.DateTimeField("Скачан", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         verbose_name = "Документ дела"
         verbose_name_plural = "Документы дел"
+        indexes = [
+            models.Index(
+                fields=["download_next_at", "created_at"],
+                condition=models.Q(stored_file__isnull=True, is_locked=False),
+                name="arbitr_att_download_queue",
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -231,6 +270,10 @@ class ArbitrCheckLog(models.Model):
         verbose_name = "Лог проверки дела"
         verbose_name_plural = "Логи проверок дел"
         ordering = ["-ts"]
+        indexes = [
+            models.Index(fields=["case", "-ts"]),
+            models.Index(fields=["ts"]),
+        ]
 
     def __str__(self):
         return f"{self.ts:%Y-%m-%d %H:%M} · {self.get_state_display()}"
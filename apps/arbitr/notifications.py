@@ -21,7 +21,8 @@ def send_parsed_alert(
     duration_sec: int,
 ) -> bool:
     """После успешного парсинга шлёт в MAX короткую сводку:
-    «А12-…/2025 — Иванов И. И. · скачано 3 новых записей, 1 новый файл · 67с»
+    «А12-…/2025 — Иванов И. И. · 3 новых записи, 1 новый документ · 67с»
+    Документы к этому моменту только в очереди скачивания (downloads.py).
     """
     chat_id = (settings.ARBITR_CAPTCHA_NOTIFY_MAX_CHAT_ID or "").strip()
     token = (settings.MAX_BOT_TOKEN or "").strip()
@@ -39,7 +40,7 @@ def send_parsed_alert(
     case_number = case.case_number or "(номер не указан)"
     text = (
         f"✅ {case_number} · {fio}\n"
-        f"Скачано: {new_events} нов. записей, {new_files} нов. файл(ов) · {duration_sec}с"
+        f"Новое: {new_events} записей, {new_files} документ(ов) в очередь · {duration_sec}с"
     )
     ok, _msg_id, err = send_max_message(
         access_token=token, chat_id=chat_id, text=text,
@@ -246,6 +246,19 @@ class KadSession:
                     pass
         return False
 
+    def is_alive(self) -> bool:
+        """Health-check для долгоживущих сессий (см. arbitr/session_pool.py).
+
+        Дёшево: один execute_script без навигации. False если driver уже
+        закрыт, chromedriver умер или Chrome-вкладка крашнулась.
+        """
+        if self.driver is None:
+            return False
+        try:
+            return self.driver.execute_script("return 1;") == 1
+        except Exception:  # noqa: BLE001 — любой WebDriverException = мёртв
+            return False
+
     # ---------- внутренние ----------
 
     def load_kad_cookies(self, cookies: list) -> None:
@@ -900,7 +913,26 @@ class KadSession:
     def download_pdf(
         self, url: str, timeout: int = 60, *, referer: str = "",
     ) -> tuple[bytes, str]:
-        """Скачивает PDF kad через эту Chrome-сессию.
+        """Скачивает PDF kad целиком в память — см. `download_pdf_file`.
+
+        Возвращает (content_bytes, 'application/pdf').
+        """
+        pdf_path, content_type = self.download_pdf_file(
+            url, timeout, referer=referer,
+        )
+        try:
+            with open(pdf_path, "rb") as f:
+                return f.read(), content_type
+        finally:
+            try:
+                os.remove(pdf_path)
+            except OSError:
+                pass
+
+    def download_pdf_file(
+        self, url: str, timeout: int = 60, *, referer: str = "",
+    ) -> tuple[str, str]:
+        """Скачивает PDF kad через эту Chrome-сессию в download-папку.
 
         Требует `KadSession(download_mode=True)` — иначе PDF откроется в
         PDF.js viewer'е, а не скачается на диск. Также требует чтобы перед
@@ -913,7 +945,9 @@ class KadSession:
         (cookies + JS-state от загруженной карточки). Прямой navigate на
         /Kad/PdfDocument/... → ПравоКапча.
 
-        Возвращает (content_bytes, 'application/pdf').
+        Возвращает (путь к файлу, 'application/pdf'). Файл не читается в
+        память — вызывающий стримит его (например, в S3) и удаляет сам;
+        иначе его подчистит следующее скачивание.
         """
         if not self.download_mode:
             raise KadParserError(
@@ -990,22 +1024,23 @@ class KadSession:
                     f"title={self.driver.title!r})"
                 )
 
+            # Грубая проверка что это PDF — по первым байтам, не читая файл.
             with open(pdf_path, "rb") as f:
-                content = f.read()
-            try:
-                os.remove(pdf_path)
-            except OSError:
-                pass
-
-            # Грубая проверка что это PDF
-            if not content[:5].startswith(b"%PDF-"):
-                head = content[:300].decode("utf-8", errors="ignore")
+                head_bytes = f.read(300)
+            if not head_bytes.startswith(b"%PDF-"):
+                try:
+                    os.remove(pdf_path)
+                except OSError:
+                    pass
+                head = head_bytes.decode("utf-8", errors="ignore")
                 if self._is_captcha_response(head):
                     raise KadCaptchaRequired(page_url=url)
                 raise KadParserError(f"Скачанный файл не PDF (head={head!r})")
 
-            logger.info("kad.download_pdf: OK len=%d", len(content))
-            return content, "application/pdf"
+            logger.info(
+                "kad.download_pdf: OK len=%d", os.path.getsize(pdf_path),
+            )
+            return pdf_path, "application/pdf"
         finally:
             # Закрываем все вкладки кроме исходной (main_handle)
             try:
@@ -0,0 +1,167 @@
+"""Адаптивное расписание проверок дел на kad.
+
+Раньше каждое дело в MONITORING парсилось раз в 24ч, а runner брал из
+готовых самое «просроченное». Запрос к kad дорогой (капча → 12ч простоя
+IP), а большинство дел неделями стоят без движения. Здесь для дела
+оценивается интенсивность появления событий λ (событий в сутки) по тому,
+что уже лежит в ArbitrEvent:
+
+  * давность последнего события — чем дольше тишина, тем ниже λ;
+  * активность — событий за последние ACTIVITY_DAYS;
+  * стадия — после завершения процедуры / прекращения дело почти не
+    движется (FINAL_RE);
+  * даты заседаний из текста событий — после заседания на kad почти
+    наверняка появится протокол/определение.
+
+Следующая проверка ставится через TARGET_EVENTS / λ (в пределах
+ARBITR_PARSE_MIN_HOURS..ARBITR_PARSE_MAX_HOURS), но не позже чем
+HEARING_LAG после ближайшего заседания; если заседание прошло, а событий
+после него ещё нет — через минимальный интервал. λ сохраняется в
+ArbitrCase.parse_priority, и из нескольких готовых дел runner берёт
+самое «живое».
+
+Ядро (`signals_from_events`, `rate`, `plan`) — чистые функции, их же
+гоняет симуляция `manage.py arbitr_schedule_sim` на истории.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+# Интервалы для веток без оценки (ошибки, поиск по ФИО).
+RETRY_AFTER_ERROR = timedelta(hours=1)
+RETRY_AFTER_BROKEN = timedelta(hours=24)  # нет kad_url / парсер не реализован
+SEARCH_HIT_INTERVAL = timedelta(hours=24)
+SEARCH_MISS_INTERVAL = timedelta(hours=3)
+# Иск не появился на kad за две недели — дальше ищем реже.
+SEARCH_MISS_SLOW_AFTER = timedelta(days=14)
+SEARCH_MISS_SLOW_INTERVAL = timedelta(hours=12)
+
+MIN_INTERVAL = timedelta(hours=getattr(settings, "ARBITR_PARSE_MIN_HOURS", 12))
+MAX_INTERVAL = timedelta(hours=getattr(settings, "ARBITR_PARSE_MAX_HOURS", 168))
+
+# Сколько ожидаемых новых событий должно накопиться к проверке.
+TARGET_EVENTS = 0.5
+# Фон: обычное дело получает событие примерно раз в две недели.
+BASE_RATE = 1 / 14
+# За сколько дней тишины фон падает вдвое.
+QUIET_HALF_DAYS = 30
+ACTIVITY_DAYS = 30
+FINAL_FACTOR = 0.1
+# Когда после заседания на kad появляется его результат.
+HEARING_LAG = timedelta(days=1)
+# Сколько дней после заседания ждём его результат с минимальным интервалом.
+HEARING_PENDING_DAYS = 5
+# Дело без оценки (новое в мониторинге) — проверить первым; = default поля.
+UNKNOWN_PRIORITY = 1.0
+# Сколько последних событий смотреть (даты заседаний — в свежих).
+EVENTS_LOOKBACK = 50
+
+HEARING_RE = re.compile(
+    r"(?:заседани|слушани)\D{0,80}?(\d{2}\.\d{2}\.\d{4})", re.IGNORECASE,
+)
+FINAL_RE = re.compile(
+    r"о завершении|прекращ|без рассмотрения|возвращении заявлени|"
+    r"освобождени\w* от (?:дальнейшего )?исполнения",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class CaseSignals:
+    last_event: date | None = None
+    events_recent: int = 0
+    next_hearing: date | None = None
+    last_hearing: date | None = None
+    final: bool = False
+
+
+def _hearing_dates(text: str) -> list[date]:
+    out = []
+    for raw in HEARING_RE.findall(text or ""):
+        try:
+            out.append(datetime.strptime(raw, "%d.%m.%Y").date())
+        except ValueError:
+            continue
+    return out
+
+
+def signals_from_events(events: Iterable[tuple[date | None, str]], today: date) -> CaseSignals:
+    """Признаки дела по его событиям `(event_date, текст)` на дату `today`."""
+    sig = CaseSignals()
+    latest_text = ""
+    for event_date, text in events:
+        if event_date and event_date <= today:
+            if sig.last_event is None or event_date >= sig.last_event:
+                sig.last_event, latest_text = event_date, text
+            if (today - event_date).days <= ACTIVITY_DAYS:
+                sig.events_recent += 1
+        for hearing in _hearing_dates(text):
+            if hearing >= today:
+                if sig.next_hearing is None or hearing < sig.next_hearing:
+                    sig.next_hearing = hearing
+            elif sig.last_hearing is None or hearing > sig.last_hearing:
+                sig.last_hearing = hearing
+    sig.final = bool(FINAL_RE.search(latest_text))
+    return sig
+
+
+def _hearing_pending(sig: CaseSignals, today: date) -> bool:
+    """Заседание прошло недавно, а событий после него ещё нет."""
+    if sig.last_hearing is None or (today - sig.last_hearing).days > HEARING_PENDING_DAYS:
+        return False
+    return sig.last_event is None or sig.last_event < sig.last_hearing
+
+
+def rate(sig: CaseSignals, today: date) -> float:
+    """Оценка λ — ожидаемых новых событий в сутки."""
+    quiet_days = (today - sig.last_event).days if sig.last_event else 0
+    background = BASE_RATE * QUIET_HALF_DAYS / (QUIET_HALF_DAYS + max(quiet_days, 0))
+    lam = max(background, sig.events_recent / ACTIVITY_DAYS)
+    if sig.final:
+        lam *= FINAL_FACTOR
+    if _hearing_pending(sig, today):
+        lam = max(lam, TARGET_EVENTS / (MIN_INTERVAL.total_seconds() / 86400))
+    return lam
+
+
+def plan(sig: CaseSignals, now: datetime) -> tuple[datetime, float]:
+    """(когда проверять следующий раз, приоритет) для дела с признаками `sig`."""
+    today = timezone.localdate(now)
+    lam = rate(sig, today)
+    interval = timedelta(days=TARGET_EVENTS / lam) if lam > 0 else MAX_INTERVAL
+    interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+    next_at = now + interval
+    if sig.next_hearing is not None:
+        hearing_at = timezone.make_aware(
+            datetime.combine(sig.next_hearing, datetime.min.time()),
+        ) + HEARING_LAG
+        next_at = min(next_at, max(hearing_at, now + MIN_INTERVAL))
+    return next_at, round(lam, 4)
+
+
+def plan_parse(case, *, now: datetime | None = None) -> tuple[datetime, float]:
+    """Следующий парсинг дела по его событиям в БД (один запрос)."""
+    now = now or timezone.now()
+    rows = (
+        case.events.order_by("-event_date", "-parsed_at")
+        .values_list("event_date", "kind", "title", "description")[:EVENTS_LOOKBACK]
+    )
+    events = [(d, f"{kind} {title} {descr}") for d, kind, title, descr in rows]
+    return plan(signals_from_events(events, timezone.localdate(now)), now)
+
+
+def next_search_at(case, *, hit: bool, now: datetime) -> datetime:
+    """Следующий поиск по ФИО: hit — раз в сутки (ждём выбора сотрудника),
+    miss — часто, пока иск свежий, потом реже."""
+    if hit:
+        return now + SEARCH_HIT_INTERVAL
+    if case.created_at and now - case.created_at > SEARCH_MISS_SLOW_AFTER:
+        return now + SEARCH_MISS_SLOW_INTERVAL
+    return now + SEARCH_MISS_INTERVAL
+
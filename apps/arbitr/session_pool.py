@@ -0,0 +1,157 @@
+"""Пул тёплых Chrome-сессий kad для arbitr-runner'а.
+
+Раньше каждый тик `_kad_smart_one` поднимал новый `KadSession()` (Chrome +
+chromedriver) и прогревал его поиском, а `_download_new_attachments` —
+ещё один в download_mode. Большая часть тика уходила на старт браузера.
+
+Теперь в процессе runner'а (--concurrency=1, один процесс = одна очередь
+arbitr_<id>) живут две долгоживущие сессии — main (search/parse) и
+download (PDF prefs). Между тиками они не закрываются.
+
+Пересоздание (recycle):
+  * после ARBITR_SESSION_MAX_CASES дел или ARBITR_SESSION_MAX_AGE_MINUTES
+    жизни — Chrome со временем пухнет по памяти;
+  * если health-check (`KadSession.is_alive`) не прошёл — упал
+    chromedriver / вкладка;
+  * если сменился outbound IP runner'а (rotator) — cookies kad привязаны
+    к IP, прогрев на старом IP бесполезен;
+  * на капче и на любом исключении внутри `lease()` — сессия «грязная».
+
+Использование:
+    pool = session_pool.get_pool()
+    with pool.lease(runner_ip) as kad:     # тёплый main
+        kad.parse_case(url)
+        dl = pool.download()               # тёплый download
+        dl.download_pdf(...)
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from celery.signals import worker_process_shutdown
+from django.conf import settings
+
+from .parsers.kad import KadSession
+
+logger = logging.getLogger("arbitr")
+
+
+class KadSessionPool:
+    """Main + download KadSession одного процесса runner'а."""
+
+    def __init__(self, *, max_cases: int, max_age_s: int):
+        self.max_cases = max_cases
+        self.max_age_s = max_age_s
+        self._main: Optional[KadSession] = None
+        self._download: Optional[KadSession] = None
+        self._ip = ""
+        self._started_at = 0.0
+        self._uses = 0
+
+    # ---------- жизненный цикл ----------
+
+    @staticmethod
+    def _open(*, download_mode: bool) -> KadSession:
+        return KadSession(download_mode=download_mode).__enter__()
+
+    @staticmethod
+    def _quit(session: Optional[KadSession]) -> None:
+        if session is None:
+            return
+        try:
+            session.__exit__(None, None, None)
+        except Exception as exc:  # noqa: BLE001 — закрываем best-effort
+            logger.debug("kad pool: quit error: %s", exc)
+
+    def discard(self, reason: str = "") -> None:
+        """Закрывает обе сессии — следующий lease() поднимет новые."""
+        if self._main is None and self._download is None:
+            return
+        logger.info(
+            "kad pool: recycle (reason=%s uses=%d age=%ds)",
+            reason or "-", self._uses, int(time.monotonic() - self._started_at),
+        )
+        self._quit(self._main)
+        self._quit(self._download)
+        self._main = None
+        self._download = None
+        self._uses = 0
+
+    def _expired(self) -> str:
+        """Причина recycle или '' если main ещё годен."""
+        if self._uses >= self.max_cases:
+            return "max_cases"
+        if time.monotonic() - self._started_at >= self.max_age_s:
+            return "max_age"
+        if not self._main.is_alive():
+            return "dead"
+        if self._download is not None and not self._download.is_alive():
+            # download отдельно — main при этом ещё тёплый, не трогаем.
+            self._quit(self._download)
+            self._download = None
+        return ""
+
+    def main(self, runner_ip: str = "") -> KadSession:
+        """Тёплая (или новая) main-сессия для search/parse."""
+        if self._main is not None:
+            reason = "ip_changed" if runner_ip != self._ip else self._expired()
+            if reason:
+                self.discard(reason)
+        if self._main is None:
+            self._main = self._open(download_mode=False)
+            self._ip = runner_ip
+            self._started_at = time.monotonic()
+            self._uses = 0
+        return self._main
+
+    def download(self) -> KadSession:
+        """Download-сессия (PDF prefs), живёт столько же, сколько main.
+
+        Cookies main-сессии вызывающий код подгружает сам
+        (`load_kad_cookies`) — они обновляются kad'ом по ходу работы.
+        """
+        if self._download is None:
+            self._download = self._open(download_mode=True)
+        return self._download
+
+    @contextmanager
+    def lease(self, runner_ip: str = "") -> Iterator[KadSession]:
+        """Выдаёт main-сессию на одно дело; исключение → recycle."""
+        kad = self.main(runner_ip)
+        try:
+            yield kad
+        except BaseException as exc:
+            self.discard(type(exc).__name__)
+            raise
+        if self._main is kad:  # внутри могли сделать discard (капча)
+            self._uses += 1
+
+
+_pool: Optional[KadSessionPool] = None
+
+
+def get_pool() -> KadSessionPool:
+    """Пул текущего процесса (ленивый — Chrome стартует при первом lease)."""
+    global _pool
+    if _pool is None:
+        _pool = KadSessionPool(
+            max_cases=settings.ARBITR_SESSION_MAX_CASES,
+            max_age_s=settings.ARBITR_SESSION_MAX_AGE_MINUTES * 60,
+        )
+    return _pool
+
+
+def shutdown(**_kwargs) -> None:
+    """Гасит Chrome при выходе процесса (иначе остаются сироты chromedriver)."""
+    if _pool is not None:
+        _pool.discard("shutdown")
+
+
+atexit.register(shutdown)
+# Prefork-child Celery выходит через os._exit (--max-tasks-per-child) —
+# atexit не срабатывает, а этот сигнал — да.
+worker_process_shutdown.connect(shutdown, weak=False)
@@ -0,0 +1,114 @@
+"""Агрегаты для страницы /arbitr/: счётчики дел и снимок статуса парсера.
+
+Счётчики (ArbitrCase.events_count / attachments_count /
+attachments_downloaded / last_log_*) ведутся инкрементально в tasks.py;
+`recount_cases` пересобирает их с нуля (команда arbitr_recount — после
+ручных правок в админке; тот же расчёт заполнил их в миграции 0004).
+
+Панель статуса парсера HTMX поллит раз в 5 сек. Тяжёлая часть (статистика
+логов за 24ч, очереди готовых к поиску/парсингу и документов к скачиванию,
+последние разобранные дела) считается не на каждый поллинг, а пишется runner'ами в кэш после
+каждого тика (`refresh_snapshot`, не чаще SNAPSHOT_MIN_INTERVAL).
+Живые ключи runner'ов (throttle, текущее дело, IP) вьюха читает сама —
+это несколько GET в Redis.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import downloads
+from .models import ArbitrAttachment, ArbitrCase, ArbitrCheckLog, ArbitrEvent
+
+logger = logging.getLogger("arbitr")
+
+SNAPSHOT_KEY = "arbitr:status_snapshot"
+SNAPSHOT_LOCK_KEY = "arbitr:status_snapshot:lock"
+# Снимок живёт дольше тика runner'ов (10 сек): если runner'ы стоят (дневное
+# окно), вьюха пересчитает его сама не чаще раза в SNAPSHOT_TTL.
+SNAPSHOT_TTL = 120
+SNAPSHOT_MIN_INTERVAL = 10
+
+
+def _count(qs, field: str):
+    return Coalesce(
+        Subquery(
+            qs.values(field).annotate(n=Count("pk")).values("n")[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recount_cases(qs=None) -> int:
+    """Пересчитать денормализованные счётчики дел `qs` (по умолчанию — всех)."""
+    qs = ArbitrCase.objects.all() if qs is None else qs
+    last_log = ArbitrCheckLog.objects.filter(case=OuterRef("pk")).order_by("-ts")
+    atts = ArbitrAttachment.objects.filter(event__case=OuterRef("pk"))
+    return qs.update(
+        events_count=_count(ArbitrEvent.objects.filter(case=OuterRef("pk")), "case"),
+        attachments_count=_count(atts, "event__case"),
+        attachments_downloaded=_count(atts.filter(stored_file__isnull=False), "event__case"),
+        last_log_state=Coalesce(Subquery(last_log.values("state")[:1]), Value("")),
+        last_log_at=Subquery(last_log.values("ts")[:1]),
+    )
+
+
+def _build_snapshot() -> dict:
+    now = timezone.now()
+    states = {
+        row["state"]: row["n"]
+        for row in ArbitrCheckLog.objects.filter(ts__gte=now - timedelta(hours=24))
+        .values("state").annotate(n=Count("pk"))
+    }
+    ready = ArbitrCase.objects.aggregate(
+        parse=Count("pk", filter=Q(status=ArbitrCase.STATUS_MONITORING) & (
+            Q(next_parse_at__isnull=True) | Q(next_parse_at__lte=now))),
+        search=Count("pk", filter=Q(status=ArbitrCase.STATUS_SEARCHING) & (
+            Q(next_search_at__isnull=True) | Q(next_search_at__lte=now))),
+    )
+    last_parsed = [
+        {"last_check_at": c.last_check_at, "case_number": c.case_number,
+         "client": str(c.service.client) if c.service.client_id else ""}
+        for c in ArbitrCase.objects.filter(last_check_ok=True)
+        .select_related("service__client").order_by("-last_check_at")[:5]
+    ]
+    return {
+        "computed_at": now,
+        "downloads_pending": downloads.pending_qs().count(),
+        "ok_24h": states.get(ArbitrCheckLog.STATE_OK, 0),
+        "nothing_24h": states.get(ArbitrCheckLog.STATE_NOTHING, 0),
+        "error_24h": states.get(ArbitrCheckLog.STATE_ERROR, 0),
+        "captcha_24h": states.get(ArbitrCheckLog.STATE_CAPTCHA, 0),
+        "ready_parse": ready["parse"],
+        "ready_search": ready["search"],
+        "last_parsed": last_parsed,
+    }
+
+
+def refresh_snapshot() -> dict | None:
+    """Пересчитать снимок и положить в кэш. Зовут runner'ы в конце тика —
+    не чаще SNAPSHOT_MIN_INTERVAL на все runner'ы вместе."""
+    if not cache.add(SNAPSHOT_LOCK_KEY, "1", SNAPSHOT_MIN_INTERVAL):
+        return None
+    try:
+        snapshot = _build_snapshot()
+    except Exception:  # noqa: BLE001 — статус не должен ронять тик парсера
+        logger.exception("arbitr: не удалось собрать снимок статуса")
+        return None
+    cache.set(SNAPSHOT_KEY, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def get_snapshot() -> dict:
+    """Снимок из кэша; если runner'ы давно не писали — собрать здесь."""
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = _build_snapshot()
+        cache.set(SNAPSHOT_KEY, snapshot, SNAPSHOT_TTL)
+    return snapshot
@@ -10,9 +10,10 @@ import time
 from datetime import datetime, time as dtime
 
 from celery import shared_task
+from django.db.models import F
 from django.utils import timezone
 
-from . import cooldown
+from . import cooldown, downloads, scheduler, session_pool
 from .models import ArbitrAttachment, ArbitrCase, ArbitrCheckLog, ArbitrEvent
 from .notifications import handle_captcha
 from .parsers.kad import (
@@ -21,6 +22,7 @@ from .parsers.kad import (
     KadParserError,
     KadSession,
 )
+from .stats import refresh_snapshot
 
 logger = logging.getLogger("arbitr")
 
@@ -40,9 +42,7 @@ def _in_work_window() -> bool:
 def _log_check(
     case: ArbitrCase, state: str, duration_ms: int = 0, notes: str = "",
 ) -> None:
-    ArbitrCheckLog.objects.create(
-        case=case, state=state, duration_ms=duration_ms, notes=notes,
-    )
+    case.log_check(state, duration_ms=duration_ms, notes=notes)
 
 
 def _parse_kad_date(s: str):
@@ -59,7 +59,8 @@ def _persist_case_info(case: ArbitrCase, info: KadCaseInfo) -> dict:
     """Сохраняет ArbitrEvent/Attachment из result'а парсера.
 
     Идемпотентно: UNIQUE по (case, kad_event_id) в модели + ignore_conflicts
-    на bulk_create. Возвращает {'new_events', 'new_attachments'}.
+    на bulk_create. Счётчики дела (events_count/attachments_count)
+    увеличиваются здесь же. Возвращает {'new_events', 'new_attachments'}.
     """
     existing = set(case.events.values_list("kad_event_id", flat=True))
     new_events_data: list[tuple[ArbitrEvent, list[dict]]] = []
@@ -115,6 +116,10 @@ def _persist_case_info(case: ArbitrCase, info: KadCaseInfo) -> dict:
             ))
     if new_atts:
         ArbitrAttachment.objects.bulk_create(new_atts)
+    ArbitrCase.objects.filter(pk=case.pk).update(
+        events_count=F("events_count") + len(fresh),
+        attachments_count=F("attachments_count") + len(new_atts),
+    )
 
     return {
         "new_events": len(new_events_data),
@@ -174,11 +179,10 @@ def _search_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> str:
     ])).strip()
     if not fio:
         _log_check(case, ArbitrCheckLog.STATE_ERROR, notes="у клиента не задано ФИО")
-        from datetime import timedelta
         now = timezone.now()
         case.last_check_at = now
         case.last_check_ok = False
-        case.next_search_at = now + timedelta(hours=24)
+        case.next_search_at = now + scheduler.RETRY_AFTER_BROKEN
         case.save(update_fields=["last_check_at", "last_check_ok", "next_search_at"])
         return "error"
 
@@ -210,20 +214,18 @@ def _search_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> str:
         logger.exception("kad: ошибка поиска для дела %s", case.id)
         _log_check(case, ArbitrCheckLog.STATE_ERROR, notes=str(exc)[:1000])
         case.last_error = str(exc)[:2000]
-        from datetime import timedelta
         now = timezone.now()
         case.last_check_at = now
         case.last_check_ok = False
         # error при поиске — пробуем через час (без этого NULL next_search_at
         # → тот же кейс снова первый в очереди, бесконечный цикл).
-        case.next_search_at = now + timedelta(hours=1)
+        case.next_search_at = now + scheduler.RETRY_AFTER_ERROR
         case.save(update_fields=[
             "last_error", "last_check_at", "last_check_ok", "next_search_at",
         ])
         return "error"
 
     duration_ms = int((time.monotonic() - started) * 1000)
-    from datetime import timedelta
     now = timezone.now()
     if not hits:
         _log_check(
@@ -232,8 +234,8 @@ def _search_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> str:
         )
         case.last_check_at = now
         case.last_check_ok = True
-        # miss — следующий поиск через 3ч
-        case.next_search_at = now + timedelta(hours=3)
+        # miss — следующий поиск через 3ч (12ч, если иска нет уже две недели)
+        case.next_search_at = scheduler.next_search_at(case, hit=False, now=now)
         case.save(update_fields=[
             "last_check_at", "last_check_ok", "next_search_at",
         ])
@@ -257,7 +259,7 @@ def _search_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> str:
     case.last_check_at = now
     case.last_check_ok = True
     # hit — нашли кандидатов, следующий поиск через 24ч (если юзер ничего не выберет)
-    case.next_search_at = now + timedelta(hours=24)
+    case.next_search_at = scheduler.next_search_at(case, hit=True, now=now)
     case.save(update_fields=[
         "search_hits", "search_hits_at",
         "last_check_at", "last_check_ok", "next_search_at",
@@ -309,21 +311,19 @@ def kad_monitor_case():
 def _parse_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> dict:
     """Парсит карточку одного дела. Возвращает dict:
       {result: 'ok'|'nothing'|'error'|'captcha',
-       new_events: N, new_files: M, remaining_files: R, duration_sec: S}
-    Файлы качаются порциями до 5 за прогон (limit=5); если осталось больше —
-    `remaining_files > 0`, докачается в следующий парсинг (через 24ч).
-    После успеха пишет next_parse_at = now() + 24ч.
+       new_events: N, new_files: M, duration_sec: S}
+    new_files — сколько новых документов встало в очередь скачивания
+    (качают download-тики, см. downloads.py).
+    После успеха пишет next_parse_at/parse_priority по scheduler.plan_parse.
     """
-    base = {"result": "error", "new_events": 0, "new_files": 0,
-            "remaining_files": 0, "duration_sec": 0}
+    base = {"result": "error", "new_events": 0, "new_files": 0, "duration_sec": 0}
     if not case.kad_url:
         _log_check(case, ArbitrCheckLog.STATE_ERROR, notes="kad_url пуст")
         # Без kad_url дело парсить нельзя — отложим на 24ч, чтоб не зацикливался.
-        from datetime import timedelta
         now = timezone.now()
         case.last_check_at = now
         case.last_check_ok = False
-        case.next_parse_at = now + timedelta(hours=24)
+        case.next_parse_at = now + scheduler.RETRY_AFTER_BROKEN
         case.save(update_fields=["last_check_at", "last_check_ok", "next_parse_at"])
         return base
 
@@ -340,11 +340,10 @@ def _parse_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> dict:
             case, ArbitrCheckLog.STATE_ERROR,
             notes="Парсер parse_case ещё не реализован",
         )
-        from datetime import timedelta
         now = timezone.now()
         case.last_check_at = now
         case.last_check_ok = False
-        case.next_parse_at = now + timedelta(hours=24)
+        case.next_parse_at = now + scheduler.RETRY_AFTER_BROKEN
         case.save(update_fields=["last_check_at", "last_check_ok", "next_parse_at"])
         return {**base, "duration_sec": int(time.monotonic() - started)}
     except Exception as exc:  # noqa: BLE001
@@ -356,40 +355,23 @@ def _parse_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> dict:
         case.last_check_ok = False
         # error — не зацикливать кейс, попробуем через час (а не сразу
         # снова, как было раньше: NULL next_parse_at → кейс снова первый).
-        from datetime import timedelta
-        case.next_parse_at = now + timedelta(hours=1)
+        case.next_parse_at = now + scheduler.RETRY_AFTER_ERROR
         case.save(update_fields=[
             "last_error", "last_check_at", "last_check_ok", "next_parse_at",
         ])
         return {**base, "duration_sec": int(time.monotonic() - started)}
 
     duration_ms = int((time.monotonic() - started) * 1000)
+    # Новые документы только встают в очередь — PDF качают download-тики
+    # runner'ов (downloads.py), тик парсинга на них не тратится.
     persisted = _persist_case_info(case, info)
 
-    # Снимок cookies main-сессии — нужны download-сессии чтобы kad её
-    # «доверял» без повторного поиска (а search в download_mode сломан
-    # из-за PDF prefs).
-    try:
-        source_cookies = kad.driver.get_cookies()
-    except Exception:
-        source_cookies = []
-
-    # Скачиваем PDF'ы новых вложений в S3 порциями по 5 (best-effort:
-    # ошибка отдельного документа не валит обработку дела целиком).
-    # ОТДЕЛЬНАЯ download-сессия — её Chrome имеет PDF prefs, которые
-    # ломают search-flow в main.
-    downloaded = _download_new_attachments(
-        case, source_cookies=source_cookies, limit=5, runner_ip=runner_ip,
-    )
-
     _log_check(
         case, ArbitrCheckLog.STATE_OK, duration_ms=duration_ms,
         notes=(
             f"events={len(info.events)} "
             f"new={persisted['new_events']} "
-            f"docs+={persisted['new_attachments']} "
-            f"dl={downloaded['ok']}/{downloaded['ok'] + downloaded['failed']} "
-            f"left={downloaded['remaining']}"
+            f"docs+={persisted['new_attachments']}"
         ),
     )
     now = timezone.now()
@@ -399,129 +381,34 @@ def _parse_one(kad: KadSession, case: ArbitrCase, runner_ip: str = "") -> dict:
         case.instances = info.instances
     case.last_check_at = now
     case.last_check_ok = True
-    # «не чаще 1 раз в сутки» на это дело
-    from datetime import timedelta
-    case.next_parse_at = now + timedelta(hours=24)
+    # Интервал по активности дела и датам заседаний (уже с новыми событиями).
+    case.next_parse_at, case.parse_priority = scheduler.plan_parse(case, now=now)
     case.save(update_fields=[
         "court_name", "judge", "instances",
-        "last_check_at", "last_check_ok", "next_parse_at",
+        "last_check_at", "last_check_ok", "next_parse_at", "parse_priority",
     ])
     return {
         "result": "ok",
         "new_events": persisted["new_events"],
-        "new_files": downloaded["ok"],
-        "remaining_files": downloaded["remaining"],
+        "new_files": persisted["new_attachments"],
         "duration_sec": int(time.monotonic() - started),
     }
 
 
-def _download_new_attachments(
-    case: ArbitrCase, *, source_cookies: list, limit: int = 5, runner_ip: str = "",
-) -> dict:
-    """Качает ArbitrAttachment этого дела без stored_file → S3, не более `limit`
-    за один раз (по умолчанию 5 — анти-капча: каждый PDF-download — это
-    отдельный запрос на kad, после ~20 подряд kad показывает капчу).
-
-    Открывает ОТДЕЛЬНУЮ download-сессию (Chrome с PDF prefs) — этой сессии
-    нельзя делать search/parse (PDF prefs ломают anti-bot), но качать PDF
-    можно. Cookies от main-сессии прокидываем чтобы kad доверял нам без
-    повторного UI-поиска.
+def _runner_ip(runner_id: str) -> str:
+    """Outbound IP, назначенный runner'у rotator'ом, или '' если не назначен.
 
-    Best-effort: ошибки скачивания отдельного файла логируем и идём дальше.
-    Captcha — поднимаем выше (KadCaptchaRequired), пусть batch остановится.
-
-    Возвращает {'ok': N, 'failed': M, 'locked': K, 'skipped': X, 'remaining': R}.
-    remaining — сколько ещё незакачанных осталось ПОСЛЕ этого прогона.
+    Ключ `arbitr:runner_ip:<id>` пишет ops/arbitr-snat-rotate.sh НАПРЯМУЮ
+    в Redis (без Django-префикса :1:), поэтому читаем через redis-py.
     """
-    from apps.files.models import StoredFile  # лениво — кросс-аппный импорт
-    from apps.files.s3_utils import upload_file_to_s3
-
-    stats = {"ok": 0, "failed": 0, "locked": 0, "skipped": 0, "remaining": 0}
-    base_qs = ArbitrAttachment.objects.filter(
-        event__case=case, stored_file__isnull=True,
-    ).select_related("event")
-    pending_total = base_qs.count()
-    if not pending_total:
-        return stats
-    qs_list = list(base_qs[:limit]) if limit and limit > 0 else list(base_qs)
-    stats["remaining"] = max(0, pending_total - len(qs_list))
-
-    # Открываем ОТДЕЛЬНУЮ Chrome-сессию с PDF prefs.
-    with KadSession(download_mode=True) as dl:
-        if source_cookies:
-            dl.load_kad_cookies(source_cookies)
-        # Активируем kad-trust открытием карточки. В download_mode warmup-
-        # поиск сломан (PDF prefs детектятся anti-bot'ом), но с cookies
-        # main-сессии прямой GET карточки работает.
-        dl.driver.get(case.kad_url)
-        time.sleep(3)
-        try:
-            dl._raise_if_captcha()  # noqa: SLF001
-        except KadCaptchaRequired:
-            handle_captcha(case, page_url=case.kad_url, ip=runner_ip)
-            raise
-
-        for att in qs_list:
-            if att.is_locked:
-                stats["locked"] += 1
-                continue
-            if not att.kad_url:
-                stats["skipped"] += 1
-                continue
-            try:
-                content, content_type = dl.download_pdf(
-                    att.kad_url, referer=case.kad_url,
-                )
-            except KadCaptchaRequired:
-                raise
-            except Exception as exc:  # noqa: BLE001
-                logger.warning(
-                    "kad: PDF не скачался (att=%s url=%s): %s",
-                    att.id, att.kad_url, exc,
-                )
-                stats["failed"] += 1
-                continue
-
-            # Имя для S3 + StoredFile. Если kad name пустой — используем att.id.
-            ext = "pdf"
-            if "pdf" not in content_type.lower():
-                if ".pdf" in att.kad_url.lower():
-                    ext = "pdf"
-                else:
-                    ext = "bin"
-            safe_name = (att.name or f"document-{att.id}").strip()
-            if not safe_name.lower().endswith(f".{ext}"):
-                safe_name = f"{safe_name}.{ext}"
-            # StoredFile.filename = CharField(max_length=255). У kad заголовки
-            # документов бывают по 300+ символов («[Подписано] Отложить
-            # судебное разбирательство (ст.157, 158, 225_15 АПК)»+.pdf).
-            if len(safe_name) > 250:
-                head = safe_name[: 250 - len(ext) - 4]
-                safe_name = f"{head}….{ext}"
-
-            try:
-                bucket, key = upload_file_to_s3(
-                    content,
-                    prefix=f"arbitr/{case.id}",
-                    filename=safe_name,
-                    content_type=content_type,
-                )
-            except Exception as exc:  # noqa: BLE001
-                logger.exception(
-                    "kad: S3 upload failed for att %s: %s", att.id, exc,
-                )
-                stats["failed"] += 1
-                continue
-
-            stored = StoredFile.objects.create(
-                bucket=bucket, key=key, filename=safe_name,
-                content_type=content_type, size=len(content),
-            )
-            att.stored_file = stored
-            att.save(update_fields=["stored_file"])
-            stats["ok"] += 1
-
-    return stats
+    try:
+        import redis as _redis  # noqa: WPS433
+        from django.conf import settings as _settings  # noqa: WPS433
+        _r = _redis.Redis.from_url(_settings.REDIS_URL)
+        _v = _r.get(f"arbitr:runner_ip:{runner_id}")
+        return _v.decode("utf-8") if _v else ""
+    except Exception:
+        return ""
 
 
 def _kad_smart_one(runner_id: str):
@@ -538,8 +425,11 @@ def _kad_smart_one(runner_id: str):
       4. Атомарно (SELECT … FOR UPDATE SKIP LOCKED) забрать кейс и сразу
          поставить next_*_at = now+30мин («резерв», чтоб другие runners
          не взяли тот же). После парсинга _parse_one/_search_one ставят
-         финальные next_*_at (24ч / 3ч / 1ч / 24ч).
-      5. Парсим.
+         финальные next_*_at (scheduler.py: по активности дела, 3ч/12ч/24ч
+         для поиска, 1ч после ошибки). Из готовых к парсингу берётся дело
+         с наибольшим parse_priority.
+      5. Парсим тёплой сессией из пула runner'а (session_pool) — Chrome
+         между тиками не перезапускается.
       6. Per-runner throttle по результату (3-15мин / 10с / 30мин / 60с).
       7. На success — алёрт в MAX. На captcha — global cooldown.
     """
@@ -547,20 +437,11 @@ def _kad_smart_one(runner_id: str):
     from datetime import timedelta
     from django.core.cache import cache
     from django.db import transaction
-    from django.db.models import F, Q
+    from django.db.models import Q
 
     # Если rotator не назначил этому runner'у IP в этом часу (мало активных IP) —
-    # пропускаем тик. Ключ `arbitr:runner_ip:<id>` пишет ops/arbitr-snat-rotate.sh
-    # НАПРЯМУЮ в Redis (без Django-префикса :1:), поэтому читаем через redis-py.
-    runner_ip = ""
-    try:
-        import redis as _redis  # noqa: WPS433
-        from django.conf import settings as _settings  # noqa: WPS433
-        _r = _redis.Redis.from_url(_settings.REDIS_URL)
-        _v = _r.get(f"arbitr:runner_ip:{runner_id}")
-        runner_ip = _v.decode("utf-8") if _v else ""
-    except Exception:
-        runner_ip = ""
+    # пропускаем тик.
+    runner_ip = _runner_ip(runner_id)
     if not runner_ip:
         return {"skipped": "runner_disabled", "runner": runner_id}
 
@@ -610,7 +491,9 @@ def _kad_smart_one(runner_id: str):
                     .select_for_update(skip_locked=True)
                     .filter(status=ArbitrCase.STATUS_MONITORING)
                     .filter(Q(next_parse_at__isnull=True) | Q(next_parse_at__lte=now))
-                    .order_by(F("next_parse_at").asc(nulls_first=True))
+                    # Из готовых — самое «живое» (scheduler.plan_parse), при
+                    # равенстве — дольше всех ждущее.
+                    .order_by("-parse_priority", F("next_parse_at").asc(nulls_first=True))
                     .first()
                 )
                 kind = "parse" if candidate else None
@@ -637,11 +520,14 @@ def _kad_smart_one(runner_id: str):
         )
         cache.set(CURRENT_KEY, str(case.id), timeout=600)
 
+        pool = session_pool.get_pool()
         try:
-            with KadSession() as kad:
+            with pool.lease(runner_ip) as kad:
                 if kind == "search":
                     sr = _search_one(kad, case, runner_ip=runner_ip)
-                    # _search_one уже ставит next_search_at (3ч miss / 24ч hit)
+                    if sr == "captcha":
+                        pool.discard("captcha")
+                    # _search_one уже ставит next_search_at (scheduler.next_search_at)
                     _set_throttle(60)
                     return {"case_id": str(case.id), "kind": "search", "result": sr}
                 # MONITORING
@@ -674,7 +560,9 @@ def _kad_smart_one(runner_id: str):
                         duration_sec=pr["duration_sec"],
                     )
                 elif pr["result"] == "captcha":
-                    pass  # handle_captcha уже включил 12ч cooldown
+                    # handle_captcha уже включил 12ч cooldown; cookies
+                    # сессии «засвечены» — следующий lease поднимет новую.
+                    pool.discard("captcha")
                 else:
                     _set_throttle(60)
                 return {"case_id": str(case.id), "kind": "parse", **pr}
@@ -688,18 +576,17 @@ def _kad_smart_one(runner_id: str):
             # без next_*_at снова первый в очереди и зацикливается).
             logger.exception("kad_smart_one: ошибка на кейсе %s", case.id)
             _log_check(case, ArbitrCheckLog.STATE_ERROR, notes=str(exc)[:1000])
-            from datetime import timedelta
             now = timezone.now()
             case.last_error = str(exc)[:2000]
             case.last_check_at = now
             case.last_check_ok = False
             if kind == "search":
-                case.next_search_at = now + timedelta(hours=1)
+                case.next_search_at = now + scheduler.RETRY_AFTER_ERROR
                 case.save(update_fields=[
                     "last_error", "last_check_at", "last_check_ok", "next_search_at",
                 ])
             else:
-                case.next_parse_at = now + timedelta(hours=1)
+                case.next_parse_at = now + scheduler.RETRY_AFTER_ERROR
                 case.save(update_fields=[
                     "last_error", "last_check_at", "last_check_ok", "next_parse_at",
                 ])
@@ -709,6 +596,7 @@ def _kad_smart_one(runner_id: str):
     finally:
         cache.delete(LOCK_KEY)
         cache.delete(CURRENT_KEY)
+        refresh_snapshot()
 
 
 # Три отдельных task-имени для celery routing'а — каждый в свою очередь
@@ -729,6 +617,78 @@ def kad_smart_one_c():
     return _kad_smart_one("c")
 
 
+def _kad_download_tick(runner_id: str):
+    """Download-тик runner'а: скачать порцию документов из очереди.
+
+    Тот же outbound IP и тот же пул Chrome, что у парсинга (процесс runner'а
+    один), но своя очередь arbitr_dl_<id> и свой бюджет запросов на IP
+    (downloads.take_budget). Берём документы одного дела (downloads.claim),
+    cookies — из тёплой main-сессии, качаем download-сессией пула.
+    """
+    from django.core.cache import cache
+
+    runner_ip = _runner_ip(runner_id)
+    if not runner_ip:
+        return {"skipped": "runner_disabled", "runner": runner_id}
+    if cooldown.is_active(runner_ip):
+        return {"skipped": "captcha_cooldown", "ip": runner_ip}
+    lock_key = f"arbitr:download_lock:{runner_id}"
+    if not cache.add(lock_key, "1", timeout=900):
+        return {"skipped": "lock_busy"}
+    try:
+        budget = downloads.take_budget(runner_ip, downloads.BATCH)
+        if not budget:
+            return {"skipped": "ip_budget", "ip": runner_ip}
+        atts = downloads.claim(budget)
+        downloads.refund_budget(runner_ip, budget - len(atts))
+        if not atts:
+            return {"skipped": "queue_empty"}
+        case = atts[0].event.case
+        pool = session_pool.get_pool()
+        try:
+            with pool.lease(runner_ip) as kad:
+                # Cookies main-сессии — чтобы kad «доверял» download-сессии
+                # без повторного поиска (search в download_mode сломан).
+                try:
+                    source_cookies = kad.driver.get_cookies()
+                except Exception:
+                    source_cookies = []
+                result = downloads.run(
+                    pool.download(), case, atts,
+                    source_cookies=source_cookies, runner_ip=runner_ip,
+                )
+        except KadCaptchaRequired:
+            # run() уже снял резерв и включил cooldown IP.
+            pool.discard("captcha")
+            return {"case_id": str(case.id), "result": "captcha"}
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("kad_download_tick[%s]: сбой на деле %s", runner_id, case.id)
+            downloads.release(atts)
+            return {"case_id": str(case.id), "result": "error", "exc": str(exc)[:200]}
+        logger.info(
+            "kad_download_tick[%s]: case=%s ok=%d failed=%d",
+            runner_id, case.id, result["ok"], result["failed"],
+        )
+        return {"case_id": str(case.id), **result}
+    finally:
+        cache.delete(lock_key)
+
+
+@shared_task(name="arbitr.kad_download_tick_a")
+def kad_download_tick_a():
+    return _kad_download_tick("a")
+
+
+@shared_task(name="arbitr.kad_download_tick_b")
+def kad_download_tick_b():
+    return _kad_download_tick("b")
+
+
+@shared_task(name="arbitr.kad_download_tick_c")
+def kad_download_tick_c():
+    return _kad_download_tick("c")
+
+
 @shared_task(name="arbitr.kad_monitor_one_case")
 def kad_monitor_one_case(case_id: str):
     """Ручной запуск парсинга ОДНОГО дела (минуя work-window).
@@ -797,3 +757,4 @@ def kad_monitor_one_case(case_id: str):
         # Тот же ключ что устанавливает views.case_run.
         from django.core.cache import cache  # noqa: WPS433 — local
         cache.delete(f"arbitr:active_task:{case.id}")
+        refresh_snapshot()
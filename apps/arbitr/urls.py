@@ -13,6 +13,7 @@ urlpatterns = [
     # Сервисная страница мониторинга
     path("", views.dashboard, name="dashboard"),
     path("parser-status/", views.parser_status, name="parser_status"),
+    path("downloads/", views.downloads_progress, name="downloads"),
     path("case/<uuid:case_id>/", views.case_detail, name="case_detail"),
     path("case/<uuid:case_id>/run/", views.case_run, name="case_run"),
     path("case/<uuid:case_id>/block-status/", views.case_block_status, name="case_block_status"),
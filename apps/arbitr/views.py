@@ -4,7 +4,7 @@ from datetime import timedelta
 
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
-from django.db.models import Count, Q
+from django.db.models import Count, F, Max, Q
 from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.utils import timezone
@@ -15,7 +15,7 @@ from apps.core.permissions import is_admin
 from apps.crm.models import Service
 from apps.crm import client_log
 
-from .models import ArbitrCase, ArbitrCheckLog
+from .models import ArbitrAttachment, ArbitrCase, ArbitrCheckLog
 from .tasks import kad_monitor_one_case
 
 # Пока работают beat-расписания каждый час — оба автотаска ходят раз в час
@@ -30,10 +30,9 @@ LOG_FRESH_SECONDS = 60
 
 
 def _log_is_fresh(case: "ArbitrCase") -> bool:
-    last = case.check_logs.first()
-    if not last:
+    if not case.last_log_at:
         return False
-    return (timezone.now() - last.ts).total_seconds() < LOG_FRESH_SECONDS
+    return (timezone.now() - case.last_log_at).total_seconds() < LOG_FRESH_SECONDS
 
 
 @login_required
@@ -113,12 +112,19 @@ def case_block(request, service_id):
 def _estimate_next_check_at(case: ArbitrCase):
     """Грубая оценка следующего захода парсера.
 
-    Beat-расписание сейчас ~раз в час, но автотаск работает только в окне
-    18:00–08:00 MSK. Возвращаем «last + час» если попадает в окно, иначе
-    следующее открытие окна (18:00 ближайшего вечера).
+    Если расписание дела уже задано (next_search_at / next_parse_at — см.
+    scheduler.py) — берём его, иначе «last + час». Автотаск работает только
+    в окне 18:00–08:00 MSK: время вне окна сдвигаем на ближайшие 18:00.
     """
-    base = case.last_check_at or case.created_at or timezone.now()
-    candidate = base + NEXT_CHECK_INTERVAL
+    planned = (
+        case.next_search_at if case.status == ArbitrCase.STATUS_SEARCHING
+        else case.next_parse_at
+    )
+    if planned:
+        candidate = max(planned, timezone.now())
+    else:
+        base = case.last_check_at or case.created_at or timezone.now()
+        candidate = base + NEXT_CHECK_INTERVAL
     local = timezone.localtime(candidate)
     hour = local.hour
     # Окно работы 18:00–08:00 (см. tasks.WORK_WINDOW_*).
@@ -129,36 +135,16 @@ def _estimate_next_check_at(case: ArbitrCase):
 
 
 def _annotate_cases(qs):
-    """Подмешивает к queryset'у case-список счётчики (events, attachments,
-    last_log_state) — чтобы UI не делал N+1."""
-    return (
-        qs.select_related(
-            "service__client", "service__region", "started_by__user",
-        )
-        .annotate(
-            events_count=Count("events", distinct=True),
-            attachments_count=Count(
-                "events__attachments",
-                filter=Q(events__attachments__isnull=False),
-                distinct=True,
-            ),
-            attachments_downloaded=Count(
-                "events__attachments",
-                filter=Q(events__attachments__stored_file__isnull=False),
-                distinct=True,
-            ),
-        )
+    """Подтягивает к queryset'у case-списка связанные объекты. Счётчики
+    (events_count, attachments_*, last_log_state) — поля самого дела,
+    их ведут tasks.py и ArbitrCase.log_check, см. stats.py."""
+    return qs.select_related(
+        "service__client", "service__region", "started_by__user",
     )
 
 
-def _last_log_state(case: ArbitrCase) -> str:
-    last = case.check_logs.first()
-    return last.state if last else ""
-
-
 def _case_pane_context(case):
     case.next_check_at = _estimate_next_check_at(case)
-    case.last_log_state = _last_log_state(case)
     events = (
         case.events
         .prefetch_related("attachments")
@@ -192,7 +178,6 @@ def dashboard(request):
 
     for case in searching + monitoring + paused:
         case.next_check_at = _estimate_next_check_at(case)
-        case.last_log_state = _last_log_state(case)
 
     # Если в URL ?case=<uuid> — сразу выбран и развёрнут.
     selected_pane = None
@@ -206,7 +191,6 @@ def dashboard(request):
             try:
                 selected = _annotate_cases(ArbitrCase.objects.all()).get(pk=selected_id)
                 selected.next_check_at = _estimate_next_check_at(selected)
-                selected.last_log_state = _last_log_state(selected)
             except (ArbitrCase.DoesNotExist, ValueError):
                 selected = None
         if selected is not None:
@@ -293,8 +277,8 @@ def case_run(request, case_id):
         "started_at": time.time(),
         "user": request.user.username,
     }, timeout=600)
-    ArbitrCheckLog.objects.create(
-        case=case, state=ArbitrCheckLog.STATE_OK,
+    case.log_check(
+        ArbitrCheckLog.STATE_OK,
         notes=f"Ручной запуск инициирован (user={request.user.username})",
     )
     if as_block:
@@ -337,8 +321,8 @@ def case_run_abort(request, case_id):
         except Exception:  # noqa: BLE001 — best-effort
             pass
         cache.delete(key)
-        ArbitrCheckLog.objects.create(
-            case=case, state=ArbitrCheckLog.STATE_ERROR,
+        case.log_check(
+            ArbitrCheckLog.STATE_ERROR,
             notes=f"Парсинг прерван пользователем (user={request.user.username})",
         )
     response = HttpResponse(status=204)
@@ -374,8 +358,8 @@ def case_toggle_pause(request, case_id):
         case.status = ArbitrCase.STATUS_PAUSED
         note = f"Приостановлено (user={request.user.username})"
     case.save(update_fields=["status", "updated_at"])
-    ArbitrCheckLog.objects.create(
-        case=case, state=ArbitrCheckLog.STATE_OK, notes=note,
+    case.log_check(
+        ArbitrCheckLog.STATE_OK, notes=note,
     )
     if request.headers.get("HX-Request"):
         response = HttpResponse(status=204)
@@ -426,7 +410,6 @@ def case_log_partial(request, case_id):
 
 def _render_case_card(request, case):
     case.next_check_at = _estimate_next_check_at(case)
-    case.last_log_state = _last_log_state(case)
     # Активный таск — выводим прогресс-UI и self-polling в шаблоне.
     active = cache.get(_active_task_cache_key(case.id))
     if active:
@@ -479,8 +462,8 @@ def case_confirm_hit(request, case_id, hit_index):
             f"парсером). Перевод в мониторинг карточки."
         ),
     )
-    ArbitrCheckLog.objects.create(
-        case=case, state=ArbitrCheckLog.STATE_OK,
+    case.log_check(
+        ArbitrCheckLog.STATE_OK,
         notes=f"Сотрудник подтвердил дело {case_number} — переводим в MONITORING",
     )
     # stay=1 (из вкладки «Суд» карточки процедуры) — перерисовать блок дела на
@@ -630,8 +613,8 @@ def case_create_searching(request, service_id):
             service=service, started_by=emp,
             status=ArbitrCase.STATUS_SEARCHING,
         )
-        ArbitrCheckLog.objects.create(
-            case=case, state=ArbitrCheckLog.STATE_OK,
+        case.log_check(
+            ArbitrCheckLog.STATE_OK,
             notes=f"Поставлено на мониторинг через поиск (user={request.user.username})",
         )
     redirect_url = f"/arbitr/?case={case.id}"
@@ -650,8 +633,7 @@ def parser_status(request):
     (работает / длинная пауза / капча), что парсит сейчас, счётчик до
     30-мин перерыва, статистику за 24ч, последние 5 успешных кейсов.
     """
-    from apps.arbitr import cooldown
-    from collections import Counter
+    from apps.arbitr import cooldown, stats
     from django.utils.dateparse import parse_datetime
 
     now = timezone.now()
@@ -677,6 +659,17 @@ def parser_status(request):
         for rid in RUNNERS:
             runner_ip_by_id[rid] = ""
 
+    # Текущие дела всех runner'ов — одним запросом.
+    cur_id_by_runner = {
+        rid: cache.get(f"arbitr:smart_current_case:{rid}") for rid in RUNNERS
+    }
+    cur_cases = {
+        str(c.pk): c
+        for c in ArbitrCase.objects.select_related("service__client").filter(
+            pk__in=[v for v in cur_id_by_runner.values() if v],
+        )
+    }
+
     runners = []
     for rid in RUNNERS:
         out_ip = runner_ip_by_id[rid]
@@ -692,15 +685,8 @@ def parser_status(request):
         # parse_count
         cnt = int(cache.get(f"arbitr:smart_parse_count:{rid}") or 0)
         # current case
-        cur_id = cache.get(f"arbitr:smart_current_case:{rid}")
-        cur_case = None
-        if cur_id:
-            cur_case = (
-                ArbitrCase.objects
-                .select_related("service__client")
-                .filter(pk=cur_id)
-                .first()
-            )
+        cur_id = cur_id_by_runner[rid]
+        cur_case = cur_cases.get(str(cur_id)) if cur_id else None
         # state-string
         ip_cooldown_until = cooldown_by_ip.get(out_ip) if out_ip else None
         if ip_cooldown_until:
@@ -752,28 +738,9 @@ def parser_status(request):
         state = "idle"
         state_label = "Ожидание"
 
-    log_24h = ArbitrCheckLog.objects.filter(ts__gte=now - timedelta(hours=24))
-    stats = Counter(log_24h.values_list("state", flat=True))
-
-    last_parsed = list(
-        ArbitrCase.objects
-        .filter(last_check_ok=True)
-        .select_related("service__client")
-        .order_by("-last_check_at")[:5]
-    )
-
-    ready_parse = (
-        ArbitrCase.objects
-        .filter(status=ArbitrCase.STATUS_MONITORING)
-        .filter(Q(next_parse_at__isnull=True) | Q(next_parse_at__lte=now))
-        .count()
-    )
-    ready_search = (
-        ArbitrCase.objects
-        .filter(status=ArbitrCase.STATUS_SEARCHING)
-        .filter(Q(next_search_at__isnull=True) | Q(next_search_at__lte=now))
-        .count()
-    )
+    # Статистика за 24ч, очереди и последние дела — из снимка, который
+    # runner'ы обновляют в конце тика (stats.refresh_snapshot).
+    snapshot = stats.get_snapshot()
 
     # Расписание IP-ротации (МСК) — должно совпадать со скриптом
     # ops/arbitr-snat-rotate.sh.
@@ -823,15 +790,48 @@ def parser_status(request):
         "runners": runners,
         "break_every": BREAK_EVERY,
         "cooldown_by_ip": cooldown_by_ip,
-        "ok_24h": stats.get("ok", 0),
-        "nothing_24h": stats.get("nothing", 0),
-        "error_24h": stats.get("error", 0),
-        "captcha_24h": stats.get("captcha", 0),
-        "ready_parse": ready_parse,
-        "ready_search": ready_search,
-        "last_parsed": last_parsed,
+        "ok_24h": snapshot["ok_24h"],
+        "nothing_24h": snapshot["nothing_24h"],
+        "error_24h": snapshot["error_24h"],
+        "captcha_24h": snapshot["captcha_24h"],
+        "ready_parse": snapshot["ready_parse"],
+        "ready_search": snapshot["ready_search"],
+        "downloads_pending": snapshot.get("downloads_pending", 0),
+        "last_parsed": snapshot["last_parsed"],
         "ip_rows": ip_rows,
         "current_ip": current_ip,
         "msk_hour": msk_hour,
     }
     return render(request, "arbitr/partials/_parser_status.html", ctx)
+
+
+@login_required
+def downloads_progress(request):
+    """Очередь скачивания документов (downloads.py): сводка, дела с самым
+    большим хвостом, последние ошибки. HTMX-полит партиал раз в 10 сек."""
+    if not is_admin(request.user):
+        return HttpResponse("forbidden", status=403)
+    from apps.arbitr import downloads
+
+    by_case = list(
+        downloads.pending_qs()
+        .values("event__case_id", "event__case__case_number")
+        .annotate(n=Count("pk"), attempts=Max("download_attempts"))
+        .order_by("-n")[:20]
+    )
+    failing = list(
+        ArbitrAttachment.objects.filter(stored_file__isnull=True)
+        .exclude(download_error="")
+        .select_related("event__case")
+        .order_by(F("download_next_at").desc(nulls_last=True))[:20]
+    )
+    ctx = {
+        "backlog": downloads.backlog(),
+        "by_case": by_case,
+        "failing": failing,
+        "max_attempts": downloads.MAX_ATTEMPTS,
+        "per_ip_hour": downloads.PER_IP_HOUR,
+    }
+    if request.headers.get("HX-Request"):
+        return render(request, "arbitr/partials/_downloads_progress.html", ctx)
+    return render(request, "arbitr/downloads.html", ctx)
@@ -101,8 +101,8 @@ def download_to_storedfile(url: str, filename: str, bubble_id: str | None = None
     Идемпотентно по bubble_id: если StoredFile уже есть — вернуть его.
     Бросает исключение при сетевой ошибке / недоступности (apply_record ловит).
     """
+    from apps.files.dedup import store_bytes
     from apps.files.models import StoredFile
-    from apps.files.s3_utils import upload_file_to_s3
 
     if bubble_id:
         existing = StoredFile.objects.filter(bubble_id=bubble_id).first()
@@ -131,20 +131,18 @@ def download_to_storedfile(url: str, filename: str, bubble_id: str | None = None
             "или требует подтверждения. Проверьте доступ «всем по ссылке»."
         )
 
-    bucket, key = upload_file_to_s3(
-        data, prefix="bubble/import", filename=filename or "file.bin",
-        content_type=content_type or None,
-    )
     # StoredFile.filename / content_type — CharField(max_length=255).
     # filename из Bubble может быть длинным (кириллица × «Дополнение к
     # договору об оказании юридических услуг от …»), content_type иногда
     # приходит с параметрами «application/pdf; charset=...; name="..."».
     # Обрезаем, чтобы apply_files не падал на DataError 255.
-    safe_filename = (filename or key)[:255]
+    # Один файл нередко прикреплён к нескольким записям Bubble — по
+    # SHA-256 повтор ссылается на уже загруженный объект S3.
+    safe_filename = (filename or "file.bin")[:255]
     safe_ctype = (content_type or "").split(";", 1)[0].strip()[:255]
-    return StoredFile.objects.create(
-        bucket=bucket, key=key, filename=safe_filename,
-        content_type=safe_ctype, size=len(data), bubble_id=bubble_id,
+    return store_bytes(
+        data, prefix="bubble/import", filename=safe_filename,
+        content_type=safe_ctype, bubble_id=bubble_id,
     )
 
 
@@ -705,6 +703,16 @@ def apply_messagewsp(rec: BubbleRecord) -> str:
         rec.save(update_fields=["status", "error", "imported_at"])
         return rec.status
 
+    from apps.crm.message_archive import is_archived
+    if is_archived(bubble_id=rec.bubble_id):
+        # Уже перенесено в архив — повторный импорт не должен вернуть
+        # сообщение в горячую таблицу.
+        rec.status = "imported"
+        rec.target_type = "MessageArchive"
+        rec.error = ""
+        rec.save(update_fields=["status", "target_type", "error"])
+        return rec.status
+
     phone = _wa_client_phone(raw)
     client = Client.objects.filter(whatsapp_phone=phone).first() if phone else None
     if client is None and phone:
@@ -768,6 +776,8 @@ def apply_messagewsp(rec: BubbleRecord) -> str:
         defaults["file_name"] = stored.filename
 
     msg, _ = Message.objects.update_or_create(bubble_id=rec.bubble_id, defaults=defaults)
+    from apps.crm.chat_summary import record_message
+    record_message(msg)
 
     # Поднять клиента в списке чатов — иначе с импортированной перепиской
     # он не всплывёт (список сортируется по last_message_at).
@@ -1602,12 +1612,15 @@ def apply_approved(entity: str) -> dict:
         entity=entity, approved=True,
     ).exclude(status="imported")
     imported = errors = 0
-    for rec in qs:
-        st = apply_record(rec)
-        if st == "imported":
-            imported += 1
-        else:
-            errors += 1
+    # Клиенты коммитятся по одному — события импорта пишутся пачками по
+    # client_log.BATCH_FLUSH_EVERY, чтобы обрыв задачи не терял накопленное.
+    with client_log.batch():
+        for rec in qs:
+            st = apply_record(rec)
+            if st == "imported":
+                imported += 1
+            else:
+                errors += 1
     extra = {}
     if entity == "Man":
         extra["spouses_linked"] = link_spouses()
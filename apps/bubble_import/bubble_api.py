@@ -10,6 +10,11 @@
 * в ответе только НЕпустые поля объекта;
 * поле _id — уникальный идентификатор объекта;
 * response.remaining — сколько ещё осталось после текущей страницы.
+
+Окна больших сущностей качаются в несколько потоков
+(pipeline.fetch_windows_parallel), поэтому все запросы процесса проходят
+через общий ограничитель BUBBLE_API_RPS. Сессии, ретраи 429/5xx и
+circuit breaker — провайдер "bubble" в apps/core/http_client.py.
 """
 import json
 import logging
@@ -17,6 +22,8 @@ import logging
 import requests
 from decouple import config
 
+from apps.core import http_client
+
 logger = logging.getLogger("bubble_import")
 
 API_BASE = config(
@@ -26,6 +33,10 @@ API_BASE = config(
 API_TOKEN = config("BUBBLE_API_TOKEN", default="")
 
 PAGE_LIMIT = 100  # максимум, который отдаёт Bubble за один запрос
+API_RPS = config("BUBBLE_API_RPS", default=5, cast=float)
+# 429 / 5xx повторяем с нарастающей паузой (http_client, с jitter).
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_ATTEMPTS = 3
 
 
 class BubbleAPIError(RuntimeError):
@@ -40,6 +51,13 @@ def _headers() -> dict:
     return {"Authorization": f"Bearer {API_TOKEN}"}
 
 
+http_client.register(http_client.Provider(
+    "bubble", rps=API_RPS, timeout=60, retries=RETRY_ATTEMPTS,
+    retry_statuses=frozenset(RETRY_STATUSES), backoff=1,
+))
+limiter = http_client.limiter("bubble")
+
+
 def fetch_page(entity: str, cursor: int = 0, limit: int = PAGE_LIMIT,
                constraints: list | None = None) -> dict:
     """Одна страница объектов. Возвращает dict с ключами:
@@ -54,7 +72,10 @@ def fetch_page(entity: str, cursor: int = 0, limit: int = PAGE_LIMIT,
     if constraints:
         params["constraints"] = json.dumps(constraints)
     try:
-        resp = requests.get(url, headers=_headers(), params=params, timeout=60)
+        resp = http_client.request(
+            "bubble", "GET", url, endpoint=f"GET /obj/{entity}",
+            headers=_headers(), params=params,
+        )
     except requests.RequestException as e:
         raise BubbleAPIError(f"Сетевая ошибка при запросе {entity}: {e}") from e
 
@@ -191,5 +191,8 @@ class Command(BaseCommand):
             self.stdout.write("Применяем Client.status…")
             for status, ids in by_status.items():
                 Client.objects.filter(pk__in=ids).update(status=status)
+            # .update() мимо сигналов — счётчики канбана сбрасываем явно.
+            from apps.crm.kanban_board import invalidate_counts
+            invalidate_counts()
 
         self.stdout.write(self.style.SUCCESS("\nГотово."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bubble_import', '0007_alter_bubblefetchstate_entity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bubbleimportjob',
+            name='stage_stats',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Скорость по этапам'),
+        ),
+    ]
@@ -154,6 +154,10 @@ class BubbleImportJob(models.Model):
     errors_count = models.PositiveIntegerField("Ошибки", default=0)
     skipped_count = models.PositiveIntegerField("Пропущено", default=0)
     remote_total = models.PositiveIntegerField("Всего в Bubble", default=0)
+    # Скорость по этапам: {stage: {"records": n, "seconds": s, "rps": r}}.
+    # seconds — время по часам для этапа целиком; http/upsert — суммарное
+    # время потоков, чтобы видеть, во что упирается выгрузка.
+    stage_stats = models.JSONField("Скорость по этапам", default=dict, blank=True)
 
     log_text = models.TextField("Лог (последние строки)", blank=True, default="")
     error_text = models.TextField("Trace при ошибке", blank=True, default="")
@@ -180,6 +184,31 @@ class BubbleImportJob(models.Model):
         end = self.finished_at or timezone.now()
         return int((end - self.started_at).total_seconds())
 
+    STAGE_LABELS = {
+        "fetch": "Выгрузка",
+        "http": "  HTTP Bubble",
+        "upsert": "  запись staging",
+        "apply": "Применение",
+    }
+
+    def set_stage(self, stage: str, records: int, seconds: float, *, save: bool = True):
+        """Записать объём и время этапа (records/sec считается здесь)."""
+        stats = dict(self.stage_stats or {})
+        stats[stage] = {
+            "records": records,
+            "seconds": round(seconds, 1),
+            "rps": round(records / seconds, 1) if seconds > 0 else 0,
+        }
+        self.stage_stats = stats
+        if save:
+            self.save(update_fields=["stage_stats"])
+
+    @property
+    def stage_rows(self) -> list:
+        """[(label, stats)] для шаблона в порядке этапов."""
+        stats = self.stage_stats or {}
+        return [(label, stats[key]) for key, label in self.STAGE_LABELS.items() if key in stats]
+
     def add_log(self, message: str, *, save: bool = True):
         """Дописать строку в лог (хранится последние ~50 строк)."""
         from django.utils import timezone
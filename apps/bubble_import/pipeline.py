@@ -0,0 +1,318 @@
+"""Конвейер массового импорта больших сущностей Bubble (MessageWSP, Files).
+
+`tasks.full_import_task` раньше качал окна строго по очереди, писал
+каждую запись staging через update_or_create и применял записи по одной —
+полный MessageWSP/Files занимал большую часть суток. Теперь:
+
+* FETCH — окна по Created Date качаются в BUBBLE_IMPORT_FETCH_WORKERS
+  потоков (`fetch_windows_parallel`); общий лимит запросов к Bubble
+  держит `bubble_api.limiter`, страница пишется в staging одним upsert
+  (`services.upsert_records`);
+* APPLY — записи идут пачками (`apply_batch`). Для MessageWSP клиенты,
+  цитаты, архив и уже импортированные сообщения резолвятся на всю пачку
+  несколькими запросами, сообщения пишутся одним bulk upsert, а медиа
+  скачиваются параллельно. Для Files параллелится скачивание, для
+  Organization запросы в DaData идут одним пакетом на пачку; прочие
+  сущности применяются по одной, как раньше (`appliers.apply_record`).
+
+Пачки можно раздать воркерам Celery chord'ом (`tasks.apply_chunk_task`) —
+BUBBLE_IMPORT_APPLY_CHORD. Скорость каждого этапа пишется в
+BubbleImportJob.stage_stats.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.crm import client_log
+
+from .appliers import (
+    _WA_TYPE_MAP, _normalize_inn_candidates, _wa_client_phone, apply_record,
+    download_to_storedfile,
+)
+from .extractors import clean_str, parse_bubble_dt, strip_bbcode
+from .models import BubbleRecord
+from .services import fetch_window
+
+logger = logging.getLogger("bubble_import")
+
+_REC_FIELDS = ["status", "target_type", "target_id", "error", "imported_at"]
+
+
+def _in_thread(fn, *args):
+    """Вызов из пула потоков: своё соединение с БД закрываем сразу."""
+    try:
+        return fn(*args)
+    finally:
+        connections.close_all()
+
+
+# ─── FETCH ─────────────────────────────────────────────────
+
+def fetch_windows_parallel(entity: str, windows: list, *, workers: int = None,
+                           on_window=None, is_cancelled=None) -> dict:
+    """Скачать окна [(start, end), …] в `workers` потоков.
+
+    on_window(index, (start, end), res) вызывается в потоке задачи по мере
+    готовности окон; is_cancelled() проверяется перед постановкой
+    следующего окна. Возвращает суммарные created/updated/fetched и
+    суммарное время HTTP и upsert по всем потокам.
+    """
+    workers = max(1, workers or settings.BUBBLE_IMPORT_FETCH_WORKERS)
+    totals = {"created": 0, "updated": 0, "fetched": 0,
+              "fetch_sec": 0.0, "upsert_sec": 0.0, "cancelled": False}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        queue = list(enumerate(windows, start=1))
+        while queue or pending:
+            while queue and len(pending) < workers:
+                if is_cancelled and is_cancelled():
+                    totals["cancelled"] = True
+                    queue = []
+                    break
+                idx, (start, end) = queue.pop(0)
+                fut = pool.submit(_in_thread, fetch_window, entity, start, end)
+                pending[fut] = (idx, (start, end))
+            if not pending:
+                break
+            done = next(iter(pending))
+            # Ждём самое раннее окно — прогресс в логе идёт по порядку.
+            res = done.result()
+            idx, window = pending.pop(done)
+            for key in ("created", "updated", "fetched", "fetch_sec", "upsert_sec"):
+                totals[key] += res[key]
+            if on_window:
+                on_window(idx, window, res)
+    return totals
+
+
+# ─── APPLY ─────────────────────────────────────────────────
+
+def _finish_rec(rec, status, *, target_type="", target_id="", error=""):
+    rec.status = status
+    rec.target_type = target_type or rec.target_type
+    rec.target_id = target_id or rec.target_id
+    rec.error = error
+    rec.imported_at = timezone.now() if status == "imported" else None
+
+
+def _resolve_wa_clients(phones: set) -> dict:
+    """{phone: Client} — whatsapp_phone одним запросом, алиасы ClientPhone — по одному."""
+    from apps.crm.models import Client
+    from apps.crm.phone_utils import find_client_by_phone
+
+    clients = {}
+    for client in Client.objects.filter(whatsapp_phone__in=phones):
+        clients.setdefault(client.whatsapp_phone, client)
+    for phone in phones - set(clients):
+        client = find_client_by_phone(phone)
+        if client is not None:
+            clients[phone] = client
+    return clients
+
+
+def apply_messagewsp_batch(records: list) -> None:
+    """MessageWSP → Message для пачки записей. Семантика apply_messagewsp."""
+    from apps.crm import chat_summary
+    from apps.crm.models import Client, Message, MessageArchive
+
+    archived = set(
+        MessageArchive.objects.filter(bubble_id__in=[r.bubble_id for r in records])
+        .values_list("bubble_id", flat=True)
+    )
+    todo = []
+    for rec in records:
+        mtype = clean_str(rec.value("type")).lower()
+        body = clean_str(rec.value("body"))
+        caption = clean_str(rec.value("caption"))
+        if not mtype or (not body and not caption):
+            _finish_rec(rec, "skipped", error="Пустое сообщение (нет type/body/caption)")
+        elif rec.bubble_id in archived:
+            # Уже перенесено в архив — не возвращаем в горячую таблицу.
+            _finish_rec(rec, "imported", target_type="MessageArchive")
+        else:
+            todo.append((rec, mtype, body, caption, _wa_client_phone(rec.raw or {})))
+
+    clients = _resolve_wa_clients({phone for *_, phone in todo if phone})
+
+    # Медиа (ссылка в body) — параллельно; недоступное не роняет сообщение.
+    media = {
+        rec.bubble_id: body for rec, mtype, body, _, phone in todo
+        if mtype != "chat" and phone in clients
+        and (body.startswith("http") or body.startswith("//"))
+    }
+    stored = {}
+    if media:
+        def _download(bid, url):
+            try:
+                return bid, download_to_storedfile(url, f"wa_{bid}", f"wamedia_{bid}"[:64])
+            except Exception as e:  # noqa: BLE001
+                logger.warning("WA media %s недоступно: %s", bid, e)
+                return bid, None
+        with ThreadPoolExecutor(max_workers=settings.BUBBLE_IMPORT_DOWNLOAD_WORKERS) as pool:
+            stored = dict(pool.map(lambda item: _in_thread(_download, *item), media.items()))
+
+    qmids = {clean_str(rec.value("quotedMsgId")) for rec, *_ in todo} - {""}
+    replies = {}
+    for m in Message.objects.filter(whatsapp_message_id__in=qmids, channel="whatsapp"):
+        replies.setdefault(m.whatsapp_message_id, m)
+
+    with_file, without_file, by_rec = [], [], {}
+    now = timezone.now()
+    last_at: dict = {}
+    for rec, mtype, body, caption, phone in todo:
+        client = clients.get(phone) if phone else None
+        if client is None:
+            _finish_rec(rec, "error", error=(
+                f"Клиент с номером +{phone or '?'} не найден. "
+                f"Сначала импортируйте клиентов."
+            ))
+            continue
+        sf = stored.get(rec.bubble_id)
+        if mtype == "chat":
+            content = strip_bbcode(body)
+        else:
+            content = strip_bbcode(caption)
+            if rec.bubble_id in media and sf is None and not content:
+                content = "(медиа недоступно)"
+            elif rec.bubble_id not in media and not content:
+                content = strip_bbcode(body)
+        msg = Message(
+            bubble_id=rec.bubble_id,
+            client=client,
+            content=content,
+            direction="outgoing" if bool(rec.value("fromMe")) else "incoming",
+            message_type=_WA_TYPE_MAP.get(mtype, "text"),
+            channel="whatsapp",
+            whatsapp_message_id=clean_str(rec.value("id"))[:128],
+            reply_to=replies.get(clean_str(rec.value("quotedMsgId"))),
+            telegram_date=parse_bubble_dt(rec.value("Created Date")) or now,
+            updated_at=now,
+        )
+        if sf is not None:
+            msg.file = sf
+            msg.file_name = sf.filename
+            with_file.append(msg)
+        else:
+            without_file.append(msg)
+        by_rec[rec.bubble_id] = (rec, msg)
+        if client.pk not in last_at or msg.telegram_date > last_at[client.pk]:
+            last_at[client.pk] = msg.telegram_date
+
+    # Один upsert по bubble_id: новые вставляются, уже импортированные
+    # обновляются. У объектов pk задан заранее (uuid4), и Django его не
+    # переписывает — pk существующих строк перечитываем по bubble_id.
+    base_fields = [
+        "client", "content", "direction", "message_type", "channel",
+        "whatsapp_message_id", "reply_to", "telegram_date", "updated_at",
+    ]
+    for msgs, fields in ((without_file, base_fields),
+                         (with_file, base_fields + ["file", "file_name"])):
+        if msgs:
+            Message.objects.bulk_create(
+                msgs, update_conflicts=True, unique_fields=["bubble_id"],
+                update_fields=fields,
+            )
+    ids = dict(
+        Message.objects.filter(bubble_id__in=list(by_rec)).values_list("bubble_id", "id")
+    )
+    for bid, (rec, _msg) in by_rec.items():
+        _finish_rec(rec, "imported", target_type="Message", target_id=str(ids[bid]))
+
+    # Поднять клиентов в списке чатов и пересобрать их сводки.
+    for client_id, at in last_at.items():
+        Client.objects.filter(pk=client_id).filter(
+            Q(last_message_at__isnull=True) | Q(last_message_at__lt=at),
+        ).update(last_message_at=at)
+    if last_at:
+        chat_summary.rebuild(list(last_at))
+    BubbleRecord.objects.bulk_update(records, _REC_FIELDS)
+
+
+def apply_files_batch(records: list) -> None:
+    """Files: скачивание — сетевое, применяем записи в пуле потоков."""
+    workers = settings.BUBBLE_IMPORT_DOWNLOAD_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda rec: _in_thread(apply_record, rec), records))
+
+
+def apply_organization_batch(records: list) -> None:
+    """Organization: DaData для всей пачки одним пакетом, затем по одной.
+
+    Запросы нужны только записям, которых нет в LegalEntity ни по
+    bubble_id, ни по ИНН; apply_organization потом берёт ответы из кэша.
+    """
+    from apps.crm.dadata_legal import prefetch
+    from apps.crm.models import LegalEntity
+
+    known = set(
+        LegalEntity.objects.filter(bubble_id__in=[r.bubble_id for r in records])
+        .values_list("bubble_id", flat=True)
+    )
+    todo = [
+        (_normalize_inn_candidates(rec.value("innOrg")),
+         clean_str(rec.value("fullOrgName")) or clean_str(rec.value("shortOrgName")))
+        for rec in records if rec.bubble_id not in known
+    ]
+    local_inns = set(
+        LegalEntity.objects.filter(inn__in={inn for cands, _ in todo for inn in cands})
+        .values_list("inn", flat=True)
+    )
+    prefetch([(cands, name) for cands, name in todo if not local_inns.intersection(cands)])
+    for rec in records:
+        apply_record(rec)
+
+
+BATCH_APPLIERS = {
+    "MessageWSP": apply_messagewsp_batch,
+    "Files": apply_files_batch,
+    "Organization": apply_organization_batch,
+}
+
+
+def apply_batch(entity: str, records: list) -> dict:
+    """Применить пачку записей одной сущности. {imported, skipped, errors}."""
+    fn = BATCH_APPLIERS.get(entity)
+    if fn is None:
+        # События импорта (bubble_imported/…) — одним bulk_create на пачку.
+        with client_log.batch():
+            statuses = [apply_record(rec) for rec in records]
+    else:
+        try:
+            fn(records)
+        except Exception:  # noqa: BLE001 — пачка упала: по одной, с ошибкой на записи
+            logger.exception("bubble batch apply %s failed, fallback per-record", entity)
+            with client_log.batch():
+                for rec in records:
+                    apply_record(rec)
+        statuses = [rec.status for rec in records]
+    return {
+        "imported": statuses.count("imported"),
+        "skipped": statuses.count("skipped"),
+        "errors": len(statuses) - statuses.count("imported") - statuses.count("skipped"),
+    }
+
+
+def pending_ids(entity: str) -> list:
+    """pk одобренных, ещё не импортированных записей — порядок как у UI."""
+    return list(
+        BubbleRecord.objects.filter(entity=entity, approved=True)
+        .exclude(status="imported")
+        .order_by("bubble_created", "pk").values_list("pk", flat=True)
+    )
+
+
+def load_chunk(ids) -> list:
+    return list(BubbleRecord.objects.filter(pk__in=ids).order_by("bubble_created", "pk"))
+
+
+def timed_apply(entity: str, ids) -> dict:
+    """apply_batch по списку pk + затраченное время (для stage_stats)."""
+    started = time.monotonic()
+    res = apply_batch(entity, load_chunk(ids))
+    res["seconds"] = time.monotonic() - started
+    return res
@@ -3,23 +3,22 @@
 Bubble FK — это _id записи справочника. Чтобы не дёргать API на каждый
 объект, при первом обращении выкачиваем весь справочник целиком
 (они маленькие: Region 92, MoneySource/TypeDebit/TypeCredit/TypeAccrual —
-десятки) и кэшируем на время процесса.
-
-Кэш живёт в рамках одного процесса. Для повторного импорта после
-изменений в Bubble — перезапустить worker/web (или вызвать clear_cache).
+десятки) и кладём в общий кэш справочников (apps/core/refcache.py,
+пространство «bubble»): его видят все web- и Celery-процессы, справочник
+выкачивается один раз на TTL. Для повторного импорта после изменений в
+Bubble — clear_cache() (сбросит во всех процессах).
 """
-import functools
 import logging
 
+from apps.core import refcache
+
 from . import bubble_api
 from .extractors import clean_str
 
 logger = logging.getLogger("bubble_import")
 
 
-@functools.lru_cache(maxsize=None)
-def _load(entity: str) -> dict:
-    """Весь справочник Bubble → {_id: raw_obj}."""
+def _fetch(entity: str) -> dict:
     objs = {}
     for o in bubble_api.iter_all(entity):
         bid = o.get("_id")
@@ -29,8 +28,13 @@ def _load(entity: str) -> dict:
     return objs
 
 
+def _load(entity: str) -> dict:
+    """Весь справочник Bubble → {_id: raw_obj}."""
+    return refcache.get("bubble", f"dict:{entity}", lambda: _fetch(entity))
+
+
 def clear_cache():
-    _load.cache_clear()
+    refcache.invalidate("bubble")
 
 
 def lookup(entity: str, bubble_id: str, field: str) -> str:
@@ -73,13 +77,7 @@ def resolve_client_status(status_prj_bubble_id: str):
     return _STATUS_PRJ_TO_CLIENT.get(name.strip().lower()) if name else None
 
 
-@functools.lru_cache(maxsize=None)
-def _projects_by_client() -> dict:
-    """Индекс ProjectBFL по клиенту: {dolgnik_id: [project, ...]}.
-
-    Выкачивает все услуги один раз (≈5400) — чтобы при импорте клиентов
-    определять их статус без отдельного запроса на каждого.
-    """
+def _build_projects_index() -> dict:
     idx: dict = {}
     for o in _load("ProjectBFL").values():
         d = o.get("dolgnik")
@@ -88,6 +86,18 @@ def _projects_by_client() -> dict:
     return idx
 
 
+def _projects_by_client() -> dict:
+    """Индекс ProjectBFL по клиенту: {dolgnik_id: [project, ...]}.
+
+    Выкачивает все услуги один раз (≈5400) — чтобы при импорте клиентов
+    определять их статус без отдельного запроса на каждого. Сам индекс
+    строится из кэшированного справочника и в Redis не дублируется.
+    """
+    return refcache.get(
+        "bubble", "index:projects_by_client", _build_projects_index, shared=False,
+    )
+
+
 def resolve_client_status_by_man(man_bubble_id: str):
     """Статус клиента по его услуге(ам) ProjectBFL. None если услуг нет.
 
@@ -128,20 +138,28 @@ def resolve_region(region_bubble_id: str):
         return None
     from apps.crm.models import Region
     try:
-        return Region.objects.filter(number=int(float(num))).first()
+        number = int(float(num))
     except (ValueError, TypeError):
         return None
+    return refcache.get(
+        "regions", str(number),
+        lambda: Region.objects.filter(number=number).first(),
+    )
 
 
 def resolve_bfl_service_name():
     """ServiceName «БФЛ» — все импортируемые услуги этого типа."""
     from apps.crm.models import ServiceName
-    sn = ServiceName.objects.filter(short_name__iexact="БФЛ").first()
-    if sn is None:
-        sn = ServiceName.objects.create(
-            short_name="БФЛ", full_name="Банкротство физических лиц",
-        )
-    return sn
+
+    def load():
+        sn = ServiceName.objects.filter(short_name__iexact="БФЛ").first()
+        if sn is None:
+            sn = ServiceName.objects.create(
+                short_name="БФЛ", full_name="Банкротство физических лиц",
+            )
+        return sn
+
+    return refcache.get("service_names", "БФЛ", load)
 
 
 def resolve_income_type(type_debit_bubble_id: str):
@@ -1,6 +1,7 @@
 """FETCH-логика: постраничная выгрузка Bubble → staging-таблица BubbleRecord."""
 import datetime
 import logging
+import time
 
 from django.utils import timezone
 
@@ -37,6 +38,52 @@ def _entity_constraints(entity: str) -> list | None:
     return None
 
 
+# Поля staging-записи, которые перезаписывает повторный fetch. overrides
+# (правки оператора), approved и статус импорта не трогаем.
+_UPSERT_FIELDS = ["raw", "display_title", "display_subtitle", "bubble_created", "fetched_at"]
+
+
+def upsert_records(entity: str, objs: list) -> dict:
+    """Записать страницу объектов Bubble в staging одним INSERT … ON CONFLICT.
+
+    Возвращает {created, updated, bubble_ids}. Раньше это был
+    update_or_create на каждый объект — 2-3 запроса на запись.
+    """
+    rows: dict[str, BubbleRecord] = {}
+    for obj in objs:
+        bid = obj.get("_id")
+        if not bid:
+            continue
+        display = extract_display(entity, obj)
+        # Для услуг — резолвим название статуса (statusPrj) в отдельный столбец.
+        if entity == "ProjectBFL":
+            from . import resolvers
+            display["display_status"] = resolvers.lookup(
+                "StatusPrj", obj.get("statusPrj"), "nameStatusPrj",
+            )
+        # Дубли внутри страницы (overlap окон) — последняя версия.
+        rows[bid] = BubbleRecord(entity=entity, bubble_id=bid, raw=obj, **display)
+    if not rows:
+        return {"created": 0, "updated": 0, "bubble_ids": []}
+
+    existing = set(
+        BubbleRecord.objects.filter(entity=entity, bubble_id__in=list(rows))
+        .values_list("bubble_id", flat=True)
+    )
+    fields = _UPSERT_FIELDS + (["display_status"] if entity == "ProjectBFL" else [])
+    BubbleRecord.objects.bulk_create(
+        list(rows.values()),
+        update_conflicts=True,
+        unique_fields=["entity", "bubble_id"],
+        update_fields=fields,
+    )
+    return {
+        "created": len(rows) - len(existing),
+        "updated": len(existing),
+        "bubble_ids": list(rows),
+    }
+
+
 def fetch_modified_since(entity: str, since: datetime.datetime,
                          by: str = "created") -> dict:
     """Доливка: выгрузить записи entity, появившиеся/изменённые ПОСЛЕ `since`.
@@ -66,25 +113,10 @@ def fetch_modified_since(entity: str, since: datetime.datetime,
         results = page["results"]
         if not results:
             break
-        for obj in results:
-            bid = obj.get("_id")
-            if not bid:
-                continue
-            display = extract_display(entity, obj)
-            if entity == "ProjectBFL":
-                from . import resolvers
-                display["display_status"] = resolvers.lookup(
-                    "StatusPrj", obj.get("statusPrj"), "nameStatusPrj",
-                )
-            _, is_new = BubbleRecord.objects.update_or_create(
-                entity=entity, bubble_id=bid,
-                defaults={"raw": obj, **display},
-            )
-            touched_ids.append(bid)
-            if is_new:
-                created += 1
-            else:
-                updated += 1
+        res = upsert_records(entity, results)
+        touched_ids.extend(res["bubble_ids"])
+        created += res["created"]
+        updated += res["updated"]
         cursor += len(results)
         if page.get("remaining", 0) <= 0:
             break
@@ -107,7 +139,7 @@ def _window_constraints(entity: str, start: datetime.datetime,
     поддерживает только `greater than` / `less than` (без `or equal`),
     поэтому нижнюю границу сдвигаем на секунду назад — даёт 1-секундный
     overlap между соседними окнами, но fetch_window идемпотентен через
-    update_or_create, дубликаты безопасны."""
+    upsert по (entity, bubble_id), дубликаты безопасны."""
     start_excl = start - datetime.timedelta(seconds=1)
     return [
         {"key": "Created Date", "constraint_type": "greater than",
@@ -120,38 +152,28 @@ def _window_constraints(entity: str, start: datetime.datetime,
 def fetch_window(entity: str, start: datetime.datetime,
                  end: datetime.datetime) -> dict:
     """Выгрузить ВСЕ записи entity за окно [start, end). Локальный cursor,
-    state.cursor не трогаем. update_or_create обеспечивает идемпотентность
-    при повторных запусках."""
+    state.cursor не трогаем. Upsert по (entity, bubble_id) обеспечивает
+    идемпотентность при повторных запусках."""
     constraints = _window_constraints(entity, start, end)
     cursor = 0
     created = updated = 0
     fetched_total = 0
+    fetch_sec = upsert_sec = 0.0
     while True:
+        t0 = time.monotonic()
         page = bubble_api.fetch_page(
             entity, cursor=cursor, limit=bubble_api.PAGE_LIMIT,
             constraints=constraints,
         )
+        t1 = time.monotonic()
+        fetch_sec += t1 - t0
         results = page["results"]
         if not results:
             break
-        for obj in results:
-            bid = obj.get("_id")
-            if not bid:
-                continue
-            display = extract_display(entity, obj)
-            if entity == "ProjectBFL":
-                from . import resolvers
-                display["display_status"] = resolvers.lookup(
-                    "StatusPrj", obj.get("statusPrj"), "nameStatusPrj",
-                )
-            _, is_new = BubbleRecord.objects.update_or_create(
-                entity=entity, bubble_id=bid,
-                defaults={"raw": obj, **display},
-            )
-            if is_new:
-                created += 1
-            else:
-                updated += 1
+        res = upsert_records(entity, results)
+        upsert_sec += time.monotonic() - t1
+        created += res["created"]
+        updated += res["updated"]
         got = len(results)
         cursor += got
         fetched_total += got
@@ -168,7 +190,10 @@ def fetch_window(entity: str, start: datetime.datetime,
         "Bubble fetch_window %s [%s..%s]: +%d new, %d upd, total in window %d",
         entity, start.date(), end.date(), created, updated, fetched_total,
     )
-    return {"created": created, "updated": updated, "fetched": fetched_total}
+    return {
+        "created": created, "updated": updated, "fetched": fetched_total,
+        "fetch_sec": fetch_sec, "upsert_sec": upsert_sec,
+    }
 
 
 def get_state(entity: str) -> BubbleFetchState:
@@ -187,35 +212,24 @@ def fetch_batch(entity: str, batch: int = DEFAULT_BATCH) -> dict:
     fetched = created = updated = 0
     remaining = state.total_remote
     constraints = _entity_constraints(entity)
+    fetch_sec = upsert_sec = 0.0
 
     while fetched < batch:
         want = min(bubble_api.PAGE_LIMIT, batch - fetched)
+        t0 = time.monotonic()
         page = bubble_api.fetch_page(entity, cursor=cursor, limit=want,
                                      constraints=constraints)
+        t1 = time.monotonic()
+        fetch_sec += t1 - t0
         results = page["results"]
         remaining = page["remaining"]
         if not results:
             break
 
-        for obj in results:
-            bid = obj.get("_id")
-            if not bid:
-                continue
-            display = extract_display(entity, obj)
-            # Для услуг — резолвим название статуса (statusPrj) в отдельный столбец.
-            if entity == "ProjectBFL":
-                from . import resolvers
-                display["display_status"] = resolvers.lookup(
-                    "StatusPrj", obj.get("statusPrj"), "nameStatusPrj",
-                )
-            rec, is_new = BubbleRecord.objects.update_or_create(
-                entity=entity, bubble_id=bid,
-                defaults={"raw": obj, **display},
-            )
-            if is_new:
-                created += 1
-            else:
-                updated += 1
+        res = upsert_records(entity, results)
+        upsert_sec += time.monotonic() - t1
+        created += res["created"]
+        updated += res["updated"]
         got = len(results)
         fetched += got
         cursor += got
@@ -237,4 +251,5 @@ def fetch_batch(entity: str, batch: int = DEFAULT_BATCH) -> dict:
         "fetched": fetched, "created": created, "updated": updated,
         "remaining": remaining, "total": total,
         "total_fetched": state.total_fetched,
+        "fetch_sec": fetch_sec, "upsert_sec": upsert_sec,
     }
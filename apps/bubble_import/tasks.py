@@ -5,16 +5,19 @@ BubbleImportJob — UI поллит его HTMX-ом каждые ~2 секун
 """
 import datetime
 import logging
+import time
 import traceback
 
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import F
 from django.utils import timezone
 
-from . import bubble_api
-from .appliers import apply_record, link_spouses
+from . import bubble_api, pipeline
+from .appliers import link_spouses
 from .models import BubbleImportJob, BubbleRecord
 from .services import (
-    FILES_YEARS, MESSAGEWSP_YEARS, fetch_batch, fetch_window, get_state,
+    FILES_YEARS, MESSAGEWSP_YEARS, fetch_batch, get_state,
 )
 
 # Bubble Data API режет cursor-пагинацию на 50 000 записей за один запрос.
@@ -30,7 +33,7 @@ logger = logging.getLogger("bubble_import")
 
 # Размер порций.
 FETCH_BATCH = 100      # max Bubble Data API
-APPLY_REPORT_EVERY = 50  # как часто обновлять счётчики при apply
+APPLY_REPORT_EVERY = 50  # пачка apply для сущностей без пакетного applier'а
 
 
 def _refresh_cancel(job: BubbleImportJob) -> bool:
@@ -81,44 +84,53 @@ def full_import_task(self, job_id: str):
         job.current_action = "Загрузка из Bubble"
         job.save(update_fields=["current_action"])
         job.add_log("Этап 1/3: загрузка из Bubble")
+        fetch_started = time.monotonic()
+        fetched = 0
+        http_sec = upsert_sec = 0.0
 
         if entity in WINDOWED_ENTITIES:
             # Окно [cutoff..now] бьём на куски по WINDOW_DAYS — каждый кусок
             # гарантированно <50 000 записей, обходим жёсткий лимит Bubble.
+            # Окна качаются параллельно (pipeline.fetch_windows_parallel).
             now = timezone.now()
             cutoff = now - datetime.timedelta(
                 days=365 * WINDOW_YEARS_BY_ENTITY.get(entity, MESSAGEWSP_YEARS)
             )
             step = datetime.timedelta(days=WINDOW_DAYS)
+            windows = []
             start = cutoff
-            n_win = 0
-            total_new = total_upd = 0
             while start < now:
-                if _refresh_cancel(job):
-                    job.add_log("Отменено пользователем")
-                    _finish(job, "cancelled")
-                    return
                 end = min(start + step, now)
-                n_win += 1
-                try:
-                    res = fetch_window(entity, start, end)
-                except bubble_api.BubbleAPIError as e:
-                    job.add_log(f"Bubble API ошибка: {e}")
-                    raise
-                total_new += res["created"]
-                total_upd += res["updated"]
+                windows.append((start, end))
+                start = end
+
+            def on_window(n_win, window, res):
                 state = get_state(entity)
                 job.fetched_total = state.total_fetched
                 job.save(update_fields=["fetched_total"])
                 job.add_log(
-                    f"  окно {n_win} [{start.date()}..{end.date()}]: "
+                    f"  окно {n_win}/{len(windows)} [{window[0].date()}..{window[1].date()}]: "
                     f"+{res['created']} новых, {res['updated']} обновлено "
                     f"(всего в БД: {state.total_fetched})"
                 )
-                start = end
+
+            try:
+                res = pipeline.fetch_windows_parallel(
+                    entity, windows, on_window=on_window,
+                    is_cancelled=lambda: _refresh_cancel(job),
+                )
+            except bubble_api.BubbleAPIError as e:
+                job.add_log(f"Bubble API ошибка: {e}")
+                raise
+            if res["cancelled"]:
+                job.add_log("Отменено пользователем")
+                _finish(job, "cancelled")
+                return
+            fetched = res["fetched"]
+            http_sec, upsert_sec = res["fetch_sec"], res["upsert_sec"]
             job.add_log(
-                f"  Этап 1 завершён: окон {n_win}, "
-                f"новых {total_new}, обновлено {total_upd}"
+                f"  Этап 1 завершён: окон {len(windows)}, "
+                f"новых {res['created']}, обновлено {res['updated']}"
             )
         else:
             page = 0
@@ -133,6 +145,9 @@ def full_import_task(self, job_id: str):
                     job.add_log(f"Bubble API ошибка: {e}")
                     raise
                 page += 1
+                fetched += res["fetched"]
+                http_sec += res["fetch_sec"]
+                upsert_sec += res["upsert_sec"]
                 state = get_state(entity)
                 job.fetched_total = state.total_fetched
                 job.remote_total = state.total_remote
@@ -144,6 +159,10 @@ def full_import_task(self, job_id: str):
                 if res["remaining"] <= 0 or res["fetched"] == 0:
                     break
 
+        job.set_stage("fetch", fetched, time.monotonic() - fetch_started, save=False)
+        job.set_stage("http", fetched, http_sec, save=False)
+        job.set_stage("upsert", fetched, upsert_sec)
+
         # ─── Этап 2: APPROVE ALL ─────────────────────────
         if _refresh_cancel(job):
             job.add_log("Отменено пользователем")
@@ -159,37 +178,43 @@ def full_import_task(self, job_id: str):
         # ─── Этап 3: APPLY ───────────────────────────────
         job.current_action = "Применение в SiriCRM"
         job.save(update_fields=["current_action"])
-        qs = BubbleRecord.objects.filter(
-            entity=entity, approved=True,
-        ).exclude(status="imported")
-        total = qs.count()
+        ids = pipeline.pending_ids(entity)
+        total = len(ids)
         job.add_log(f"Этап 3/3: применение, к импорту {total}")
 
+        batched = entity in pipeline.BATCH_APPLIERS
+        size = settings.BUBBLE_IMPORT_APPLY_CHUNK if batched else APPLY_REPORT_EVERY
+        chunks = [ids[n:n + size] for n in range(0, total, size)]
+
+        if batched and settings.BUBBLE_IMPORT_APPLY_CHORD and len(chunks) > 1:
+            # Пачки — отдельными задачами на свободных воркерах; счётчики
+            # они прибавляют сами, job закрывает finish_apply_task.
+            job.add_log(f"  раздано воркерам: {len(chunks)} пачек по {size}")
+            chord(
+                apply_chunk_task.s(str(job.pk), entity, chunk) for chunk in chunks
+            )(finish_apply_task.s(str(job.pk), time.time()))
+            return
+
+        apply_started = time.monotonic()
         i = imp = errs = skp = 0
-        for rec in qs.iterator(chunk_size=100):
+        for chunk in chunks:
             if _refresh_cancel(job):
                 job.add_log(f"Отменено после {i} из {total}")
                 _finish(job, "cancelled")
                 return
-            i += 1
-            st = apply_record(rec)
-            if st == "imported":
-                imp += 1
-            elif st == "skipped":
-                skp += 1
-            else:
-                errs += 1
-            if i % APPLY_REPORT_EVERY == 0:
-                job.applied_count = imp
-                job.errors_count = errs
-                job.skipped_count = skp
-                job.save(update_fields=["applied_count", "errors_count", "skipped_count"])
-                job.add_log(f"  применено {i}/{total} (импорт {imp}, ошибки {errs}, пропуск {skp})")
-
-        job.applied_count = imp
-        job.errors_count = errs
-        job.skipped_count = skp
-        job.save(update_fields=["applied_count", "errors_count", "skipped_count"])
+            res = pipeline.apply_batch(entity, pipeline.load_chunk(chunk))
+            i += len(chunk)
+            imp += res["imported"]
+            skp += res["skipped"]
+            errs += res["errors"]
+            job.applied_count = imp
+            job.errors_count = errs
+            job.skipped_count = skp
+            job.set_stage("apply", i, time.monotonic() - apply_started, save=False)
+            job.save(update_fields=[
+                "applied_count", "errors_count", "skipped_count", "stage_stats",
+            ])
+            job.add_log(f"  применено {i}/{total} (импорт {imp}, ошибки {errs}, пропуск {skp})")
 
         # Дополнительно для клиентов — связь супругов.
         if entity == "Man":
@@ -212,3 +237,39 @@ def full_import_task(self, job_id: str):
             "status", "current_action", "finished_at", "error_text", "log_text",
         ])
         logger.exception("full_import_task %s failed", entity)
+
+
+@shared_task(name="bubble_import.apply_chunk", time_limit=60 * 60)
+def apply_chunk_task(job_id: str, entity: str, record_ids: list) -> dict:
+    """Пачка apply для chord'а full_import_task. Счётчики job — атомарно через F()."""
+    res = {"imported": 0, "skipped": 0, "errors": 0}
+    if BubbleImportJob.objects.filter(pk=job_id, cancel_requested=True).exists():
+        return res
+    try:
+        res = pipeline.apply_batch(entity, pipeline.load_chunk(record_ids))
+    except Exception:  # noqa: BLE001 — упавшая пачка не должна ронять chord
+        logger.exception("apply_chunk_task %s: пачка из %d упала", entity, len(record_ids))
+        res["errors"] = len(record_ids)
+    BubbleImportJob.objects.filter(pk=job_id).update(
+        applied_count=F("applied_count") + res["imported"],
+        skipped_count=F("skipped_count") + res["skipped"],
+        errors_count=F("errors_count") + res["errors"],
+    )
+    return res
+
+
+@shared_task(name="bubble_import.finish_apply")
+def finish_apply_task(results: list, job_id: str, started_at: float):
+    """Callback chord'а: скорость этапа apply и финальный статус job."""
+    job = BubbleImportJob.objects.get(pk=job_id)
+    done = sum(r["imported"] + r["skipped"] + r["errors"] for r in results)
+    job.set_stage("apply", done, time.time() - started_at)
+    if job.cancel_requested:
+        job.add_log(f"Отменено после {done} записей")
+        _finish(job, "cancelled")
+        return
+    job.add_log(
+        f"ГОТОВО: импортировано {job.applied_count}, ошибок {job.errors_count}, "
+        f"пропущено {job.skipped_count}"
+    )
+    _finish(job, "done")
@@ -0,0 +1,364 @@
+"""Общий HTTP-слой исходящих интеграций (1msg, MAX, ЕФРСБ, Bubble, DaData, ТБанк).
+
+Раньше каждый модуль звал голый ``requests.get/post``: на каждый вызов —
+новый TCP + TLS handshake, свои (или никаких) ретраи, и при лежащем
+провайдере воркеры висели на таймаутах. Здесь:
+
+* сессия ``requests.Session`` на провайдера и поток — keep-alive, пул
+  соединений по хосту (HTTPAdapter). После fork (Celery prefork) сессии
+  пересоздаются;
+* ``Provider`` — настройки провайдера: лимит запросов в секунду на процесс
+  (`RateLimiter`), таймаут, ретраи, circuit breaker. Регистрируется модулем
+  клиента через `register`;
+* ретраи с full jitter: соединение не установилось (ConnectTimeout,
+  NewConnectionError — DNS, отказ в соединении) — запрос не ушёл,
+  повторяется для любого метода. Остальные сетевые ошибки (в т.ч.
+  «Connection aborted» на переиспользованном keep-alive: сервер мог
+  получить POST), таймаут чтения и retry_statuses — только для
+  идемпотентных (GET/HEAD/… или idempotent=True; 429 — для любого метода);
+* `CircuitBreaker`: после breaker_threshold подряд сетевых ошибок/5xx
+  провайдер «открывается» на breaker_reset секунд и вызовы сразу падают
+  `CircuitOpen` (это ``requests.ConnectionError`` — существующие
+  ``except requests.RequestException`` ловят его как обычный сбой сети);
+* метрики: число вызовов, ошибки, суммарная и «медленная» задержка по
+  (провайдер, эндпоинт) копятся в процессе и порциями сбрасываются в
+  Redis — `manage.py http_stats`.
+
+HTTP/2 (httpx) не используется: пакета h2 в окружении нет, а все клиенты
+написаны на requests — keep-alive даёт основную часть выигрыша.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+DEFAULT_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+SLOW_SECONDS = 1.0
+STATS_FLUSH_EVERY = 200
+STATS_FLUSH_SECONDS = 60
+STATS_KINDS = ("count", "errors", "ms", "slow")
+_STATS_INDEX_KEY = "http:stats:index"
+
+
+@dataclass(frozen=True)
+class Provider:
+    name: str
+    rps: float = 0  # 0 — без ограничения
+    timeout: float | tuple = 30
+    retries: int = 2
+    retry_statuses: frozenset = DEFAULT_RETRY_STATUSES
+    backoff: float = 0.5  # базовая пауза, растёт как backoff * 2**attempt
+    backoff_max: float = 10
+    breaker_threshold: int = 5  # 0 — без circuit breaker
+    breaker_reset: float = 30
+    pool_maxsize: int = 10
+
+
+class CircuitOpen(requests.ConnectionError):
+    """Провайдер временно отключён после серии сбоев."""
+
+
+class RateLimiter:
+    """Не чаще `rps` запросов в секунду на процесс, потокобезопасно.
+
+    Каждый вызов `wait` резервирует следующий слот и спит до него — потоки
+    не толкаются, а встают в очередь.
+    """
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CircuitBreaker:
+    """closed → (threshold сбоев подряд) → open → (reset сек) → half-open.
+
+    В half-open пропускается один пробный вызов: успех закрывает, сбой
+    снова открывает на reset секунд.
+    """
+
+    def __init__(self, name: str, threshold: int, reset: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset = reset
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        if not self.threshold:
+            return True
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("http %s: circuit closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def failure(self) -> None:
+        if not self.threshold:
+            return
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._failures >= self.threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        "http %s: circuit open на %.0fs после %d сбоев подряд",
+                        self.name, self.reset, self._failures,
+                    )
+                self._opened_at = time.monotonic()
+
+
+PROVIDERS: dict[str, Provider] = {}
+_limiters: dict[str, RateLimiter] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+_local = threading.local()
+
+
+def register(provider: Provider) -> Provider:
+    """Зарегистрировать (или перенастроить) провайдера."""
+    PROVIDERS[provider.name] = provider
+    _limiters[provider.name] = RateLimiter(provider.rps)
+    _breakers[provider.name] = CircuitBreaker(
+        provider.name, provider.breaker_threshold, provider.breaker_reset,
+    )
+    return provider
+
+
+def limiter(name: str) -> RateLimiter:
+    return _limiters[name]
+
+
+def breaker(name: str) -> CircuitBreaker:
+    return _breakers[name]
+
+
+def session(name: str) -> requests.Session:
+    """Сессия провайдера для текущего потока (после fork — новая)."""
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.pid = pid
+        _local.sessions = {}
+    s = _local.sessions.get(name)
+    if s is None:
+        provider = PROVIDERS[name]
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=provider.pool_maxsize)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        _local.sessions[name] = s
+    return s
+
+
+# ── метрики ─────────────────────────────────────────────────────────────────
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,}|[A-Za-z0-9_-]{32,})$")
+_stats_lock = threading.Lock()
+_stats: dict[tuple, dict[str, int]] = defaultdict(lambda: dict.fromkeys(STATS_KINDS, 0))
+_pending = 0
+_last_flush = time.monotonic()
+
+
+def endpoint_label(method: str, url: str) -> str:
+    """«GET /v1/messages/:id» — путь без идентификаторов и query."""
+    parts = [
+        ":id" if _ID_SEGMENT.match(seg) else seg
+        for seg in urlsplit(url).path.split("/")
+    ]
+    return f"{method} {'/'.join(parts) or '/'}"
+
+
+def _stats_key(provider: str, endpoint: str, kind: str) -> str:
+    return f"http:stats:{provider}:{endpoint.replace(' ', '_')}:{kind}"
+
+
+def record(provider: str, endpoint: str, seconds: float, error: bool) -> None:
+    """Учесть вызов в метриках (request() зовёт сам; нужно клиентам в обход него)."""
+    global _pending
+    with _stats_lock:
+        counts = _stats[(provider, endpoint)]
+        counts["count"] += 1
+        counts["errors"] += int(error)
+        counts["ms"] += int(seconds * 1000)
+        counts["slow"] += int(seconds >= SLOW_SECONDS)
+        _pending += 1
+        due = (_pending >= STATS_FLUSH_EVERY
+               or time.monotonic() - _last_flush >= STATS_FLUSH_SECONDS)
+    if due:
+        flush_stats()
+
+
+def local_stats() -> dict[tuple, dict[str, int]]:
+    """Счётчики этого процесса с последнего flush."""
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def flush_stats() -> None:
+    """Прибавить счётчики процесса к общим в Redis и обнулить локальные."""
+    global _pending, _last_flush
+    with _stats_lock:
+        snapshot = {k: dict(v) for k, v in _stats.items()}
+        _stats.clear()
+        _pending = 0
+        _last_flush = time.monotonic()
+    if not snapshot:
+        return
+    try:
+        for (provider, endpoint), counts in snapshot.items():
+            for kind, n in counts.items():
+                if not n:
+                    continue
+                key = _stats_key(provider, endpoint, kind)
+                if not cache.add(key, n, None):
+                    cache.incr(key, n)
+        # Индекс эндпоинтов: гонка двух процессов может потерять новую
+        # строку до следующего flush — для статистики это допустимо.
+        index = set(map(tuple, cache.get(_STATS_INDEX_KEY) or []))
+        if not set(snapshot) <= index:
+            cache.set(_STATS_INDEX_KEY, sorted(index | set(snapshot)), None)
+    except Exception:  # noqa: BLE001 — статистика не должна ронять запрос
+        logger.warning("http_client: не удалось сбросить счётчики", exc_info=True)
+
+
+def shared_stats() -> dict[tuple, dict[str, int]]:
+    """Общие счётчики из Redis: {(provider, endpoint): {kind: n}}."""
+    index = [tuple(x) for x in cache.get(_STATS_INDEX_KEY) or []]
+    keys = {
+        _stats_key(p, e, kind): ((p, e), kind)
+        for p, e in index for kind in STATS_KINDS
+    }
+    values = cache.get_many(list(keys))
+    out = {row: dict.fromkeys(STATS_KINDS, 0) for row in index}
+    for key, n in values.items():
+        row, kind = keys[key]
+        out[row][kind] = n
+    return out
+
+
+def reset_shared_stats() -> None:
+    index = [tuple(x) for x in cache.get(_STATS_INDEX_KEY) or []]
+    cache.delete_many(
+        [_stats_key(p, e, kind) for p, e in index for kind in STATS_KINDS]
+        + [_STATS_INDEX_KEY]
+    )
+
+
+# ── запрос ─────────────────────────────────────────────────────────────────
+
+def _sleep_before_retry(provider: Provider, attempt: int, resp=None) -> None:
+    delay = random.uniform(0, min(provider.backoff_max, provider.backoff * 2 ** attempt))
+    if resp is not None and resp.status_code == 429:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            delay = min(float(retry_after), provider.backoff_max)
+    time.sleep(delay)
+
+
+def _not_sent(exc: requests.RequestException) -> bool:
+    """Соединение так и не установилось — запрос точно не ушёл на сервер."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(exc, requests.ConnectionError) or not exc.args:
+        return False
+    # requests заворачивает MaxRetryError(reason=NewConnectionError).
+    reason = exc.args[0]
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, NewConnectionError)
+
+
+def request(name: str, method: str, url: str, *, endpoint: str = None,
+            idempotent: bool = None, retries: int = None, **kwargs) -> requests.Response:
+    """HTTP-запрос через пул провайдера `name`.
+
+    kwargs — как у ``requests.Session.request`` (timeout по умолчанию из
+    Provider). Возвращает последний ответ — статус проверяет вызывающий;
+    если последняя попытка упала на сети, исключение пробрасывается.
+    idempotent=True — можно повторять POST (read-only API вроде DaData).
+    """
+    provider = PROVIDERS[name]
+    method = method.upper()
+    endpoint = endpoint or endpoint_label(method, url)
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    retries = provider.retries if retries is None else retries
+    kwargs.setdefault("timeout", provider.timeout)
+    cb = _breakers[name]
+
+    for attempt in range(retries + 1):
+        if not cb.allow():
+            record(name, endpoint, 0, True)
+            raise CircuitOpen(f"{name}: circuit open, запрос {endpoint} не отправлен")
+        _limiters[name].wait()
+        started = time.monotonic()
+        try:
+            resp = session(name).request(method, url, **kwargs)
+        except requests.RequestException as e:
+            record(name, endpoint, time.monotonic() - started, True)
+            cb.failure()
+            if attempt < retries and (idempotent or _not_sent(e)):
+                logger.info("http %s %s: %s, повтор %d", name, endpoint, e, attempt + 1)
+                _sleep_before_retry(provider, attempt)
+                continue
+            raise
+
+        record(name, endpoint, time.monotonic() - started, resp.status_code >= 400)
+        if resp.status_code >= 500:
+            cb.failure()
+        else:
+            cb.success()
+        retryable = resp.status_code in provider.retry_statuses and (
+            idempotent or resp.status_code == 429)
+        if attempt < retries and retryable:
+            logger.info("http %s %s: HTTP %s, повтор %d",
+                        name, endpoint, resp.status_code, attempt + 1)
+            resp.close()
+            _sleep_before_retry(provider, attempt, resp)
+            continue
+        return resp
@@ -0,0 +1,162 @@
+"""Ночной контроль просрочек: начисления, мероприятия процедур, запросы.
+
+Раньше каждая задача шла по строкам: save() на строку, событийка
+`client_log.record_event` на строку (а в ней — получатели и пуши на
+каждое уведомление), а начисления ещё и агрегат Sum по платежам на
+каждое, включая давно просроченные. Здесь всё множествами:
+
+  * select — один запрос выбирает ТОЛЬКО строки, у которых состояние
+    действительно меняется (для начислений сумма оплат — подзапросом);
+  * update — UPDATE ... WHERE pk IN (...) по целевому статусу; выборка и
+    UPDATE в одной транзакции под FOR UPDATE, так что событийка пишется
+    ровно по тем строкам, которые мы перевели;
+  * log — client_log.record_many: записи событийки и уведомления по ним
+    bulk_create'ами, получатели всех клиентов — сгруппированными
+    запросами, рассылка бейджей — отдельной celery-задачей.
+
+Каждая функция возвращает отчёт: {"changed": N, "phases": {фаза: секунды}}.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class _Report(dict):
+    def __init__(self, name: str):
+        super().__init__(changed=0, phases={})
+        self.name = name
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self["phases"][name] = round(time.monotonic() - started, 3)
+
+    def log(self) -> _Report:
+        logger.info(
+            "overdue %s: changed=%d %s", self.name, self["changed"],
+            " ".join(f"{k}={v}s" for k, v in self["phases"].items()),
+        )
+        return self
+
+
+def _log_events(report: _Report, code: str, items) -> None:
+    """Записи событийки `code` по [(client_id, comment)] одной пачкой."""
+    from apps.crm import client_log
+
+    with report.phase("log"):
+        client_log.record_many(
+            {"client_id": client_id, "code": code, "comment": comment}
+            for client_id, comment in items
+            if client_id
+        )
+
+
+def mark_charges(charge_qs=None, *, today=None) -> dict:
+    """Непогашенные Charge с due_date < today → overdue (или paid, если
+    оплачены полностью). Событийка — только на переходе в overdue."""
+    from apps.finance.models import Charge, Payment
+
+    report = _Report("charges")
+    today = today or timezone.localdate()
+    if charge_qs is None:
+        charge_qs = Charge.objects.exclude(status="paid").filter(due_date__lt=today)
+    paid = (
+        Payment.objects.filter(charge=OuterRef("pk"), direction="in")
+        .values("charge").annotate(s=Sum("amount_in")).values("s")
+    )
+    zero = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+    with transaction.atomic():
+        with report.phase("select"):
+            rows = list(
+                charge_qs.select_for_update(of=("self",)).order_by()
+                .annotate(paid_sum=Coalesce(Subquery(paid), zero))
+                .filter(
+                    (Q(paid_sum__gte=F("amount")) & ~Q(status="paid"))
+                    | (Q(paid_sum__lt=F("amount")) & ~Q(status="overdue"))
+                )
+                .values_list("pk", "client_id", "title", "due_date", "amount", "paid_sum")
+            )
+        to_paid = [r[0] for r in rows if r[5] >= r[4]]
+        to_overdue = [r for r in rows if r[5] < r[4]]
+        with report.phase("update"):
+            report["changed"] = (
+                Charge.objects.filter(pk__in=to_paid).update(status="paid")
+                + Charge.objects.filter(pk__in=[r[0] for r in to_overdue]).update(status="overdue")
+            )
+    _log_events(report, "charge_overdue", [
+        (client_id, f"Просрочено начисление «{title}» от {due:%d.%m.%Y} на {amount} руб.")
+        for _pk, client_id, title, due, amount, _paid in to_overdue
+    ])
+    return report.log()
+
+
+def mark_milestones(*, today=None) -> dict:
+    """pending + due_date < today → overdue + событийка
+    `procedure_milestone_overdue`. Каждое мероприятие флипается один раз."""
+    from apps.procedure.models import ProcedureMilestone
+
+    report = _Report("milestones")
+    today = today or timezone.localdate()
+    pending = ProcedureMilestone.objects.filter(
+        status=ProcedureMilestone.STATUS_PENDING, due_date__lt=today,
+    )
+    with transaction.atomic():
+        with report.phase("select"):
+            rows = list(
+                pending.select_for_update(of=("self",)).order_by()
+                .values_list("pk", "case__service__client_id", "title", "due_date")
+            )
+        with report.phase("update"):
+            report["changed"] = ProcedureMilestone.objects.filter(
+                pk__in=[r[0] for r in rows],
+            ).update(status=ProcedureMilestone.STATUS_OVERDUE, updated_at=timezone.now())
+    _log_events(report, "procedure_milestone_overdue", [
+        (client_id, f"Просрочено мероприятие: {title} (срок {due:%d.%m.%Y})")
+        for _pk, client_id, title, due in rows
+    ])
+    return report.log()
+
+
+def mark_requests(*, today=None) -> dict:
+    """Отправленные запросы без ответа с due_date < today → overdue_notified +
+    событийка `request_overdue`. Флаг — чтобы уведомить ровно один раз."""
+    from apps.procedure.models import Request
+
+    report = _Report("requests")
+    today = today or timezone.localdate()
+    due = Request.objects.filter(
+        status=Request.STATUS_SENT, due_date__lt=today, overdue_notified=False,
+    )
+    with transaction.atomic():
+        with report.phase("select"):
+            reqs = list(
+                due.select_for_update(of=("self",)).order_by().select_related("recipient")
+                .only("pk", "title", "due_date", "recipient", "recipient_name",
+                      "recipient__name", "recipient__short_name")
+                .annotate(client_id=F("case__service__client_id"))
+            )
+        with report.phase("update"):
+            report["changed"] = Request.objects.filter(pk__in=[r.pk for r in reqs]).update(
+                overdue_notified=True, updated_at=timezone.now(),
+            )
+    _log_events(report, "request_overdue", [
+        (
+            r.client_id,
+            f"Просрочен ответ на запрос: {r.title} → {r.recipient_display} "
+            f"(срок {r.due_date:%d.%m.%Y})",
+        )
+        for r in reqs
+    ])
+    return report.log()
@@ -0,0 +1,171 @@
+"""Двухуровневый кэш справочников: словарь процесса + общий кэш (Redis).
+
+Справочники (EventType/ActionType, ServiceName «БФЛ», статусы, регионы,
+словари Bubble) раньше кэшировались каждым процессом отдельно:
+lru_cache в bubble_import.resolvers, словари в client_log. Каждый web- и
+Celery-процесс прогревал свою копию, а после правок в /references/
+старые значения жили до рестарта или ручного clear.
+
+Здесь значения лежат в Redis под ключом с версией пространства имён
+(``ref:<ns>:v<version>:<key>``) и дублируются в памяти процесса.
+`invalidate(ns)` поднимает версию — старые ключи больше не читаются и
+уходят по TTL. Свой процесс сбрасывает локальную копию сразу, остальные
+сверяют версию не чаще раза в LOCAL_CHECK_SECONDS. Инвалидация
+вызывается сигналами на save/delete моделей-справочников
+(apps/crm/signals.py).
+
+Счётчики попаданий (local/shared/miss) копятся в процессе и раз в
+STATS_FLUSH_EVERY обращений сбрасываются в Redis — общую картину
+показывает `manage.py refcache_stats`.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 6 * 60 * 60
+LOCAL_CHECK_SECONDS = 5
+STATS_FLUSH_EVERY = 500
+STATS_KINDS = ("local", "shared", "miss")
+
+# Пространства имён, которые используются в коде (для refcache_stats).
+NAMESPACES = (
+    "event_types", "action_types", "service_names", "service_statuses",
+    "regions", "bubble", "procedure_stages", "arbitration_managers",
+)
+
+_lock = threading.Lock()
+# ns → {"version": int, "checked": monotonic, "items": {key: value}}
+_local: dict[str, dict] = {}
+_stats: dict[str, dict[str, int]] = defaultdict(lambda: dict.fromkeys(STATS_KINDS, 0))
+_pending = 0
+
+
+def _version_key(ns: str) -> str:
+    return f"ref:{ns}:version"
+
+
+def _stats_key(ns: str, kind: str) -> str:
+    return f"ref:stats:{ns}:{kind}"
+
+
+def _current_version(ns: str) -> int:
+    return cache.get_or_set(_version_key(ns), 1, None)
+
+
+def _namespace(ns: str) -> dict:
+    """Локальная копия ns, сверенная с версией в Redis."""
+    now = time.monotonic()
+    entry = _local.get(ns)
+    if entry is not None and now - entry["checked"] < LOCAL_CHECK_SECONDS:
+        return entry
+    version = _current_version(ns)
+    with _lock:
+        entry = _local.get(ns)
+        if entry is None or entry["version"] != version:
+            entry = _local[ns] = {"version": version, "checked": now, "items": {}}
+        else:
+            entry["checked"] = now
+    return entry
+
+
+def _count(ns: str, kind: str) -> None:
+    global _pending
+    _stats[ns][kind] += 1
+    _pending += 1
+    if _pending >= STATS_FLUSH_EVERY:
+        flush_stats()
+
+
+def get(ns: str, key: str, loader: Callable[[], Any], *,
+        ttl: int = DEFAULT_TTL, shared: bool = True) -> Any:
+    """Значение `key` из пространства `ns`; при промахе — loader() и запись в оба уровня.
+
+    None не кэшируется: отсутствующий справочник проверяется заново (его
+    могут создать в любой момент). shared=False — только память процесса
+    (производные индексы, которые дешевле пересчитать, чем гонять по сети),
+    но сброс по версии тот же.
+    """
+    try:
+        entry = _namespace(ns)
+    except Exception:  # noqa: BLE001 — Redis недоступен: работаем без кэша
+        logger.warning("refcache: Redis недоступен, %s/%s без кэша", ns, key)
+        return loader()
+    items = entry["items"]
+    if key in items:
+        _count(ns, "local")
+        return items[key]
+
+    shared_key = f"ref:{ns}:v{entry['version']}:{key}"
+    value = cache.get(shared_key) if shared else None
+    if value is not None:
+        _count(ns, "shared")
+    else:
+        _count(ns, "miss")
+        value = loader()
+        if value is None:
+            return None
+        if shared:
+            cache.set(shared_key, value, ttl)
+    items[key] = value
+    return value
+
+
+def invalidate(*namespaces: str) -> None:
+    """Сбросить пространства имён во всех процессах (поднять версию)."""
+    for ns in namespaces:
+        key = _version_key(ns)
+        if not cache.add(key, 2, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 2, None)
+        with _lock:
+            _local.pop(ns, None)
+        logger.debug("refcache: invalidated %s", ns)
+
+
+def local_stats() -> dict[str, dict[str, int]]:
+    """Счётчики этого процесса с последнего flush."""
+    return {ns: dict(counts) for ns, counts in _stats.items()}
+
+
+def flush_stats() -> None:
+    """Прибавить счётчики процесса к общим в Redis и обнулить локальные."""
+    global _pending
+    with _lock:
+        snapshot = local_stats()
+        _stats.clear()
+        _pending = 0
+    try:
+        for ns, counts in snapshot.items():
+            for kind, n in counts.items():
+                if not n:
+                    continue
+                key = _stats_key(ns, kind)
+                if not cache.add(key, n, None):
+                    cache.incr(key, n)
+    except Exception:  # noqa: BLE001 — статистика не должна ронять запрос
+        logger.warning("refcache: не удалось сбросить счётчики", exc_info=True)
+
+
+def shared_stats(namespaces) -> dict[str, dict[str, int]]:
+    """Общие счётчики из Redis по списку пространств имён."""
+    keys = {_stats_key(ns, kind): (ns, kind) for ns in namespaces for kind in STATS_KINDS}
+    values = cache.get_many(list(keys))
+    out: dict[str, dict[str, int]] = {ns: dict.fromkeys(STATS_KINDS, 0) for ns in namespaces}
+    for key, n in values.items():
+        ns, kind = keys[key]
+        out[ns][kind] = n
+    return out
+
+
+def reset_shared_stats(namespaces) -> None:
+    cache.delete_many([_stats_key(ns, kind) for ns in namespaces for kind in STATS_KINDS])
@@ -900,8 +900,6 @@ def reference_event_type_edit(request, pk=None):
         form = EventTypeForm(request.POST, instance=obj)
         if form.is_valid():
             form.save()
-            from apps.crm.client_log import invalidate_cache
-            invalidate_cache()
             return HttpResponse(headers={"HX-Trigger": "reloadEventTypes"})
     else:
         form = EventTypeForm(instance=obj)
@@ -918,8 +916,6 @@ def reference_event_type_delete(request, pk):
     if obj.is_system:
         return HttpResponse("Системный тип нельзя удалить", status=400)
     obj.delete()
-    from apps.crm.client_log import invalidate_cache
-    invalidate_cache()
     return HttpResponse(headers={"HX-Trigger": "reloadEventTypes"})
 
 
@@ -940,8 +936,6 @@ def reference_action_type_edit(request, pk=None):
         form = ActionTypeForm(request.POST, instance=obj)
         if form.is_valid():
             form.save()
-            from apps.crm.client_log import invalidate_cache
-            invalidate_cache()
             return HttpResponse(headers={"HX-Trigger": "reloadActionTypes"})
     else:
         form = ActionTypeForm(instance=obj)
@@ -958,8 +952,6 @@ def reference_action_type_delete(request, pk):
     if obj.is_system:
         return HttpResponse("Системный тип нельзя удалить", status=400)
     obj.delete()
-    from apps.crm.client_log import invalidate_cache
-    invalidate_cache()
     return HttpResponse(headers={"HX-Trigger": "reloadActionTypes"})
 
 
@@ -6,6 +6,8 @@ class CrmConfig(AppConfig):
     name = 'apps.crm'
 
     def ready(self):
+        from . import signals  # noqa: F401
+
         try:
             from django.template.loader import get_template
             for t in [
@@ -0,0 +1,232 @@
+"""Сводка переписки клиента (`ClientChatSummary`).
+
+Канбан (`views.kanban_column`) показывал последнее сообщение через
+``Subquery(Message … order_by("-created_at")[:1])`` на каждую карточку, а
+список чатов (`views.telegram_clients_list`) для значков Т/М/W делал
+``DISTINCT (client_id, channel)`` по всей переписке клиентов страницы. Оба
+запроса ходили в большую crm_message на каждой прокрутке.
+
+Теперь это одна строка на клиента, которая обновляется в момент
+приёма/отправки (`record_message` — userbot, WA/MAX processing,
+send-таски, импорт истории) и целиком пересобирается `rebuild`
+(команда rebuild_chat_summaries). Вьюхи читают её JOIN'ом по PK
+(`with_summary`).
+
+«Непрочитанные» (`unread_count`) — входящие после нашего последнего
+исходящего, то есть сообщения, ждущие ответа. Флаг Message.is_read для
+этого не годится: входящие userbot сохраняет сразу прочитанными, а у
+исходящих он означает «клиент прочитал».
+"""
+from __future__ import annotations
+
+import logging
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Count, F, IntegerField, OuterRef, Q, QuerySet, Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.crm.models import Client, ClientChatSummary, Message, MessageArchive
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 255
+REBUILD_BATCH_SIZE = 500
+
+CHANNEL_FLAGS = {
+    "telegram": "has_telegram",
+    "max": "has_max",
+    "whatsapp": "has_whatsapp",
+}
+
+_SUMMARY_FIELDS = (
+    "last_message_id", "last_message_at", "last_message_preview",
+    "last_direction", "last_channel", "has_telegram", "has_max",
+    "has_whatsapp", "unread_count", "updated_at",
+)
+
+
+def preview_for(content: str, file_name: str = "") -> str:
+    """Текст для превью: первая строка сообщения или имя вложения."""
+    text = " ".join((content or "").split())
+    if not text and file_name:
+        text = f"📎 {file_name}"
+    if len(text) > PREVIEW_LENGTH:
+        text = text[:PREVIEW_LENGTH - 1] + "…"
+    return text
+
+
+def _message_at(msg):
+    return msg.telegram_date or msg.created_at or timezone.now()
+
+
+def record_message(msg) -> None:
+    """Учесть сообщение `msg` в сводке его клиента.
+
+    Сообщение старше уже учтённого последнего (догрузка истории, импорт)
+    меняет только флаг канала. Повторный вызов для того же сообщения
+    (ретрай send-таски) счётчик не накручивает. Ошибка логируется и не
+    пробрасывается — приём сообщения важнее сводки, которую всегда можно
+    пересобрать.
+    """
+    try:
+        with transaction.atomic():
+            _record(msg)
+    except Exception:  # noqa: BLE001
+        logger.exception("chat_summary: не удалось учесть сообщение %s", msg.pk)
+
+
+def _record(msg) -> None:
+    at = _message_at(msg)
+    ClientChatSummary.objects.bulk_create(
+        [ClientChatSummary(client_id=msg.client_id)], ignore_conflicts=True,
+    )
+    qs = ClientChatSummary.objects.filter(pk=msg.client_id)
+    flag = CHANNEL_FLAGS.get(msg.channel)
+    if flag:
+        qs.filter(**{flag: False}).update(**{flag: True})
+    qs.filter(
+        Q(last_message_at__isnull=True) | Q(last_message_at__lte=at)
+    ).exclude(last_message_id=msg.pk).update(
+        last_message_id=msg.pk,
+        last_message_at=at,
+        last_message_preview=preview_for(msg.content, msg.file_name),
+        last_direction=msg.direction,
+        last_channel=msg.channel,
+        unread_count=(
+            F("unread_count") + 1 if msg.direction == "incoming" else Value(0)
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def with_summary(qs: QuerySet) -> QuerySet:
+    """annotate() полей сводки на queryset клиентов (LEFT JOIN по PK).
+
+    Имена совпадают с тем, что раньше проставляли вьюхи:
+    last_message_content, has_telegram/has_max/has_whatsapp, unread_count.
+    """
+    return qs.annotate(
+        last_message_content=F("chat_summary__last_message_preview"),
+        has_telegram=Coalesce(
+            F("chat_summary__has_telegram"), Value(False), output_field=BooleanField(),
+        ),
+        has_max=Coalesce(
+            F("chat_summary__has_max"), Value(False), output_field=BooleanField(),
+        ),
+        has_whatsapp=Coalesce(
+            F("chat_summary__has_whatsapp"), Value(False), output_field=BooleanField(),
+        ),
+        unread_count=Coalesce(
+            F("chat_summary__unread_count"), Value(0), output_field=IntegerField(),
+        ),
+    )
+
+
+# ─── Пересборка ────────────────────────────────────────────
+
+def _latest(model, client_ids) -> dict:
+    """{client_id: последнее сообщение (values)} — DISTINCT ON (client_id)."""
+    rows = (
+        model.objects.filter(client_id__in=client_ids)
+        .annotate(at=Coalesce("telegram_date", "created_at"))
+        .order_by("client_id", F("at").desc(), "-id")
+        .distinct("client_id")
+        .values("client_id", "id", "at", "content", "file_name", "direction", "channel")
+    )
+    return {r["client_id"]: r for r in rows}
+
+
+def _channels(client_ids) -> dict:
+    channels: dict = {}
+    for model in (Message, MessageArchive):
+        for cid, ch in (
+            model.objects.filter(client_id__in=client_ids)
+            .values_list("client_id", "channel").distinct()
+        ):
+            channels.setdefault(cid, set()).add(ch)
+    return channels
+
+
+def _unread(client_ids) -> dict:
+    """Входящие горячей таблицы после последнего исходящего клиента.
+
+    Архив не смотрим: он целиком старше горячего окна, поэтому входящее
+    в горячей таблице «после» любого исходящего из архива.
+    """
+    last_out = (
+        Message.objects.filter(client_id=OuterRef("client_id"), direction="outgoing")
+        .annotate(at=Coalesce("telegram_date", "created_at"))
+        .order_by("-at").values("at")[:1]
+    )
+    rows = (
+        Message.objects.filter(client_id__in=client_ids, direction="incoming")
+        .annotate(
+            at=Coalesce("telegram_date", "created_at"),
+            last_out=Subquery(last_out),
+        )
+        .filter(Q(last_out__isnull=True) | Q(at__gt=F("last_out")))
+        .values("client_id").annotate(n=Count("id")).values_list("client_id", "n")
+    )
+    return dict(rows)
+
+
+def _rebuild_batch(client_ids) -> int:
+    latest = _latest(Message, client_ids)
+    missing = [cid for cid in client_ids if cid not in latest]
+    if missing:
+        latest.update(_latest(MessageArchive, missing))
+    channels = _channels(client_ids)
+    unread = _unread(client_ids)
+    now = timezone.now()
+
+    objs = []
+    for cid in client_ids:
+        last = latest.get(cid)
+        chans = channels.get(cid, set())
+        objs.append(ClientChatSummary(
+            client_id=cid,
+            last_message_id=last["id"] if last else None,
+            last_message_at=last["at"] if last else None,
+            last_message_preview=(
+                preview_for(last["content"], last["file_name"]) if last else ""
+            ),
+            last_direction=last["direction"] if last else "",
+            last_channel=last["channel"] if last else "",
+            has_telegram="telegram" in chans,
+            has_max="max" in chans,
+            has_whatsapp="whatsapp" in chans,
+            unread_count=unread.get(cid, 0),
+            updated_at=now,
+        ))
+    ClientChatSummary.objects.bulk_create(
+        objs, update_conflicts=True, unique_fields=["client"],
+        update_fields=list(_SUMMARY_FIELDS),
+    )
+    return len(objs)
+
+
+def rebuild(client_ids=None, *, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """Пересобрать сводки по переписке (горячая таблица + архив).
+
+    client_ids=None — все клиенты. Возвращает число записанных строк.
+    """
+    if client_ids is None:
+        client_ids = Client.objects.order_by("pk").values_list("pk", flat=True)
+        ids_iter = client_ids.iterator(chunk_size=batch_size)
+    else:
+        ids_iter = iter(list(client_ids))
+
+    total = 0
+    batch: list = []
+    for cid in ids_iter:
+        batch.append(cid)
+        if len(batch) >= batch_size:
+            total += _rebuild_batch(batch)
+            batch = []
+    if batch:
+        total += _rebuild_batch(batch)
+    return total
@@ -17,50 +17,62 @@
 `record_legacy(client, event_type=..., description=..., employee=...)`
 самостоятельно классифицирует по справочникам и пишет в нужный kind.
 
+Пачкой (импорт, ночные задачи)::
+
+    with client_log.batch():
+        for client in clients:
+            client_log.record_event(client, "bubble_imported", comment="...")
+
+Внутри `batch()` записи копятся в памяти и пишутся bulk_create'ом на
+выходе или каждые `flush_every` записей (длинный цикл, убитый посреди,
+не теряет уже накопленное); уведомления по ним — notifications.notify_many
+(получатели всех клиентов сгруппированными запросами, рассылка —
+celery-задачей). Возвращённые внутри блока записи до сброса ещё не в БД.
+`record_many(rows)` — то же для готового списка.
+
 Все коды справочников — в миграции `0071_seed_and_migrate_log.py`.
 """
 from __future__ import annotations
 
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Буфер открытого batch() в текущем потоке:
+# {"entries": [...], "notify": [...], "flush_every": N}.
+_local = threading.local()
+
+BATCH_FLUSH_EVERY = 200
 
-# Кэш справочников (заполняется лениво при первом доступе) — справочники
-# меняются редко, кэш на процесс. При обновлении через UI сбрасывается вручную.
-_EVENT_TYPE_CACHE: dict[str, "EventType"] = {}
-_ACTION_TYPE_CACHE: dict[str, "ActionType"] = {}
 
+# Справочники — через общий кэш (apps/core/refcache.py): сбрасывается
+# сигналом на save/delete EventType/ActionType во всех процессах.
 
 def _et(code: str):
     """Достать EventType по коду (с кэшем)."""
+    from apps.core import refcache
     from apps.crm.models import EventType
-    cached = _EVENT_TYPE_CACHE.get(code)
-    if cached is not None:
-        return cached
-    obj = EventType.objects.filter(code=code).first()
-    if obj is not None:
-        _EVENT_TYPE_CACHE[code] = obj
-    return obj
+    return refcache.get(
+        "event_types", code, lambda: EventType.objects.filter(code=code).first(),
+    )
 
 
 def _at(code: str):
     """Достать ActionType по коду (с кэшем)."""
+    from apps.core import refcache
     from apps.crm.models import ActionType
-    cached = _ACTION_TYPE_CACHE.get(code)
-    if cached is not None:
-        return cached
-    obj = ActionType.objects.filter(code=code).first()
-    if obj is not None:
-        _ACTION_TYPE_CACHE[code] = obj
-    return obj
+    return refcache.get(
+        "action_types", code, lambda: ActionType.objects.filter(code=code).first(),
+    )
 
 
 def invalidate_cache():
-    """Сбросить кэш справочников. Дёргать после правок в /references/."""
-    _EVENT_TYPE_CACHE.clear()
-    _ACTION_TYPE_CACHE.clear()
+    """Сбросить кэш справочников. Правки моделей сбрасывают его сами (сигналы)."""
+    from apps.core import refcache
+    refcache.invalidate("event_types", "action_types")
 
 
 def _maybe_notify(entry):
@@ -80,6 +92,78 @@ def _maybe_notify(entry):
         logger.exception("notify() упал для entry=%s", getattr(entry, "pk", None))
 
 
+def _client_kw(client) -> dict:
+    # В пачках удобно передавать client_id, не поднимая Client из БД.
+    if hasattr(client, "pk"):
+        return {"client": client}
+    return {"client_id": client}
+
+
+def _write(*entries, notify=None):
+    """Сохранить записи и уведомить по `notify` — сразу или в конце batch()."""
+    buf = getattr(_local, "buffer", None)
+    if buf is not None:
+        buf["entries"].extend(entries)
+        if notify is not None:
+            buf["notify"].append(notify)
+        if len(buf["entries"]) >= buf["flush_every"]:
+            pending, buf["entries"] = buf["entries"], []
+            notify_pending, buf["notify"] = buf["notify"], []
+            _flush(pending, notify_pending)
+        return
+    for entry in entries:
+        entry.save(force_insert=True)
+    _maybe_notify(notify)
+
+
+@contextmanager
+def batch(flush_every: int = BATCH_FLUSH_EVERY):
+    """Копить record_event/record_action и записывать их пачками.
+
+    Пачка сбрасывается каждые `flush_every` записей и на выходе.
+    Исключение внутри блока — несброшенный остаток выбрасывается.
+    Вложенный batch() пишет вместе с внешним.
+    """
+    if getattr(_local, "buffer", None) is not None:
+        yield
+        return
+    _local.buffer = buf = {"entries": [], "notify": [], "flush_every": max(1, flush_every)}
+    try:
+        yield
+    finally:
+        _local.buffer = None
+    _flush(buf["entries"], buf["notify"])
+
+
+def _flush(entries, notify):
+    from apps.crm.models import ClientLogEntry, EventType
+
+    if not entries:
+        return
+    ClientLogEntry.objects.bulk_create(entries, batch_size=500)
+    # Порождённые действиями события знают только event_type_id.
+    missing = {
+        e.event_type_id for e in notify
+        if e.event_type_id and not ClientLogEntry.event_type.is_cached(e)
+    }
+    if missing:
+        types = EventType.objects.in_bulk(missing)
+        for e in notify:
+            if e.event_type_id in types:
+                e.event_type = types[e.event_type_id]
+    notify = [
+        e for e in notify
+        if getattr(e.event_type or e.action_type, "notifies", False)
+    ]
+    if not notify:
+        return
+    try:
+        from apps.notifications.services import notify_many
+        notify_many(notify)
+    except Exception:
+        logger.exception("notify_many() упал для пачки из %d записей", len(notify))
+
+
 def record_event(
     client,
     code: str,
@@ -108,9 +192,9 @@ def record_event(
     if et is None:
         logger.warning("EventType code=%r не найден; событие не записано", code)
         return None
-    entry = ClientLogEntry.objects.create(
+    entry = ClientLogEntry(
         subject_kind="client",
-        client=client,
+        **_client_kw(client),
         kind="event",
         event_type=et,
         comment=comment or "",
@@ -121,7 +205,7 @@ def record_event(
         bubble_id=bubble_id,
         stored_file=stored_file,
     )
-    _maybe_notify(entry)
+    _write(entry, notify=entry)
     return entry
 
 
@@ -150,9 +234,9 @@ def record_action(
     if at is None:
         logger.warning("ActionType code=%r не найден; действие не записано", code)
         return None
-    action = ClientLogEntry.objects.create(
+    action = ClientLogEntry(
         subject_kind="client",
-        client=client,
+        **_client_kw(client),
         kind="action",
         action_type=at,
         comment=comment or "",
@@ -166,9 +250,9 @@ def record_action(
     # Spawn связанное событие, если задано
     spawned = None
     if at.spawns_event_id is not None:
-        spawned = ClientLogEntry.objects.create(
+        spawned = ClientLogEntry(
             subject_kind="client",
-            client=client,
+            **_client_kw(client),
             kind="event",
             event_type_id=at.spawns_event_id,
             comment=comment or "",
@@ -177,10 +261,30 @@ def record_action(
         )
     # Анти-дубль: для пар action→event уведомляем на стороне события;
     # «одиночное» действие (без spawns_event) — на самом действии.
-    _maybe_notify(spawned if spawned is not None else action)
+    if spawned is not None:
+        _write(action, spawned, notify=spawned)
+    else:
+        _write(action, notify=action)
     return action
 
 
+def record_many(rows) -> list:
+    """Записать пачку событий/действий одним bulk_create (см. batch()).
+
+    rows — dict'ы с аргументами record_event / record_action и ключами
+    "code" и "kind" ("event" по умолчанию или "action"); клиент — "client"
+    (объект) или "client_id". Возвращает записанные записи.
+    """
+    out = []
+    with batch():
+        for row in rows:
+            row = dict(row)
+            fn = record_action if row.pop("kind", "event") == "action" else record_event
+            client = row.pop("client", None) or row.pop("client_id", None)
+            out.append(fn(client, row.pop("code"), **row))
+    return [e for e in out if e is not None]
+
+
 # ─── Совместимость со старым API: классификация по legacy event_type ──────
 
 # Старые ClientEvent.event_type → (kind, new_code). Совпадает с LEGACY_MAP
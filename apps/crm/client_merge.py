@@ -19,8 +19,8 @@ import re
 from django.db import transaction
 
 from apps.crm.models import (
-    Client, ClientPhone, ClientEmployee, ClientLogEntry, Message, Service,
-    Address, ClientNameHistory,
+    Client, ClientChatSummary, ClientPhone, ClientEmployee, ClientLogEntry,
+    Message, MessageArchive, Service, Address, ClientNameHistory,
 )
 from apps.finance.models import Payment, Charge
 from apps.files.models import ClientFolder, ClientFile
@@ -172,12 +172,13 @@ def _move_files(source, survivor):
 _SIMPLE = {
     "services":  [(Service, "client")],
     "finance":   [(Payment, "client"), (Charge, "client")],
-    "messages":  [(Message, "client")],
+    "messages":  [(Message, "client"), (MessageArchive, "client")],
     "addresses": [(Address, "client")],
     "events":    [(ClientLogEntry, "client")],
 }
 _HANDLED_MODELS = {ClientPhone, ClientFolder, ClientEmployee,
-                   Service, Payment, Charge, Message, Address, ClientLogEntry}
+                   Service, Payment, Charge, Message, MessageArchive, Address,
+                   ClientLogEntry, ClientChatSummary}
 
 
 @transaction.atomic
@@ -243,6 +244,12 @@ def merge_clients(survivor, other, *, scalar_take_other=None, collection_actions
     # 4) spouse-ссылки
     Client.objects.filter(spouse=other).update(spouse=survivor)
 
+    # 4a) Сводка переписки: у other удаляем, survivor пересобираем по уже
+    #     перенесённым сообщениям.
+    from apps.crm.chat_summary import rebuild as rebuild_chat_summary
+    ClientChatSummary.objects.filter(client=other).delete()
+    rebuild_chat_summary([survivor.pk])
+
     # 5) Всё прочее (не выбранное явно) — безопасно переносим на survivor,
     #    чтобы ничего не потерять (ClientNameHistory, Consultation, Kreditor,
     #    GeneratedDocument, EmployeeLog, IncomingScan, ...).
@@ -0,0 +1,367 @@
+"""Шлюз к DaData с постоянным кэшем ответов.
+
+Импортёры справочников (import_*), применение Bubble Organization и
+dadata_legal ходили в DaData по одному синхронному запросу на запись, и
+каждый повторный прогон импорта заново спрашивал те же ИНН и адреса.
+
+Теперь все запросы идут через `lookup` / `lookup_many`:
+
+* ответ кэшируется в таблице DadataCache по ключу «эндпоинт + sha256
+  нормализованного запроса и параметров» на DADATA_CACHE_TTL_DAYS;
+  «ничего не найдено» — на DADATA_CACHE_EMPTY_TTL_DAYS. Ошибки (сеть, 5xx,
+  нет ключей) не кэшируются;
+* `lookup` — одиночный запрос через провайдера "dadata" в
+  apps/core/http_client.py (keep-alive, ретраи, circuit breaker);
+* `lookup_many` — пакет: кэш читается одним запросом, промахи качаются
+  конкурентно async-клиентом httpx (DADATA_CONCURRENCY одновременно, не
+  чаще DADATA_RPS в секунду) и пишутся в кэш одним upsert на порцию.
+  Повторный прогон импорта без изменений у источника в DaData не ходит.
+
+Поверх — обёртки по эндпоинтам: find_party(ies), suggest_party(ies),
+find_court(s), suggest_court, clean_address(es), clean_name(s). Результаты — в формате
+DaData (suggestion / результат cleaner'а), разбор остаётся у вызывающих.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from apps.core import http_client
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_BASE = "https://suggestions.dadata.ru/suggestions/api/4_1/rs"
+CLEANER_BASE = "https://cleaner.dadata.ru/api/v1"
+ENDPOINTS = {
+    "findById/party": f"{SUGGEST_BASE}/findById/party",
+    "suggest/party": f"{SUGGEST_BASE}/suggest/party",
+    "findById/court": f"{SUGGEST_BASE}/findById/court",
+    "suggest/court": f"{SUGGEST_BASE}/suggest/court",
+    "clean/address": f"{CLEANER_BASE}/clean/address",
+    "clean/name": f"{CLEANER_BASE}/clean/name",
+}
+# Cleaner: платный, нужен X-Secret, тело — список из одной строки.
+_CLEANER = {"clean/address", "clean/name"}
+CHUNK_SIZE = 500
+ASYNC_RETRIES = 2
+
+http_client.register(http_client.Provider("dadata", rps=settings.DADATA_RPS, timeout=15))
+
+
+def is_configured(endpoint: str = "suggest/party") -> bool:
+    if not settings.DADATA_API_KEY:
+        return False
+    return endpoint not in _CLEANER or bool(settings.DADATA_SECRET_KEY)
+
+
+def normalize(query) -> str:
+    """Ключ кэша: пробелы схлопнуты, регистр не важен; ИНН/ОГРН — только цифры."""
+    q = " ".join(str(query or "").split())
+    digits = re.sub(r"[\s-]", "", q)
+    if digits.isdigit():
+        return digits
+    return q.casefold()
+
+
+def _key(endpoint: str, query, params: dict) -> str:
+    raw = json.dumps([normalize(query), params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _headers(endpoint: str) -> dict:
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        "Authorization": f"Token {settings.DADATA_API_KEY}",
+    }
+    if endpoint in _CLEANER:
+        headers["X-Secret"] = settings.DADATA_SECRET_KEY
+    return headers
+
+
+def _body(endpoint: str, query: str, params: dict):
+    if endpoint in _CLEANER:
+        return [query]
+    return {"query": query, **params}
+
+
+def _extract(endpoint: str, payload):
+    if endpoint in _CLEANER:
+        return payload[0] if payload else None
+    return payload
+
+
+def _is_empty(endpoint: str, response) -> bool:
+    if endpoint in _CLEANER:
+        return not response
+    return not (response or {}).get("suggestions")
+
+
+# ── кэш ─────────────────────────────────────────────────────────────────────
+
+def _cached(endpoint: str, keys) -> dict:
+    """{key: response} свежих записей кэша."""
+    from apps.crm.models import DadataCache
+
+    now = timezone.now()
+    ttl = timedelta(days=settings.DADATA_CACHE_TTL_DAYS)
+    empty_ttl = timedelta(days=settings.DADATA_CACHE_EMPTY_TTL_DAYS)
+    out = {}
+    rows = DadataCache.objects.filter(endpoint=endpoint, key__in=list(keys)).values_list(
+        "key", "response", "is_empty", "fetched_at",
+    )
+    for key, response, is_empty, fetched_at in rows:
+        if now - fetched_at < (empty_ttl if is_empty else ttl):
+            out[key] = response
+    return out
+
+
+def _store(endpoint: str, fetched: dict) -> None:
+    """fetched: {key: (query, response)} → upsert в DadataCache."""
+    from apps.crm.models import DadataCache
+
+    if not fetched:
+        return
+    now = timezone.now()
+    DadataCache.objects.bulk_create(
+        [
+            DadataCache(
+                endpoint=endpoint, key=key, query=query, response=response,
+                is_empty=_is_empty(endpoint, response), fetched_at=now,
+            )
+            for key, (query, response) in fetched.items()
+        ],
+        update_conflicts=True, unique_fields=["endpoint", "key"],
+        update_fields=["query", "response", "is_empty", "fetched_at"],
+    )
+
+
+# ── сеть ────────────────────────────────────────────────────────────────────
+
+def _fetch_one(endpoint: str, query: str, params: dict):
+    """(ok, response) одиночного запроса."""
+    try:
+        resp = http_client.request(
+            "dadata", "POST", ENDPOINTS[endpoint], endpoint=f"POST {endpoint}",
+            idempotent=True, json=_body(endpoint, query, params),
+            headers=_headers(endpoint),
+        )
+        resp.raise_for_status()
+        return True, _extract(endpoint, resp.json())
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("DaData %s failed for %r: %s", endpoint, query[:80], e)
+        return False, None
+
+
+class _AsyncRateLimiter:
+    """RateLimiter для одного event loop: слоты раздаются по очереди."""
+
+    def __init__(self, rps: float):
+        self.interval = 1.0 / rps if rps > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _fetch_many(endpoint: str, items: list, params: dict) -> dict:
+    """{key: response} для [(key, query)]; упавшие запросы в результат не попадают."""
+    import httpx
+
+    limiter = _AsyncRateLimiter(settings.DADATA_RPS)
+    semaphore = asyncio.Semaphore(settings.DADATA_CONCURRENCY)
+    breaker = http_client.breaker("dadata")
+    label = f"POST {endpoint}"
+    out = {}
+
+    async def one(client, key, query):
+        async with semaphore:
+            for attempt in range(ASYNC_RETRIES + 1):
+                if not breaker.allow():
+                    http_client.record("dadata", label, 0, True)
+                    return
+                await limiter.wait()
+                started = time.monotonic()
+                try:
+                    resp = await client.post(
+                        ENDPOINTS[endpoint], json=_body(endpoint, query, params),
+                        headers=_headers(endpoint),
+                    )
+                except httpx.HTTPError as e:
+                    error = e
+                    status = None
+                else:
+                    error = None
+                    status = resp.status_code
+                http_client.record("dadata", label, time.monotonic() - started,
+                                   error is not None or status >= 400)
+                if error is None and status < 500:
+                    breaker.success()
+                else:
+                    breaker.failure()
+                if status == 200:
+                    try:
+                        out[key] = _extract(endpoint, resp.json())
+                    except ValueError as e:
+                        logger.warning("DaData %s: bad JSON for %r: %s", endpoint, query[:80], e)
+                    return
+                if attempt < ASYNC_RETRIES and (error is not None or status in (429, 502, 503, 504)):
+                    await asyncio.sleep(random.uniform(0, 0.5 * 2 ** attempt))
+                    continue
+                logger.warning("DaData %s failed for %r: %s", endpoint, query[:80],
+                               error or f"HTTP {status}")
+                return
+
+    limits = httpx.Limits(max_connections=settings.DADATA_CONCURRENCY)
+    async with httpx.AsyncClient(timeout=15, limits=limits) as client:
+        await asyncio.gather(*(one(client, key, query) for key, query in items))
+    return out
+
+
+def _run(coro):
+    """asyncio.run из синхронного кода; внутри работающего loop — в потоке."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+# ── API ─────────────────────────────────────────────────────────────────────
+
+def lookup(endpoint: str, query, **params):
+    """Ответ DaData на один запрос (из кэша или сети); None — ошибка/не настроено."""
+    query = " ".join(str(query or "").split())
+    if not query or not is_configured(endpoint):
+        return None
+    key = _key(endpoint, query, params)
+    cached = _cached(endpoint, [key])
+    if key in cached:
+        return cached[key]
+    ok, response = _fetch_one(endpoint, query, params)
+    if ok:
+        _store(endpoint, {key: (query, response)})
+    return response
+
+
+def lookup_many(endpoint: str, queries, *, progress=None, **params) -> dict:
+    """{query: ответ DaData | None} для набора запросов.
+
+    Дубликаты (с точностью до normalize) запрашиваются один раз. Промахи
+    кэша качаются порциями по CHUNK_SIZE, каждая порция сразу пишется в
+    кэш — прерванный импорт при перезапуске продолжит с места остановки.
+    progress(done, total) вызывается после каждой порции.
+    """
+    queries = list(queries)
+    by_key: dict[str, list] = {}
+    for q in queries:
+        q_clean = " ".join(str(q or "").split())
+        if q_clean:
+            by_key.setdefault(_key(endpoint, q_clean, params), []).append(q)
+    out = dict.fromkeys(queries)
+    if not by_key or not is_configured(endpoint):
+        return out
+
+    responses = {}
+    keys = list(by_key)
+    for start in range(0, len(keys), CHUNK_SIZE):
+        responses.update(_cached(endpoint, keys[start:start + CHUNK_SIZE]))
+    missing = [(key, " ".join(str(by_key[key][0]).split())) for key in keys if key not in responses]
+    logger.info("DaData %s: %d запросов, из кэша %d, в сеть %d",
+                endpoint, len(keys), len(keys) - len(missing), len(missing))
+
+    for start in range(0, len(missing), CHUNK_SIZE):
+        chunk = missing[start:start + CHUNK_SIZE]
+        fetched = _run(_fetch_many(endpoint, chunk, params))
+        queries_by_key = dict(chunk)
+        _store(endpoint, {key: (queries_by_key[key], resp) for key, resp in fetched.items()})
+        responses.update(fetched)
+        if progress:
+            progress(min(start + CHUNK_SIZE, len(missing)), len(missing))
+
+    for key, originals in by_key.items():
+        for q in originals:
+            out[q] = responses.get(key)
+    return out
+
+
+def _first(response):
+    suggestions = (response or {}).get("suggestions") or []
+    return suggestions[0] if suggestions else None
+
+
+def find_party(query, **params):
+    """Первый suggestion findById/party (ИНН/ОГРН) или None."""
+    params.setdefault("count", 1)
+    return _first(lookup("findById/party", query, **params))
+
+
+def find_parties(queries, **params) -> dict:
+    params.setdefault("count", 1)
+    return {q: _first(r) for q, r in lookup_many("findById/party", queries, **params).items()}
+
+
+def suggest_party(query, count: int = 10, **params) -> list:
+    return (lookup("suggest/party", query, count=count, **params) or {}).get("suggestions") or []
+
+
+def suggest_parties(queries, count: int = 10, **params) -> dict:
+    return {
+        q: (r or {}).get("suggestions") or []
+        for q, r in lookup_many("suggest/party", queries, count=count, **params).items()
+    }
+
+
+def find_court(query, **params):
+    return _first(lookup("findById/court", query, **params))
+
+
+def find_courts(queries, **params) -> dict:
+    return {q: _first(r) for q, r in lookup_many("findById/court", queries, **params).items()}
+
+
+def suggest_court(query, count: int = 10) -> list:
+    return (lookup("suggest/court", query, count=count) or {}).get("suggestions") or []
+
+
+def suggest_courts(queries, count: int = 10) -> dict:
+    return {
+        q: (r or {}).get("suggestions") or []
+        for q, r in lookup_many("suggest/court", queries, count=count).items()
+    }
+
+
+def clean_address(address):
+    """Результат /clean/address (dict с result, region_kladr_id, …) или None."""
+    return lookup("clean/address", address)
+
+
+def clean_addresses(addresses, progress=None) -> dict:
+    return lookup_many("clean/address", addresses, progress=progress)
+
+
+def clean_name(name):
+    """Результат /clean/name (dict с surname, name, patronymic, qc) или None."""
+    return lookup("clean/name", name)
+
+
+def clean_names(names, progress=None) -> dict:
+    return lookup_many("clean/name", names, progress=progress)
@@ -11,28 +11,27 @@
 Оба возвращают нормализованный dict с полями LegalEntity, либо None.
 Запрашиваемые поля DaData: name (short_with_opf/full_with_opf), inn, kpp,
 ogrn, okpo, okved, address (value), management.name/post, type (LEGAL|INDIVIDUAL).
+
+Запросы идут через шлюз apps/crm/dadata.py (кэш ответов в DadataCache).
+Для пачки записей — `prefetch(organizations)`: недостающее в кэше
+запрашивается конкурентно, после чего find_by_inn/search_by_name
+отвечают из кэша.
 """
 from __future__ import annotations
 
 import logging
 from typing import Optional
 
-import requests
 from django.conf import settings
 
-logger = logging.getLogger("bubble_import")
-
-_SUGGEST_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/party"
-_FIND_BY_ID_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/party"
+from apps.crm import dadata
 
+logger = logging.getLogger("bubble_import")
 
-def _headers() -> dict:
-    api_key = getattr(settings, "DADATA_API_KEY", "")
-    return {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "Authorization": f"Token {api_key}",
-    }
+# Параметры запросов одинаковые у одиночных и пакетных вызовов — иначе
+# prefetch не попадёт в тот же ключ кэша DadataCache.
+_FIND_PARAMS = {"count": 1}
+_SUGGEST_PARAMS = {"count": 1, "status": ["ACTIVE", "LIQUIDATING"]}
 
 
 def _normalize(party: dict) -> dict:
@@ -86,19 +85,8 @@ def find_by_inn(inn: str) -> Optional[dict]:
     inn = "".join(c for c in str(inn) if c.isdigit())
     if len(inn) not in (10, 12):
         return None
-    try:
-        resp = requests.post(
-            _FIND_BY_ID_URL, json={"query": inn, "count": 1},
-            headers=_headers(), timeout=10,
-        )
-        resp.raise_for_status()
-        suggestions = resp.json().get("suggestions") or []
-    except Exception as e:
-        logger.warning(f"DaData findById failed for inn={inn}: {e}")
-        return None
-    if not suggestions:
-        return None
-    return _normalize(suggestions[0])
+    party = dadata.find_party(inn, **_FIND_PARAMS)
+    return _normalize(party) if party else None
 
 
 def search_by_name(query: str) -> Optional[dict]:
@@ -113,17 +101,23 @@ def search_by_name(query: str) -> Optional[dict]:
     query = (query or "").strip()
     if not query:
         return None
-    try:
-        resp = requests.post(
-            _SUGGEST_URL,
-            json={"query": query, "count": 1, "status": ["ACTIVE", "LIQUIDATING"]},
-            headers=_headers(), timeout=10,
-        )
-        resp.raise_for_status()
-        suggestions = resp.json().get("suggestions") or []
-    except Exception as e:
-        logger.warning(f"DaData suggest failed for {query!r}: {e}")
-        return None
-    if not suggestions:
-        return None
-    return _normalize(suggestions[0])
+    suggestions = dadata.suggest_party(query, **_SUGGEST_PARAMS)
+    return _normalize(suggestions[0]) if suggestions else None
+
+
+def prefetch(organizations) -> None:
+    """Прогреть кэш DaData для пачки организаций [(кандидаты ИНН, название)].
+
+    Как в apply_organization: название ищется, только если ни один ИНН
+    не нашёлся. Каждый эндпоинт — один пакетный вызов шлюза.
+    """
+    if not getattr(settings, "DADATA_API_KEY", ""):
+        return
+    inns = {inn for candidates, _ in organizations for inn in candidates}
+    found = dadata.find_parties(inns, **_FIND_PARAMS) if inns else {}
+    names = {
+        name.strip() for candidates, name in organizations
+        if (name or "").strip() and not any(found.get(inn) for inn in candidates)
+    }
+    if names:
+        dadata.lookup_many("suggest/party", names, **_SUGGEST_PARAMS)
@@ -0,0 +1,119 @@
+"""Канбан по клиентам (`views.kanban` / `views.kanban_column` / `views.kanban_counts`).
+
+Доска больше не грузит клиентов: каркас рисуется со счётчиками колонок из
+одного ``GROUP BY status``, карточки приходят постранично через
+`kanban_column`. Фильтры из querystring разбираются один раз
+(`read_filters`) и применяются одинаково к счётчикам и колонкам
+(`filtered_clients`) — связи проверяются через EXISTS, без JOIN + DISTINCT.
+
+Счётчики кэшируются на пользователя и набор фильтров. Ключ содержит
+версию, которую `invalidate_counts` поднимает при смене статуса любого
+клиента (сигнал в apps/crm/signals.py), — так все пользователи сразу видят
+перенос карточки. Прочие изменения (назначения, новые услуги) догоняют
+по TTL.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q, QuerySet
+
+from apps.crm.models import Client, ClientEmployee, ClientPhone, Service
+
+FILTER_PARAMS = (
+    "employee", "service_employee", "ms_status",
+    "created_from", "created_to", "q", "cid",
+)
+COUNTS_TTL = 60
+_VERSION_KEY = "kanban:counts:version"
+
+
+def read_filters(params) -> dict:
+    """Фильтры канбана из request.GET (пустые — "")."""
+    return {name: (params.get(name) or "").strip() for name in FILTER_PARAMS}
+
+
+def filtered_clients(user, filters: dict, emp=None) -> QuerySet:
+    """Клиенты, видимые `user`, с фильтрами канбана (без статуса).
+
+    emp — Employee текущего пользователя (нужен только для ms_status).
+    """
+    qs = Client.objects.visible_to(user)
+    cid, q = filters.get("cid"), filters.get("q")
+    if cid:
+        # «Только этот клиент» из главного поиска — точная фильтрация по id
+        # (иначе у клиента без фамилии фильтр по ФИО показывал всех тёзок).
+        qs = qs.filter(pk=cid)
+    elif q:
+        # «Каныгин Денис» → каждое слово должно совпасть с одним из полей
+        # (AND по словам, OR по полям).
+        for word in q.split():
+            qs = qs.filter(
+                Q(first_name__icontains=word)
+                | Q(last_name__icontains=word)
+                | Q(patronymic__icontains=word)
+                | Q(phone__icontains=word)
+                | Exists(ClientPhone.objects.filter(
+                    client_id=OuterRef("pk"), phone__icontains=word,
+                ))
+            )
+
+    employee_id = filters.get("employee")
+    if employee_id == "__none__":
+        qs = qs.filter(~Exists(ClientEmployee.objects.filter(client_id=OuterRef("pk"))))
+    elif employee_id:
+        qs = qs.filter(Exists(ClientEmployee.objects.filter(
+            client_id=OuterRef("pk"), employee_id=employee_id,
+        )))
+    if filters.get("service_employee"):
+        qs = qs.filter(Exists(Service.objects.filter(
+            client_id=OuterRef("pk"), employees__id=filters["service_employee"],
+        )))
+    if filters.get("created_from"):
+        qs = qs.filter(created_at__gte=filters["created_from"])
+    if filters.get("created_to"):
+        qs = qs.filter(created_at__lte=filters["created_to"])
+    if filters.get("ms_status"):
+        if emp is None:
+            return qs.none()
+        qs = qs.filter(Exists(ClientEmployee.objects.filter(
+            client_id=OuterRef("pk"), employee=emp,
+            messenger_status=filters["ms_status"],
+        )))
+    return qs
+
+
+def _counts_key(user, filters: dict) -> str:
+    version = cache.get_or_set(_VERSION_KEY, 1, None)
+    digest = hashlib.md5(
+        json.dumps(filters, sort_keys=True).encode(), usedforsecurity=False,
+    ).hexdigest()
+    return f"kanban:counts:{version}:{user.pk}:{digest}"
+
+
+def column_counts(user, filters: dict, emp=None) -> dict[str, int]:
+    """{status: число клиентов} по всем статусам — один GROUP BY, кэш COUNTS_TTL."""
+    key = _counts_key(user, filters)
+    counts = cache.get(key)
+    if counts is not None:
+        return counts
+    counts = {status: 0 for status, _ in Client.STATUS_CHOICES}
+    rows = (
+        filtered_clients(user, filters, emp).order_by()
+        .values("status").annotate(n=Count("pk", distinct=True))
+        .values_list("status", "n")
+    )
+    counts.update(dict(rows))
+    cache.set(key, counts, COUNTS_TTL)
+    return counts
+
+
+def invalidate_counts() -> None:
+    """Сбросить счётчики канбана у всех пользователей (смена статуса клиента)."""
+    if not cache.add(_VERSION_KEY, 2, None):
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, 2, None)
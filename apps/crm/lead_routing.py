@@ -12,6 +12,7 @@ import logging
 
 from django.db import transaction
 
+from apps.core import refcache
 from apps.core.models import Employee
 from . import client_log
 from .models import (
@@ -59,7 +60,21 @@ def lead_recipients() -> list[Employee]:
 
 
 def _bfl_service_name() -> ServiceName | None:
-    return ServiceName.objects.filter(short_name__iexact="БФЛ").first()
+    return refcache.get(
+        "service_names", "БФЛ",
+        lambda: ServiceName.objects.filter(short_name__iexact="БФЛ").first(),
+    )
+
+
+def _first_common_status(sn: ServiceName) -> ServiceCommonStatus | None:
+    """Первый общий статус услуги — в него встаёт личный статус лидов."""
+    return refcache.get(
+        "service_statuses", f"first:{sn.pk}",
+        lambda: (
+            ServiceCommonStatus.objects.filter(service_name=sn)
+            .order_by("order", "name").first()
+        ),
+    )
 
 
 def ensure_lead_employee_status(employee: Employee) -> ServiceEmployeeStatus | None:
@@ -68,10 +83,7 @@ def ensure_lead_employee_status(employee: Employee) -> ServiceEmployeeStatus | N
     if sn is None:
         logger.warning("Нет ServiceName=БФЛ — лид не закрепится в «Мой канбан»")
         return None
-    common = (
-        ServiceCommonStatus.objects.filter(service_name=sn)
-        .order_by("order", "name").first()
-    )
+    common = _first_common_status(sn)
     if common is None:
         return None
     obj, _ = ServiceEmployeeStatus.objects.get_or_create(
@@ -0,0 +1,34 @@
+"""Ручной прогон архивации переписки (то же, что задача archive_old_messages).
+
+Использование:
+    python manage.py archive_messages --dry-run          # сколько строк/байт уедет
+    python manage.py archive_messages                    # перенести всё старше 90 дней
+    python manage.py archive_messages --days 180 --batch-size 5000 --max-batches 10
+
+Прерванный прогон безопасно перезапускать — продолжит с остатка.
+"""
+from django.core.management.base import BaseCommand
+
+from apps.crm.message_archive import (
+    DEFAULT_BATCH_SIZE, DEFAULT_DAYS, archive_messages,
+)
+
+
+class Command(BaseCommand):
+    help = "Перенести старые Message в MessageArchive (без raw_payload)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, default=0, help="0 — до конца")
+        parser.add_argument("--dry-run", action="store_true", help="только посчитать")
+
+    def handle(self, *args, **opts):
+        stats = archive_messages(
+            opts["days"],
+            batch_size=opts["batch_size"],
+            max_batches=opts["max_batches"],
+            dry_run=opts["dry_run"],
+        )
+        for key, value in stats.items():
+            self.stdout.write(f"{key:>14}: {value}")
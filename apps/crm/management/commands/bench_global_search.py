@@ -0,0 +1,126 @@
+"""Замер латентности глобального поиска (apps/crm/search.py) на текущей БД.
+
+Гоняет набор запросов через те же функции, что и `views.global_search`,
+и печатает p50/p95/max по каждой секции (клиенты / юр.лица / сообщения /
+файлы). С `--legacy` — те же запросы в старой форме (JOIN phones + DISTINCT,
+выгрузка всех visible_to() id в set), чтобы сравнить до/после на одной базе.
+
+Синтетический объём для стенда — `generate_test_data`
+(например, `--clients 5000 --messages-per-client 200` ≈ 1М сообщений).
+
+Использование:
+    python manage.py bench_global_search --user ivanov
+    python manage.py bench_global_search --user ivanov --legacy
+    python manage.py bench_global_search --queries "иванов,7999,договор" --repeat 50
+    python manage.py bench_global_search --explain      # план запроса по сообщениям
+"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from apps.crm import search
+from apps.crm.models import Client, LegalEntity, Message
+
+DEFAULT_QUERIES = "иванов,петр,7999,договор,заявление,банкрот,ООО"
+
+
+def _legacy(q: str, user) -> None:
+    """Форма запросов global_search до перехода на apps/crm/search.py."""
+    from apps.files.models import ClientFile
+
+    clients_qs = Client.objects.all()
+    for word in q.split():
+        clients_qs = clients_qs.filter(
+            Q(first_name__icontains=word) | Q(last_name__icontains=word)
+            | Q(patronymic__icontains=word) | Q(username__icontains=word)
+            | Q(phone__icontains=word) | Q(phones__phone__icontains=word)
+        )
+    list(clients_qs.distinct().order_by("last_name", "first_name")[:12])
+    list(LegalEntity.objects.filter(
+        Q(name__icontains=q) | Q(inn__icontains=q) | Q(ogrn__icontains=q)
+    ).order_by("name")[:12])
+    list(Message.objects.filter(content__icontains=q)
+         .select_related("client").order_by("-created_at")[:12])
+    files_qs = ClientFile.objects.all()
+    for word in q.split():
+        files_qs = files_qs.filter(name__icontains=word)
+    list(files_qs.select_related("folder__client").order_by("-created_at")[:12])
+    set(Client.objects.visible_to(user).values_list("id", flat=True))
+
+
+class Command(BaseCommand):
+    help = "p50/p95 латентности глобального поиска (текущая и --legacy форма)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="", help="username (по умолчанию — первый superuser)")
+        parser.add_argument("--queries", default=DEFAULT_QUERIES, help="через запятую")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--legacy", action="store_true", help="старая форма запросов")
+        parser.add_argument("--explain", action="store_true", help="EXPLAIN ANALYZE поиска по сообщениям")
+
+    def handle(self, *args, **opts):
+        if opts["user"]:
+            user = User.objects.filter(username=opts["user"]).first()
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("Пользователь не найден")
+        queries = [q.strip() for q in opts["queries"].split(",") if q.strip()]
+
+        if opts["explain"]:
+            qs = search.with_access(
+                Message.objects.filter(content__icontains=queries[0]), user,
+            ).order_by("-created_at")[:12]
+            self.stdout.write(qs.explain(analyze=True))
+            return
+
+        if opts["legacy"]:
+            sections = {"legacy_total": lambda q: _legacy(q, user)}
+        else:
+            sections = {
+                "clients": lambda q: search.search_clients(q, user),
+                "legal_entities": lambda q: search.search_legal_entities(q),
+                "messages": lambda q: search.search_messages(q, user),
+                "files": lambda q: search.search_files(q, user),
+            }
+
+        self.stdout.write(
+            f"user={user.username} queries={len(queries)} repeat={opts['repeat']} "
+            f"messages≈{self._estimate('crm_message')}"
+        )
+        samples: dict[str, list[float]] = {name: [] for name in sections}
+        totals: list[float] = []
+        for _ in range(opts["repeat"]):
+            for q in queries:
+                total = 0.0
+                for name, fn in sections.items():
+                    started = time.perf_counter()
+                    fn(q)
+                    ms = (time.perf_counter() - started) * 1000
+                    samples[name].append(ms)
+                    total += ms
+                totals.append(total)
+        for name, values in samples.items():
+            self._report(name, values)
+        if len(sections) > 1:
+            self._report("total", totals)
+
+    @staticmethod
+    def _estimate(table: str) -> int:
+        # reltuples — мгновенная оценка вместо COUNT(*) по миллиону строк.
+        with connection.cursor() as cur:
+            cur.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+    def _report(self, name: str, samples: list[float]) -> None:
+        samples = sorted(samples)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        self.stdout.write(
+            f"{name:>16}: p50={statistics.median(samples):8.1f}ms "
+            f"p95={p95:8.1f}ms max={samples[-1]:8.1f}ms n={len(samples)}"
+        )
@@ -0,0 +1,99 @@
+"""
+Пропускная способность исходящих HTTP: голый ``requests.get`` (как было в
+интеграциях) против пула apps/core/http_client.py.
+
+Поднимает локальный stub-сервер (HTTP/1.1 keep-alive, ответ — небольшой
+JSON, опционально с задержкой) и гоняет на него --requests запросов в
+--threads потоков обоими способами. Печатает запросы/с и сколько TCP-
+соединений принял сервер. Stub без TLS, поэтому разница — только
+установка TCP; на HTTPS к внешним API выигрыш больше (handshake на каждый
+вызов).
+
+    python manage.py bench_http_client
+    python manage.py bench_http_client --requests 5000 --threads 16 --delay-ms 5
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from apps.core import http_client
+
+_BODY = json.dumps({"sent": True, "id": "bench"}).encode()
+
+
+def _make_server(delay: float):
+    connections = {"n": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Заголовки и тело — одним write: иначе Nagle + delayed ACK дают
+        # ~40 мс на каждый ответ в keep-alive соединении.
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with lock:
+                connections["n"] += 1
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(_BODY)))
+            self.end_headers()
+            self.wfile.write(_BODY)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    return server, connections
+
+
+class Command(BaseCommand):
+    help = "Benchmark bare requests vs pooled http_client against a local stub"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Запросов на вариант")
+        parser.add_argument("--threads", type=int, default=8, help="Параллельных потоков")
+        parser.add_argument("--delay-ms", type=int, default=0, help="Задержка ответа stub'а")
+
+    def handle(self, *args, **options):
+        server, connections = _make_server(options["delay_ms"] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/ping"
+        threads = options["threads"]
+        http_client.register(http_client.Provider(
+            "bench", timeout=10, retries=0, breaker_threshold=0, pool_maxsize=threads,
+        ))
+
+        variants = {
+            "bare": lambda: requests.get(url, timeout=10),
+            "pooled": lambda: http_client.request("bench", "GET", url),
+        }
+        try:
+            for name, call in variants.items():
+                connections["n"] = 0
+                started = time.monotonic()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    statuses = list(pool.map(
+                        lambda _: call().status_code, range(options["requests"]),
+                    ))
+                elapsed = time.monotonic() - started
+                failed = sum(1 for s in statuses if s != 200)
+                self.stdout.write(
+                    f"{name:>7}: {len(statuses) / elapsed:8.0f} req/s  "
+                    f"{elapsed:6.2f}s  соединений: {connections['n']:>5}  ошибок: {failed}"
+                )
+        finally:
+            server.shutdown()
+            http_client.flush_stats()
@@ -0,0 +1,45 @@
+"""
+Задержки и ошибки исходящих HTTP-вызовов (apps/core/http_client.py) по
+всем процессам: вызовов, доля ошибок (сеть/4xx/5xx), средняя задержка,
+сколько вызовов дольше SLOW_SECONDS. Процессы сбрасывают счётчики в Redis
+порциями (раз в минуту или каждые 200 вызовов).
+
+    python manage.py http_stats
+    python manage.py http_stats --provider efrsb
+    python manage.py http_stats --reset
+"""
+from django.core.management.base import BaseCommand
+
+from apps.core import http_client
+
+
+class Command(BaseCommand):
+    help = "Show per-endpoint latency/error counters of outbound HTTP integrations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--provider", help="Только один провайдер")
+        parser.add_argument("--reset", action="store_true", help="Обнулить счётчики")
+
+    def handle(self, *args, **options):
+        http_client.flush_stats()
+        stats = http_client.shared_stats()
+        rows = sorted(
+            (row for row in stats.items()
+             if not options["provider"] or row[0][0] == options["provider"]),
+            key=lambda row: -row[1]["count"],
+        )
+        self.stdout.write(
+            f"{'provider':<16}{'endpoint':<40}{'calls':>9}{'err %':>8}"
+            f"{'avg ms':>9}{'slow':>7}"
+        )
+        for (provider, endpoint), c in rows:
+            calls = c["count"]
+            err = c["errors"] / calls * 100 if calls else 0
+            avg = c["ms"] / calls if calls else 0
+            self.stdout.write(
+                f"{provider:<16}{endpoint[:39]:<40}{calls:>9}{err:>7.1f}%"
+                f"{avg:>9.0f}{c['slow']:>7}"
+            )
+        if options["reset"]:
+            http_client.reset_shared_stats()
+            self.stdout.write("Счётчики обнулены")
@@ -4,45 +4,33 @@
 
 Дополнительно обогащает записи данными из DaData по ОГРН:
 ИНН, КПП, ОКПО, ОКВЭД, руководитель, адреса, телефоны, e-mail.
+Запросы — одним пакетом через шлюз apps/crm/dadata.py (ответы кэшируются).
 """
 import re
 import urllib.request
 from html.parser import HTMLParser
 
-import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind
 
 
 CBR_URL = "https://www.cbr.ru/banking_sector/credit/FullCoList/"
-DADATA_FIND_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/party"
 
 
 def dadata_find_by_ogrn(ogrn: str) -> dict | None:
     """Возвращает data-блок первой организации из DaData по ОГРН."""
-    token = getattr(settings, "DADATA_API_KEY", "") or ""
-    if not token or not ogrn:
-        return None
-    try:
-        r = requests.post(
-            DADATA_FIND_URL,
-            json={"query": ogrn, "count": 1},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        suggestions = r.json().get("suggestions") or []
-        if not suggestions:
-            return None
-        return suggestions[0].get("data") or None
-    except Exception:
-        return None
+    party = dadata.find_party(ogrn)
+    return (party or {}).get("data") or None
+
+
+def dadata_find_parties(ogrns) -> dict:
+    """{ОГРН: data-блок | None} — одним пакетом через шлюз (кэш + конкурентно)."""
+    return {
+        ogrn: (party or {}).get("data") or None
+        for ogrn, party in dadata.find_parties([o for o in ogrns if o]).items()
+    }
 
 
 def enrich_from_dadata(data: dict) -> dict:
@@ -190,6 +178,11 @@ class Command(BaseCommand):
         rows = parser.rows[:limit]
         self.stdout.write(f"Найдено строк в таблице: {len(parser.rows)}, беру {len(rows)}")
 
+        # DaData по всем ОГРН сразу — повторный прогон берёт ответы из кэша.
+        enrich_by_ogrn = {}
+        if not no_enrich:
+            enrich_by_ogrn = dadata_find_parties(row[3] for row in rows if len(row) >= 9)
+
         created = 0
         updated = 0
         for row in rows:
@@ -214,7 +207,7 @@ class Command(BaseCommand):
             # Обогащение через DaData по ОГРН
             enrichment = {}
             if not no_enrich:
-                dd = dadata_find_by_ogrn(ogrn)
+                dd = enrich_by_ogrn.get(ogrn)
                 enrichment = enrich_from_dadata(dd)
                 if enrichment:
                     self.stdout.write(
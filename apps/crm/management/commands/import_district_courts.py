@@ -5,7 +5,8 @@ Seed-источник — список court_id с GitHub `dataout-org/sudrfpars
 + URL сайтов, но без адресов.
 
 Адреса добираем через DaData /suggest/court — берём первый match
-с совпадающим court_id (поле `data.code`).
+с совпадающим court_id (поле `data.code`). Запросы по всем судам идут
+одним пакетом через шлюз apps/crm/dadata.py (ответы кэшируются).
 
 Идемпотентно по LegalEntity.court_code (формат «22RS0001»). При повторном
 запуске запись обновляется.
@@ -15,14 +16,12 @@ Seed-источник — список court_id с GitHub `dataout-org/sudrfpars
   python manage.py import_district_courts               # полный
 """
 import json
-import os
-import time
 from collections import Counter
 
 import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind, Region
 
 
@@ -30,9 +29,6 @@ GITHUB_URL = (
     "https://raw.githubusercontent.com/dataout-org/sudrfparser/main/"
     "courts_info/sudrf_websites.json"
 )
-DADATA_SUGGEST_URL = (
-    "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/court"
-)
 
 # Типы (2 буквы внутри court_id) которые мы импортируем.
 INCLUDE_TYPES = {"RS"}  # районный/городской/межрайонный
@@ -52,26 +48,6 @@ REGION_ALIASES = {
 }
 
 
-def _dadata_find_court(query, api_key, secret_key, count=10):
-    """DaData /suggest/court — top-N по name."""
-    try:
-        r = requests.post(
-            DADATA_SUGGEST_URL,
-            json={"query": query, "count": count},
-            headers={
-                "Authorization": f"Token {api_key}",
-                "X-Secret": secret_key,
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        return (r.json() or {}).get("suggestions") or []
-    except Exception:
-        return []
-
-
 def _clean_name(s: str) -> str:
     """Из 'Алейский городской суд (Алтайский край)' → 'Алейский городской суд'."""
     if not s:
@@ -114,10 +90,8 @@ class Command(BaseCommand):
         dry = opts["dry_run"]
         use_dadata = not opts["no_dadata"]
 
-        api_key = getattr(settings, "DADATA_API_KEY", "") or os.environ.get("DADATA_API_KEY", "")
-        secret_key = getattr(settings, "DADATA_SECRET_KEY", "") or os.environ.get("DADATA_SECRET_KEY", "")
-        if use_dadata and (not api_key or not secret_key):
-            self.stderr.write("DADATA_API_KEY/DADATA_SECRET_KEY не заданы. "
+        if use_dadata and not dadata.is_configured("suggest/court"):
+            self.stderr.write("DADATA_API_KEY не задан. "
                               "Используй --no-dadata если хочешь без адресов.")
             return
 
@@ -135,10 +109,16 @@ class Command(BaseCommand):
         seed = self._fetch_seed()
         self.stdout.write(f"  Получено: {len(seed)} судов типов {INCLUDE_TYPES}")
 
+        if limit:
+            seed = seed[:limit]
+        suggestions_by_name = {}
+        if use_dadata:
+            suggestions_by_name = dadata.suggest_courts(
+                [_clean_name(c["name"]) for c in seed], count=10,
+            )
+
         stats = Counter()
         for i, c in enumerate(seed):
-            if limit and i >= limit:
-                break
 
             cid = c["court_id"]
             name_clean = _clean_name(c["name"])
@@ -159,7 +139,7 @@ class Command(BaseCommand):
             full_name = c["name"]
             short_name = name_clean
             if use_dadata:
-                suggestions = _dadata_find_court(name_clean, api_key, secret_key)
+                suggestions = suggestions_by_name.get(name_clean) or []
                 match = None
                 for s in suggestions:
                     if (s.get("data") or {}).get("code") == cid:
@@ -176,8 +156,6 @@ class Command(BaseCommand):
                     full_name = d.get("name") or full_name
                     if match.get("value"):
                         short_name = match["value"]
-                # DaData free tier — 30 req/sec.
-                time.sleep(0.05)
 
             if dry:
                 stats["would_create_or_update"] += 1
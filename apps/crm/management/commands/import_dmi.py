@@ -19,20 +19,19 @@
      ГИМС, ЛРР — итого 13 000+ записей) извлекаем уникальные муниципальные
      образования: (регион, название города/района).
   2. Для каждого MO делаем DaData suggest с запросами "<муни> имуществ"
-     и "<муни> КУМИ".
+     и "<муни> КУМИ" — пакетом на регион через шлюз apps/crm/dadata.py
+     (ответы кэшируются, повторный прогон квоту почти не тратит).
   3. Фильтруем: в имени должен быть корень «имущ» / «изо», ОПФ не
      коммерческая, статус ACTIVE/LIQUIDATING.
   4. Дедуп по ИНН.
   5. Сохраняем LegalEntity(kind=ДМИ).
 """
 import re
-import time
 
-import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind, Region
 from apps.crm.management.commands.assign_legal_entity_regions import (
     find_region_number,
@@ -43,7 +42,6 @@ from apps.crm.management.commands.import_cbr_banks import (
 )
 
 
-SUGGEST_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/party"
 
 COMMERCIAL_OPF = {"ООО", "АО", "ПАО", "ЗАО", "ИП", "ОАО", "НКО", "НП", "ОО", "ТСЖ"}
 
@@ -62,24 +60,6 @@ MUNI_WORDS_RE = re.compile(
 )
 
 
-def dadata_suggest(query: str, token: str, count: int = 10) -> list[dict]:
-    try:
-        r = requests.post(
-            SUGGEST_URL,
-            json={"query": query, "count": count, "type": "LEGAL"},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=10,
-        )
-        r.raise_for_status()
-        return r.json().get("suggestions") or []
-    except Exception:
-        return []
-
-
 def looks_like_dmi(sugg: dict) -> bool:
     """Проверяет, что suggestion похож на муниципальный ДМИ."""
     data = sugg.get("data") or {}
@@ -142,7 +122,6 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--dry-run", action="store_true")
-        parser.add_argument("--sleep", type=float, default=0.12)
         parser.add_argument("--limit", type=int, default=0, help="Ограничить число МО")
         parser.add_argument("--region", type=int, default=0, help="Только один регион по Region.number")
         parser.add_argument(
@@ -156,14 +135,12 @@ class Command(BaseCommand):
 
     def handle(self, *args, **opts):
         dry_run = opts["dry_run"]
-        sleep_s = opts["sleep"]
         limit = opts["limit"]
         only_region = opts["region"]
         skip_covered = opts["skip_covered"]
         max_queries = opts["max_queries"]
 
-        token = getattr(settings, "DADATA_API_KEY", "") or ""
-        if not token:
+        if not dadata.is_configured():
             self.stdout.write(self.style.ERROR("DADATA_API_KEY не задан"))
             return
 
@@ -221,28 +198,27 @@ class Command(BaseCommand):
             by_inn: dict[str, dict] = {}
             self.stdout.write(f"[{rg.number:3}] {rg.name} — МО: {len(rg_munis)}")
 
-            for muni in rg_munis:
-                queries = [f"{muni} имуществ", f"{muni} КУМИ"]
-                for q in queries:
-                    if max_queries and queries_used >= max_queries:
-                        aborted = True
-                        break
-                    for s in dadata_suggest(q, token, count=10):
-                        if not looks_like_dmi(s):
-                            continue
-                        inn = (s.get("data") or {}).get("inn")
-                        if not inn or inn in by_inn:
-                            continue
-                        data = s.get("data") or {}
-                        addr = (data.get("address") or {}).get("unrestricted_value") or ""
-                        addr_region = find_region_number(addr)
-                        if addr_region and addr_region != rg.number:
-                            continue
-                        by_inn[inn] = {"sugg": s, "muni": muni}
-                    queries_used += 1
-                    time.sleep(sleep_s)
-                if aborted:
-                    break
+            queries = [(muni, q) for muni in rg_munis
+                       for q in (f"{muni} имуществ", f"{muni} КУМИ")]
+            if max_queries and queries_used + len(queries) > max_queries:
+                queries = queries[:max(0, max_queries - queries_used)]
+                aborted = True
+            queries_used += len(queries)
+            results = dadata.suggest_parties([q for _, q in queries], count=10, type="LEGAL")
+
+            for muni, q in queries:
+                for s in results.get(q) or []:
+                    if not looks_like_dmi(s):
+                        continue
+                    inn = (s.get("data") or {}).get("inn")
+                    if not inn or inn in by_inn:
+                        continue
+                    data = s.get("data") or {}
+                    addr = (data.get("address") or {}).get("unrestricted_value") or ""
+                    addr_region = find_region_number(addr)
+                    if addr_region and addr_region != rg.number:
+                        continue
+                    by_inn[inn] = {"sugg": s, "muni": muni}
 
             # Сохраняем результат региона отдельной транзакцией.
             created = updated = 0
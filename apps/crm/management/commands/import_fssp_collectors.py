@@ -7,7 +7,8 @@ XLS-выгрузка доступна на old.fssp.gov.ru (актуальна 
 
 Реквизиты из XLS: наименование, ОГРН, ИНН, страховщик, адрес, сайт, рег.номер.
 DaData используется по ИНН для получения чистого наименования, ОПФ, ОКПО и
-формального юридического адреса (адрес из XLS часто с переносами).
+формального юридического адреса (адрес из XLS часто с переносами) —
+все ИНН одним пакетом через шлюз apps/crm/dadata.py (с кэшем ответов).
 Руководитель НЕ импортируется.
 """
 import os
@@ -20,6 +21,7 @@ from django.core.management.base import BaseCommand
 
 from apps.crm.models import LegalEntity, LegalEntityKind
 from apps.crm.management.commands.import_cbr_banks import (
+    dadata_find_parties,
     enrich_from_dadata,
     map_entity_type,
 )
@@ -108,7 +110,11 @@ class Command(BaseCommand):
             except OSError:
                 pass
 
-        # 3) Обрабатываем записи
+        # 3) Обрабатываем записи; DaData — пакетом, в цикле ответы из кэша.
+        if not no_enrich:
+            dadata_find_parties(
+                m.group(1) for m in (INN_RE.search(e["codes"]) for e in entries) if m
+            )
         created = updated = skipped = 0
         for e in entries:
             inn_m = INN_RE.search(e["codes"])
@@ -7,7 +7,9 @@ CSV содержит поля (header на английском): код суб
 наименование, почтовый адрес, ФИО начальника, телефон, факс, режим работы,
 территория обслуживания, координаты, URL. ~2700 строк, обновляется ежемесячно.
 
-Адрес нормализуем через DaData /clean/address (нужны и API_KEY, и SECRET_KEY).
+Адрес нормализуем через DaData /clean/address (нужны и API_KEY, и SECRET_KEY)
+— все адреса файла одним пакетом через шлюз apps/crm/dadata.py; ответы
+кэшируются, повторный прогон платных запросов почти не делает.
 Идемпотентность — по LegalEntity.fssp_code (код терр.органа, напр. "34005").
 
   python manage.py import_fssp_osp --limit 100   # тестовый прогон
@@ -16,21 +18,17 @@ CSV содержит поля (header на английском): код суб
 """
 import csv
 import io
-import os
-import time
 from collections import Counter
 
 import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind, Region
 
 
 META_URL = "https://opendata.fssp.gov.ru/opendata/7709576929-osp/meta.csv"
 BASE_URL = "https://opendata.fssp.gov.ru/7709576929-osp/"
-CLEAN_ADDRESS_URL = "https://cleaner.dadata.ru/api/v1/clean/address"
 
 
 def _latest_data_url():
@@ -64,31 +62,6 @@ def _latest_data_url():
     return candidates[-1][1]
 
 
-def _dadata_clean_address(address, api_key, secret_key, timeout=15):
-    """DaData cleaner /clean/address. Возвращает dict с ключом `result`
-    (нормализованный адрес) и компонентами, либо None при ошибке.
-    """
-    if not address:
-        return None
-    try:
-        r = requests.post(
-            CLEAN_ADDRESS_URL,
-            json=[address],
-            headers={
-                "Authorization": f"Token {api_key}",
-                "X-Secret": secret_key,
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=timeout,
-        )
-        r.raise_for_status()
-        result = r.json()
-        return result[0] if result else None
-    except Exception:
-        return None
-
-
 def _pick(row, *candidates):
     """Берёт значение из CSV-строки по первому ключу из candidates что нашёлся."""
     for c in candidates:
@@ -114,9 +87,7 @@ class Command(BaseCommand):
         dry = opts["dry_run"]
         use_dadata = not opts["no_dadata"]
 
-        api_key = getattr(settings, "DADATA_API_KEY", "") or os.environ.get("DADATA_API_KEY", "")
-        secret_key = getattr(settings, "DADATA_SECRET_KEY", "") or os.environ.get("DADATA_SECRET_KEY", "")
-        if use_dadata and (not api_key or not secret_key):
+        if use_dadata and not dadata.is_configured("clean/address"):
             self.stderr.write("DADATA_API_KEY/DADATA_SECRET_KEY не заданы. "
                               "Использую --no-dadata если хочешь продолжить без нормализации.")
             return
@@ -153,9 +124,20 @@ class Command(BaseCommand):
 
         stats = Counter()
 
-        for i, row in enumerate(reader):
-            if limit and i >= limit:
-                break
+        rows = list(reader)
+        if limit:
+            rows = rows[:limit]
+
+        # Все адреса — одним пакетом (кэш + конкурентные запросы).
+        cleaned_by_postal = {}
+        if use_dadata:
+            postals = [_pick(row, "postal address", "Почтовый адрес") for row in rows]
+            cleaned_by_postal = dadata.clean_addresses(
+                [p for p in postals if p],
+                progress=lambda done, total: self.stdout.write(f"  DaData: {done}/{total}"),
+            )
+
+        for i, row in enumerate(rows):
 
             # Поля CSV ФССП (английские названия из структуры 2024 г.)
             code = _pick(row, "code of the territorial agency",
@@ -189,14 +171,12 @@ class Command(BaseCommand):
             normalized = postal
             cleaned = None
             if use_dadata and postal:
-                cleaned = _dadata_clean_address(postal, api_key, secret_key)
+                cleaned = cleaned_by_postal.get(postal)
                 if cleaned and cleaned.get("result"):
                     normalized = cleaned["result"]
                     stats["dadata_clean_ok"] += 1
                 else:
                     stats["dadata_clean_fail"] += 1
-                # DaData free tier — 30 req/sec; маленькая пауза.
-                time.sleep(0.05)
 
             # Фолбэк региона: если в CSV region_code не маппится (СОСП/ГМУ
             # с кодом 98), берём из нормализованного DaData ответа.
@@ -5,15 +5,12 @@
 Список берём перебором DaData suggest/party с разными запросами:
   - "ФКУ Центр ГИМС МЧС"
   - "Центр ГИМС МЧС России по <регион>"
-Дедуп по ИНН. Руководителя не заполняем.
+Дедуп по ИНН. Руководителя не заполняем. Все запросы — пакетами через
+шлюз apps/crm/dadata.py (кэш ответов, лимит запросов держит шлюз).
 """
-import re
-import time
-
-import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind
 from apps.crm.management.commands.import_cbr_banks import (
     enrich_from_dadata,
@@ -22,8 +19,6 @@ from apps.crm.management.commands.import_cbr_banks import (
 from apps.crm.management.commands.import_myfin_mfo import dadata_find_by_inn
 
 
-SUGGEST_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/party"
-
 # Список субъектов РФ (для подстановки в имя региона).
 REGIONS = [
     "Республике Адыгея", "Республике Башкортостан", "Республике Бурятия",
@@ -59,24 +54,6 @@ REGIONS = [
 ]
 
 
-def dadata_suggest(query: str, token: str, count: int = 20) -> list[dict]:
-    try:
-        r = requests.post(
-            SUGGEST_URL,
-            json={"query": query, "count": count, "type": "LEGAL"},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        return r.json().get("suggestions") or []
-    except Exception:
-        return []
-
-
 def is_gims(s: dict) -> bool:
     """Фильтруем — в имени должно быть 'ГИМС' и 'МЧС'."""
     v = (s.get("value") or "").upper()
@@ -88,13 +65,10 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--dry-run", action="store_true")
-        parser.add_argument("--sleep", type=float, default=0.15)
 
     def handle(self, *args, **opts):
         dry_run = opts["dry_run"]
-        sleep_s = opts["sleep"]
-        token = getattr(settings, "DADATA_API_KEY", "") or ""
-        if not token:
+        if not dadata.is_configured():
             self.stdout.write(self.style.ERROR("Нет DADATA_API_KEY"))
             return
 
@@ -108,24 +82,22 @@ class Command(BaseCommand):
         # 1) собираем кандидатов
         by_inn: dict[str, dict] = {}
 
-        # Общий запрос (центральный ФКУ ЦОД + часть регионов)
-        for base in ["ФКУ Центр ГИМС МЧС", "Центр ГИМС МЧС России"]:
-            for s in dadata_suggest(base, token, count=20):
+        # Общий запрос (центральный ФКУ ЦОД + часть регионов) и перебор по регионам
+        bases = ["ФКУ Центр ГИМС МЧС", "Центр ГИМС МЧС России"]
+        regional = [f"ФКУ Центр ГИМС МЧС России по {reg}" for reg in REGIONS]
+        results = [
+            *dadata.suggest_parties(bases, count=20, type="LEGAL").values(),
+            *dadata.suggest_parties(regional, count=5, type="LEGAL").values(),
+        ]
+        for suggestions in results:
+            for s in suggestions:
                 if is_gims(s):
                     inn = (s.get("data") or {}).get("inn") or ""
                     if inn:
                         by_inn[inn] = s
-            time.sleep(sleep_s)
 
-        # Перебор по регионам
-        for reg in REGIONS:
-            q = f"ФКУ Центр ГИМС МЧС России по {reg}"
-            for s in dadata_suggest(q, token, count=5):
-                if is_gims(s):
-                    inn = (s.get("data") or {}).get("inn") or ""
-                    if inn:
-                        by_inn[inn] = s
-            time.sleep(sleep_s)
+        # Полные реквизиты (findById) — тоже одним пакетом, ниже из кэша.
+        dadata.find_parties(list(by_inn))
 
         self.stdout.write(f"Уникальных ГИМС найдено: {len(by_inn)}")
 
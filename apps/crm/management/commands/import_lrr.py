@@ -24,10 +24,10 @@ import re
 import time
 
 import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind, Region
 from apps.crm.management.commands.assign_legal_entity_regions import (
     find_region_number,
@@ -42,7 +42,6 @@ HEADERS = {"User-Agent": UA, "Accept": "text/html"}
 
 # DaData suggest для обогащения (структурные единицы без отдельного ИНН,
 # но родительское ГУ Росгвардии найдётся).
-SUGGEST_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/party"
 
 # Маркёры названия подразделения — ищем в начале <b>/<strong>.
 UNIT_RE = re.compile(
@@ -384,22 +383,8 @@ def parse_subpage(html: str) -> dict | None:
     return {"name": name, "address": addr, "phone": phone}
 
 
-def dadata_suggest(query: str, token: str, count: int = 3) -> list[dict]:
-    try:
-        r = requests.post(
-            SUGGEST_URL,
-            json={"query": query, "count": count, "type": "LEGAL"},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=10,
-        )
-        r.raise_for_status()
-        return r.json().get("suggestions") or []
-    except Exception:
-        return []
+def dadata_suggest(query: str, count: int = 3) -> list[dict]:
+    return dadata.suggest_party(query, count=count, type="LEGAL")
 
 
 class Command(BaseCommand):
@@ -424,8 +409,7 @@ class Command(BaseCommand):
             ))
             return
 
-        token = getattr(settings, "DADATA_API_KEY", "") or ""
-        if not token and not no_dadata:
+        if not dadata.is_configured() and not no_dadata:
             self.stdout.write(self.style.WARNING(
                 "DADATA_API_KEY не задан — обогащение выключено."
             ))
@@ -529,6 +513,11 @@ class Command(BaseCommand):
 
             self.stdout.write(f"  записей: {len(records)}")
 
+            # DaData по исходным названиям — одним пакетом (кэш + конкурентно),
+            # ниже dadata_suggest отвечает из кэша.
+            if not no_dadata:
+                dadata.suggest_parties([rec["name"] for rec in records], count=1, type="LEGAL")
+
             # Сохраняем.
             created = updated = 0
             with transaction.atomic():
@@ -548,7 +537,7 @@ class Command(BaseCommand):
                     # DaData suggest по исходному названию.
                     if not no_dadata:
                         for q in [rec["name"], f"{rec['name']} Росгвардия {region.name}"]:
-                            sug = dadata_suggest(q, token, count=1)
+                            sug = dadata_suggest(q, count=1)
                             if sug:
                                 data = sug[0].get("data") or {}
                                 inn = data.get("inn") or inn
@@ -561,7 +550,6 @@ class Command(BaseCommand):
                                 director_title = director_title or mgmt.get("post", "")
                                 email = email or data.get("emails", "") or ""
                                 break
-                            time.sleep(0.1)
 
                     # Нормализуем регион: если в адресе явно определили —
                     # используем его, иначе берём текущий region.
@@ -9,25 +9,22 @@
      (для Чечни ищем 20*, для Крыма — 91*, и т. п.).
   2. Для каждого региона перебираем коды 0001…9999 с findById.
   3. Останавливаемся после N подряд пустых ответов (порог настроен на 30).
+     Коды запрашиваются блоками по N через шлюз apps/crm/dadata.py —
+     конкурентно и с кэшем ответов (повторный обход почти бесплатен).
   4. Идемпотентно через LegalEntity.court_code.
 
   python manage.py import_magistrate_courts --limit-region 100  # тест
   python manage.py import_magistrate_courts --regions 39,77      # выборочно
   python manage.py import_magistrate_courts                       # полный (всех)
 """
-import os
-import time
 from collections import Counter
 
-import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind, Region
 
 
-FIND_BY_ID_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/court"
-
 # Обратные алиасы: судебный код → Region.number в Siri (см. import_district_courts).
 JUDICIAL_PREFIXES = {
     # Чечня: судебные коды 20, классификатор 95.
@@ -42,25 +39,6 @@ JUDICIAL_PREFIXES = {
 EMPTY_THRESHOLD = 30
 
 
-def _find_by_id(code, api_key):
-    try:
-        r = requests.post(
-            FIND_BY_ID_URL,
-            json={"query": code},
-            headers={
-                "Authorization": f"Token {api_key}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        s = (r.json() or {}).get("suggestions") or []
-        return s[0]["data"] if s else None
-    except Exception:
-        return None
-
-
 class Command(BaseCommand):
     help = "Импорт мировых судебных участков в LegalEntity через DaData findById/court."
 
@@ -73,6 +51,25 @@ class Command(BaseCommand):
         parser.add_argument("--threshold", type=int, default=EMPTY_THRESHOLD,
                             help="Сколько подряд пустых = стоп региона.")
 
+    def _probe_block(self, prefix: str, first: int, last: int) -> dict:
+        """{code: data | None} для кодов first..last региона.
+
+        Уже импортированные участки берутся из БД (без DaData-запроса для
+        идемпотентности), остальные — одним пакетом findById/court.
+        """
+        codes = [f"{prefix}{n:04d}" for n in range(first, last + 1)]
+        existing = {
+            le.court_code: {"code": le.court_code, "name": le.name,
+                            "address": le.postal_address, "website": le.website}
+            for le in LegalEntity.objects.filter(court_code__in=codes)
+            .only("court_code", "name", "postal_address", "website")
+        }
+        found = dadata.find_courts([c for c in codes if c not in existing])
+        return {
+            code: existing.get(code) or (found.get(code) or {}).get("data")
+            for code in codes
+        }
+
     def handle(self, *args, **opts):
         dry = opts["dry_run"]
         limit_region = opts["limit_region"]
@@ -85,9 +82,7 @@ class Command(BaseCommand):
                 self.stderr.write("--regions: ожидался список целых чисел")
                 return
 
-        api_key = (getattr(settings, "DADATA_API_KEY", "")
-                   or os.environ.get("DADATA_API_KEY", ""))
-        if not api_key:
+        if not dadata.is_configured("findById/court"):
             self.stderr.write("DADATA_API_KEY не задан")
             return
 
@@ -115,21 +110,14 @@ class Command(BaseCommand):
             empty_streak = 0
             tried = 0
             found_in_region = 0
-            for n in range(1, 10000):
-                if limit_region and tried >= limit_region:
-                    break
+            block = {}
+            last = min(9999, limit_region) if limit_region else 9999
+            for n in range(1, last + 1):
                 tried += 1
                 code = f"{prefix}{n:04d}"
-
-                # Если уже есть в БД — пропускаем DaData-запрос для идемпотентности
-                existing = LegalEntity.objects.filter(court_code=code).only("id").first()
-                if existing is None:
-                    data = _find_by_id(code, api_key)
-                    time.sleep(0.05)
-                else:
-                    data = {"code": code, "name": existing.name,
-                            "address": existing.postal_address,
-                            "website": existing.website}
+                if code not in block:
+                    block = self._probe_block(prefix, n, min(n + max(threshold, 1) - 1, last))
+                data = block[code]
 
                 if not data:
                     empty_streak += 1
@@ -1,24 +1,24 @@
 """
 Импорт МФО со страницы https://ru.myfin.by/mfo
-с обогащением реквизитов через DaData по ИНН.
+с обогащением реквизитов через DaData по ИНН (шлюз apps/crm/dadata.py, с кэшем).
 """
 import re
 import time
 
 import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind
 from apps.crm.management.commands.import_cbr_banks import (
     dadata_find_by_ogrn,
+    dadata_find_parties,
     enrich_from_dadata,
     map_entity_type,
 )
 
 
 MYFIN_URL = "https://ru.myfin.by/mfo"
-DADATA_FIND_URL = "https://suggestions.dadata.ru/suggestions/api/4_1/rs/findById/party"
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
@@ -45,25 +45,9 @@ PAGE_SIZE_RE = re.compile(r'data-page-size="(\d+)"')
 
 
 def dadata_find_by_inn(query: str) -> dict | None:
-    token = getattr(settings, "DADATA_API_KEY", "") or ""
-    if not token or not query:
-        return None
-    try:
-        r = requests.post(
-            DADATA_FIND_URL,
-            json={"query": query, "count": 1},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        sugs = r.json().get("suggestions") or []
-        return sugs[0].get("data") if sugs else None
-    except Exception:
-        return None
+    """data-блок DaData findById/party по ИНН/ОГРН (через кэширующий шлюз)."""
+    party = dadata.find_party(query)
+    return (party or {}).get("data") or None
 
 
 def parse_page(html: str) -> list[dict]:
@@ -158,7 +142,10 @@ class Command(BaseCommand):
             uniq = uniq[:limit]
         self.stdout.write(f"Собрано уникальных МФО: {len(uniq)}")
 
-        # 2) обогащение + запись
+        # 2) обогащение + запись. DaData — сначала пакетом по всем ИНН/ОГРН
+        # (кэш + конкурентные запросы), в цикле ответы берутся из кэша.
+        if not no_enrich:
+            dadata_find_parties([it["inn"] or it["ogrn"] for it in uniq])
         created = 0
         updated = 0
         skipped = 0
@@ -6,15 +6,17 @@
 
 Для каждой СРО берём наименование → поиск в DaData по имени (suggest/party)
 → берём первую организацию-НКО (АССОЦИАЦИЯ / СОЮЗ / НП) → findById по ИНН.
+Поиск по всем именам идёт одним пакетом через шлюз apps/crm/dadata.py
+(кэш ответов, лимит запросов в секунду держит шлюз).
 """
 import html as htmlmod
 import re
 import time
 
 import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, LegalEntityKind
 from apps.crm.management.commands.import_cbr_banks import (
     dadata_find_by_ogrn,
@@ -25,31 +27,11 @@ from apps.crm.management.commands.import_myfin_mfo import dadata_find_by_inn
 
 
 SRC_URL = "https://reestrbankrotov.ru/reestr-sro-arbitrazhnyh-upravlyayuschih/"
-DADATA_SUGGEST_URL = (
-    "https://suggestions.dadata.ru/suggestions/api/4_1/rs/suggest/party"
-)
 HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) Chrome/120"}
 
 
 def dadata_suggest_party(query: str, count: int = 5) -> list[dict]:
-    token = getattr(settings, "DADATA_API_KEY", "") or ""
-    if not token:
-        return []
-    try:
-        r = requests.post(
-            DADATA_SUGGEST_URL,
-            json={"query": query, "count": count},
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {token}",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        return r.json().get("suggestions") or []
-    except Exception:
-        return []
+    return dadata.suggest_party(query, count=count)
 
 
 def parse_source(html: str) -> list[dict]:
@@ -98,7 +80,7 @@ class Command(BaseCommand):
         parser.add_argument("--limit", type=int, default=0)
         parser.add_argument("--dry-run", action="store_true")
         parser.add_argument("--no-enrich", action="store_true")
-        parser.add_argument("--sleep", type=float, default=0.2)
+        parser.add_argument("--sleep", type=float, default=0)
 
     def handle(self, *args, **opts):
         limit = opts["limit"]
@@ -122,6 +104,9 @@ class Command(BaseCommand):
             items = items[:limit]
         self.stdout.write(f"  найдено СРО: {len(items)}")
 
+        if not no_enrich:
+            dadata.suggest_parties([it["name"] for it in items], count=5)
+
         created = updated = skipped = 0
         for idx, it in enumerate(items, 1):
             name = it["name"]
@@ -3,32 +3,13 @@
 
 qc=0 — распознано уверенно, qc=1 — частично (принимаем), qc=2 — не распознано.
 Клиентам с qc=2 ставим статус "unknown".
+
+Запросы — через шлюз apps/crm/dadata.py (кэш, общий лимит DADATA_RPS).
 """
-import time
-import requests
 from django.core.management.base import BaseCommand
-from django.conf import settings
-from apps.crm.models import Client
-
 
-CLEAN_URL = "https://cleaner.dadata.ru/api/v1/clean/name"
-PAUSE = 0.15  # секунд между запросами (тариф: только по одному)
-
-
-def clean_one_name(value: str, api_key: str, secret_key: str) -> dict:
-    resp = requests.post(
-        CLEAN_URL,
-        json=[value],
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Authorization": f"Token {api_key}",
-            "X-Secret": secret_key,
-        },
-        timeout=15,
-    )
-    resp.raise_for_status()
-    return resp.json()[0]
+from apps.crm import dadata
+from apps.crm.models import Client
 
 
 class Command(BaseCommand):
@@ -42,10 +23,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
-        api_key = getattr(settings, "DADATA_API_KEY", "")
-        secret_key = getattr(settings, "DADATA_SECRET_KEY", "")
-
-        if not api_key or not secret_key:
+        if not dadata.is_configured("clean/name"):
             self.stderr.write(self.style.ERROR("Нужны DADATA_API_KEY и DADATA_SECRET_KEY в settings"))
             return
 
@@ -55,22 +33,28 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.WARNING("-- DRY RUN, изменения не сохраняются --"))
 
+        raws = {}
+        for client in clients:
+            parts = [client.last_name, client.first_name, client.patronymic]
+            raws[client.pk] = " ".join(p.strip() for p in parts if p and p.strip())
+        results = dadata.clean_names(
+            {raw for raw in raws.values() if raw},
+            progress=lambda done, n: self.stdout.write(f"  DaData: {done}/{n}..."),
+        )
+
         updated = unrecognized = skipped = errors = 0
 
         for i, client in enumerate(clients, 1):
-            parts = [client.last_name, client.first_name, client.patronymic]
-            raw = " ".join(p.strip() for p in parts if p and p.strip())
+            raw = raws[client.pk]
 
             if not raw:
                 skipped += 1
                 continue
 
-            try:
-                res = clean_one_name(raw, api_key, secret_key)
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f"  [{i}/{total}] ошибка для {repr(raw)}: {e}"))
+            res = results.get(raw)
+            if res is None:
+                self.stderr.write(self.style.ERROR(f"  [{i}/{total}] DaData не ответила для {repr(raw)}"))
                 errors += 1
-                time.sleep(1)
                 continue
 
             qc         = res.get("qc", 2)
@@ -112,7 +96,6 @@ class Command(BaseCommand):
                         client.save(update_fields=["last_name", "first_name", "patronymic"])
                     updated += 1
 
-            time.sleep(PAUSE)
             if i % 25 == 0:
                 self.stdout.write(f"  {i}/{total}...")
 
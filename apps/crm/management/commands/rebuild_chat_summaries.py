@@ -0,0 +1,31 @@
+"""Пересобрать ClientChatSummary (превью последнего сообщения, значки
+каналов, счётчик «ждут ответа») по crm_message + crm_messagearchive.
+
+Нужна один раз после миграции и при подозрении на рассинхрон (например,
+сообщения правились напрямую в БД).
+
+Использование:
+    python manage.py rebuild_chat_summaries
+    python manage.py rebuild_chat_summaries --client <uuid> --client <uuid>
+    python manage.py rebuild_chat_summaries --batch-size 1000
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.crm.chat_summary import REBUILD_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Пересобрать сводки переписки клиентов (ClientChatSummary)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client", action="append", default=[], help="id клиента (можно несколько)")
+        parser.add_argument("--batch-size", type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **opts):
+        started = time.monotonic()
+        n = rebuild(opts["client"] or None, batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Сводок записано: {n} за {time.monotonic() - started:.1f}s"
+        ))
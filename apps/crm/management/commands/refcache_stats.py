@@ -0,0 +1,42 @@
+"""
+Попадания общего кэша справочников (apps/core/refcache.py) по всем
+процессам: local — из памяти процесса, shared — из Redis, miss — запрос
+в БД/Bubble. Счётчики процессы сбрасывают в Redis порциями, поэтому
+последние несколько сотен обращений могут быть ещё не учтены.
+
+    python manage.py refcache_stats
+    python manage.py refcache_stats --reset
+    python manage.py refcache_stats --invalidate bubble
+"""
+from django.core.management.base import BaseCommand
+
+from apps.core import refcache
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the shared reference cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Обнулить счётчики")
+        parser.add_argument(
+            "--invalidate", nargs="+", metavar="NS",
+            help="Сбросить пространства имён во всех процессах",
+        )
+
+    def handle(self, *args, **options):
+        if options["invalidate"]:
+            refcache.invalidate(*options["invalidate"])
+            self.stdout.write(f"Сброшено: {', '.join(options['invalidate'])}")
+
+        stats = refcache.shared_stats(refcache.NAMESPACES)
+        self.stdout.write(f"{'namespace':<18}{'local':>10}{'shared':>10}{'miss':>10}{'hit %':>8}")
+        for ns, counts in stats.items():
+            total = sum(counts.values())
+            hit = (counts["local"] + counts["shared"]) / total * 100 if total else 0
+            self.stdout.write(
+                f"{ns:<18}{counts['local']:>10}{counts['shared']:>10}"
+                f"{counts['miss']:>10}{hit:>7.1f}%"
+            )
+        if options["reset"]:
+            refcache.reset_shared_stats(refcache.NAMESPACES)
+            self.stdout.write("Счётчики обнулены")
@@ -12,41 +12,15 @@
   python manage.py refill_fssp_osp --only-region  # только регион (без обновления адреса)
   python manage.py refill_fssp_osp --only-address # только адрес
 """
-import os
 import re
-import time
 from collections import Counter
 
-import requests
-from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from apps.crm import dadata
 from apps.crm.models import LegalEntity, Region
 
 
-CLEAN_ADDRESS_URL = "https://cleaner.dadata.ru/api/v1/clean/address"
-
-
-def _dadata_clean(addr, api_key, secret_key):
-    if not addr:
-        return None
-    try:
-        r = requests.post(
-            CLEAN_ADDRESS_URL, json=[addr],
-            headers={
-                "Authorization": f"Token {api_key}",
-                "X-Secret": secret_key,
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-            timeout=15,
-        )
-        r.raise_for_status()
-        return (r.json() or [None])[0]
-    except Exception:
-        return None
-
-
 def _is_raw_address(addr: str) -> bool:
     """Признак сырого CSV-адреса: подряд идущие запятые с пробелами."""
     if not addr:
@@ -145,9 +119,7 @@ class Command(BaseCommand):
         only_address = opts["only_address"]
         limit = opts["limit"]
 
-        api_key = getattr(settings, "DADATA_API_KEY", "") or os.environ.get("DADATA_API_KEY", "")
-        secret_key = getattr(settings, "DADATA_SECRET_KEY", "") or os.environ.get("DADATA_SECRET_KEY", "")
-        if not api_key or not secret_key:
+        if not dadata.is_configured("clean/address"):
             self.stderr.write("DADATA_API_KEY/DADATA_SECRET_KEY не заданы")
             return
 
@@ -193,12 +165,11 @@ class Command(BaseCommand):
             # Если ещё нужен адрес или регион — идём в DaData
             cleaned = None
             if (need_addr or need_region) and le.postal_address:
-                cleaned = _dadata_clean(le.postal_address, api_key, secret_key)
+                cleaned = dadata.clean_address(le.postal_address)
                 if cleaned and cleaned.get("result"):
                     stats["dadata_ok"] += 1
                 else:
                     stats["dadata_fail"] += 1
-                time.sleep(0.05)
 
             # Обновляем адрес если сырой и DaData дала результат
             if need_addr and cleaned and cleaned.get("result"):
@@ -0,0 +1,190 @@
+"""Архивный уровень переписки: crm_message → crm_messagearchive.
+
+Горячая таблица `Message` хранит raw_payload на каждой строке и растёт
+бесконечно — от её размера зависят чат, канбан и поиск. Сообщения старше
+N дней (по `telegram_date`, для строк без неё — по `created_at`) переносятся
+пачками в `MessageArchive` с тем же id и без raw_payload, затем удаляются
+из горячей таблицы.
+
+Пачка = одна транзакция (SELECT … FOR UPDATE SKIP LOCKED → bulk_create
+архива с ignore_conflicts → DELETE). Прерванный прогон безопасно
+продолжается следующим: всё, что ещё лежит в горячей таблице и старше
+cutoff, — и есть «остаток»; повторная вставка уже перенесённого id
+игнорируется.
+
+Не переносим сообщения, на которые ссылается ответ (`reply_to`) из
+горячей таблицы, — иначе FK SET_NULL оборвал бы цитату в свежем ответе.
+Такие уедут, когда уедет сам ответ.
+
+Чтение: `ChatHistory` склеивает архив и горячую таблицу в одну
+последовательность для Paginator — чат подгружает архивные страницы при
+прокрутке вверх так же, как обычные.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Count, Exists, F, Func, IntegerField, OuterRef, Q, QuerySet, Sum,
+)
+from django.db.models.functions import Coalesce, Length
+from django.utils import timezone
+
+from apps.crm.models import Message, MessageArchive
+
+logger = logging.getLogger("celery")
+
+DEFAULT_DAYS = 90
+DEFAULT_BATCH_SIZE = 2000
+
+# Поля, переносимые в архив 1:1 (raw_payload и прочие служебные — нет).
+ARCHIVE_FIELDS = (
+    "id", "client_id", "employee_id", "message_type", "channel", "direction",
+    "content", "telegram_message_id", "max_message_id", "whatsapp_message_id",
+    "bubble_id", "reply_to_id", "file_url", "file_name", "file_id",
+    "telegram_date", "is_read", "is_sent", "is_delivered", "is_failed",
+    "error_text", "reactions", "created_at",
+)
+
+
+class _PgColumnSize(Func):
+    function = "pg_column_size"
+    output_field = IntegerField()
+
+
+def candidates(cutoff) -> QuerySet:
+    """Сообщения горячей таблицы, которые пора перенести в архив."""
+    return Message.objects.filter(
+        Q(telegram_date__lt=cutoff)
+        | Q(telegram_date__isnull=True, created_at__lt=cutoff)
+    ).filter(
+        ~Exists(Message.objects.filter(reply_to_id=OuterRef("pk")))
+    )
+
+
+def _archive_batch(cutoff, batch_size: int) -> dict:
+    """Переносит одну пачку. Возвращает {'rows', 'bytes', 'payload_bytes'}."""
+    with transaction.atomic():
+        rows = list(
+            candidates(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("telegram_date", "id")
+            .annotate(
+                _content_bytes=Coalesce(Length("content"), 0),
+                _payload_bytes=Coalesce(_PgColumnSize(F("raw_payload")), 0),
+            )
+            .values(*ARCHIVE_FIELDS, "_content_bytes", "_payload_bytes")[:batch_size]
+        )
+        if not rows:
+            return {"rows": 0, "bytes": 0, "payload_bytes": 0}
+        stats = {
+            "rows": len(rows),
+            "bytes": sum(r.pop("_content_bytes") for r in rows),
+            "payload_bytes": sum(r.pop("_payload_bytes") for r in rows),
+        }
+        MessageArchive.objects.bulk_create(
+            [MessageArchive(**r) for r in rows], ignore_conflicts=True,
+        )
+        Message.objects.filter(pk__in=[r["id"] for r in rows]).delete()
+    return stats
+
+
+def archive_messages(
+    days: int = DEFAULT_DAYS,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: int = 0,
+    dry_run: bool = False,
+) -> dict:
+    """Переносит сообщения старше `days` дней в архив.
+
+    max_batches — потолок пачек за прогон (0 = до конца); остаток уйдёт
+    следующим запуском. dry_run — только посчитать, что будет перенесено.
+
+    Метрики: rows — строк перенесено, bytes — объём текста (content),
+    payload_bytes — сколько занимал выброшенный raw_payload, remaining —
+    сколько ещё осталось к переносу (если прогон упёрся в max_batches).
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    if dry_run:
+        agg = candidates(cutoff).aggregate(
+            rows=Count("id"),
+            bytes=Coalesce(Sum(Length("content")), 0),
+            payload_bytes=Coalesce(Sum(_PgColumnSize(F("raw_payload"))), 0),
+        )
+        logger.info(
+            "archive_messages[dry-run]: cutoff=%s rows=%d bytes=%d payload_bytes=%d",
+            cutoff.date(), agg["rows"], agg["bytes"], agg["payload_bytes"],
+        )
+        return {"dry_run": True, "cutoff": cutoff.isoformat(), **agg}
+
+    total = {"rows": 0, "bytes": 0, "payload_bytes": 0, "batches": 0}
+    started = time.monotonic()
+    while not max_batches or total["batches"] < max_batches:
+        batch = _archive_batch(cutoff, batch_size)
+        if not batch["rows"]:
+            break
+        total["batches"] += 1
+        for key in ("rows", "bytes", "payload_bytes"):
+            total[key] += batch[key]
+        logger.info(
+            "archive_messages: batch=%d rows=%d (total %d, %d bytes + %d payload)",
+            total["batches"], batch["rows"], total["rows"],
+            total["bytes"], total["payload_bytes"],
+        )
+    total["seconds"] = round(time.monotonic() - started, 1)
+    total["cutoff"] = cutoff.isoformat()
+    if max_batches and total["batches"] >= max_batches:
+        total["remaining"] = candidates(cutoff).count()
+    return total
+
+
+def is_archived(**lookup) -> bool:
+    """Есть ли сообщение в архиве (дедуп импортов по внешним id)."""
+    return MessageArchive.objects.filter(**lookup).exists()
+
+
+class ChatHistory:
+    """Архив + горячие сообщения клиента как одна упорядоченная последовательность.
+
+    Поддерживает ровно то, что нужно Paginator: count() и срез. Архив всегда
+    старше горячего окна, поэтому он идёт первым, а срезы на стыке
+    склеиваются из двух запросов.
+    """
+
+    def __init__(self, archived: QuerySet, hot: QuerySet):
+        self.archived = archived
+        self.hot = hot
+        self._archived_count = None
+        self._hot_count = None
+
+    @property
+    def archived_count(self) -> int:
+        if self._archived_count is None:
+            self._archived_count = self.archived.count()
+        return self._archived_count
+
+    def count(self) -> int:
+        if self._hot_count is None:
+            self._hot_count = self.hot.count()
+        return self.archived_count + self._hot_count
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("ChatHistory поддерживает только срезы")
+        start, stop = key.start or 0, key.stop
+        if stop is None:
+            stop = self.count()
+        edge = self.archived_count
+        items: list = []
+        if start < edge:
+            items.extend(self.archived[start:min(stop, edge)])
+        if stop > edge:
+            items.extend(self.hot[max(start - edge, 0):stop - edge])
+        return items
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.10 on 2026-10-18 00:51
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY нельзя внутри транзакции; crm_message большая —
+    # обычный CREATE INDEX заблокировал бы запись в чаты на время построения.
+    atomic = False
+
+    dependencies = [
+        ('core', '0025_seed_monitor_vpn_and_daily_report'),
+        ('crm', '0094_region_arbitr_code_data'),
+        ('files', '0004_storedfile_bubble_id'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('first_name'), name='gin_trgm_ops'), name='crm_client_fname_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('last_name'), name='gin_trgm_ops'), name='crm_client_lname_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('patronymic'), name='gin_trgm_ops'), name='crm_client_patr_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('username'), name='gin_trgm_ops'), name='crm_client_uname_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('phone'), name='gin_trgm_ops'), name='crm_client_phone_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='clientphone',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('phone'), name='gin_trgm_ops'), name='crm_clientphone_phone_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='legalentity',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='crm_legal_name_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='legalentity',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('inn'), name='gin_trgm_ops'), name='crm_legal_inn_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='legalentity',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('ogrn'), name='gin_trgm_ops'), name='crm_legal_ogrn_trgm'),
+        ),
+        AddIndexConcurrently(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('content'), name='gin_trgm_ops'), name='crm_message_content_trgm'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.10 on 2026-10-18 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_seed_monitor_vpn_and_daily_report'),
+        ('crm', '0095_search_trgm_indexes'),
+        ('files', '0005_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageArchive',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('message_type', models.CharField(default='text', max_length=20, verbose_name='Тип сообщения')),
+                ('channel', models.CharField(default='telegram', max_length=16)),
+                ('direction', models.CharField(default='incoming', max_length=20, verbose_name='Направление')),
+                ('content', models.TextField(verbose_name='Содержание')),
+                ('telegram_message_id', models.BigIntegerField(blank=True, db_index=True, null=True)),
+                ('max_message_id', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('whatsapp_message_id', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('bubble_id', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('file_url', models.URLField(blank=True)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('telegram_date', models.DateTimeField(blank=True, null=True)),
+                ('is_read', models.BooleanField(default=False)),
+                ('is_sent', models.BooleanField(default=False)),
+                ('is_delivered', models.BooleanField(default=False)),
+                ('is_failed', models.BooleanField(default=False)),
+                ('error_text', models.CharField(blank=True, default='', max_length=500)),
+                ('reactions', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='crm.client', verbose_name='Клиент')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_sent_messages', to='core.employee', verbose_name='Сотрудник')),
+                ('file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_messages', to='files.storedfile')),
+                ('reply_to', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='crm.messagearchive')),
+            ],
+            options={
+                'verbose_name': 'Сообщение (архив)',
+                'verbose_name_plural': 'Сообщения (архив)',
+                'ordering': ['telegram_date', 'id'],
+                'indexes': [models.Index(fields=['client', 'telegram_date'], name='crm_message_client__6a79cd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0096_message_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientChatSummary',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chat_summary', serialize=False, to='crm.client', verbose_name='Клиент')),
+                ('last_message_id', models.UUIDField(blank=True, null=True)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('last_message_preview', models.CharField(blank=True, default='', max_length=255)),
+                ('last_direction', models.CharField(blank=True, default='', max_length=20)),
+                ('last_channel', models.CharField(blank=True, default='', max_length=16)),
+                ('has_telegram', models.BooleanField(default=False)),
+                ('has_max', models.BooleanField(default=False)),
+                ('has_whatsapp', models.BooleanField(default=False)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Сводка переписки',
+                'verbose_name_plural': 'Сводки переписки',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0097_client_chat_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DadataCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=32, verbose_name='Эндпоинт')),
+                ('key', models.CharField(max_length=64, verbose_name='Ключ')),
+                ('query', models.TextField(verbose_name='Запрос')),
+                ('response', models.JSONField(blank=True, null=True, verbose_name='Ответ')),
+                ('is_empty', models.BooleanField(default=False, verbose_name='Пустой ответ')),
+                ('fetched_at', models.DateTimeField(db_index=True, verbose_name='Получено')),
+            ],
+            options={
+                'verbose_name': 'Кэш DaData',
+                'verbose_name_plural': 'Кэш DaData',
+                'constraints': [models.UniqueConstraint(fields=('endpoint', 'key'), name='crm_dadatacache_endpoint_key')],
+            },
+        ),
+    ]
@@ -7,6 +7,8 @@ import uuid
 from apps.files.models import StoredFile
 from apps.core.models import Employee
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 
 from apps.crm.managers import ClientQuerySet, ServiceQuerySet
 
@@ -217,6 +219,13 @@ class Client(TimeStampedModel):
         indexes = [
             models.Index(fields=['telegram_id']),
             models.Index(fields=['status']),
+            # Триграммные GIN по UPPER(...) — под `icontains` глобального
+            # поиска (Django рендерит его как UPPER(col::text) LIKE UPPER(%s)).
+            GinIndex(OpClass(Upper("first_name"), name="gin_trgm_ops"), name="crm_client_fname_trgm"),
+            GinIndex(OpClass(Upper("last_name"), name="gin_trgm_ops"), name="crm_client_lname_trgm"),
+            GinIndex(OpClass(Upper("patronymic"), name="gin_trgm_ops"), name="crm_client_patr_trgm"),
+            GinIndex(OpClass(Upper("username"), name="gin_trgm_ops"), name="crm_client_uname_trgm"),
+            GinIndex(OpClass(Upper("phone"), name="gin_trgm_ops"), name="crm_client_phone_trgm"),
         ]
 
 
@@ -272,6 +281,7 @@ class ClientPhone(models.Model):
         indexes = [
             models.Index(fields=["phone"]),
             models.Index(fields=["client", "purpose"]),
+            GinIndex(OpClass(Upper("phone"), name="gin_trgm_ops"), name="crm_clientphone_phone_trgm"),
         ]
 
     def __str__(self):
@@ -541,6 +551,11 @@ class LegalEntity(TimeStampedModel):
         verbose_name = "Юридическое лицо"
         verbose_name_plural = "Юридические лица"
         ordering = ["name"]
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="crm_legal_name_trgm"),
+            GinIndex(OpClass(Upper("inn"), name="gin_trgm_ops"), name="crm_legal_inn_trgm"),
+            GinIndex(OpClass(Upper("ogrn"), name="gin_trgm_ops"), name="crm_legal_ogrn_trgm"),
+        ]
 
 
 
@@ -913,8 +928,110 @@ class Message(TimeStampedModel):
             models.Index(fields=['client', 'created_at']),
             models.Index(fields=['employee', 'created_at']),
             models.Index(fields=['is_read']),
+            # Поиск по тексту переписки (global_search) — триграммы.
+            GinIndex(OpClass(Upper("content"), name="gin_trgm_ops"), name="crm_message_content_trgm"),
         ]
 
+
+class MessageArchive(models.Model):
+    """Холодный архив сообщений (см. apps/crm/message_archive.py).
+
+    Старые Message переносятся сюда пачками задачей archive_old_messages
+    с тем же id и без raw_payload, затем удаляются из горячей crm_message.
+    Поля и их имена совпадают с Message — шаблон чата рендерит обе модели
+    одинаково (архивные — без кнопок ответа/реакции, см. `is_archived`).
+    """
+    is_archived = True
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    client = models.ForeignKey(
+        Client, on_delete=models.CASCADE, related_name='archived_messages',
+        verbose_name='Клиент',
+    )
+    employee = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='archived_sent_messages', verbose_name='Сотрудник',
+    )
+    message_type = models.CharField(max_length=20, default='text', verbose_name='Тип сообщения')
+    channel = models.CharField(max_length=16, default='telegram')
+    direction = models.CharField(max_length=20, default='incoming', verbose_name='Направление')
+    content = models.TextField(verbose_name='Содержание')
+
+    telegram_message_id = models.BigIntegerField(null=True, blank=True, db_index=True)
+    max_message_id = models.CharField(max_length=128, blank=True, null=True, db_index=True)
+    whatsapp_message_id = models.CharField(max_length=128, blank=True, null=True, db_index=True)
+    bubble_id = models.CharField(max_length=64, blank=True, null=True, unique=True)
+
+    # Ответ на сообщение — id без FK-констрейнта: цель может быть и в архиве,
+    # и (редко) ещё в горячей таблице. select_related даёт None во втором случае.
+    reply_to = models.ForeignKey(
+        'self', on_delete=models.DO_NOTHING, null=True, blank=True,
+        db_constraint=False, related_name='+',
+    )
+    file_url = models.URLField(blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    file = models.ForeignKey(
+        StoredFile, null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='archived_messages',
+    )
+
+    telegram_date = models.DateTimeField(null=True, blank=True)
+    is_read = models.BooleanField(default=False)
+    is_sent = models.BooleanField(default=False)
+    is_delivered = models.BooleanField(default=False)
+    is_failed = models.BooleanField(default=False)
+    error_text = models.CharField(max_length=500, blank=True, default='')
+    reactions = models.JSONField(default=dict, blank=True)
+
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived message {self.id} ({self.client_id})"
+
+    class Meta:
+        verbose_name = 'Сообщение (архив)'
+        verbose_name_plural = 'Сообщения (архив)'
+        ordering = ['telegram_date', 'id']
+        indexes = [
+            models.Index(fields=['client', 'telegram_date']),
+        ]
+
+
+class ClientChatSummary(models.Model):
+    """Сводка переписки клиента — одна строка на клиента (apps/crm/chat_summary.py).
+
+    Канбан и список чатов читают превью последнего сообщения и значки
+    каналов отсюда (JOIN по PK) вместо подзапросов в crm_message.
+    Обновляется при каждом входящем/исходящем сообщении; пересобирается
+    командой rebuild_chat_summaries.
+    """
+    client = models.OneToOneField(
+        Client, on_delete=models.CASCADE, primary_key=True,
+        related_name='chat_summary', verbose_name='Клиент',
+    )
+    last_message_id = models.UUIDField(null=True, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=255, blank=True, default='')
+    last_direction = models.CharField(max_length=20, blank=True, default='')
+    last_channel = models.CharField(max_length=16, blank=True, default='')
+
+    has_telegram = models.BooleanField(default=False)
+    has_max = models.BooleanField(default=False)
+    has_whatsapp = models.BooleanField(default=False)
+
+    # Входящие после нашего последнего исходящего — «ждут ответа».
+    unread_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Chat summary {self.client_id}"
+
+    class Meta:
+        verbose_name = 'Сводка переписки'
+        verbose_name_plural = 'Сводки переписки'
+
 """
 class EmployeeLog(models.Model):
    # Audit log for Employee actions
@@ -1843,3 +1960,28 @@ class Correspondence(TimeStampedModel):
     def __str__(self):
         return f'{self.get_direction_display()}: {self.subject_type or self.outgoing_number or "—"} ({self.sent_at})'
 
+
+
+class DadataCache(models.Model):
+    """Кэш ответов DaData (apps/crm/dadata.py).
+
+    Ключ — эндпоинт + sha256 нормализованного запроса и параметров. Ответ
+    хранится как есть; пустой ответ («ничего не найдено») тоже кэшируется,
+    но живёт меньше (DADATA_CACHE_EMPTY_TTL_DAYS).
+    """
+    endpoint = models.CharField('Эндпоинт', max_length=32)
+    key = models.CharField('Ключ', max_length=64)
+    query = models.TextField('Запрос')
+    response = models.JSONField('Ответ', null=True, blank=True)
+    is_empty = models.BooleanField('Пустой ответ', default=False)
+    fetched_at = models.DateTimeField('Получено', db_index=True)
+
+    class Meta:
+        verbose_name = 'Кэш DaData'
+        verbose_name_plural = 'Кэш DaData'
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'key'], name='crm_dadatacache_endpoint_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.endpoint}: {self.query[:60]}'
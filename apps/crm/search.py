@@ -0,0 +1,148 @@
+"""Глобальный поиск CRM (шапка → `views.global_search`).
+
+Все выборки — `icontains`, который Django на PostgreSQL рендерит как
+``UPPER(col::text) LIKE UPPER('%q%')``. Под это выражение в миграциях
+crm.0095 / files.0005 заведены триграммные GIN-индексы
+``gin_trgm_ops`` по ``UPPER(col)`` — PostgreSQL сам поддерживает их при
+каждом INSERT/UPDATE, отдельного «переиндексирования» не нужно. Запрос
+короче 3 символов триграммы не ускоряют, поэтому minimum длины — в view.
+
+Доступ к клиенту (``Client.objects.visible_to``) не материализуется в
+Python-set, а вычисляется в SQL как ``EXISTS(...)`` на каждую строку
+результата (annotate ``has_access``).
+"""
+from __future__ import annotations
+
+import re
+
+from django.db.models import (
+    Case, Exists, IntegerField, OuterRef, Q, QuerySet, Value, When,
+)
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from apps.crm.models import Client, ClientPhone, LegalEntity, Message
+
+RESULT_LIMIT = 12
+SNIPPET_WIDTH = 60
+
+
+def _words(q: str) -> list[str]:
+    return [w for w in q.split() if w]
+
+
+def with_access(qs: QuerySet, user, client_ref: str = "client_id") -> QuerySet:
+    """annotate(has_access=EXISTS(клиент строки виден пользователю)).
+
+    `client_ref` — путь к id клиента у строки qs (для Client это "pk").
+    Фильтр visible_to уходит подзапросом — без выгрузки всех видимых id.
+    """
+    visible = Client.objects.visible_to(user).filter(pk=OuterRef(client_ref))
+    return qs.annotate(has_access=Exists(visible.values("pk")))
+
+
+def search_clients(q: str, user, limit: int = RESULT_LIMIT) -> list[Client]:
+    """Клиенты: каждое слово должно найтись хоть в одном поле ФИО/телефона.
+
+    Ранжирование: совпадение начала фамилии → начала имени → остальное.
+    Телефоны из ClientPhone — через EXISTS (без JOIN + DISTINCT).
+    """
+    words = _words(q)
+    qs = Client.objects.all()
+    for word in words:
+        qs = qs.filter(
+            Q(first_name__icontains=word) | Q(last_name__icontains=word)
+            | Q(patronymic__icontains=word) | Q(username__icontains=word)
+            | Q(phone__icontains=word)
+            | Exists(ClientPhone.objects.filter(
+                client_id=OuterRef("pk"), phone__icontains=word,
+            ))
+        )
+    head = words[0] if words else q
+    qs = qs.annotate(rank=Case(
+        When(last_name__istartswith=head, then=Value(2)),
+        When(first_name__istartswith=head, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+    qs = with_access(qs, user, "pk").prefetch_related(
+        "services__name", "services__common_status", "services__region",
+    ).order_by("-rank", "last_name", "first_name")
+    return list(qs[:limit])
+
+
+def search_legal_entities(q: str, limit: int = RESULT_LIMIT) -> list[LegalEntity]:
+    qs = LegalEntity.objects.filter(
+        Q(name__icontains=q) | Q(inn__icontains=q) | Q(ogrn__icontains=q)
+    ).annotate(rank=Case(
+        When(inn=q, then=Value(3)),
+        When(ogrn=q, then=Value(3)),
+        When(name__istartswith=q, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )).only("id", "name", "inn").order_by("-rank", "name")
+    return list(qs[:limit])
+
+
+def search_messages(q: str, user, limit: int = RESULT_LIMIT) -> list[Message]:
+    """Сообщения — свежие сверху. raw_payload/реакции не грузим."""
+    qs = Message.objects.filter(content__icontains=q).select_related(
+        "client",
+    ).only(
+        "id", "content", "created_at", "client_id",
+        "client__first_name", "client__last_name",
+    )
+    qs = with_access(qs, user).order_by("-created_at")
+    return list(qs[:limit])
+
+
+def search_files(q: str, user, limit: int = RESULT_LIMIT) -> list:
+    from apps.files.models import ClientFile
+
+    qs = ClientFile.objects.all()
+    for word in _words(q):
+        qs = qs.filter(name__icontains=word)
+    qs = with_access(
+        qs.select_related("folder__client", "stored_file"), user,
+        "folder__client_id",
+    ).order_by("-created_at")
+    return list(qs[:limit])
+
+
+def highlight(text: str, q: str) -> str:
+    """HTML с <mark> вокруг вхождений слов запроса (регистр не важен)."""
+    text = text or ""
+    words = sorted(set(_words(q)), key=len, reverse=True)
+    if not words:
+        return escape(text)
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    out, pos = [], 0
+    for m in pattern.finditer(text):
+        out.append(escape(text[pos:m.start()]))
+        out.append(f"<mark>{escape(m.group(0))}</mark>")
+        pos = m.end()
+    out.append(escape(text[pos:]))
+    return mark_safe("".join(out))
+
+
+def snippet(text: str, q: str, width: int = SNIPPET_WIDTH) -> str:
+    """Фрагмент `text` ~width символов вокруг первого вхождения запроса.
+
+    `truncatechars` отрезал начало длинного сообщения — совпадение из
+    середины текста в выдаче было не видно.
+    """
+    text = " ".join((text or "").split())
+    if len(text) <= width:
+        return text
+    words = _words(q)
+    idx = min(
+        (i for i in (text.lower().find(w.lower()) for w in words) if i >= 0),
+        default=0,
+    )
+    start = max(0, idx - width // 3)
+    end = min(len(text), start + width)
+    start = max(0, end - width)
+    return (
+        ("…" if start > 0 else "") + text[start:end].strip()
+        + ("…" if end < len(text) else "")
+    )
@@ -0,0 +1,38 @@
+"""Сигналы crm: сброс кэша счётчиков канбана при смене статуса клиента и
+общего кэша справочников (apps/core/refcache.py) при их правке."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core import refcache
+from apps.crm.kanban_board import invalidate_counts
+
+
+@receiver(post_save, sender="crm.Client")
+def client_status_saved(sender, instance, created, update_fields=None, **kwargs):
+    # save() без update_fields (формы, импорт) тоже может менять статус.
+    if created or update_fields is None or "status" in update_fields:
+        invalidate_counts()
+
+
+@receiver(post_delete, sender="crm.Client")
+def client_deleted(sender, instance, **kwargs):
+    invalidate_counts()
+
+
+# Модель-справочник → пространства имён refcache, которые она наполняет.
+REFERENCE_NAMESPACES = {
+    "crm.EventType": ("event_types",),
+    "crm.ActionType": ("action_types",),
+    "crm.ServiceName": ("service_names", "service_statuses"),
+    "crm.ServiceCommonStatus": ("service_statuses",),
+    "crm.Region": ("regions",),
+}
+
+
+def _reference_changed(sender, **kwargs):
+    refcache.invalidate(*REFERENCE_NAMESPACES[sender._meta.label])
+
+
+for _label in REFERENCE_NAMESPACES:
+    post_save.connect(_reference_changed, sender=_label, dispatch_uid=f"refcache_save_{_label}")
+    post_delete.connect(_reference_changed, sender=_label, dispatch_uid=f"refcache_delete_{_label}")
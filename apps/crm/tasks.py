@@ -2,6 +2,7 @@
 
 from datetime import timedelta
 import logging
+import math
 import asyncio
 
 from celery import shared_task
@@ -115,83 +116,46 @@ def sync_employee_status():
 @shared_task
 def send_telegram_message_task(message_id):
     """
-    Отправка сообщения через Telegram userbot с поддержкой медиа
+    Отправка сообщения через Telegram userbot с поддержкой медиа.
+
+    Штатно задача только ставит сообщение в очередь постоянного отправителя
+    внутри userbot (apps/telegram/sender_service.py) — там один подключённый
+    клиент, кэш получателей и общий лимит FloodWait. Если userbot не
+    запущен (нет heartbeat), отправляем сами через разовое подключение.
     """
     from apps.crm.models import Message
-    from django.utils import timezone
+    from apps.telegram import sender_service
+    from apps.telegram.telegram_sender import (
+        apply_send_result, flood_wait_remaining, message_send_params,
+    )
     import asyncio
     
     logger.info(f"📤 Starting task: send_telegram_message_task for message_id={message_id}")
 
+    if sender_service.is_running():
+        sender_service.enqueue("message", message_id=str(message_id))
+        logger.info(f"📮 Message {message_id} queued for userbot sender")
+        return
+
+    # FloodWait аккаунта общий с userbot — не подключаемся, откладываем.
+    remaining = flood_wait_remaining()
+    if remaining:
+        logger.info(f"⏳ Message {message_id}: FloodWait, отложено на {remaining:.0f}s")
+        send_telegram_message_task.apply_async((message_id,), countdown=math.ceil(remaining))
+        return
+
     # Создаём новый event loop для этой задачи
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     
     try:
         message = Message.objects.select_related('client', 'file', 'reply_to').get(id=message_id)
-        
-        # Подготовка параметров для отправки
-        send_params = {
-            'telegram_id': message.client.telegram_id,
-            'text': message.content,
-            'message_type': message.message_type,
-            'username': message.client.username or None,
-        }
-        
-        # Если есть файл, добавляем его
-        if message.file:
-            from apps.files.s3_utils import download_file_from_s3
-            
-            # Скачиваем файл из S3
-            file_bytes = download_file_from_s3(message.file.bucket, message.file.key)
-            
-            send_params['file_bytes'] = file_bytes
-            send_params['file_name'] = message.file.filename
-            
-            logger.info(f"📦 Downloaded file {message.file.filename} from S3 for message {message_id}")
-        
-        if message.reply_to_id and message.reply_to and message.reply_to.telegram_message_id:
-            send_params['reply_to_msg_id'] = int(message.reply_to.telegram_message_id)
-        
-        # Отправляем через userbot в новом event loop
-        result = loop.run_until_complete(send_telegram_message(**send_params))
-        
-        if result['success']:
-            message.is_sent = True
-            message.telegram_message_id = result['message_id']
-            message.sent_at = timezone.now()
-            message.telegram_date = timezone.now()
-            message.save(update_fields=['is_sent', 'telegram_message_id', 'sent_at', 'telegram_date'])
-            logger.info(f"✅ Task: Message {message_id} sent successfully")
-
-            try:
-                from apps.realtime.utils import push_message_status, push_toast
-                push_message_status(message)
-                if message.employee and message.employee.user:
-                    push_toast(message.employee.user, "Сообщение отправлено", level="success")
-            except Exception as e:
-                logger.warning(f"Failed to push WS update: {e}")
-
-            try:
-                from apps.crm.event_logger import log_messenger_message
-                log_messenger_message(message.client, message, message.employee)
-            except Exception as e:
-                logger.warning(f"Failed to log messenger event: {e}")
-        else:
-            logger.error(f"❌ Task: Failed to send message {message_id}: {result['error']}")
-            # Без is_failed Message висит ⏳ «отправляется» вечно в UI.
-            # У TG-таски нет Celery-ретраев — провал = сразу финальный fail.
-            message.is_failed = True
-            message.error_text = (str(result.get('error') or 'unknown'))[:500]
-            message.save(update_fields=['is_failed', 'error_text'])
-            try:
-                from apps.realtime.utils import push_toast, push_message_status
-                push_message_status(message)
-                if message.employee and message.employee.user:
-                    push_toast(message.employee.user, f"Ошибка отправки: {result['error']}", level="error")
-            except Exception as e:
-                logger.warning(f"Failed to push toast: {e}")
+        send_params = message_send_params(message)
 
+        # Отправляем через отдельное подключение в новом event loop
+        result = loop.run_until_complete(send_telegram_message(**send_params))
+        # У TG-таски нет Celery-ретраев — провал = сразу финальный fail.
+        apply_send_result(message, result)
 
     except Message.DoesNotExist:
         logger.error(f"❌ Task: Message {message_id} not found")
@@ -313,14 +277,19 @@ def generate_employee_stats(employee_id, start_date=None, end_date=None):
         return {"error": str(e)}
 
 
-@shared_task
-def archive_old_messages(days=90):
+@shared_task(time_limit=60 * 60)
+def archive_old_messages(days=90, batch_size=2000, max_batches=200, dry_run=False):
+    """Переносит сообщения старше `days` в MessageArchive (см. message_archive).
+
+    За прогон — не больше max_batches пачек; остаток доедет следующим запуском.
+    """
+    from apps.crm.message_archive import archive_messages
     try:
-        cutoff_date = timezone.now() - timedelta(days=days)
-        old_messages = Message.objects.filter(created_at__lt=cutoff_date)
-        archived_count = old_messages.count()
-        logger.info(f"Archived {archived_count} messages older than {days} days")
-        return f"Archived {archived_count} messages"
+        stats = archive_messages(
+            days, batch_size=batch_size, max_batches=max_batches, dry_run=dry_run,
+        )
+        logger.info(f"archive_old_messages: {stats}")
+        return stats
     except Exception as e:
         logger.error(f"Error archiving messages: {e}")
         return {"error": str(e)}
@@ -341,8 +310,7 @@ def import_telegram_history_task(telegram_id, limit=300):
 
     async def do_import():
         from apps.crm.models import Client, Message
-        from apps.files.s3_utils import upload_file_to_s3
-        from apps.files.models import StoredFile
+        from apps.files.dedup import store_bytes
 
         db_client = await sync_to_async(
             Client.objects.filter(telegram_id=telegram_id).first
@@ -364,6 +332,10 @@ def import_telegram_history_task(telegram_id, limit=300):
                 exists = await sync_to_async(
                     Message.objects.filter(telegram_message_id=msg.id).exists
                 )()
+                if not exists:
+                    # Старые сообщения могли уже уехать в MessageArchive.
+                    from apps.crm.message_archive import is_archived
+                    exists = await sync_to_async(is_archived)(telegram_message_id=msg.id)
                 if exists:
                     continue
 
@@ -407,16 +379,11 @@ def import_telegram_history_task(telegram_id, limit=300):
 
                         file_bytes = await tg.download_media(msg, bytes)
                         if file_bytes:
-                            bucket, key = await sync_to_async(upload_file_to_s3)(
+                            file_data = await sync_to_async(store_bytes)(
                                 file_bytes,
                                 prefix="telegram/media",
-                                filename=original_filename
-                            )
-                            file_data = await sync_to_async(StoredFile.objects.create)(
-                                bucket=bucket, key=key,
                                 filename=original_filename,
                                 content_type=doc.mime_type or "application/octet-stream",
-                                size=len(file_bytes)
                             )
                             file_name = original_filename
 
@@ -425,16 +392,11 @@ def import_telegram_history_task(telegram_id, limit=300):
                         original_filename = "photo.jpg"
                         file_bytes = await tg.download_media(msg, bytes)
                         if file_bytes:
-                            bucket, key = await sync_to_async(upload_file_to_s3)(
+                            file_data = await sync_to_async(store_bytes)(
                                 file_bytes,
                                 prefix="telegram/media",
-                                filename=original_filename
-                            )
-                            file_data = await sync_to_async(StoredFile.objects.create)(
-                                bucket=bucket, key=key,
                                 filename=original_filename,
                                 content_type="image/jpeg",
-                                size=len(file_bytes)
                             )
                             file_name = original_filename
 
@@ -466,6 +428,9 @@ def import_telegram_history_task(telegram_id, limit=300):
                 logger.info(f"  [{direction}] {message_type} — {msg.id}")
 
             logger.info(f"✅ Imported {imported_count} messages for {telegram_id}")
+            if imported_count:
+                from apps.crm.chat_summary import rebuild
+                await sync_to_async(rebuild)([db_client.pk])
 
     asyncio.run(do_import())
 
@@ -489,15 +454,28 @@ def send_reaction_task(message_uuid: str, emoji: str):
 
 
 def _send_telegram_reaction(msg, emoji):
-    """Отправляет реакцию через отдельный TelegramClient и сохраняет в БД."""
+    """Отправляет реакцию (через очередь userbot'а или отдельный клиент) и сохраняет в БД."""
     if not msg.telegram_message_id or not msg.client.telegram_id:
         logger.warning(f"_send_telegram_reaction: no IDs for msg {msg.id}")
         return
 
+    from apps.telegram import sender_service
+    if sender_service.is_running():
+        sender_service.enqueue("reaction", message_id=str(msg.id), emoji=emoji)
+        return
+
+    from apps.telegram.telegram_sender import flood_wait_remaining, note_flood_wait
+    remaining = flood_wait_remaining()
+    if remaining:
+        logger.info(f"⏳ TG reaction for {msg.id}: FloodWait, отложено на {remaining:.0f}s")
+        send_reaction_task.apply_async((str(msg.id), emoji), countdown=math.ceil(remaining))
+        return
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
         from apps.telegram.telegram_sender import get_telegram_client
+        from telethon.errors import FloodWaitError
         from telethon.tl.functions.messages import SendReactionRequest
         from telethon.tl.types import ReactionEmoji, PeerUser
 
@@ -509,6 +487,10 @@ def _send_telegram_reaction(msg, emoji):
                     msg_id=int(msg.telegram_message_id),
                     reaction=[ReactionEmoji(emoticon=emoji)],
                 ))
+            except FloodWaitError as e:
+                # Паузу соблюдают все отправки (userbot и этот путь).
+                note_flood_wait(e.seconds)
+                raise
             finally:
                 await client.disconnect()
 
@@ -20,3 +20,17 @@ def short_name(emp):
     if patr:
         result += f"{patr[0]}."
     return result
+
+
+@register.filter
+def search_highlight(text, q):
+    """Подсветка <mark> слов запроса глобального поиска (HTML-safe)."""
+    from apps.crm.search import highlight
+    return highlight(str(text or ""), q or "")
+
+
+@register.filter
+def search_snippet(text, q):
+    """Фрагмент текста вокруг первого совпадения с запросом."""
+    from apps.crm.search import snippet
+    return snippet(str(text or ""), q or "")
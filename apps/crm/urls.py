@@ -6,6 +6,7 @@ urlpatterns = [
     path("", views.dashboard, name="dashboard"),  # корень
     path('dashboard/', views.dashboard, name='dashboard'),
     path('kanban/', views.kanban, name='kanban'),
+    path("kanban/counts/", views.kanban_counts, name="kanban_counts"),
     path("kanban/<str:status>/", views.kanban_column, name="kanban_column"),
     path('clients/', views.clients_list, name='clients_list'),
     path('employees/', views.employees_list, name='employees_list'),
@@ -16,7 +16,7 @@ from django.db.models import Q, Prefetch, F
 from django.utils import timezone
 
 from .models import (
-    Client, Message, Address, LegalEntity, ClientEmployee,
+    Client, Message, MessageArchive, Address, LegalEntity, ClientEmployee,
     Service, ServiceName, PaymentProcedure, ServiceCommonStatus,
     ServiceEmployeeStatus, ServiceTag, ServiceEmployeeState,
     ServiceTagAssignment, ServiceLog, ClientLogEntry,
@@ -482,11 +482,20 @@ def telegram_chat_for_client(request, client_id):
         .select_related("employee", "employee__user", "file", "reply_to", "reply_to__client", "reply_to__file")
         .order_by("telegram_date", "id")
     )
+    # Старые сообщения живут в MessageArchive — подклеиваем их перед горячими,
+    # прокрутка вверх листает в архив прозрачно (см. message_archive.ChatHistory).
+    from apps.crm.message_archive import ChatHistory
+    archived_qs = (
+        MessageArchive.objects.filter(client=client)
+        .select_related("employee", "employee__user", "file", "reply_to", "reply_to__client", "reply_to__file")
+        .order_by("telegram_date", "id")
+    )
 
     if search_q:
         qs = qs.filter(content__icontains=search_q)
+        archived_qs = archived_qs.filter(content__icontains=search_q)
 
-    paginator = Paginator(qs, MESSAGES_PER_PAGE)
+    paginator = Paginator(ChatHistory(archived_qs, qs), MESSAGES_PER_PAGE)
     page_param = request.GET.get("page")
     page_number = int(page_param) if page_param else (paginator.num_pages or 1)
     page_obj = paginator.get_page(page_number)
@@ -588,7 +597,8 @@ def telegram_clients_list(request):
     if scope == "all" and not can_view_all_clients(request.user):
         scope = "mine"
 
-    qs = _telegram_clients_base_qs(emp, scope)
+    from apps.crm.chat_summary import with_summary
+    qs = with_summary(_telegram_clients_base_qs(emp, scope))
 
     ALLOWED_SORTS = {
         "-last_message_at", "last_message_at",
@@ -635,7 +645,7 @@ def telegram_clients_list(request):
         if pin_client_id not in page_ids:
             try:
                 pinned_client = (
-                    Client.objects.visible_to(request.user)
+                    with_summary(Client.objects.visible_to(request.user))
                     .filter(pk=pin_client_id)
                     .first()
                 )
@@ -658,19 +668,9 @@ def telegram_clients_list(request):
         for c in clients_for_status:
             c.ms_status = ""
 
-    # Каналы, по которым у клиента есть сообщения — для значков Т/М/W в списке
-    # (серый = сообщений из канала не было). Один запрос на всю страницу.
-    channel_map = {}
-    for cid_, ch in (
-        Message.objects.filter(client__in=clients_for_status)
-        .values_list("client_id", "channel").distinct()
-    ):
-        channel_map.setdefault(cid_, set()).add(ch)
-    for c in clients_for_status:
-        chans = channel_map.get(c.pk, set())
-        c.has_telegram = "telegram" in chans
-        c.has_max = "max" in chans
-        c.has_whatsapp = "whatsapp" in chans
+    # Каналы, по которым у клиента есть сообщения (значки Т/М/W), и счётчик
+    # «ждут ответа» — из ClientChatSummary (with_summary выше), без запросов
+    # в crm_message.
 
     # Регион(ы) услуг клиента — для отображения в списке. Один запрос на страницу
     # (без N+1). У клиента может быть несколько услуг в разных регионах — собираем
@@ -764,164 +764,107 @@ def dashboard(request):
     )
 
 
-def _annotate_ms_status(clients, user):
-    """Проставляет ms_status на объекты клиентов для текущего пользователя."""
-    try:
-        emp = Employee.objects.get(user=user)
-        statuses = dict(
-            ClientEmployee.objects.filter(
-                employee=emp, client__in=clients,
-            ).values_list("client_id", "messenger_status")
-        )
-        for c in clients:
-            c.ms_status = statuses.get(c.pk, "")
-    except Employee.DoesNotExist:
+_UNSET = object()
+
+
+def _annotate_ms_status(clients, user, emp=_UNSET):
+    """Проставляет ms_status на объекты клиентов для текущего пользователя.
+
+    emp — уже найденный Employee пользователя (или None), чтобы не искать
+    его повторно.
+    """
+    if emp is _UNSET:
+        emp = Employee.objects.filter(user=user).first()
+    if emp is None:
         for c in clients:
             c.ms_status = ""
+        return clients
+    statuses = dict(
+        ClientEmployee.objects.filter(
+            employee=emp, client__in=clients,
+        ).values_list("client_id", "messenger_status")
+    )
+    for c in clients:
+        c.ms_status = statuses.get(c.pk, "")
     return clients
 
 
 @login_required
 def kanban(request):
-    # фильтры из querystring
-    employee_id         = request.GET.get("employee") or ""
-    service_employee_id = request.GET.get("service_employee") or ""
-    ms_status    = request.GET.get("ms_status") or ""
-    created_from = request.GET.get("created_from") or ""
-    created_to   = request.GET.get("created_to") or ""
-
-    base_qs = Client.objects.all()
-    if employee_id == "__none__":
-        base_qs = base_qs.filter(employees__isnull=True)
-    elif employee_id:
-        base_qs = base_qs.filter(employees__id=employee_id)
-    if service_employee_id:
-        base_qs = base_qs.filter(services__employees__id=service_employee_id).distinct()
-    if created_from:
-        base_qs = base_qs.filter(created_at__gte=created_from)
-    if created_to:
-        base_qs = base_qs.filter(created_at__lte=created_to)
-
-    if ms_status:
-        try:
-            emp = Employee.objects.get(user=request.user)
-            ce_ids = ClientEmployee.objects.filter(
-                employee=emp, messenger_status=ms_status,
-            ).values_list("client_id", flat=True)
-            base_qs = base_qs.filter(id__in=list(ce_ids))
-        except Employee.DoesNotExist:
-            base_qs = base_qs.none()
-
-    _pfetch = ["employees", "services__name", "services__common_status"]
-    unknowns = list(base_qs.filter(status="unknown").prefetch_related(*_pfetch))
-    leads = list(base_qs.filter(status="lead").prefetch_related(*_pfetch))
-    actives = list(base_qs.filter(status="active").prefetch_related(*_pfetch))
-    closeds = list(base_qs.filter(status="closed").prefetch_related(*_pfetch))
-    archives = list(base_qs.filter(status="archive").prefetch_related(*_pfetch))
-
-    for group in (unknowns, leads, actives, closeds, archives):
-        _annotate_ms_status(group, request.user)
+    """Каркас канбана: только счётчики колонок (apps/crm/kanban_board.py).
+
+    Карточки колонки грузят сами через kanban_column (hx-trigger="load").
+    """
+    from apps.crm.kanban_board import column_counts, read_filters
+
+    filters = read_filters(request.GET)
+    emp = Employee.objects.filter(user=request.user).first()
+    counts = column_counts(request.user, filters, emp)
 
     employees_all = Employee.objects.filter(is_active=True).select_related("user").order_by("user__last_name", "user__first_name")
     context = {
-        "unknowns": unknowns, "leads": leads, "actives": actives,
-        "closeds": closeds, "archives": archives,
-        "filter_employee":         employee_id,
-        "filter_service_employee": service_employee_id,
-        "filter_ms_status":        ms_status,
-        "filter_created_from":     created_from,
-        "filter_created_to":       created_to,
+        "counts": counts,
+        "filter_employee":         filters["employee"],
+        "filter_service_employee": filters["service_employee"],
+        "filter_ms_status":        filters["ms_status"],
+        "filter_created_from":     filters["created_from"],
+        "filter_created_to":       filters["created_to"],
         "employees_all":           employees_all,
     }
-    template = "crm/kanban.html"
-    if request.headers.get("HX-Request"):
-        template = "crm/kanban.html"
-    return render(request, template, context)
+    return render(request, "crm/kanban.html", context)
+
+
+@login_required
+def kanban_counts(request):
+    """JSON {status: count} для колонок канбана с текущими фильтрами (кэш)."""
+    from apps.crm.kanban_board import column_counts, read_filters
+
+    emp = Employee.objects.filter(user=request.user).first()
+    return JsonResponse(column_counts(request.user, read_filters(request.GET), emp))
 
 
 @login_required
 def kanban_column(request, status):
-    employee_id         = request.GET.get("employee") or ""
-    service_employee_id = request.GET.get("service_employee") or ""
-    ms_status    = request.GET.get("ms_status") or ""
-    created_from = request.GET.get("created_from") or ""
-    created_to   = request.GET.get("created_to") or ""
-    q            = (request.GET.get("q") or "").strip()
-    cid          = (request.GET.get("cid") or "").strip()
-
-    qs = Client.objects.visible_to(request.user).filter(status=status)
-    if cid:
-        # «Только этот клиент» из главного поиска — точная фильтрация по id
-        # (иначе у клиента без фамилии фильтр по ФИО показывал всех тёзок).
-        qs = qs.filter(pk=cid)
-    elif q:
-        # Разбиваем «Каныгин Денис» на слова — каждое слово должно
-        # совпасть с одним из полей (AND по словам, OR по полям).
-        for word in q.split():
-            qs = qs.filter(
-                Q(first_name__icontains=word)
-                | Q(last_name__icontains=word)
-                | Q(patronymic__icontains=word)
-                | Q(phone__icontains=word)
-                | Q(phones__phone__icontains=word)
-            )
-        qs = qs.distinct()
-    if employee_id == "__none__":
-        qs = qs.filter(employees__isnull=True)
-    elif employee_id:
-        qs = qs.filter(employees__id=employee_id)
-    if service_employee_id:
-        qs = qs.filter(services__employees__id=service_employee_id).distinct()
-    if created_from:
-        qs = qs.filter(created_at__gte=created_from)
-    if created_to:
-        qs = qs.filter(created_at__lte=created_to)
-    if ms_status:
-        try:
-            emp = Employee.objects.get(user=request.user)
-            ce_ids = ClientEmployee.objects.filter(
-                employee=emp, messenger_status=ms_status,
-            ).values_list("client_id", flat=True)
-            qs = qs.filter(id__in=list(ce_ids))
-        except Employee.DoesNotExist:
-            qs = qs.none()
+    from apps.crm.kanban_board import column_counts, filtered_clients, read_filters
+
+    filters = read_filters(request.GET)
+    emp = Employee.objects.filter(user=request.user).first()
+    qs = filtered_clients(request.user, filters, emp).filter(status=status)
 
     # Сортировка: клиенты с перепиской — сверху по дате сообщения; без неё
     # (импортированные, ещё без сообщений) — ниже, в стабильном порядке
     # по дате создания. nulls_last обязателен — иначе пустые last_message_at
     # уезжают в начало колонки.
-    # Последнее сообщение — через Subquery, чтобы не получить N+1 на колонке.
-    from django.db.models import OuterRef, Subquery
-    from apps.crm.models import Message
-    last_msg = Message.objects.filter(client=OuterRef("pk")).order_by("-created_at")
+    # Превью последнего сообщения — из ClientChatSummary (JOIN по PK).
+    from apps.crm.chat_summary import with_summary
     from django.db.models import Prefetch as _Prefetch
-    qs = qs.prefetch_related(
+    qs = with_summary(qs.prefetch_related(
         # для client.primary_employee (детерминированный ответственный) без N+1
         _Prefetch("client_employees", queryset=ClientEmployee.objects.select_related("employee__user")),
         "services__name", "services__common_status",
-    ).annotate(
-        last_message_content=Subquery(last_msg.values("content")[:1]),
-    ).order_by(
-        F("last_message_at").desc(nulls_last=True), "-created_at",
+    )).order_by(
+        F("last_message_at").desc(nulls_last=True), "-created_at", "id",
     )
 
     # Постраничная подгрузка — иначе на больших колонках (после импорта из
-    # Bubble) рендер всех карточек разом вешает страницу. ВАЖНО: total
-    # считаем через qs.count() и режем срезом, чтобы не тащить весь
-    # queryset в память (это и был причиной тормозов).
+    # Bubble) рендер всех карточек разом вешает страницу.
     # PAGE_SIZE небольшой: 5 колонок × карточка (~185 строк шаблона) грузились
     # на старте дашборда жадно (~1.7 МБ). Теперь начальная отрисовка лёгкая,
     # остальное догружается на скролл (intersect «load more» в kanban_column.html).
+    # has_more — по лишней (PAGE_SIZE+1) строке, без COUNT по колонке;
+    # число в шапке — из кэшированных счётчиков доски.
     PAGE_SIZE = 12
-    total = qs.count()
     try:
         offset = max(int(request.GET.get("offset") or 0), 0)
     except (TypeError, ValueError):
         offset = 0
-    shown = list(qs[offset:offset + PAGE_SIZE])
-    _annotate_ms_status(shown, request.user)
+    shown = list(qs[offset:offset + PAGE_SIZE + 1])
+    has_more = len(shown) > PAGE_SIZE
+    shown = shown[:PAGE_SIZE]
+    _annotate_ms_status(shown, request.user, emp)
     next_offset = offset + PAGE_SIZE
-    has_more = next_offset < total
+    total = column_counts(request.user, filters, emp).get(status, 0)
+    total = max(total, offset + len(shown) + (1 if has_more else 0))
 
     # column_id — DOM-идентификатор колонки (для intersect-root, OOB-счётчика,
     # «Показать ещё»). Обычно совпадает со status, но для динамической
@@ -1734,52 +1677,25 @@ def global_search(request):
         return render(request, "crm/partials/global_search_results.html",
                       {"q": q, "clients": [], "legal_entities": [], "messages": [], "empty": True})
 
-    # Мультислово: «Каныгин Денис» → каждое слово должно match'иться
-    # хоть в одном из полей.
-    clients_qs = Client.objects.all()
-    for word in q.split():
-        clients_qs = clients_qs.filter(
-            Q(first_name__icontains=word) | Q(last_name__icontains=word) |
-            Q(patronymic__icontains=word) | Q(username__icontains=word) |
-            Q(phone__icontains=word) | Q(phones__phone__icontains=word)
-        )
-    clients = clients_qs.distinct().prefetch_related(
-        "services__name", "services__common_status", "services__region",
-    ).order_by("last_name", "first_name")[:12]
-
-    legal_entities = LegalEntity.objects.filter(
-        Q(name__icontains=q) | Q(inn__icontains=q) | Q(ogrn__icontains=q)
-    ).order_by("name")[:12]
-
-    messages = Message.objects.filter(
-        content__icontains=q
-    ).select_related("client").order_by("-created_at")[:12]
-
-    # Файлы клиентов — по ClientFile.name (мультислово AND).
-    from apps.files.models import ClientFile
-    files_qs = ClientFile.objects.all()
-    for word in q.split():
-        files_qs = files_qs.filter(name__icontains=word)
-    files = files_qs.select_related(
-        "folder__client", "stored_file"
-    ).order_by("-created_at")[:12]
-
-    # Доступ к клиентам (object-level visibility). Затем затеняем строки
-    # тех клиентов, которые есть в результатах поиска, но недоступны.
-    visible_ids = set(
-        Client.objects.visible_to(request.user)
-        .values_list("id", flat=True)
-    )
+    # Выборки и ранжирование — apps/crm/search.py (триграммные индексы);
+    # доступ к клиенту приходит из SQL (has_access), без выгрузки visible_to().
+    from apps.crm import search
+
+    clients = search.search_clients(q, request.user)
+    legal_entities = search.search_legal_entities(q)
+    messages = search.search_messages(q, request.user)
+    files = search.search_files(q, request.user)
+
     for c in clients:
-        c.no_access = c.id not in visible_ids
+        c.no_access = not c.has_access
         # Услуги БФЛ — для кнопки «Дело БФЛ» (Юрист БФЛ). services уже prefetch'нуты.
         c.bfl_services = ([] if c.no_access else
                           [s for s in c.services.all()
                            if getattr(s.name, "short_name", "") == "БФЛ"])
     for m in messages:
-        m.no_access = m.client_id not in visible_ids
+        m.no_access = not m.has_access
     for f in files:
-        f.no_access = f.folder.client_id not in visible_ids
+        f.no_access = not f.has_access
 
     empty = not (clients or legal_entities or messages or files)
     return render(request, "crm/partials/global_search_results.html", {
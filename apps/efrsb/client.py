@@ -5,8 +5,11 @@
   • Authorization: Bearer <jwt> на каждом вызове; HTTPS only; лимит 8 req/s/IP.
   • даты-фильтры: gte:/lte:/gt:/lt:/eq: + ISO; диапазон ≤31 дня без number/guid/bankruptGUID.
 
+Лимит 8 req/s общий на все воркеры — token bucket в Redis (_acquire), так что
+синки разных дел идут параллельно, пока укладываются в квоту.
 401 → авто-релогин + 1 повтор. 429 → EfrsbRateLimited (таска делает backoff).
-5xx → ретрай ×3 с экспон. задержкой. Прочее → EfrsbError.
+5xx/сеть → ретрай ×3 с экспон. задержкой и jitter (провайдер "efrsb" в
+apps/core/http_client.py, там же keep-alive и circuit breaker). Прочее → EfrsbError.
 """
 from __future__ import annotations
 
@@ -16,14 +19,17 @@ from datetime import date, datetime
 from typing import Iterator, Optional
 
 import requests
+from django.conf import settings
 from django.core.cache import cache
 
+from apps.core import http_client
+
 from . import config
 
 log = logging.getLogger(__name__)
 
 _JWT_CACHE_KEY = "efrsb:jwt"
-_THROTTLE_KEY = "efrsb:last_call_ts"
+_BUCKET_KEY = "efrsb:rate_bucket"
 
 
 class EfrsbError(RuntimeError):
@@ -42,6 +48,13 @@ class EfrsbRateLimited(EfrsbError):
     pass
 
 
+# 429 не повторяем здесь: его обрабатывает таска (EfrsbRateLimited → retry).
+http_client.register(http_client.Provider(
+    "efrsb", timeout=config.HTTP_TIMEOUT, retries=3, backoff=1,
+    retry_statuses=frozenset({500, 502, 503, 504}),
+))
+
+
 # ── auth / token ────────────────────────────────────────────────────────────
 
 def get_jwt(*, force: bool = False) -> str:
@@ -54,8 +67,8 @@ def get_jwt(*, force: bool = False) -> str:
     login, password = config.credentials()
     url = f"{config.base_url()}/v1/auth"
     try:
-        r = requests.post(url, json={"login": login, "password": password},
-                          timeout=config.HTTP_TIMEOUT)
+        r = http_client.request("efrsb", "POST", url, idempotent=True,
+                                json={"login": login, "password": password})
     except requests.RequestException as e:
         raise EfrsbError(f"auth: сеть недоступна: {e}") from e
     if r.status_code != 200:
@@ -67,38 +80,69 @@ def get_jwt(*, force: bool = False) -> str:
     return token
 
 
-def _throttle():
-    """Грубый распределённый throttle: держим ≥MIN_INTERVAL между вызовами."""
-    last = cache.get(_THROTTLE_KEY)
-    now = time.monotonic()
-    if last is not None:
-        wait = config.MIN_INTERVAL_SEC - (now - last)
-        if wait > 0:
-            time.sleep(wait)
-    cache.set(_THROTTLE_KEY, time.monotonic(), timeout=5)
+# Token bucket: `tokens` пополняются со скоростью rate до burst. Каждый вызов
+# забирает токен, даже если их нет (уходит в минус), и получает в ответ,
+# сколько ждать своей очереди. Так воркеры встают в общую очередь без
+# повторных опросов Redis. Время — серверное (TIME), часы воркеров не важны.
+_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], 60)
+if tokens >= 0 then
+  return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+_bucket_script = None
+_local_limiter = http_client.RateLimiter(config.RATE_PER_SEC)
+
+
+def _acquire() -> None:
+    """Дождаться слота в общей квоте ЕФРСБ (RATE_PER_SEC + RATE_BURST на все воркеры).
+
+    Redis недоступен → ограничиваем только свой процесс (как раньше при
+    одном воркере), чтобы синк не падал из-за лимитера.
+    """
+    global _bucket_script
+    try:
+        if _bucket_script is None:
+            import redis  # noqa: WPS433
+            _bucket_script = redis.Redis.from_url(settings.REDIS_URL).register_script(_BUCKET_LUA)
+        wait = float(_bucket_script(
+            keys=[_BUCKET_KEY], args=[config.RATE_PER_SEC, config.RATE_BURST],
+        ))
+    except Exception:  # noqa: BLE001
+        log.warning("efrsb: общий лимитер недоступен, лимит только на процесс", exc_info=True)
+        _local_limiter.wait()
+        return
+    if wait > 0:
+        time.sleep(wait)
 
 
 def _request(method: str, path: str, *, params=None, stream=False,
-             _retry_auth: bool = True, _retries_5xx: int = 3) -> requests.Response:
+             _retry_auth: bool = True) -> requests.Response:
     url = f"{config.base_url()}{path}"
-    _throttle()
+    _acquire()
     headers = {"Authorization": f"Bearer {get_jwt()}", "Accept": "application/json"}
     try:
-        r = requests.request(method, url, headers=headers, params=params,
-                             stream=stream, timeout=config.HTTP_TIMEOUT)
+        r = http_client.request("efrsb", method, url, headers=headers,
+                                params=params, stream=stream)
     except requests.RequestException as e:
         raise EfrsbError(f"{method} {path}: сеть недоступна: {e}") from e
 
     if r.status_code == 401 and _retry_auth:
         get_jwt(force=True)
-        return _request(method, path, params=params, stream=stream,
-                        _retry_auth=False, _retries_5xx=_retries_5xx)
+        return _request(method, path, params=params, stream=stream, _retry_auth=False)
     if r.status_code == 429:
         raise EfrsbRateLimited(f"{method} {path}: 429 Too Many Requests")
-    if r.status_code >= 500 and _retries_5xx > 0:
-        time.sleep(2 ** (3 - _retries_5xx))  # 1s, 2s, 4s
-        return _request(method, path, params=params, stream=stream,
-                        _retry_auth=_retry_auth, _retries_5xx=_retries_5xx - 1)
     if r.status_code >= 400:
         raise EfrsbError(f"{method} {path}: HTTP {r.status_code}: {r.text[:300]}")
     return r
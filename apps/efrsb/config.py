@@ -3,10 +3,12 @@ from __future__ import annotations
 
 from django.conf import settings
 
-# Лимит ЕФРСБ: не более 8 запросов/сек с одного IP. Держим минимальный интервал
-# между вызовами с запасом (1 воркер) — см. client._throttle.
+# Лимит ЕФРСБ: не более 8 запросов/сек с одного IP. Общий token bucket в Redis
+# (client._acquire): RATE_PER_SEC в среднем + всплеск RATE_BURST — в любую
+# секунду не больше RATE_PER_SEC + RATE_BURST = RATE_LIMIT_PER_SEC вызовов.
 RATE_LIMIT_PER_SEC = 8
-MIN_INTERVAL_SEC = 0.15
+RATE_PER_SEC = 6
+RATE_BURST = 2
 HTTP_TIMEOUT = 30
 JWT_TTL_SEC = int(7.5 * 3600)  # токен живёт 8ч — кэшируем 7.5ч с запасом
 
@@ -38,6 +40,10 @@ def sync_interval_hours() -> int:
     return int(getattr(settings, "EFRSB_SYNC_INTERVAL_HOURS", 4))
 
 
+def full_resync_days() -> int:
+    return int(getattr(settings, "EFRSB_FULL_RESYNC_DAYS", 1))
+
+
 def search_retry_hours() -> int:
     return int(getattr(settings, "EFRSB_SEARCH_RETRY_HOURS", 24))
 
@@ -6,7 +6,7 @@ DocumentTemplate kind=efrsb или секционный IskTemplate) → пло
 в файл-менеджер клиента (папка «Публикации ЕФРСБ»), событийка.
 
 Текст нужен для РУЧНОЙ публикации АУ в ЛК fedresurs (авто-публикация — Phase B).
-Переиспользует AFD: render_docx / render_isk_docx / docx_to_pdf и helpers
+Переиспользует AFD: compiled_for / render_isk_docx / docx_to_pdf и helpers
 apps.procedure.request_documents (_fmt, _debtor_address, _spouse_data).
 """
 from __future__ import annotations
@@ -15,12 +15,12 @@ import logging
 
 from django.utils import timezone
 
-from apps.afd.docx_engine import render_docx
+from apps.afd.docx_engine import compiled_for
 from apps.afd.pdf_utils import docx_to_pdf
 from apps.crm import client_log
 from apps.files.folder_utils import _mk, get_or_create_root
 from apps.files.models import ClientFile, StoredFile
-from apps.files.s3_utils import download_file_from_s3, upload_file_to_s3
+from apps.files.s3_utils import upload_file_to_s3
 from apps.procedure.request_documents import _debtor_address, _fmt, _spouse_data
 
 log = logging.getLogger(__name__)
@@ -123,9 +123,7 @@ def check_publication_data(publication, *, overrides=None):
         publication.message_type_id and publication.message_type.template_id) else None
     if tpl and tpl.stored_file_id:
         try:
-            from apps.afd.docx_engine import list_placeholders
-            tb = download_file_from_s3(tpl.stored_file.bucket, tpl.stored_file.key)
-            used = set(list_placeholders(tb))
+            used = set(compiled_for(tpl.stored_file).placeholders)
         except Exception:
             log.exception("check_publication_data: не прочитать плейсхолдеры шаблона")
 
@@ -198,9 +196,7 @@ def generate_publication(publication, *, overrides=None, employee=None):
         from apps.afd.isk_engine import render_isk_docx
         docx_bytes = render_isk_docx(mt.isk_template, ctx, {})
     elif mt.template_id and mt.template and mt.template.stored_file_id:
-        template_bytes = download_file_from_s3(
-            mt.template.stored_file.bucket, mt.template.stored_file.key)
-        docx_bytes = render_docx(template_bytes, ctx)
+        docx_bytes = compiled_for(mt.template.stored_file).render(ctx)
     else:
         raise EfrsbGenError(
             "У типа сообщения не задан шаблон текста. Привяжите .docx (kind=ЕФРСБ) "
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('efrsb', '0003_efrsbmessagetype_sets_efrsb_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='efrsbbankruptlink',
+            name='last_full_sync_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя полная выборка окна'),
+        ),
+        migrations.AddField(
+            model_name='efrsbbankruptlink',
+            name='messages_cursor_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Курсор сообщений: дата публикации'),
+        ),
+        migrations.AddField(
+            model_name='efrsbbankruptlink',
+            name='messages_cursor_guid',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Курсор сообщений: guid'),
+        ),
+        migrations.AddField(
+            model_name='efrsbbankruptlink',
+            name='reports_cursor_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Курсор отчётов: дата публикации'),
+        ),
+        migrations.AddField(
+            model_name='efrsbbankruptlink',
+            name='reports_cursor_guid',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Курсор отчётов: guid'),
+        ),
+    ]
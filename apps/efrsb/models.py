@@ -133,6 +133,7 @@ class EfrsbBankruptLink(TimeStampedModel):
     bankruptGuid резолвится из ИНН/СНИЛС через /v1/bankrupts. Несколько кандидатов →
     сохраняем `candidates` и ждём ручного подтверждения сотрудником (как
     ArbitrCase.search_hits). Поля next_* — smart-throttle (паттерн ArbitrCase.next_*_at).
+    *_cursor_* — «водяной знак» инкрементального синка (services.sync_case).
     """
     MATCH_INN = "inn"
     MATCH_SNILS = "snils"
@@ -166,6 +167,13 @@ class EfrsbBankruptLink(TimeStampedModel):
     next_search_at = models.DateTimeField("Следующий поиск не ранее", null=True, blank=True)
     last_sync_at = models.DateTimeField("Последняя выборка сообщений", null=True, blank=True)
     next_sync_at = models.DateTimeField("Следующая выборка не ранее", null=True, blank=True)
+    # Курсоры инкрементального синка: datePublish + guid последней обработанной
+    # публикации по разделу API. Выборка идёт от курсора, а не от окна 31 день.
+    messages_cursor_at = models.DateTimeField("Курсор сообщений: дата публикации", null=True, blank=True)
+    messages_cursor_guid = models.CharField("Курсор сообщений: guid", max_length=64, blank=True)
+    reports_cursor_at = models.DateTimeField("Курсор отчётов: дата публикации", null=True, blank=True)
+    reports_cursor_guid = models.CharField("Курсор отчётов: guid", max_length=64, blank=True)
+    last_full_sync_at = models.DateTimeField("Последняя полная выборка окна", null=True, blank=True)
     last_error = models.TextField("Последняя ошибка", blank=True)
 
     class Meta:
@@ -1,8 +1,9 @@
 """Доменные функции интеграции ЕФРСБ (над ORM + client).
 
 resolve_bankrupt_guid — резолв должника (ИНН/СНИЛС → bankruptGuid).
-sync_case — выборка сообщений/отчётов по должнику → upsert публикаций.
-upsert_publication / match_to_internal / apply_publication_date / flag_violation —
+sync_case — инкрементальная выборка сообщений/отчётов по должнику (от курсора
+  последней публикации, потоком по страницам) → пакетный upsert публикаций.
+upsert_publication / upsert_publications / match_to_internal / apply_publication_date / flag_violation —
 обработка одной публикации (дедуп по guid, привязка к нашей заготовке,
 автозаполнение Procedure.publication_efrsb_date, флаг нарушения срока).
 """
@@ -10,7 +11,9 @@ from __future__ import annotations
 
 import logging
 from datetime import timedelta
+from itertools import islice
 
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 from apps.crm import client_log
@@ -123,25 +126,17 @@ def confirm_bankrupt(case, bankrupt_guid: str) -> EfrsbBankruptLink:
 
 # ── обработка публикаций ─────────────────────────────────────────────────────
 
-def upsert_publication(case, item: dict, *, kind: str, type_index=None) -> tuple[EfrsbPublication, bool]:
-    """Идемпотентный апсёрт обнаруженной публикации по fedresurs_guid."""
-    type_index = type_index if type_index is not None else _type_index()
-    guid = (item.get("guid") or "").strip()
-    if not guid:
-        raise ValueError("upsert_publication: пустой guid")
-    api_type = (item.get("type") or "").strip()
-    mt = type_index.get(api_type.lower())
+# Поля факта публикации, которые пересобираются из item при каждом синке.
+_PUBLICATION_FIELDS = [
+    "case", "kind", "message_type", "api_type", "fedresurs_number", "bankrupt_guid",
+    "date_publish", "procedure_type", "has_violation", "annulment_guid", "is_annulled",
+    "lock_reason", "is_locked", "content_xml", "raw", "title", "status",
+]
 
-    pub, created = EfrsbPublication.objects.get_or_create(
-        fedresurs_guid=guid,
-        defaults={
-            "case": case, "kind": kind,
-            "origin": EfrsbPublication.ORIGIN_DISCOVERED,
-            "status": EfrsbPublication.STATUS_PUBLISHED,
-            "message_type": mt,
-        },
-    )
-    # Обновляем поля факта публикации (на случай повторного синка с изменениями).
+
+def _fill_publication(pub: EfrsbPublication, case, item: dict, *, kind: str, mt) -> None:
+    """Перенести в pub поля факта публикации из item read-API (без сохранения)."""
+    api_type = (item.get("type") or "").strip()
     pub.case = case
     pub.kind = kind
     if mt and pub.message_type_id is None:
@@ -168,12 +163,83 @@ def upsert_publication(case, item: dict, *, kind: str, type_index=None) -> tuple
         pub.status = EfrsbPublication.STATUS_ANNULLED
     elif pub.is_locked:
         pub.status = EfrsbPublication.STATUS_LOCKED
+
+
+def upsert_publication(case, item: dict, *, kind: str, type_index=None) -> tuple[EfrsbPublication, bool]:
+    """Идемпотентный апсёрт обнаруженной публикации по fedresurs_guid."""
+    type_index = type_index if type_index is not None else _type_index()
+    guid = (item.get("guid") or "").strip()
+    if not guid:
+        raise ValueError("upsert_publication: пустой guid")
+    mt = type_index.get((item.get("type") or "").strip().lower())
+
+    pub, created = EfrsbPublication.objects.get_or_create(
+        fedresurs_guid=guid,
+        defaults={
+            "case": case, "kind": kind,
+            "origin": EfrsbPublication.ORIGIN_DISCOVERED,
+            "status": EfrsbPublication.STATUS_PUBLISHED,
+            "message_type": mt,
+        },
+    )
+    # Обновляем поля факта публикации (на случай повторного синка с изменениями).
+    _fill_publication(pub, case, item, kind=kind, mt=mt)
     if created:
         pub.discovered_at = timezone.now()
     pub.save()
     return pub, created
 
 
+def upsert_publications(case, items, *, kind: str, type_index=None) -> list[tuple[EfrsbPublication, bool]]:
+    """Пакетный upsert_publication: один SELECT по guid'ам, bulk_create новых,
+    bulk_update известных. Порядок результата — порядок items (без дублей guid)."""
+    type_index = type_index if type_index is not None else _type_index()
+    by_guid: dict[str, dict] = {}
+    for item in items:
+        guid = (item.get("guid") or "").strip()
+        if not guid:
+            log.warning("upsert_publications: пропуск item без guid: %s", item.get("number"))
+            continue
+        by_guid[guid] = item
+    if not by_guid:
+        return []
+
+    existing = {
+        p.fedresurs_guid: p
+        for p in EfrsbPublication.objects.filter(fedresurs_guid__in=list(by_guid))
+        .select_related("message_type")
+    }
+    now = timezone.now()
+    out, new, known = [], [], []
+    for guid, item in by_guid.items():
+        mt = type_index.get((item.get("type") or "").strip().lower())
+        pub = existing.get(guid)
+        created = pub is None
+        if created:
+            pub = EfrsbPublication(
+                fedresurs_guid=guid, origin=EfrsbPublication.ORIGIN_DISCOVERED,
+                status=EfrsbPublication.STATUS_PUBLISHED, discovered_at=now,
+            )
+            new.append(pub)
+        else:
+            pub.updated_at = now  # bulk_update не трогает auto_now
+            known.append(pub)
+        _fill_publication(pub, case, item, kind=kind, mt=mt)
+        out.append((pub, created))
+
+    try:
+        with transaction.atomic():
+            EfrsbPublication.objects.bulk_create(new)
+            EfrsbPublication.objects.bulk_update(known, _PUBLICATION_FIELDS + ["updated_at"])
+    except IntegrityError:
+        # Тот же guid успели вставить параллельно (другое дело с тем же должником) —
+        # доводим пачку поштучно, get_or_create разрулит.
+        log.warning("upsert_publications: конфликт guid, поштучный апсёрт %d шт.", len(by_guid))
+        return [upsert_publication(case, item, kind=kind, type_index=type_index)
+                for item in by_guid.values()]
+    return out
+
+
 def match_to_internal(pub: EfrsbPublication) -> bool:
     """Привязать обнаруженную публикацию к нашей заготовке того же типа/процедуры
     без guid (превращаем 2 строки в 1). True — если привязали."""
@@ -261,27 +327,64 @@ def flag_violation(pub: EfrsbPublication) -> bool:
         return False
 
 
-def sync_case(case, *, days: int = 31, download_files: bool = False) -> dict:
+SYNC_BATCH = 500  # = limit страницы read-API
+
+
+def _cursor(link: EfrsbBankruptLink, kind: str) -> tuple:
+    return getattr(link, f"{kind}s_cursor_at"), getattr(link, f"{kind}s_cursor_guid")
+
+
+def _advance_cursor(link: EfrsbBankruptLink, kind: str, pubs) -> None:
+    """Сдвинуть курсор раздела на самую позднюю публикацию пачки (только вперёд)."""
+    cursor_at, _ = _cursor(link, kind)
+    latest = None
+    for pub, _created in pubs:
+        if pub.date_publish and (latest is None or pub.date_publish >= latest.date_publish):
+            latest = pub
+    if latest is None or (cursor_at and latest.date_publish < cursor_at):
+        return
+    setattr(link, f"{kind}s_cursor_at", latest.date_publish)
+    setattr(link, f"{kind}s_cursor_guid", latest.fedresurs_guid)
+    link.save(update_fields=[f"{kind}s_cursor_at", f"{kind}s_cursor_guid", "updated_at"])
+
+
+def _upsert_each(case, items, *, kind: str, type_index) -> list[tuple[EfrsbPublication, bool]]:
+    """Поштучный апсёрт: битый item не должен терять всю пачку."""
+    out = []
+    for item in items:
+        try:
+            out.append(upsert_publication(case, item, kind=kind, type_index=type_index))
+        except Exception:
+            log.exception("sync_case: upsert упал для item=%s", item.get("guid"))
+    return out
+
+
+def sync_case(case, *, days: int = 31, download_files: bool = False, full=None) -> dict:
     """Выборка сообщений+отчётов по должнику дела → upsert/match/apply/flag.
 
+    Инкрементально: каждый раздел запрашивается с datePublish курсора
+    (EfrsbBankruptLink.*_cursor_*), страницы обрабатываются по мере получения,
+    курсор двигается после каждой пачки — оборванный синк продолжится с места
+    обрыва. Без курсора и раз в EFRSB_FULL_RESYNC_DAYS (full=None) — полный
+    проход по окну `days`: старые публикации могли быть аннулированы или
+    заблокированы. full=True/False — принудительно.
+
     Возвращает статистику. Требует резолвленного bankrupt_guid.
     """
     link = get_or_create_link(case)
     if not link.bankrupt_guid:
         return {"skipped": "no_bankrupt_guid"}
 
+    now = timezone.now()
+    if full is None:
+        full = (link.last_full_sync_at is None
+                or link.last_full_sync_at <= now - timedelta(days=config.full_resync_days()))
+    window_begin = now - timedelta(days=days)
     type_index = _type_index()
-    date_begin = timezone.now() - timedelta(days=days)
-    date_end = timezone.now()
     stats = {"new": 0, "updated": 0, "matched": 0, "date_applied": 0, "violations": 0}
 
-    def _process(items, kind):
-        for item in items:
-            try:
-                pub, created = upsert_publication(case, item, kind=kind, type_index=type_index)
-            except Exception:
-                log.exception("sync_case: upsert упал для item=%s", item.get("guid"))
-                continue
+    def _process(pubs):
+        for pub, created in pubs:
             stats["new" if created else "updated"] += 1
             if created and match_to_internal(pub):
                 stats["matched"] += 1
@@ -299,15 +402,30 @@ def sync_case(case, *, days: int = 31, download_files: bool = False) -> dict:
                 except Exception:
                     log.exception("sync_case: скачивание файлов упало для %s", pub.fedresurs_guid)
 
+    sections = (
+        (EfrsbPublication.KIND_MESSAGE, client.get_messages),
+        (EfrsbPublication.KIND_REPORT, client.get_reports),
+    )
     try:
-        msgs = list(client.iter_all(
-            client.get_messages, bankrupt_guid=link.bankrupt_guid,
-            date_begin=date_begin, date_end=date_end))
-        _process(msgs, EfrsbPublication.KIND_MESSAGE)
-        reports = list(client.iter_all(
-            client.get_reports, bankrupt_guid=link.bankrupt_guid,
-            date_begin=date_begin, date_end=date_end))
-        _process(reports, EfrsbPublication.KIND_REPORT)
+        for kind, fetch_fn in sections:
+            cursor_at, cursor_guid = _cursor(link, kind)
+            date_begin = window_begin
+            if cursor_at is not None:
+                date_begin = min(cursor_at, window_begin) if full else cursor_at
+            # Фильтр ЕФРСБ — московское время без tz; gte по секундам, так что
+            # публикация-курсор приходит повторно — её и пропускаем.
+            items = (item for item in client.iter_all(
+                fetch_fn, limit=SYNC_BATCH, bankrupt_guid=link.bankrupt_guid,
+                date_begin=timezone.localtime(date_begin))
+                if full or item.get("guid") != cursor_guid)
+            while batch := list(islice(items, SYNC_BATCH)):
+                try:
+                    pubs = upsert_publications(case, batch, kind=kind, type_index=type_index)
+                except Exception:
+                    log.exception("sync_case: upsert пачки упал (%s, %d шт.)", kind, len(batch))
+                    pubs = _upsert_each(case, batch, kind=kind, type_index=type_index)
+                _process(pubs)
+                _advance_cursor(link, kind, pubs)
     except client.EfrsbRateLimited:
         raise
     except client.EfrsbError as e:
@@ -317,6 +435,8 @@ def sync_case(case, *, days: int = 31, download_files: bool = False) -> dict:
 
     link.last_sync_at = timezone.now()
     link.next_sync_at = timezone.now() + timedelta(hours=config.sync_interval_hours())
+    if full:
+        link.last_full_sync_at = now
     link.last_error = ""
     link.save()
     return stats
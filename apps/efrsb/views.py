@@ -244,7 +244,7 @@ def confirm_bankrupt(request, service_id):
 @require_procedures
 @require_POST
 def refresh_now(request, service_id):
-    """Обновить публикации из ЕФРСБ (синхронно — окно 31 день, объём мал)."""
+    """Обновить публикации из ЕФРСБ (синхронно — только новые от курсора, объём мал)."""
     try:
         service, case = _case(request, service_id)
     except _NotBFL as exc:
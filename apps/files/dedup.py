@@ -0,0 +1,149 @@
+"""Контентная дедупликация StoredFile (SHA-256).
+
+Один и тот же PDF приходит многократно: kad перескачивает документы дела,
+импорт из Bubble тянет одни файлы для разных записей, документ
+пересылают в чате. Раньше каждый раз это был новый объект S3 со
+случайным UUID-ключом.
+
+Теперь файлы сохраняются через `store_bytes` / `store_stream` /
+`store_uploaded_file`: SHA-256 считается при загрузке, и если такое
+содержимое уже лежит в S3 (`find_duplicate`), новая запись StoredFile
+ссылается на тот же bucket/key. Записи остаются отдельными — у них свои
+имя файла, bubble_id, владельцы по FK.
+
+Счётчик ссылок — число StoredFile с тем же bucket/key
+(`reference_count`); `s3_utils.delete_file_from_s3` удаляет объект,
+только когда ссылается последняя запись. Переиспользование и удаление
+сериализуются блокировкой (FOR UPDATE) записей объекта: переиспользующий
+держит лок на найденном дубликате, пока создаёт свою запись, и под ним же
+проверяет, что объект ещё в S3 (удаляющий мог успеть раньше). Отключается
+FILES_DEDUP=False (хэш всё равно пишется).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.files.models import StoredFile
+from apps.files.s3_utils import (
+    delete_file_from_s3, file_exists_in_s3, upload_file_to_s3, upload_stream_to_s3_hashed,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_duplicate(sha256: str, size: int | None = None, *,
+                   lock: bool = False) -> StoredFile | None:
+    """Самый старый StoredFile с тем же содержимым (его объект S3 и переиспользуем).
+
+    lock=True — FOR UPDATE на найденную запись (внутри transaction.atomic).
+    """
+    if not sha256:
+        return None
+    qs = StoredFile.objects.filter(sha256=sha256)
+    if size is not None:
+        qs = qs.filter(size=size)
+    if lock:
+        qs = qs.select_for_update()
+    return qs.order_by("created_at").first()
+
+
+def reference_count(bucket: str, key: str) -> int:
+    """Сколько StoredFile ссылаются на объект S3."""
+    return StoredFile.objects.filter(bucket=bucket, key=key).count()
+
+
+def _create(bucket, key, *, filename, content_type, size, sha256, **fields) -> StoredFile:
+    return StoredFile.objects.create(
+        bucket=bucket, key=key, filename=filename,
+        content_type=content_type or "", size=size, sha256=sha256, **fields,
+    )
+
+
+def _create_from_duplicate(sha256: str, size: int, *, filename, content_type,
+                           **fields) -> StoredFile | None:
+    """Запись на объект S3 дубликата — или None, если переиспользовать нечего.
+
+    Лок на дубликате держится до коммита новой записи: delete_file_from_s3
+    берёт тот же лок и считает ссылки уже с ней.
+    """
+    with transaction.atomic():
+        existing = find_duplicate(sha256, size, lock=True)
+        if existing is None:
+            return None
+        if not file_exists_in_s3(existing.bucket, existing.key):
+            # Последнюю ссылку удалили до нас — объекта уже нет.
+            return None
+        logger.info("dedup: %s → %s (%d bytes)", filename, existing.key, size)
+        return _create(
+            existing.bucket, existing.key, filename=filename,
+            content_type=content_type, size=size, sha256=sha256, **fields,
+        )
+
+
+def store_bytes(
+    data: bytes, *, prefix: str, filename: str, content_type: str = "", **fields,
+) -> StoredFile:
+    """Сохранить bytes как StoredFile; дубликат не загружается в S3 повторно.
+
+    fields — прочие поля StoredFile (bubble_id, ...).
+    """
+    sha256 = sha256_bytes(data)
+    if settings.FILES_DEDUP:
+        stored = _create_from_duplicate(
+            sha256, len(data), filename=filename, content_type=content_type, **fields,
+        )
+        if stored is not None:
+            return stored
+    bucket, key = upload_file_to_s3(
+        data, prefix=prefix, filename=filename, content_type=content_type or None,
+    )
+    return _create(
+        bucket, key, filename=filename, content_type=content_type,
+        size=len(data), sha256=sha256, **fields,
+    )
+
+
+def store_stream(
+    source, *, prefix: str, filename: str, content_type: str = "", **fields,
+) -> StoredFile:
+    """Сохранить поток (файл, итератор кусков) как StoredFile.
+
+    Хэш потока известен только после чтения, поэтому файл сначала
+    загружается; если такое содержимое уже было — свежий объект удаляется,
+    а запись ссылается на старый. Экономится место, не трафик.
+    """
+    bucket, key, size, sha256 = upload_stream_to_s3_hashed(
+        source, prefix=prefix, filename=filename, content_type=content_type or None,
+    )
+    if settings.FILES_DEDUP:
+        stored = _create_from_duplicate(
+            sha256, size, filename=filename, content_type=content_type, **fields,
+        )
+        if stored is not None:
+            delete_file_from_s3(bucket, key)  # свежий объект — ссылок на него нет
+            return stored
+    return _create(
+        bucket, key, filename=filename, content_type=content_type,
+        size=size, sha256=sha256, **fields,
+    )
+
+
+def store_uploaded_file(
+    uploaded, *, prefix: str, filename: str = None, content_type: str = None, **fields,
+) -> StoredFile:
+    """Django UploadedFile → StoredFile по кускам `chunks()`."""
+    return store_stream(
+        uploaded.chunks(settings.AWS_S3_MULTIPART_PART_SIZE_MB * 1024 * 1024),
+        prefix=prefix,
+        filename=filename or uploaded.name or "file.bin",
+        content_type=content_type or uploaded.content_type or "",
+        **fields,
+    )
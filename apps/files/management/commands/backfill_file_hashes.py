@@ -0,0 +1,137 @@
+"""
+Считает SHA-256 для StoredFile, загруженных до дедупликации, и
+показывает, сколько места занимают дубликаты.
+
+Объекты S3 читаются потоково в `--workers` потоков; хэш пишется
+bulk_update пачками. Несколько записей на один объект хэшируются один раз.
+С --merge записи-дубликаты переводятся на самый старый объект, а
+освободившиеся объекты удаляются из S3.
+
+    python manage.py backfill_file_hashes --workers 16
+    python manage.py backfill_file_hashes --report-only
+    python manage.py backfill_file_hashes --merge
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+BATCH_SIZE = 200
+
+
+def _hash_object(bucket: str, key: str):
+    """(sha256, size) объекта S3 или (None, None), если объекта нет."""
+    from botocore.exceptions import ClientError
+
+    from apps.files.s3_utils import iter_s3_file
+
+    h = hashlib.sha256()
+    size = 0
+    try:
+        for chunk in iter_s3_file(bucket, key):
+            h.update(chunk)
+            size += len(chunk)
+    except ClientError:
+        return None, None
+    return h.hexdigest(), size
+
+
+def _fmt(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} МБ"
+
+
+class Command(BaseCommand):
+    help = "Backfill StoredFile.sha256 and report/merge duplicate S3 objects"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="Параллельных скачиваний")
+        parser.add_argument("--limit", type=int, default=0, help="Не больше N объектов за запуск")
+        parser.add_argument("--report-only", action="store_true", help="Только отчёт, без хэширования")
+        parser.add_argument("--merge", action="store_true", help="Перевести дубликаты на один объект и удалить лишние")
+
+    def handle(self, *args, **options):
+        if not options["report_only"]:
+            self._backfill(options["workers"], options["limit"])
+        self._report()
+        if options["merge"]:
+            self._merge()
+
+    def _backfill(self, workers: int, limit: int):
+        from apps.files.models import StoredFile
+
+        objects = (
+            StoredFile.objects.filter(sha256="")
+            .values_list("bucket", "key").distinct().order_by("bucket", "key")
+        )
+        if limit:
+            objects = objects[:limit]
+        objects = list(objects)
+        self.stdout.write(f"Объектов без хэша: {len(objects)}")
+
+        done = missing = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for start in range(0, len(objects), BATCH_SIZE):
+                batch = objects[start:start + BATCH_SIZE]
+                results = pool.map(lambda obj: (obj, _hash_object(*obj)), batch)
+                hashed = {obj: res for obj, res in results if res[0]}
+                missing += len(batch) - len(hashed)
+
+                rows = []
+                for sf in StoredFile.objects.filter(
+                    sha256="", key__in=[key for _, key in hashed],
+                ):
+                    res = hashed.get((sf.bucket, sf.key))
+                    if not res:
+                        continue
+                    sf.sha256, size = res
+                    sf.size = sf.size or size
+                    rows.append(sf)
+                StoredFile.objects.bulk_update(rows, ["sha256", "size"], batch_size=BATCH_SIZE)
+                done += len(hashed)
+                self.stdout.write(f"  {done}/{len(objects)} (нет в S3: {missing})")
+
+    def _duplicate_groups(self):
+        from apps.files.models import StoredFile
+
+        return (
+            StoredFile.objects.exclude(sha256="")
+            .values("sha256")
+            .annotate(objects=Count("key", distinct=True), size=Min("size"))
+            .filter(objects__gt=1)
+        )
+
+    def _report(self):
+        groups = list(self._duplicate_groups())
+        extra = sum(g["objects"] - 1 for g in groups)
+        reclaimable = sum((g["objects"] - 1) * (g["size"] or 0) for g in groups)
+        self.stdout.write(self.style.SUCCESS(
+            f"Групп дубликатов: {len(groups)}, лишних объектов S3: {extra}, "
+            f"можно освободить: {_fmt(reclaimable)}"
+        ))
+
+    def _merge(self):
+        from apps.files.dedup import reference_count
+        from apps.files.models import StoredFile
+        from apps.files.s3_utils import s3_client
+
+        freed = deleted = 0
+        for group in self._duplicate_groups().iterator():
+            rows = list(StoredFile.objects.filter(sha256=group["sha256"]).order_by("created_at"))
+            keeper = rows[0]
+            stale = {(sf.bucket, sf.key) for sf in rows if sf.key != keeper.key}
+            with transaction.atomic():
+                StoredFile.objects.filter(sha256=group["sha256"]).exclude(
+                    bucket=keeper.bucket, key=keeper.key,
+                ).update(bucket=keeper.bucket, key=keeper.key)
+            for bucket, key in stale:
+                # Запись могла появиться между запросами — проверяем заново.
+                if reference_count(bucket, key):
+                    continue
+                s3_client.delete_object(Bucket=bucket, Key=key)
+                deleted += 1
+                freed += keeper.size or 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено объектов S3: {deleted}, освобождено: {_fmt(freed)}"
+        ))
@@ -0,0 +1,80 @@
+"""
+Сравнение памяти при загрузке большого файла в S3: старый путь
+(`upload_file_to_s3(f.read())`) против потокового (`upload_stream_to_s3`).
+
+Генерирует временный файл (по умолчанию 500 МБ), грузит его обоими
+способами и печатает пиковую память Python-аллокаций (tracemalloc) и
+пиковый RSS процесса. Потоковый вариант идёт первым — ru_maxrss растёт
+монотонно, иначе его пик скрылся бы за старым путём.
+
+    python manage.py bench_s3_stream --size-mb 500
+    python manage.py bench_s3_stream --only stream --keep
+"""
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+MB = 1024 * 1024
+
+
+def _max_rss_mb() -> float:
+    # Linux отдаёт ru_maxrss в килобайтах.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Benchmark memory of buffered vs streaming S3 upload"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=int, default=500, help="Размер тестового файла")
+        parser.add_argument("--only", choices=("stream", "legacy"), help="Прогнать только один вариант")
+        parser.add_argument("--keep", action="store_true", help="Не удалять загруженные объекты")
+
+    def handle(self, *args, **options):
+        from apps.files.s3_utils import (
+            delete_file_from_s3, upload_file_to_s3, upload_stream_to_s3,
+        )
+
+        size = options["size_mb"] * MB
+        modes = [options["only"]] if options["only"] else ["stream", "legacy"]
+
+        fd, path = tempfile.mkstemp(prefix="bench_s3_", suffix=".bin")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                chunk = os.urandom(MB)
+                for _ in range(options["size_mb"]):
+                    f.write(chunk)
+            self.stdout.write(f"Тестовый файл: {path} ({options['size_mb']} МБ)")
+
+            for mode in modes:
+                tracemalloc.start()
+                started = time.monotonic()
+                with open(path, "rb") as f:
+                    if mode == "stream":
+                        bucket, key, _ = upload_stream_to_s3(
+                            f, prefix="bench", filename="bench.bin",
+                            content_type="application/octet-stream",
+                        )
+                    else:
+                        bucket, key = upload_file_to_s3(
+                            f.read(), prefix="bench", filename="bench.bin",
+                            content_type="application/octet-stream",
+                        )
+                elapsed = time.monotonic() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"{mode:>6}: {elapsed:6.1f}s  "
+                    f"{size / MB / max(elapsed, 1e-6):6.1f} МБ/с  "
+                    f"peak alloc {peak / MB:7.1f} МБ  "
+                    f"max RSS {_max_rss_mb():7.1f} МБ"
+                )
+                if not options["keep"]:
+                    delete_file_from_s3(bucket, key)
+        finally:
+            os.remove(path)
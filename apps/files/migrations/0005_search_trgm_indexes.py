@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-18 00:51
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0025_seed_monitor_vpn_and_daily_report'),
+        ('files', '0004_storedfile_bubble_id'),
+        # pg_trgm ставится в crm.0095.
+        ('crm', '0095_search_trgm_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='clientfile',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='files_clientfile_name_trgm'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.10 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0005_search_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['bucket', 'key'], name='files_storedfile_object'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 import uuid
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 
 
 class StoredFile(models.Model):
@@ -14,10 +16,18 @@ class StoredFile(models.Model):
         max_length=64, blank=True, null=True, unique=True,
         help_text="ID записи Files в исходной CRM на bubble.io",
     )
+    # SHA-256 содержимого (hex). Пусто — файл загружен до дедупликации и
+    # ещё не посчитан (backfill_file_hashes). Несколько StoredFile с одним
+    # хэшем ссылаются на один объект S3 — см. apps/files/dedup.py.
+    sha256       = models.CharField(max_length=64, blank=True, default='', db_index=True)
 
     class Meta:
         verbose_name = "Файл"
         verbose_name_plural = "Файлы"
+        indexes = [
+            # Подсчёт ссылок на объект S3 перед удалением.
+            models.Index(fields=["bucket", "key"], name="files_storedfile_object"),
+        ]
 
     def __str__(self):
         return self.filename or self.key
@@ -70,6 +80,10 @@ class ClientFile(models.Model):
         verbose_name = "Файл клиента"
         verbose_name_plural = "Файлы клиентов"
         ordering = ["-created_at"]
+        indexes = [
+            # Глобальный поиск по имени файла (icontains) — триграммы.
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="files_clientfile_name_trgm"),
+        ]
 
     def __str__(self):
         return self.name
@@ -2,8 +2,12 @@
 
 import io
 import uuid
+import hashlib
 import logging
+from typing import Iterator
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from django.conf import settings
 from botocore.config import Config
 from botocore.exceptions import ClientError
@@ -79,6 +83,168 @@ def upload_file_to_s3(
         raise
 
 
+# ── Потоковые загрузка/скачивание ────────────────────────────────────────────
+# upload_file_to_s3/download_file_from_s3 держат весь файл в памяти — для
+# сканов и видео на сотни МБ это пики RSS у воркеров. Потоковый путь читает
+# источник кусками: в памяти одновременно не больше part_size × concurrency.
+
+MB = 1024 * 1024
+# Минимальная часть multipart в S3 — 5 МБ (кроме последней).
+MIN_PART_SIZE = 5 * MB
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def transfer_config(part_size: int = None, concurrency: int = None) -> TransferConfig:
+    """TransferConfig для multipart: размер части и число параллельных частей."""
+    part_size = max(
+        part_size or settings.AWS_S3_MULTIPART_PART_SIZE_MB * MB, MIN_PART_SIZE,
+    )
+    return TransferConfig(
+        multipart_threshold=part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=concurrency or settings.AWS_S3_MULTIPART_CONCURRENCY,
+        max_io_queue=2,
+    )
+
+
+class _CountingReader(io.RawIOBase):
+    """Файлоподобная обёртка: читает из `source`, считает байты и SHA-256.
+
+    `source` — файлоподобный объект (read) или итератор кусков bytes
+    (UploadedFile.chunks(), requests.iter_content, ...).
+    """
+
+    def __init__(self, source):
+        self._read = getattr(source, "read", None)
+        self._chunks = None if self._read else iter(source)
+        self._pending = b""
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        if self._read:
+            data = self._read(len(buf))
+        else:
+            data = self._pending
+            while not data:
+                try:
+                    data = next(self._chunks)
+                except StopIteration:
+                    break
+            self._pending = data[len(buf):]
+            data = data[:len(buf)]
+        n = len(data)
+        buf[:n] = data
+        self.size += n
+        self.sha256.update(data)
+        return n
+
+
+def new_s3_key(prefix: str, filename: str) -> str:
+    ext = filename.rsplit(".", 1)[-1] if "." in filename else "bin"
+    return f"{prefix.rstrip('/')}/{uuid.uuid4()}.{ext}"
+
+
+def upload_stream_to_s3(
+    source,
+    *,
+    prefix: str = "uploads",
+    filename: str = "file.bin",
+    content_type: str = None,
+    part_size: int = None,
+    concurrency: int = None,
+) -> tuple[str, str, int]:
+    """Потоковая загрузка в S3, возвращает (bucket, key, size).
+
+    source — файлоподобный объект или итератор кусков bytes (например,
+    ``UploadedFile.chunks()``). Файлы больше части уходят multipart'ом
+    с `concurrency` параллельными частями; весь файл в память не читается.
+    """
+    bucket, key, size, _ = upload_stream_to_s3_hashed(
+        source, prefix=prefix, filename=filename, content_type=content_type,
+        part_size=part_size, concurrency=concurrency,
+    )
+    return bucket, key, size
+
+
+def upload_stream_to_s3_hashed(
+    source,
+    *,
+    prefix: str = "uploads",
+    filename: str = "file.bin",
+    content_type: str = None,
+    part_size: int = None,
+    concurrency: int = None,
+) -> tuple[str, str, int, str]:
+    """Как `upload_stream_to_s3`, плюс SHA-256 содержимого (hex), посчитанный на лету."""
+    key = new_s3_key(prefix, filename)
+    reader = _CountingReader(source)
+    extra_args = {"ContentType": content_type} if content_type else None
+    try:
+        s3_client.upload_fileobj(
+            io.BufferedReader(reader, buffer_size=DOWNLOAD_CHUNK_SIZE),
+            settings.AWS_STORAGE_BUCKET_NAME,
+            key,
+            ExtraArgs=extra_args,
+            Config=transfer_config(part_size, concurrency),
+        )
+    except Exception as e:
+        logger.exception(f"❌ S3 stream upload error for {filename}: {e}")
+        raise
+    logger.info(f"✅ Streamed file to S3: {key} ({reader.size} bytes)")
+    return settings.AWS_STORAGE_BUCKET_NAME, key, reader.size, reader.sha256.hexdigest()
+
+
+def upload_uploaded_file_to_s3(
+    uploaded, *, prefix: str, filename: str = None, content_type: str = None,
+) -> tuple[str, str, int]:
+    """Django UploadedFile → S3 по кускам `chunks()` (без `read()` целиком)."""
+    chunk_size = settings.AWS_S3_MULTIPART_PART_SIZE_MB * MB
+    return upload_stream_to_s3(
+        uploaded.chunks(chunk_size),
+        prefix=prefix,
+        filename=filename or uploaded.name or "file.bin",
+        content_type=content_type,
+    )
+
+
+def open_s3_stream(bucket: str, key: str, *, byte_range: str = None):
+    """GET объекта без чтения тела: (StreamingBody, content_length, content_type)."""
+    params = {"Bucket": bucket, "Key": key}
+    if byte_range:
+        params["Range"] = byte_range
+    resp = s3_client.get_object(**params)
+    return resp["Body"], resp.get("ContentLength"), resp.get("ContentType")
+
+
+def iter_body(body, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """Куски StreamingBody; соединение закрывается и при обрыве клиента."""
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def iter_s3_file(
+    bucket: str, key: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Генератор кусков объекта S3 — для StreamingHttpResponse и проксирования."""
+    body, _, _ = open_s3_stream(bucket, key)
+    yield from iter_body(body, chunk_size)
+
+
+def read_s3_prefix(bucket: str, key: str, limit: int) -> bytes:
+    """Первые `limit` байт объекта (Range-запрос) — превью без скачивания целиком."""
+    body, _, _ = open_s3_stream(bucket, key, byte_range=f"bytes=0-{limit - 1}")
+    try:
+        return body.read(limit)
+    finally:
+        body.close()
+
+
 def download_file_from_s3(bucket: str, key: str) -> bytes:
     """
     Скачивает файл из S3 и возвращает его как bytes.
@@ -141,23 +307,42 @@ def get_presigned_url(bucket: str, key: str, expiration: int = 3600,
 
 def delete_file_from_s3(bucket: str, key: str) -> bool:
     """
-    Удаляет файл из S3.
+    Удаляет файл из S3, если на объект не ссылаются другие StoredFile.
+
+    После дедупликации (apps/files/dedup.py) один объект может принадлежать
+    нескольким StoredFile. Вызывается ДО удаления своей записи StoredFile
+    (так делают все вьюхи), поэтому «своя» ссылка одна: при двух и более
+    объект остаётся, удаляется только запись. Проверка и удаление — под
+    FOR UPDATE на записях объекта (см. dedup._create_from_duplicate).
     
     Args:
         bucket: Имя бакета S3
         key: Ключ файла
     
     Returns:
-        bool: True если успешно удалено
+        bool: True если успешно удалено (или объект ещё используется)
     """
-    try:
-        s3_client.delete_object(Bucket=bucket, Key=key)
-        logger.info(f"✅ Deleted file from S3: {key}")
-        return True
-        
-    except ClientError as e:
-        logger.exception(f"❌ Error deleting file {key}: {e}")
-        return False
+    from django.db import transaction
+
+    from apps.files.models import StoredFile  # лениво — s3_utils грузится до моделей
+
+    refs = StoredFile.objects.filter(bucket=bucket, key=key)
+    with transaction.atomic():
+        # Тот же лок берёт dedup при переиспользовании объекта. Считаем
+        # отдельным запросом после ожидания — он видит записи, созданные
+        # переиспользующим, пока мы ждали.
+        list(refs.select_for_update().values_list("pk", flat=True))
+        if refs.count() > 1:
+            logger.info(f"↪️ S3 object {key} still referenced — keep")
+            return True
+        try:
+            s3_client.delete_object(Bucket=bucket, Key=key)
+            logger.info(f"✅ Deleted file from S3: {key}")
+            return True
+
+        except ClientError as e:
+            logger.exception(f"❌ Error deleting file {key}: {e}")
+            return False
 
 
 def file_exists_in_s3(bucket: str, key: str) -> bool:
@@ -9,9 +9,8 @@ from apps.crm.models import Client
 from apps.core.models import Employee
 from .models import ClientFile, ClientFolder, StoredFile
 from .folder_utils import build_tree, create_default_folders, get_folder_path
-from .s3_utils import (
-    delete_file_from_s3, get_presigned_url, upload_file_to_s3,
-)
+from .dedup import store_uploaded_file
+from .s3_utils import delete_file_from_s3, get_presigned_url
 
 
 def _current_employee(request):
@@ -111,27 +110,22 @@ def file_upload(request, folder_pk):
     uploaded = request.FILES.getlist("files")
     for f in uploaded:
         content_type = f.content_type or mimetypes.guess_type(f.name)[0] or "application/octet-stream"
-        file_bytes = f.read()
         try:
-            bucket, key = upload_file_to_s3(
-                file_bytes,
+            # По кускам f.chunks() — крупные сканы/видео не читаются в память целиком.
+            # Тот же файл, загруженный повторно, переиспользует объект S3.
+            stored = store_uploaded_file(
+                f,
                 prefix=f"clients/{folder.client_id}/files",
                 filename=f.name,
                 content_type=content_type,
             )
         except Exception:
             continue
-        stored = StoredFile.objects.create(
-            bucket=bucket, key=key,
-            filename=f.name,
-            content_type=content_type,
-            size=len(file_bytes),
-        )
         ClientFile.objects.create(
             folder=folder,
             stored_file=stored,
             name=f.name,
-            size=len(file_bytes),
+            size=stored.size,
             content_type=content_type,
             uploaded_by=emp,
         )
@@ -323,8 +317,9 @@ def file_preview(request, file_pk):
     text_content = None
     if kind == "text":
         try:
-            from apps.files.s3_utils import download_file_from_s3
-            raw = download_file_from_s3(cf.stored_file.bucket, cf.stored_file.key)
+            # Превью — только начало файла (Range-запрос), не весь объект.
+            from apps.files.s3_utils import read_s3_prefix
+            raw = read_s3_prefix(cf.stored_file.bucket, cf.stored_file.key, 200_000)
             text_content = raw.decode("utf-8", errors="replace")[:50_000]
         except Exception:
             kind = None
@@ -1,19 +1,20 @@
 """Помечает непогашенные начисления как просроченные (status=overdue).
 
-Использует apps.finance.services.mark_overdue — там же логируется
-переход status→overdue в ClientEvent (charge_overdue).
+Использует apps.core.overdue.mark_charges — там же логируется
+переход status→overdue в событийку (charge_overdue). Печатает время фаз.
 
 Запуск вручную или из cron:
   docker compose exec -T web python manage.py mark_overdue_charges
 """
 from django.core.management.base import BaseCommand
 
-from apps.finance.services import mark_overdue
+from apps.core import overdue
 
 
 class Command(BaseCommand):
     help = "Помечает непогашенные начисления как просроченные по due_date"
 
     def handle(self, *args, **opts):
-        updated = mark_overdue()
-        self.stdout.write(self.style.SUCCESS(f"Обновлено: {updated}"))
+        report = overdue.mark_charges()
+        phases = "  ".join(f"{k}: {v}s" for k, v in report["phases"].items())
+        self.stdout.write(self.style.SUCCESS(f"Обновлено: {report['changed']}  ({phases})"))
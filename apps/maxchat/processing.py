@@ -13,15 +13,18 @@ sync-threadpool daphne и вешает сервер.
 import logging
 import mimetypes
 
-import requests
 from django.utils import timezone
 
+from apps.core import http_client
+from apps.crm.chat_summary import record_message
 from apps.crm.models import Client, Message
-from apps.files.models import StoredFile
-from apps.files.s3_utils import upload_file_to_s3
+from apps.files.dedup import store_bytes
 
 logger = logging.getLogger("maxbot")
 
+# CDN вложений MAX: повторы — в _download_max_file (там же проверка полноты).
+http_client.register(http_client.Provider("max_cdn", timeout=(10, 90), retries=0))
+
 
 def _determine_message_type(filename: str | None, content_type: str) -> str:
     name = filename or ""
@@ -56,7 +59,8 @@ def _download_max_file(url: str, attempts: int = 3):
     last_err = None
     for i in range(attempts):
         try:
-            resp = requests.get(url, timeout=(10, 90), verify=max_ca_bundle())
+            resp = http_client.request("max_cdn", "GET", url, endpoint="GET attachment",
+                                       verify=max_ca_bundle())
             resp.raise_for_status()
             data = resp.content
             ctype = (resp.headers.get("Content-Type") or "").lower()
@@ -87,6 +91,7 @@ def _create_download_pending(client, max_mid, att, att_uid, url, filename):
             "attachment_type": att.get("type"), "payload": att.get("payload") or {},
         },
     )
+    record_message(msg)
     from apps.maxchat.tasks import retry_max_attachment_download
     retry_max_attachment_download.apply_async((str(msg.id),), countdown=30)
     logger.warning("⏳ MAX download deferred → auto-retry: msg=%s url=%s", msg.id, url[:60])
@@ -107,6 +112,7 @@ def _create_unhandled_placeholder(client, max_mid, body):
         max_message_id=max_mid, channel="max", telegram_date=timezone.now(),
         raw_payload={"channel": "max", "unhandled_attachment": True, "body": body},
     )
+    record_message(msg)
     _push(msg)
     logger.warning("📎 MAX unhandled attachment (mid=%s) → placeholder %s (body stored for diag)",
                    max_mid, msg.id)
@@ -198,6 +204,7 @@ def handle_max_event(data: dict):
                 },
             )
             logger.info("💬 MAX text message %s for client %s", msg_obj.id, client.id)
+            record_message(msg_obj)
             _push(msg_obj)
             from apps.crm.event_logger import log_messenger_message
             log_messenger_message(client, msg_obj)
@@ -265,22 +272,16 @@ def handle_max_event(data: dict):
         message_type = _determine_message_type(filename, content_type)
 
         try:
-            bucket, key = upload_file_to_s3(
+            stored = store_bytes(
                 file_bytes,
                 prefix="max/media",
                 filename=filename,
+                content_type=content_type or "application/octet-stream",
             )
         except Exception as e:
             logger.exception("❌ MAX webhook: failed upload to S3: %s", e)
             continue
 
-        stored = StoredFile.objects.create(
-            bucket=bucket,
-            key=key,
-            filename=filename,
-            content_type=content_type or "application/octet-stream",
-            size=len(file_bytes),
-        )
         # Авторутинг в папку клиента
         try:
             from apps.files.folder_utils import get_chat_folder
@@ -327,6 +328,7 @@ def handle_max_event(data: dict):
             filename,
             len(file_bytes),
         )
+        record_message(msg_obj)
         _push(msg_obj)  # пушим только входящие
         produced += 1
 
@@ -3,9 +3,9 @@ import logging
 import time
 from typing import Optional, Tuple
 
-import requests
 from django.conf import settings
 
+from apps.core import http_client
 from apps.maxchat.ca import max_ca_bundle
 
 logger = logging.getLogger(__name__)
@@ -13,6 +13,11 @@ logger = logging.getLogger(__name__)
 # С 19.07.2026 — platform-api2.max.ru (см. settings.MAX_API_BASE_URL + ca.py).
 MAX_API_BASE_URL = getattr(settings, "MAX_API_BASE_URL", "https://platform-api2.max.ru")
 
+# API MAX и загрузка файлов на upload-URL (keep-alive, circuit breaker —
+# apps/core/http_client.py). Отправка сообщений не повторяется, если
+# запрос мог дойти до MAX.
+http_client.register(http_client.Provider("max", timeout=15))
+
 
 def _get_upload_type(message_type: str) -> str:
     """Маппинг message_type → тип загрузки MAX API."""
@@ -37,8 +42,8 @@ def _upload_file_to_max(
 
     # Шаг 1: получаем URL для загрузки
     try:
-        r = requests.post(
-            f"{MAX_API_BASE_URL}/uploads",
+        r = http_client.request(
+            "max", "POST", f"{MAX_API_BASE_URL}/uploads",
             params={"type": upload_type},
             headers=headers_auth,
             timeout=10,
@@ -63,8 +68,8 @@ def _upload_file_to_max(
         content_type = content_type or "application/octet-stream"
 
     try:
-        r2 = requests.post(
-            upload_url,
+        r2 = http_client.request(
+            "max", "POST", upload_url, endpoint="POST upload",
             files={"data": (filename, file_bytes, content_type)},
             timeout=60,
             verify=max_ca_bundle(),
@@ -124,8 +129,8 @@ def _wait_attachment_ready(
 
     for attempt in range(1, max_attempts + 1):
         try:
-            resp = requests.post(
-                f"{MAX_API_BASE_URL}/messages",
+            resp = http_client.request(
+                "max", "POST", f"{MAX_API_BASE_URL}/messages",
                 params=params,
                 json=payload,
                 headers=headers,
@@ -203,8 +208,8 @@ def send_max_message(
             return _wait_attachment_ready(access_token, chat_id, payload)
 
     try:
-        resp = requests.post(
-            f"{MAX_API_BASE_URL}/messages",
+        resp = http_client.request(
+            "max", "POST", f"{MAX_API_BASE_URL}/messages",
             params=params,
             json=payload,
             headers=headers,
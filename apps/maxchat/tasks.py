@@ -33,8 +33,7 @@ def retry_max_attachment_download(self, message_id: str):
     """
     import mimetypes
     from apps.maxchat import processing as mp
-    from apps.files.models import StoredFile
-    from apps.files.s3_utils import upload_file_to_s3
+    from apps.files.dedup import store_bytes
 
     try:
         msg = Message.objects.select_related("client").get(id=message_id)
@@ -53,15 +52,14 @@ def retry_max_attachment_download(self, message_id: str):
             ext = (mimetypes.guess_extension(ctype or "") or ".bin").lstrip(".")
             filename = f"max_file_{msg.max_message_id}.{ext}"
         try:
-            bucket, key = upload_file_to_s3(file_bytes, prefix="max/media", filename=filename)
+            stored = store_bytes(
+                file_bytes, prefix="max/media", filename=filename,
+                content_type=ctype or "application/octet-stream",
+            )
         except Exception:
             logger.exception("MAX retry: S3 upload failed for msg %s", msg.id)
-            bucket = None
-        if bucket:
-            stored = StoredFile.objects.create(
-                bucket=bucket, key=key, filename=filename,
-                content_type=ctype or "application/octet-stream", size=len(file_bytes),
-            )
+            stored = None
+        if stored:
             try:
                 from apps.files.folder_utils import get_chat_folder
                 from apps.files.models import ClientFile
@@ -144,6 +142,8 @@ def send_max_message_task(self, message_id: str):
         msg.sent_at = timezone.now()
         msg.save(update_fields=["max_message_id", "is_sent", "sent_at"])
         logger.info("MAX task: message %s sent, max_id=%s", msg.id, max_id)
+        from apps.crm.chat_summary import record_message
+        record_message(msg)
 
         try:
             from apps.realtime.utils import push_message_status, push_toast
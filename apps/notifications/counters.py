@@ -0,0 +1,127 @@
+"""Счётчики новых уведомлений сотрудников (бейдж колокола) в Redis.
+
+Раньше каждый пуш и каждая реакция на уведомление пересчитывали
+`Notification.filter(recipient=…, status=new).count()` — у сотрудников
+с большим хвостом это сканирование индекса на каждое событие. Теперь
+счётчик живёт в кэше (`notif:unread:<employee_id>`) и меняется там же,
+где меняется статус:
+
+  * создание уведомлений (notify / notify_many) — +1 на строку;
+  * реакция (services.respond), в т.ч. «отложить», из «Новых» — −1;
+  * возврат отложенных (tasks.revive_snoozed) — +1 на строку.
+
+Изменения применяются после коммита транзакции. Холодный ключ
+(истёк TTL, Redis перезапущен, кэш недоступен) не инкрементируется.
+При чтении такой счётчик пересчитывается из БД и кладётся обратно.
+Расхождения от удалений каскадом и гонок чинит `reconcile()`: задача
+notifications.reconcile_badges пересчитывает тёплые ключи по БД.
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+TTL = 24 * 3600
+
+
+def _key(employee_id) -> str:
+    return f"notif:unread:{employee_id}"
+
+
+def _count_db(employee_ids) -> dict:
+    counts = dict(
+        Notification.objects.filter(recipient_id__in=employee_ids, status=Notification.STATUS_NEW)
+        .values("recipient_id").annotate(n=Count("pk")).values_list("recipient_id", "n")
+    )
+    return {emp_id: counts.get(emp_id, 0) for emp_id in employee_ids}
+
+
+def get_many(employee_ids) -> dict:
+    """{employee_id: число новых}. Холодные — из БД одним запросом."""
+    employee_ids = set(employee_ids)
+    if not employee_ids:
+        return {}
+    keys = {_key(emp_id): emp_id for emp_id in employee_ids}
+    try:
+        cached = cache.get_many(list(keys))
+    except Exception:  # noqa: BLE001 — без Redis бейдж считается из БД
+        logger.warning("notif counters: кэш недоступен, считаем из БД", exc_info=True)
+        return _count_db(employee_ids)
+    out = {keys[k]: v for k, v in cached.items()}
+    cold = employee_ids - out.keys()
+    if cold:
+        fresh = _count_db(cold)
+        out.update(fresh)
+        try:
+            for emp_id, n in fresh.items():
+                cache.add(_key(emp_id), n, TTL)
+        except Exception:  # noqa: BLE001
+            pass
+    return out
+
+
+def get(employee_id) -> int:
+    return get_many([employee_id])[employee_id]
+
+
+def set_exact(employee_id, count: int) -> None:
+    """Записать известное точное значение (панель уведомлений его и так считает)."""
+    try:
+        cache.set(_key(employee_id), count, TTL)
+    except Exception:  # noqa: BLE001
+        pass
+
+
+def _apply(deltas: dict) -> None:
+    for emp_id, delta in deltas.items():
+        if not delta:
+            continue
+        key = _key(emp_id)
+        try:
+            value = cache.incr(key, delta)
+        except ValueError:
+            continue  # холодный ключ — посчитается при чтении
+        except Exception:  # noqa: BLE001
+            logger.warning("notif counters: incr %s не прошёл", key, exc_info=True)
+            continue
+        if value < 0:
+            cache.delete(key)
+
+
+def adjust(deltas) -> None:
+    """Изменить счётчики после коммита: deltas — {employee_id: ±n}."""
+    deltas = dict(deltas)
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def created(notifications) -> None:
+    """+1 получателю на каждое новое (status=new) уведомление."""
+    adjust(Counter(
+        n.recipient_id for n in notifications if n.status == Notification.STATUS_NEW
+    ))
+
+
+def reconcile() -> int:
+    """Пересчитать тёплые счётчики по БД. Возвращает число исправленных."""
+    from apps.core.models import Employee
+
+    emp_ids = list(Employee.objects.filter(is_active=True).values_list("pk", flat=True))
+    keys = {_key(emp_id): emp_id for emp_id in emp_ids}
+    cached = cache.get_many(list(keys))
+    if not cached:
+        return 0
+    actual = _count_db([keys[k] for k in cached])
+    fixed = {k: actual[keys[k]] for k, v in cached.items() if v != actual[keys[k]]}
+    if fixed:
+        cache.set_many(fixed, TTL)
+        logger.info("notif counters: исправлено %d счётчиков", len(fixed))
+    return len(fixed)
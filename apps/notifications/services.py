@@ -1,9 +1,15 @@
 """Генерация и обработка уведомлений. Точка входа — notify() из событийки."""
+import logging
+
+from django.db import transaction
 from django.utils import timezone
 
 from apps.crm import client_log
+from . import counters
 from .models import Notification
 
+logger = logging.getLogger(__name__)
+
 # Реакция → (новый статус, код ActionType для записи в событийку)
 RESPONSE_MAP = {
     "accept":      (Notification.STATUS_ACCEPTED,     "notif_accepted"),
@@ -50,6 +56,41 @@ def recipients_for_client(client):
     return Employee.objects.filter(pk__in=ids)
 
 
+def recipient_ids_for_clients(client_ids) -> dict:
+    """{client_id: {employee_id, ...}} — recipients_for_client для многих
+    клиентов сразу: те же три источника, по запросу на источник (плюс
+    отделы этапов услуг), а не по три запроса на клиента."""
+    from apps.core.models import Employee
+    from apps.crm.models import ClientEmployee, Service, ServiceEmployeeState
+
+    out = {cid: set() for cid in client_ids}
+    if not out:
+        return out
+    rows = (ClientEmployee.objects
+            .filter(client_id__in=out, employee__is_active=True)
+            .values_list("client_id", "employee_id"))
+    for cid, eid in rows:
+        out[cid].add(eid)
+    rows = (ServiceEmployeeState.objects
+            .filter(service__client_id__in=out, employee__is_active=True)
+            .values_list("service__client_id", "employee_id"))
+    for cid, eid in rows:
+        out[cid].add(eid)
+    dept_clients: dict = {}
+    rows = (Service.objects.filter(client_id__in=out)
+            .exclude(common_status__department__isnull=True)
+            .values_list("client_id", "common_status__department_id"))
+    for cid, dept_id in rows:
+        dept_clients.setdefault(dept_id, set()).add(cid)
+    if dept_clients:
+        rows = (Employee.objects.filter(department_id__in=dept_clients, is_active=True)
+                .values_list("department_id", "pk"))
+        for dept_id, eid in rows:
+            for cid in dept_clients[dept_id]:
+                out[cid].add(eid)
+    return out
+
+
 def _build_text(entry) -> str:
     t = entry.event_type or entry.action_type
     base = t.name if t else "Событие"
@@ -84,15 +125,64 @@ def notify(entry, recipients=None, *, exclude_actor=True):
     if not rows:
         return []
     Notification.objects.bulk_create(rows)  # PG возвращает pk
+    counters.created(rows)
 
-    # Рассылка. Импорт здесь — избегаем циклов и тянем channels лениво.
+    # Рассылка — после коммита (и после счётчиков бейджа). Импорт здесь —
+    # избегаем циклов и тянем channels лениво.
     from apps.realtime.utils import push_notification
-    for n in rows:
-        push_notification(n)
-        # TODO stage C: enqueue_telegram(n)
+
+    def _push():
+        for n in rows:
+            push_notification(n)
+            # TODO stage C: enqueue_telegram(n)
+    transaction.on_commit(_push)
     return rows
 
 
+def notify_many(entries) -> list:
+    """notify() для пачки записей событийки (client_log.batch / record_many).
+
+    Получатели — recipient_ids_for_clients одним проходом по всем клиентам,
+    уведомления — одним bulk_create. Рассылка (WS, позже Telegram) — после
+    коммита celery-задачей notifications.push_batch: по одному бейджу на
+    сотрудника, а не по пушу на уведомление.
+    """
+    entries = [e for e in entries if e is not None and e.client_id is not None]
+    if not entries:
+        return []
+    recipients = recipient_ids_for_clients({e.client_id for e in entries})
+    rows = []
+    for entry in entries:
+        t = entry.event_type or entry.action_type
+        text = _build_text(entry)
+        hint = (t.notify_hint if t else "") or ""
+        rows.extend(
+            Notification(recipient_id=emp_id, client_id=entry.client_id, source=entry,
+                         text=text, hint=hint)
+            for emp_id in recipients[entry.client_id]
+            if emp_id != entry.employee_id
+        )
+    if not rows:
+        return []
+    Notification.objects.bulk_create(rows, batch_size=500)
+    counters.created(rows)
+
+    ids = [str(n.pk) for n in rows]
+    transaction.on_commit(lambda: _enqueue_push(ids, rows))
+    return rows
+
+
+def _enqueue_push(ids, rows):
+    from .tasks import push_batch
+    try:
+        push_batch.delay(ids)
+    except Exception:
+        # Брокер недоступен — бейджи всё равно обновляем, синхронно.
+        logger.exception("notify_many: push_batch не поставлен, пушим синхронно")
+        from apps.realtime.utils import push_notifications
+        push_notifications(rows)
+
+
 def respond(notification, action, *, employee=None, via="web", snooze_until=None, comment=""):
     """Реакция сотрудника на уведомление. Пишет действие в событийку и
     меняет статус. action ∈ {acknowledge, accept, done, reject, snooze}.
@@ -113,6 +203,8 @@ def respond(notification, action, *, employee=None, via="web", snooze_until=None
         notification.client, code,
         comment=log_comment, employee=employee, parent=notification.source,
     )
+    if notification.status == Notification.STATUS_NEW and status != Notification.STATUS_NEW:
+        counters.adjust({notification.recipient_id: -1})
     notification.status = status
     notification.responded_via = via
     notification.response_log = log
@@ -127,6 +219,7 @@ def respond(notification, action, *, employee=None, via="web", snooze_until=None
     ])
 
     from apps.realtime.utils import push_notification_badge
-    push_notification_badge(notification.recipient)  # обновить бейдж у получателя
+    # обновить бейдж у получателя (после коммита — счётчик уже изменён)
+    transaction.on_commit(lambda: push_notification_badge(notification.recipient))
     # TODO stage C: edit_telegram_card(notification)
     return notification
@@ -1,9 +1,12 @@
 """Фоновые задачи уведомлений."""
 import logging
+from collections import Counter
 
 from celery import shared_task
 from django.utils import timezone
 
+from . import counters
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,6 +35,7 @@ def revive_snoozed():
     Notification.objects.filter(pk__in=ids).update(
         status=Notification.STATUS_NEW, snooze_until=None,
     )
+    counters.adjust(Counter(n.recipient_id for n in due))
 
     # Пуш по одному разу на получателя (бейдж считает общий счётчик).
     seen = set()
@@ -47,3 +51,24 @@ def revive_snoozed():
 
     logger.info("revive_snoozed: возвращено %d уведомлений в «Новые»", len(ids))
     return len(ids)
+
+
+@shared_task(name="notifications.push_batch")
+def push_batch(notification_ids):
+    """Рассылка пачки уведомлений из notify_many (client_log.batch).
+
+    Сколько бы уведомлений ни досталось сотруднику в пачке — один пуш
+    бейджа (push_notifications группирует по получателю).
+    """
+    from .models import Notification
+    from apps.realtime.utils import push_notifications
+
+    rows = list(Notification.objects.filter(pk__in=notification_ids).only("pk", "recipient_id"))
+    push_notifications(rows)
+    return len(rows)
+
+
+@shared_task(name="notifications.reconcile_badges")
+def reconcile_badges():
+    """Сверить счётчики бейджей в Redis с БД (удаления каскадом, гонки)."""
+    return counters.reconcile()
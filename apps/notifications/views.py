@@ -8,7 +8,7 @@ from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from .models import Notification
-from . import services
+from . import counters, services
 
 # Вкладки панели → набор статусов
 TABS = {
@@ -67,6 +67,8 @@ def _panel_context(request):
             "client", "source", "source__event_type", "source__action_type",
         )
         counts["new"] = base.filter(status=Notification.STATUS_NEW).count()
+        # Точное число всё равно посчитано — заодно чиним счётчик бейджа.
+        counters.set_exact(emp.pk, counts["new"])
         counts["work"] = base.filter(status=Notification.STATUS_ACCEPTED).count()
         counts["snoozed"] = base.filter(status=Notification.STATUS_SNOOZED).count()
         counts["closed"] = base.filter(status__in=TABS["closed"]).count()
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import services
 from .models import (
     ArbitrationManager,
     BankruptcyCase,
@@ -43,6 +44,12 @@ class MilestoneTemplateAdmin(admin.ModelAdmin):
     search_fields = ("title", "code")
     ordering = ("stage__order", "order")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Новое правило срока — в открытые мероприятия активных дел.
+        if change and {"base_date_key", "offset_days"} & set(form.changed_data):
+            services.apply_template_rule(obj)
+
 
 class ProcedureInline(admin.TabularInline):
     model = Procedure
@@ -5,3 +5,6 @@ class ProcedureConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.procedure"
     verbose_name = "Процедуры банкротства (рабочее место юриста)"
+
+    def ready(self):
+        from . import signals  # noqa: F401
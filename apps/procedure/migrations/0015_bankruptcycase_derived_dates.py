@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # Та же логика, что services.derived_dates (модели — исторические).
+    BankruptcyCase = apps.get_model("procedure", "BankruptcyCase")
+    QuestionnaireResponse = apps.get_model("questionnaire", "QuestionnaireResponse")
+    ClientLogEntry = apps.get_model("crm", "ClientLogEntry")
+
+    for case in BankruptcyCase.objects.select_related("service__client").iterator():
+        client = case.service.client
+        qr_at = (QuestionnaireResponse.objects.filter(service_id=case.service_id)
+                 .order_by("created_at").values_list("created_at", flat=True).first())
+        if qr_at is None:
+            qr_at = client.created_at
+        prep_at = (ClientLogEntry.objects
+                   .filter(client_id=client.pk, event_type__code="claim_prep_assigned")
+                   .order_by("created_at").values_list("created_at", flat=True).first())
+        case.application_date = qr_at.date() if qr_at else None
+        case.claim_prep_date = prep_at.date() if prep_at else None
+        case.save(update_fields=["application_date", "claim_prep_date"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("procedure", "0014_request_bubble_id"),
+        ("questionnaire", "0004_response_pdf_fields"),
+        ("crm", "0098_dadatacache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bankruptcycase",
+            name="application_date",
+            field=models.DateField(
+                blank=True, editable=False, null=True, verbose_name="Дата обращения",
+                help_text="Дата первой анкеты услуги, иначе дата внесения клиента в базу.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bankruptcycase",
+            name="claim_prep_date",
+            field=models.DateField(
+                blank=True, editable=False, null=True,
+                verbose_name="Дата передачи на подготовку иска",
+                help_text="Дата первого события «claim_prep_assigned» клиента.",
+            ),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -196,6 +196,16 @@ class BankruptcyCase(TimeStampedModel):
         "Итог первого заседания", max_length=32,
         choices=FIRST_HEARING_OUTCOMES, blank=True,
     )
+    # Вычисляемые даты услуги (read-only в сводке). Пишутся при появлении
+    # источника — см. services.refresh_derived_dates и signals.py.
+    application_date = models.DateField(
+        "Дата обращения", null=True, blank=True, editable=False,
+        help_text="Дата первой анкеты услуги, иначе дата внесения клиента в базу.",
+    )
+    claim_prep_date = models.DateField(
+        "Дата передачи на подготовку иска", null=True, blank=True, editable=False,
+        help_text="Дата первого события «claim_prep_assigned» клиента.",
+    )
     notes = models.TextField("Заметки", blank=True)
 
     class Meta:
@@ -1,7 +1,7 @@
 """Формирование документа-запроса (исходящее письмо): подстановка плейсхолдеров
 из дела/должника/АУ/госоргана → .docx + PDF в файлы дела.
 
-Переиспользует движок AFD (render_docx, docx_to_pdf, S3). Подпись/печать (PNG)
+Переиспользует движок AFD (compiled_for, docx_to_pdf, S3). Подпись/печать (PNG)
 накладываются позже — когда заданы ArbitrationManager.signature_file/stamp_file.
 """
 import logging
@@ -10,12 +10,13 @@ import re
 from django.db.models import Max
 from django.utils import timezone
 
-from apps.afd.docx_engine import render_docx
+from apps.afd.docx_engine import compiled_for
 from apps.afd.pdf_utils import docx_to_pdf
 from apps.crm import client_log
 from apps.files.folder_utils import _mk, get_or_create_root
-from apps.files.models import ClientFile, StoredFile
-from apps.files.s3_utils import download_file_from_s3, upload_file_to_s3
+from apps.files.dedup import store_bytes
+from apps.files.models import ClientFile
+from apps.files.s3_utils import download_file_from_s3
 
 log = logging.getLogger(__name__)
 DOCX_CT = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
@@ -172,9 +173,7 @@ def check_request_data(req):
     tpl = req.request_type.template if req.request_type_id else None
     if tpl and tpl.stored_file_id:
         try:
-            from apps.afd.docx_engine import list_placeholders
-            tb = download_file_from_s3(tpl.stored_file.bucket, tpl.stored_file.key)
-            used = set(list_placeholders(tb))
+            used = set(compiled_for(tpl.stored_file).placeholders)
         except Exception:
             log.exception("check_request_data: не удалось прочитать плейсхолдеры шаблона")
 
@@ -281,12 +280,9 @@ def save_edited_document(req, new_docx_bytes: bytes, *, employee=None):
 
 
 def _store(file_bytes, *, filename, content_type):
-    bucket, key = upload_file_to_s3(
+    return store_bytes(
         file_bytes, prefix="procedure/requests", filename=filename, content_type=content_type,
     )
-    return StoredFile.objects.create(
-        bucket=bucket, key=key, filename=filename, content_type=content_type, size=len(file_bytes),
-    )
 
 
 def _attach(client, stored, employee):
@@ -316,8 +312,7 @@ def generate_request_document(req, *, with_signature=False, marriage_cert="", em
         req.outgoing_number = mx + 1
 
     ctx = build_request_context(req, marriage_cert=marriage_cert)
-    template_bytes = download_file_from_s3(tpl.stored_file.bucket, tpl.stored_file.key)
-    docx_bytes = render_docx(template_bytes, ctx)
+    docx_bytes = compiled_for(tpl.stored_file).render(ctx)
     if with_signature:
         proc = _am_procedure(req.case)
         am = proc.arbitr_manager if (proc and proc.arbitr_manager_id) else None
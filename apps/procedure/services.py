@@ -10,14 +10,16 @@ from datetime import date, timedelta
 from typing import Optional
 
 from django.db import transaction
-from django.db.models import Max
+from django.db.models import Case, DateField, ExpressionWrapper, F, Max, Q, Value, When
 from django.utils import timezone
 
+from apps.core import refcache
 from apps.crm import client_log
 
 from .models import (
     CLOSING_OUTCOMES,
     SCOPE_COMMON,
+    ArbitrationManager,
     BankruptcyCase,
     MilestoneTemplate,
     Procedure,
@@ -28,49 +30,117 @@ from .models import (
 
 
 # ── Стадии ─────────────────────────────────────────────────────────────────
+# Каталог стадий и список АУ читаются на каждую перерисовку «Обзора» —
+# держим их в общем кэше справочников (apps/core/refcache.py), сброс —
+# сигналами на save/delete (apps/procedure/signals.py).
+
+def stage_catalogue() -> list[ProcedureStage]:
+    """Активные стадии по порядку (все области)."""
+    return refcache.get(
+        "procedure_stages", "active",
+        lambda: list(ProcedureStage.objects.filter(is_active=True).order_by("order")),
+    )
+
+
+def stages_for(scope: str) -> list[ProcedureStage]:
+    """Нетерминальные активные стадии области scope (общие / вид процедуры)."""
+    return [st for st in stage_catalogue() if st.kind_scope == scope and not st.is_terminal]
+
 
 def _first_stage(scope: str) -> Optional[ProcedureStage]:
-    return (
-        ProcedureStage.objects.filter(kind_scope=scope, is_active=True, is_terminal=False)
-        .order_by("order")
-        .first()
+    stages = stages_for(scope)
+    return stages[0] if stages else None
+
+
+def terminal_stage() -> Optional[ProcedureStage]:
+    return next((st for st in stage_catalogue() if st.is_terminal), None)
+
+
+def manager_choices() -> list[dict]:
+    """Активные АУ для выпадашки «Финуправляющий»: [{"id", "label"}]."""
+    return refcache.get(
+        "arbitration_managers", "choices",
+        lambda: [
+            {"id": str(m.id), "label": m.full_fio}
+            for m in ArbitrationManager.objects.filter(is_active=True)
+        ],
     )
 
 
-def _terminal_stage() -> Optional[ProcedureStage]:
-    return (
-        ProcedureStage.objects.filter(is_terminal=True, is_active=True)
-        .order_by("order")
-        .first()
+# ── Вычисляемые даты услуги ────────────────────────────────────────────────
+# Показываются в сводке read-only. Хранятся на деле и пересчитываются, когда
+# появляется/удаляется их источник (signals.py), а не на каждый рендер.
+
+CLAIM_PREP_EVENT = "claim_prep_assigned"
+
+
+def claim_prep_event_type():
+    """EventType источника п.4 (тот же ключ refcache, что у client_log)."""
+    from apps.crm.models import EventType
+    return refcache.get(
+        "event_types", CLAIM_PREP_EVENT,
+        lambda: EventType.objects.filter(code=CLAIM_PREP_EVENT).first(),
     )
 
 
+def derived_dates(service) -> dict:
+    """Даты п.1 и п.4 по источникам:
+
+    * application_date — дата первой анкеты услуги, иначе дата внесения
+      клиента в базу;
+    * claim_prep_date — дата первого события «claim_prep_assigned» клиента.
+    """
+    from apps.crm.models import ClientLogEntry
+    from apps.questionnaire.models import QuestionnaireResponse
+
+    client = service.client
+    qr_at = (QuestionnaireResponse.objects.filter(service=service)
+             .order_by("created_at").values_list("created_at", flat=True).first())
+    if qr_at is None:
+        qr_at = client.created_at
+    prep_at = (ClientLogEntry.objects.filter(client=client, event_type__code=CLAIM_PREP_EVENT)
+               .order_by("created_at").values_list("created_at", flat=True).first())
+    return {
+        "application_date": qr_at.date() if qr_at else None,
+        "claim_prep_date": prep_at.date() if prep_at else None,
+    }
+
+
+def refresh_derived_dates(cases) -> None:
+    """Пересчитать вычисляемые даты дел; пишет только изменившиеся."""
+    for case in cases:
+        dates = derived_dates(case.service)
+        changed = [f for f, v in dates.items() if getattr(case, f) != v]
+        if changed:
+            for f in changed:
+                setattr(case, f, dates[f])
+            case.save(update_fields=[*changed, "updated_at"])
+
+
 # ── Базовые даты ───────────────────────────────────────────────────────────
 
-def _resolve_base_date(case: BankruptcyCase, ms: ProcedureMilestone) -> Optional[date]:
-    """Значение базовой даты для мероприятия по его ключу.
+# base_date_key → дата-якорь (по связям мероприятия), от которой считается срок.
+BASE_DATE_FIELDS = {
+    "case_filing_date": "case__filing_date",
+    "case_claim_accept_date": "case__claim_accept_date",
+    "case_first_hearing_date": "case__first_hearing_date",
+    "proc_intro_date": "procedure__intro_date",
+    "proc_publication_efrsb_date": "procedure__publication_efrsb_date",
+    "proc_publication_kommersant_date": "procedure__publication_kommersant_date",
+}
+
 
-    case_* — от полей дела; proc_* — от процедуры мероприятия (если есть).
+def _due_date_expr():
+    """Срок мероприятия в SQL: CASE по base_date_key + offset_days.
+
+    Нет якоря (ключ неизвестен, даты нет, proc_* у мероприятия общей фазы) —
+    NULL. date + integer в PostgreSQL — date.
     """
-    key = ms.base_date_key
-    if not key:
-        return None
-    if key == "case_filing_date":
-        return case.filing_date
-    if key == "case_claim_accept_date":
-        return case.claim_accept_date
-    if key == "case_first_hearing_date":
-        return case.first_hearing_date
-    proc = ms.procedure
-    if proc is None:
-        return None
-    if key == "proc_intro_date":
-        return proc.intro_date
-    if key == "proc_publication_efrsb_date":
-        return proc.publication_efrsb_date
-    if key == "proc_publication_kommersant_date":
-        return proc.publication_kommersant_date
-    return None
+    base = Case(
+        *[When(base_date_key=key, then=F(field)) for key, field in BASE_DATE_FIELDS.items()],
+        default=Value(None), output_field=DateField(),
+    )
+    return ExpressionWrapper(base + F("offset_days"), output_field=DateField())
 
 
 # ── Дело ───────────────────────────────────────────────────────────────────
@@ -98,6 +168,7 @@ def ensure_case(service) -> BankruptcyCase:
     """
     case, created = BankruptcyCase.objects.get_or_create(service=service)
     if created:
+        refresh_derived_dates([case])
         stage = _first_stage(SCOPE_COMMON)
         if stage is not None:
             case.current_stage = stage
@@ -143,24 +214,80 @@ def instantiate_stage_milestones(
     return created
 
 
-def recompute_due_dates(case: BankruptcyCase) -> int:
-    """Пересчитать `due_date` у всех мероприятий дела из снапшота правила."""
-    updated = 0
-    qs = case.milestones.exclude(base_date_key="").select_related("procedure")
-    for ms in qs:
-        base = _resolve_base_date(case, ms)
-        new_due = base + timedelta(days=ms.offset_days) if base else None
-        if ms.due_date != new_due:
-            ms.due_date = new_due
-            ms.save(update_fields=["due_date", "updated_at"])
-            updated += 1
-    return updated
+@transaction.atomic
+def recompute_due_dates(case: Optional[BankruptcyCase] = None, *,
+                        template: Optional[MilestoneTemplate] = None,
+                        today: Optional[date] = None) -> list:
+    """Пересчитать `due_date` мероприятий из снапшота правила — множеством.
+
+    Область: мероприятия дела `case` и/или мероприятия шаблона `template` в
+    активных делах. Новый срок считается в SQL (_due_date_expr), из БД
+    выбираются только строки, у которых он изменился, и пишутся одним
+    bulk_update. Флаг просрочки правится в том же проходе: overdue, чей
+    срок сдвинули на сегодня и дальше, снова pending (обратный переход —
+    ночной overdue.mark_milestones, он же пишет событийку).
+
+    Возвращает pk изменённых мероприятий.
+    """
+    if case is None and template is None:
+        raise ValueError("recompute_due_dates: нужен case или template")
+    qs = ProcedureMilestone.objects.exclude(base_date_key="")
+    if case is not None:
+        qs = qs.filter(case=case)
+    if template is not None:
+        qs = qs.filter(template=template, case__status=BankruptcyCase.STATUS_ACTIVE)
+    rows = list(
+        qs.select_for_update(of=("self",)).order_by()
+        .annotate(new_due=_due_date_expr())
+        .filter(
+            Q(due_date__isnull=True, new_due__isnull=False)
+            | Q(due_date__isnull=False, new_due__isnull=True)
+            | (Q(due_date__isnull=False, new_due__isnull=False) & ~Q(due_date=F("new_due")))
+        )
+        .values_list("pk", "status", "new_due")
+    )
+    if not rows:
+        return []
+    today = today or timezone.localdate()
+    now = timezone.now()
+    changed = []
+    for pk, status, new_due in rows:
+        if status == ProcedureMilestone.STATUS_OVERDUE and (new_due is None or new_due >= today):
+            status = ProcedureMilestone.STATUS_PENDING
+        changed.append(ProcedureMilestone(pk=pk, due_date=new_due, status=status, updated_at=now))
+    ProcedureMilestone.objects.bulk_update(
+        changed, ["due_date", "status", "updated_at"], batch_size=500,
+    )
+    return [ms.pk for ms in changed]
+
+
+@transaction.atomic
+def apply_template_rule(template: MilestoneTemplate) -> list:
+    """Правило шаблона изменилось (base_date_key/offset_days) — перенести его
+    в открытые мероприятия активных дел и пересчитать их сроки.
+
+    Выполненные/пропущенные хранят свой снапшот (история не переписывается).
+    Возвращает pk мероприятий с изменившимся сроком.
+    """
+    (
+        ProcedureMilestone.objects
+        .filter(
+            template=template, case__status=BankruptcyCase.STATUS_ACTIVE,
+            status__in=(ProcedureMilestone.STATUS_PENDING, ProcedureMilestone.STATUS_OVERDUE),
+        )
+        .exclude(base_date_key=template.base_date_key, offset_days=template.offset_days)
+        .update(
+            base_date_key=template.base_date_key, offset_days=template.offset_days,
+            updated_at=timezone.now(),
+        )
+    )
+    return recompute_due_dates(template=template)
 
 
 @transaction.atomic
 def close_case(case: BankruptcyCase) -> BankruptcyCase:
     case.status = BankruptcyCase.STATUS_CLOSED
-    term = _terminal_stage()
+    term = terminal_stage()
     if term is not None:
         case.current_stage = term
     case.save(update_fields=["status", "current_stage", "updated_at"])
@@ -0,0 +1,56 @@
+"""Сигналы процедур: сброс кэша каталога стадий и списка АУ
+(apps/core/refcache.py) при их правке и пересчёт вычисляемых дат дела
+(services.refresh_derived_dates) при появлении/удалении их источников."""
+from django.db.models.signals import post_delete, post_save
+
+from apps.core import refcache
+
+from . import services
+
+# Модель → пространства имён refcache, которые она наполняет.
+REFERENCE_NAMESPACES = {
+    "procedure.ProcedureStage": ("procedure_stages",),
+    "procedure.ArbitrationManager": ("arbitration_managers",),
+}
+
+
+def _reference_changed(sender, **kwargs):
+    refcache.invalidate(*REFERENCE_NAMESPACES[sender._meta.label])
+
+
+for _label in REFERENCE_NAMESPACES:
+    post_save.connect(_reference_changed, sender=_label, dispatch_uid=f"refcache_save_{_label}")
+    post_delete.connect(_reference_changed, sender=_label, dispatch_uid=f"refcache_delete_{_label}")
+
+
+def _refresh(**case_filter):
+    from .models import BankruptcyCase
+
+    services.refresh_derived_dates(
+        BankruptcyCase.objects.filter(**case_filter).select_related("service__client")
+    )
+
+
+def _questionnaire_changed(sender, instance, created=True, **kwargs):
+    # Анкета не переезжает между услугами — интересны создание и удаление.
+    if created:
+        _refresh(service_id=instance.service_id)
+
+
+def _log_entry_changed(sender, instance, created=False, **kwargs):
+    # Только post_save: ресивер на post_delete лишил бы каскадное удаление
+    # клиента fast-delete'а по всему его логу. Записи из client_log.batch()
+    # (bulk_create) сигналов не шлют — «claim_prep_assigned» пачками не пишется.
+    if not created or instance.kind != "event" or not instance.client_id:
+        return
+    et = services.claim_prep_event_type()
+    if et is not None and instance.event_type_id == et.pk:
+        _refresh(service__client_id=instance.client_id)
+
+
+post_save.connect(_questionnaire_changed, sender="questionnaire.QuestionnaireResponse",
+                  dispatch_uid="procedure_dates_qr_save")
+post_delete.connect(_questionnaire_changed, sender="questionnaire.QuestionnaireResponse",
+                    dispatch_uid="procedure_dates_qr_delete")
+post_save.connect(_log_entry_changed, sender="crm.ClientLogEntry",
+                  dispatch_uid="procedure_dates_log_save")
@@ -0,0 +1,114 @@
+"""Бюджет SQL-запросов вкладки «Обзор» карточки БФЛ.
+
+`_overview_context` перерисовывается после почти каждой правки (_reload):
+число запросов не должно зависеть от числа процедур/мероприятий, а
+каталог стадий и список АУ берутся из refcache.
+"""
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from apps.crm.models import Client, Service, ServiceName
+
+from . import services, views
+from .models import (
+    KIND_REALIZATION,
+    KIND_RESTRUCTURING,
+    SCOPE_COMMON,
+    ArbitrationManager,
+    Procedure,
+    ProcedureMilestone,
+    ProcedureStage,
+)
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Сервис + дело + процедуры + мероприятия + супруг(а).
+OVERVIEW_BUDGET = 6
+# + сохранение дела/услуги, проверка закрытия, пересчёт сроков.
+UPDATE_BUDGET = 14
+
+
+@override_settings(CACHES=LOCMEM)
+class OverviewQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("lawyer", "lawyer@example.com", "x")
+        for order, (code, scope, terminal) in enumerate([
+            ("prep", SCOPE_COMMON, False),
+            ("filing", SCOPE_COMMON, False),
+            ("restr_start", KIND_RESTRUCTURING, False),
+            ("real_start", KIND_REALIZATION, False),
+            ("closed", SCOPE_COMMON, True),
+        ]):
+            ProcedureStage.objects.create(
+                code=code, name=code, kind_scope=scope, order=order, is_terminal=terminal,
+            )
+        cls.manager = ArbitrationManager.objects.create(last_name="Петров", first_name="Пётр")
+        ArbitrationManager.objects.create(last_name="Сидоров", first_name="Сидор")
+
+        spouse = Client.objects.create(first_name="Мария", last_name="Иванова")
+        debtor = Client.objects.create(first_name="Иван", last_name="Иванов", spouse=spouse)
+        name = ServiceName.objects.create(full_name="Банкротство физлиц", short_name="БФЛ")
+        cls.service = Service.objects.create(client=debtor, name=name)
+        cls.case = services.ensure_case(cls.service)
+        cls.case.filing_date = date(2026, 1, 15)
+        cls.case.save(update_fields=["filing_date"])
+        for kind in (KIND_RESTRUCTURING, KIND_REALIZATION):
+            cls._add_procedure(kind)
+
+    @classmethod
+    def _add_procedure(cls, kind):
+        proc = Procedure.objects.create(
+            case=cls.case, kind=kind, order=cls.case.procedures.count() + 1,
+            intro_date=date(2026, 3, 1), arbitr_manager=cls.manager,
+        )
+        for offset in (10, 30):
+            ProcedureMilestone.objects.create(
+                case=cls.case, procedure=proc, title=f"Мероприятие +{offset}",
+                base_date_key="proc_intro_date", offset_days=offset,
+                due_date=proc.intro_date + timedelta(days=offset),
+            )
+        return proc
+
+    def setUp(self):
+        cache.clear()
+        self.rf = RequestFactory()
+
+    def _count(self, request, view):
+        request.user = self.user
+        view(request, self.service.pk)  # прогрев refcache
+        with CaptureQueriesContext(connection) as ctx:
+            resp = view(request, self.service.pk)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def _overview(self):
+        return self._count(self.rf.get("/"), views.tab_overview)
+
+    def _update(self):
+        case = self.case
+        return self._count(self.rf.post("/", {
+            "filing_date": views._fmt(case.filing_date),
+            "claim_accept_date": "",
+            "first_hearing_date": "",
+            "first_hearing_outcome": "",
+            "date_dogovor": "",
+            "docs_dept_date": "",
+        }), views.update_case_block)
+
+    def test_tab_overview_query_budget(self):
+        self.assertLessEqual(self._overview(), OVERVIEW_BUDGET)
+
+    def test_update_case_block_query_budget(self):
+        self.assertLessEqual(self._update(), UPDATE_BUDGET)
+
+    def test_query_count_does_not_grow_with_procedures(self):
+        overview, update = self._overview(), self._update()
+        self._add_procedure(KIND_REALIZATION)
+        self.assertEqual(self._overview(), overview)
+        self.assertEqual(self._update(), update)
@@ -29,6 +29,7 @@ from apps.crm.phone_utils import (
 
 from . import services
 from .models import (
+    ALL_OUTCOMES,
     BASE_DATE_KEY_CHOICES,
     CLOSING_OUTCOMES,
     FIRST_HEARING_OUTCOMES,
@@ -115,24 +116,15 @@ def _fmt(d):
 def build_timeline_phases(case: BankruptcyCase) -> list:
     """Таймлайны стадий по фазам (до введения / процедура(ы) / окончание).
     Рендерится в шапке карточки — блок `stages_bar`."""
-    from apps.questionnaire.models import QuestionnaireResponse
-    client = case.service.client
-    qr = (QuestionnaireResponse.objects.filter(service=case.service)
-          .order_by("created_at").first())
-    date_application = (qr.created_at.date() if qr
-                        else (client.created_at.date() if client.created_at else None))
-
-    common_stages = list(ProcedureStage.objects.filter(
-        kind_scope=SCOPE_COMMON, is_active=True, is_terminal=False).order_by("order"))
-    terminal_stage = ProcedureStage.objects.filter(
-        is_terminal=True, is_active=True).order_by("order").first()
+    common_stages = services.stages_for(SCOPE_COMMON)
+    terminal_stage = services.terminal_stage()
     procedures = list(case.procedures.order_by("order"))
     cur_stage = case.current_stage_id
     cur_proc = case.current_procedure_id
 
     def _stage_date(code, proc):
         if code == "prep":
-            return date_application
+            return case.application_date
         if code == "filing":
             return case.filing_date
         if code == "accept":
@@ -145,8 +137,8 @@ def build_timeline_phases(case: BankruptcyCase) -> list:
             if code in ("restr_done", "real_done"):
                 return proc.end_date
         if code == "closed":
-            last = case.procedures.exclude(end_date=None).order_by("-order").first()
-            return last.end_date if last else None
+            ended = [p for p in procedures if p.end_date]
+            return ended[-1].end_date if ended else None
         return None
 
     def _items(stages, proc):
@@ -159,9 +151,8 @@ def build_timeline_phases(case: BankruptcyCase) -> list:
 
     phases = [{"label": "До введения процедуры", "items": _items(common_stages, None)}]
     for proc in procedures:
-        pst = list(ProcedureStage.objects.filter(
-            kind_scope=proc.kind, is_active=True, is_terminal=False).order_by("order"))
-        phases.append({"label": proc.get_kind_display(), "items": _items(pst, proc)})
+        phases.append({"label": proc.get_kind_display(),
+                       "items": _items(services.stages_for(proc.kind), proc)})
     if terminal_stage:
         phases.append({"label": "Окончание", "items": [{
             "obj": terminal_stage, "name": terminal_stage.name, "procedure_id": "",
@@ -178,18 +169,20 @@ def build_timeline_phases(case: BankruptcyCase) -> list:
 
 def _overview_context(case: BankruptcyCase, expand_proc_id=None,
                       active_person_tab="debtor") -> dict:
+    """Контекст вкладки «Обзор». Перерисовывается после почти каждой правки
+    (_reload), поэтому число запросов фиксировано: процедуры (с ФУ),
+    мероприятия, супруг(а). Каталог стадий и список АУ — из refcache,
+    вычисляемые даты услуги хранятся на деле (services.refresh_derived_dates).
+    Бюджет запросов — apps/procedure/tests.py."""
     today = timezone.localdate()
-    procedures = list(case.procedures.order_by("order"))
+    procedures = list(
+        case.procedures.order_by("order")
+        .select_related("arbitr_manager", "financial_manager__user")
+    )
 
     # Многострочный таймлайн: строка общих стадий + строка на каждую процедуру.
-    common_stages = list(
-        ProcedureStage.objects.filter(
-            kind_scope=SCOPE_COMMON, is_active=True, is_terminal=False
-        ).order_by("order")
-    )
-    terminal_stage = ProcedureStage.objects.filter(
-        is_terminal=True, is_active=True
-    ).order_by("order").first()
+    common_stages = services.stages_for(SCOPE_COMMON)
+    terminal_stage = services.terminal_stage()
     cur_stage = case.current_stage_id
     cur_proc = case.current_procedure_id
 
@@ -203,13 +196,8 @@ def _overview_context(case: BankruptcyCase, expand_proc_id=None,
     rows = [{"label": "Общие стадии", "procedure": None,
              "stages": _mark(common_stages, None)}]
     for proc in procedures:
-        stages = list(
-            ProcedureStage.objects.filter(
-                kind_scope=proc.kind, is_active=True, is_terminal=False
-            ).order_by("order")
-        )
         rows.append({"label": proc.get_kind_display(), "procedure": proc,
-                     "stages": _mark(stages, proc.id)})
+                     "stages": _mark(services.stages_for(proc.kind), proc.id)})
 
     terminal_is_current = bool(terminal_stage and terminal_stage.id == cur_stage)
 
@@ -237,31 +225,19 @@ def _overview_context(case: BankruptcyCase, expand_proc_id=None,
         "outcome_choices": outcomes_for_kind(p.kind),
     } for p in procedures]
 
-    def _mgr_label(e):
-        name = " ".join(filter(None, [e.user.last_name, e.user.first_name, e.patronymic]))
-        return name.strip() or e.user.get_full_name() or e.user.username
+    # ФУ дела и итог — по уже загруженным процедурам (свойства модели
+    # BankruptcyCase.fm_display/result_label сходили бы в БД ещё раз).
+    last_proc = procedures[-1] if procedures else None
+    fm_display = last_proc.fm_display if last_proc else "—"
+    result_label = ""
+    if case.status == BankruptcyCase.STATUS_CLOSED:
+        with_outcome = [p for p in procedures if p.outcome]
+        code = with_outcome[-1].outcome if with_outcome else case.first_hearing_outcome
+        result_label = ALL_OUTCOMES.get(code, "")
 
-    # Финуправляющие — из справочника «Арбитражные управляющие».
-    managers = [
-        {"id": str(m.id), "label": m.full_fio}
-        for m in ArbitrationManager.objects.filter(is_active=True)
-    ]
     client = case.service.client
     spouse_client = client.spouse
 
-    # Вычисляемые даты услуги (read-only):
-    # 1 — обращение/анкета: дата анкеты услуги, иначе дата внесения клиента в базу.
-    from apps.questionnaire.models import QuestionnaireResponse
-    qr = (QuestionnaireResponse.objects.filter(service=case.service)
-          .order_by("created_at").first())
-    date_application = (qr.created_at.date() if qr
-                        else (client.created_at.date() if client.created_at else None))
-    # 4 — передача на подготовку иска: дата события «claim_prep_assigned».
-    from apps.crm.models import ClientLogEntry
-    e4 = (ClientLogEntry.objects.filter(client=client, event_type__code="claim_prep_assigned")
-          .order_by("created_at").first())
-    date_claim_prep = e4.created_at.date() if e4 else None
-
     # «+ Процедура»: для ПЕРВОЙ процедуры вид определяется итогом 1-го заседания;
     # для последующих — свободный выбор.
     _FIRST_KIND = {
@@ -302,14 +278,18 @@ def _overview_context(case: BankruptcyCase, expand_proc_id=None,
         "case_first_hearing_date": _fmt(case.first_hearing_date),
         "date_dogovor": _fmt(case.service.date_dogovor),
         "case_docs_dept_date": _fmt(case.service.docs_dept_date),
-        "date_application": date_application,
-        "date_claim_prep": date_claim_prep,
+        # Вычисляемые даты услуги (read-only): 1 — обращение/анкета,
+        # 4 — передача на подготовку иска.
+        "date_application": case.application_date,
+        "date_claim_prep": case.claim_prep_date,
+        "fm_display": fm_display,
+        "result_label": result_label,
         "add_kind_locked": add_kind_locked,
         "add_kind_locked_label": add_kind_locked_label,
         "add_disabled": add_disabled,
         "add_disabled_reason": add_disabled_reason,
         "expand_proc_id": str(expand_proc_id) if expand_proc_id else "",
-        "managers": managers,
+        "managers": services.manager_choices(),
         "debtor": _person_view(client),
         "spouse": _person_view(spouse_client),
         "spouse_client": spouse_client,
@@ -922,7 +902,9 @@ def reference_milestone_edit(request, pk=None):
     if request.method == "POST":
         form = MilestoneTemplateForm(request.POST, instance=obj)
         if form.is_valid():
-            form.save()
+            tpl = form.save()
+            if obj is not None and {"base_date_key", "offset_days"} & set(form.changed_data):
+                services.apply_template_rule(tpl)
             return HttpResponse(headers={"HX-Trigger": "reloadMilestones"})
     else:
         form = MilestoneTemplateForm(instance=obj)
@@ -1321,17 +1303,11 @@ def request_generate(request, service_id, req_id):
 
 def _scan_to_storedfile(f):
     """Загрузить файл-скан в S3 → StoredFile (+ ссылка для предпросмотра)."""
-    from apps.files.models import StoredFile
-    from apps.files.s3_utils import upload_file_to_s3
-    data = f.read()
-    bucket, key = upload_file_to_s3(
-        data, prefix="procedure/correspondence", filename=f.name,
+    from apps.files.dedup import store_uploaded_file
+    return store_uploaded_file(
+        f, prefix="procedure/correspondence", filename=f.name,
         content_type=(f.content_type or "application/octet-stream"),
     )
-    return StoredFile.objects.create(
-        bucket=bucket, key=key, filename=f.name,
-        content_type=(f.content_type or ""), size=len(data),
-    )
 
 
 @never_cache
@@ -1520,14 +1496,11 @@ def request_upload(request, service_id, req_id):
     if not f or not (name.endswith(".pdf") or name.endswith(".docx")):
         return render(request, "procedure/_request_upload_doc_modal.html",
                       {"service": service, "req": req, "error": "Загрузите файл .pdf или .docx"})
-    from apps.files.models import StoredFile
-    from apps.files.s3_utils import upload_file_to_s3
     from .request_documents import DOCX_CT, _attach, _store
     is_docx = name.endswith(".docx")
     data = f.read()
     ct = f.content_type or (DOCX_CT if is_docx else "application/pdf")
-    bucket, key = upload_file_to_s3(data, prefix="procedure/requests", filename=f.name, content_type=ct)
-    sf = StoredFile.objects.create(bucket=bucket, key=key, filename=f.name, content_type=ct, size=len(data))
+    sf = _store(data, filename=f.name, content_type=ct)
     client = req.case.service.client
     emp = _actor(request)
     _attach(client, sf, emp)
@@ -1,13 +1,17 @@
 # /var/www/projects/siricrm/apps/realtime/consumers.py
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from asgiref.sync import sync_to_async
 from django.contrib.auth.models import AnonymousUser
 
-from apps.core.models import Employee
-from apps.crm.models import Client
 
-class TelegramChatConsumer(AsyncWebsocketConsumer):
+class BatchedEventsMixin:
+    """Пачка событий от apps.realtime.dispatcher — разбираем обычными хендлерами."""
+
+    async def realtime_batch(self, event):
+        for item in event["events"]:
+            await self.dispatch(item)
+
+
+class TelegramChatConsumer(BatchedEventsMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.client_id = self.scope["url_route"]["kwargs"]["client_id"]
         self.group_name = f"telegram_client_{self.client_id}"
@@ -50,7 +54,7 @@ class TelegramChatConsumer(AsyncWebsocketConsumer):
         }))
 
 
-class NotificationsConsumer(AsyncWebsocketConsumer):
+class NotificationsConsumer(BatchedEventsMixin, AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope.get("user")
         if isinstance(user, AnonymousUser) or not user.is_authenticated:
@@ -63,31 +67,13 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
             return
         self.already_connected = True
 
-        self.groups_list = []
-
-        # Личная группа пользователя — для push_toast
-        personal_group = f"user_notifications_{user.id}"
-        await self.channel_layer.group_add(personal_group, self.channel_name)
-        self.groups_list.append(personal_group)
-
-        # Глобальный канал — все сотрудники получают уведомления о новых клиентах
-        await self.channel_layer.group_add("all_employees_notifications", self.channel_name)
-        self.groups_list.append("all_employees_notifications")
-
-        # Группы клиентов сотрудника — для push_client_toast
-        try:
-            employee = await sync_to_async(Employee.objects.get)(user=user)
-            client_ids = await sync_to_async(
-                lambda: list(
-                    Client.objects.filter(employees=employee).values_list("id", flat=True)
-                )
-            )()
-            for cid in client_ids:
-                group_name = f"client_ops_{cid}"
-                await self.channel_layer.group_add(group_name, self.channel_name)
-                self.groups_list.append(group_name)
-        except Employee.DoesNotExist:
-            pass
+        # Постоянный набор групп: личная (push_toast, push_client_toast —
+        # получателей по клиенту считает сервер, см. utils.push_client_toast)
+        # и общая. Раньше здесь был group_add на каждого закреплённого
+        # клиента — тысячи вызовов Redis на connect у загруженного юриста.
+        self.groups_list = [f"user_notifications_{user.id}", "all_employees_notifications"]
+        for group in self.groups_list:
+            await self.channel_layer.group_add(group, self.channel_name)
 
         await self.accept()
 
@@ -100,8 +86,14 @@ class NotificationsConsumer(AsyncWebsocketConsumer):
 
     async def client_list_bump(self, event):
         # Невидимый маркер для JS-обработчика в dashboard.html: пришло новое
-        # сообщение в чате клиента — пусть фронт переподтянет список (если
-        # активна дефолтная сортировка и нет поиска).
+        # сообщение в чате клиента — фронт поднимает карточку наверх и
+        # обновляет время/счётчик (если активна дефолтная сортировка и нет
+        # поиска). data-mine — клиент в scope «Мои» этого сотрудника.
+        mine = ' data-mine="1"' if event.get("mine") else ""
         await self.send(
-            text_data=f'<div data-client-list-bump="{event["client_id"]}" style="display:none"></div>'
+            text_data=(
+                f'<div data-client-list-bump="{event["client_id"]}"'
+                f' data-unread="{event.get("unread", 0)}" data-time="{event.get("time", "")}"'
+                f'{mine} style="display:none"></div>'
+            )
         )
@@ -0,0 +1,154 @@
+"""Пакетная рассылка событий в channel layer.
+
+Раньше каждый push_* делал свой ``async_to_sync(group_send)``: новый event
+loop, поход в Redis, и так на каждое сообщение и каждого получателя. При
+пачке входящих WhatsApp/Telegram это сотни синхронных round-trip'ов прямо
+в Celery-таске или userbot.
+
+Здесь `send(group, event)` только кладёт событие в буфер процесса. Фоновый
+поток ждёт окно BATCH_SECONDS (REALTIME_BATCH_MS) и рассылает накопленное:
+одно сообщение channel layer на группу, все группы параллельно, в одном
+долгоживущем event loop (соединения channels_redis переиспользуются).
+
+В пачке одной группы события сжимаются (`_merge`):
+  * подряд идущие HTML-кадры одного типа (notify, chat_message) склеиваются
+    в один — OOB-фрагменты htmx независимы, порядок сохраняется;
+  * JSON-обновления одного сообщения (статус, реакции) и сигналы списка
+    клиентов — остаётся последнее.
+Несколько событий уходят как ``{"type": "realtime.batch", "events": [...]}``,
+консьюмеры разбирают их обычными хендлерами (consumers.BatchedEventsMixin).
+
+REALTIME_BATCH_MS=0 — отправлять сразу, без буфера (как раньше).
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BATCH_SECONDS = getattr(settings, "REALTIME_BATCH_MS", 150) / 1000
+
+# Типы, чьи HTML-кадры можно склеить в один (consumer шлёт event["html"] как есть).
+HTML_TYPES = {"notify", "chat_message"}
+# Тип → поле события, по которому последнее событие заменяет предыдущие.
+LATEST_WINS = {
+    "chat_message_status": "message_id",
+    "chat_message_reactions": "message_id",
+    "client_list_bump": "client_id",
+}
+
+_lock = threading.Lock()
+_pending: dict[str, list[dict]] = {}
+_wakeup = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _merge(events: list[dict]) -> list[dict]:
+    """Сжать события одной группы, сохраняя порядок."""
+    latest = {}
+    for i, event in enumerate(events):
+        field = LATEST_WINS.get(event["type"])
+        if field:
+            latest[(event["type"], event.get(field))] = i
+
+    out: list[dict] = []
+    for i, event in enumerate(events):
+        field = LATEST_WINS.get(event["type"])
+        if field and latest[(event["type"], event.get(field))] != i:
+            continue
+        prev = out[-1] if out else None
+        if event["type"] in HTML_TYPES and prev is not None and prev["type"] == event["type"]:
+            out[-1] = {"type": event["type"], "html": prev["html"] + event["html"]}
+            continue
+        out.append(event)
+    return out
+
+
+def _frame(events: list[dict]) -> dict:
+    events = _merge(events)
+    if len(events) == 1:
+        return events[0]
+    return {"type": "realtime.batch", "events": events}
+
+
+async def _send_all(layer, batch: dict[str, list[dict]]) -> None:
+    groups = list(batch)
+    results = await asyncio.gather(
+        *(layer.group_send(group, _frame(batch[group])) for group in groups),
+        return_exceptions=True,
+    )
+    for group, result in zip(groups, results):
+        if isinstance(result, BaseException):
+            logger.warning("realtime: не удалось отправить в %s: %s", group, result)
+
+
+def _take() -> dict[str, list[dict]]:
+    global _pending
+    with _lock:
+        batch, _pending = _pending, {}
+        _wakeup.clear()
+    return batch
+
+
+def _run() -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    while True:
+        _wakeup.wait()
+        # Окно: всё, что придёт за BATCH_SECONDS после первого события, уйдёт одной пачкой.
+        time.sleep(BATCH_SECONDS)
+        batch = _take()
+        if not batch:
+            continue
+        try:
+            loop.run_until_complete(_send_all(get_channel_layer(), batch))
+        except Exception:  # noqa: BLE001 — поток рассылки не должен умирать
+            logger.exception("realtime: сбой пакетной рассылки")
+
+
+def send(group: str, event: dict) -> None:
+    """Поставить событие `event` для группы `group` в ближайшую пачку."""
+    global _thread
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    if not BATCH_SECONDS:
+        async_to_sync(layer.group_send)(group, event)
+        return
+    with _lock:
+        _pending.setdefault(group, []).append(event)
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_run, name="realtime-dispatch", daemon=True)
+            _thread.start()
+        _wakeup.set()
+
+
+def flush() -> None:
+    """Отправить накопленное синхронно (выход процесса, management-команды)."""
+    batch = _take()
+    layer = get_channel_layer()
+    if batch and layer is not None:
+        async_to_sync(_send_all)(layer, batch)
+
+
+def _after_fork() -> None:
+    # Celery prefork: поток родителя в дочернем процессе не существует, а лок
+    # мог быть захвачен в момент fork — начинаем с чистого состояния.
+    global _lock, _pending, _wakeup, _thread
+    _lock = threading.Lock()
+    _pending = {}
+    _wakeup = threading.Event()
+    _thread = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(flush)
@@ -0,0 +1,88 @@
+"""
+Нагрузочный тест /ws/notifications/: открывает --connections одновременных
+websocket-соединений к NotificationsConsumer и печатает задержку connect
+(p50/p95/max), затем шлёт один тост в личную группу пользователя и меряет,
+за сколько он дошёл до всех соединений.
+
+Соединения открываются в процессе (channels.testing.WebsocketCommunicator,
+без daphne и сети), channel layer — из settings (channels-redis). Меряется
+именно работа consumer'а: group_add/group_discard в Redis и доставка.
+
+    python manage.py bench_ws_connect
+    python manage.py bench_ws_connect --connections 500 --username ivanov
+"""
+import asyncio
+import statistics
+import time
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.realtime.consumers import NotificationsConsumer
+
+
+def _summary(samples: list[float]) -> str:
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return "нет данных"
+    p95 = statistics.quantiles(ms, n=20)[-1] if len(ms) > 1 else ms[0]
+    return f"p50 {statistics.median(ms):7.1f} мс  p95 {p95:7.1f} мс  max {ms[-1]:7.1f} мс"
+
+
+async def _connect(app, user):
+    comm = WebsocketCommunicator(app, "/ws/notifications/")
+    comm.scope["user"] = user
+    started = time.perf_counter()
+    connected, _ = await comm.connect(timeout=30)
+    return comm, connected, time.perf_counter() - started
+
+
+async def _receive(comm, started):
+    await comm.receive_from(timeout=30)
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = "Load-test websocket connect latency of NotificationsConsumer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", type=int, default=200, help="Одновременных соединений")
+        parser.add_argument("--username", help="От чьего имени (по умолчанию — первый активный сотрудник)")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True, employee__isnull=False)
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.order_by("pk").first()
+        if user is None:
+            raise CommandError("Нет подходящего пользователя")
+        if get_channel_layer() is None:
+            raise CommandError("CHANNEL_LAYERS не настроен")
+        asyncio.run(self._run(user, options["connections"]))
+
+    async def _run(self, user, n):
+        app = NotificationsConsumer.as_asgi()
+        started = time.perf_counter()
+        results = await asyncio.gather(*(_connect(app, user) for _ in range(n)))
+        total = time.perf_counter() - started
+        comms = [comm for comm, ok, _ in results if ok]
+        self.stdout.write(
+            f"connect: {len(comms)}/{n} за {total:.2f}s  "
+            f"{_summary([elapsed for _, ok, elapsed in results if ok])}"
+        )
+        try:
+            started = time.perf_counter()
+            await get_channel_layer().group_send(
+                f"user_notifications_{user.id}", {"type": "notify", "html": "<div>bench</div>"},
+            )
+            delivered = await asyncio.gather(
+                *(_receive(comm, started) for comm in comms), return_exceptions=True,
+            )
+            ok = [d for d in delivered if isinstance(d, float)]
+            self.stdout.write(f"доставка: {len(ok)}/{len(comms)}  {_summary(ok)}")
+        finally:
+            started = time.perf_counter()
+            await asyncio.gather(*(comm.disconnect() for comm in comms), return_exceptions=True)
+            self.stdout.write(f"disconnect: {time.perf_counter() - started:.2f}s")
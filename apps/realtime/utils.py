@@ -1,12 +1,20 @@
 #/siricrm/apps/realtime/utils.py
-from asgiref.sync import async_to_sync
+from functools import lru_cache
+
 from channels.layers import get_channel_layer
+from django.core.cache import cache
 from django.template.loader import render_to_string
+from django.utils import timezone
 
 from apps.crm.models import Message, Client  # твои модели
 
+from . import dispatcher
+
 channel_layer = get_channel_layer()
 
+# Кто видит клиента в списке чатов — кэш на время «пачки» сообщений клиента.
+VIEWERS_TTL = 60
+
 def push_toast(user, text: str, level: str = "info"):
     """
     Тост одному пользователю (по user.id), если тебе это всё ещё нужно.
@@ -25,7 +33,7 @@ def push_toast(user, text: str, level: str = "info"):
         },
     )
 
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"user_notifications_{user.id}",
         {"type": "notify", "html": html},
     )
@@ -65,7 +73,7 @@ def push_chat_message(msg: Message):
         "is_sent": msg.is_sent, 
     }
 
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"telegram_client_{msg.client_id}",
         {
             "type": "chat_message",
@@ -75,18 +83,75 @@ def push_chat_message(msg: Message):
         },
     )
 
-    # Сигнал «у клиента <id> новое сообщение» — всем онлайн-сотрудникам, чтобы
-    # их левый список клиентов в чат-панели переподтянулся (карточка всплывёт
-    # наверх) если sort=default и нет поиска. См. dashboard.html listener.
-    async_to_sync(channel_layer.group_send)(
-        "all_employees_notifications",
-        {"type": "client_list_bump", "client_id": str(msg.client_id)},
+    # Сигнал «у клиента <id> новое сообщение» — только тем, у кого клиент есть
+    # в списке чатов (а не всем онлайн): фронт поднимает карточку наверх и
+    # обновляет время/счётчик на месте, список перезапрашивает, только если
+    # карточки на странице нет. См. dashboard.html listener.
+    from apps.crm.models import ClientChatSummary
+    unread = (ClientChatSummary.objects.filter(pk=msg.client_id)
+              .values_list("unread_count", flat=True).first()) or 0
+    bump = {
+        "type": "client_list_bump",
+        "client_id": str(msg.client_id),
+        "unread": unread,
+        "time": timezone.localtime(msg.telegram_date or msg.created_at or timezone.now()).strftime("%H:%M"),
+    }
+    viewers = client_viewer_user_ids(msg.client)
+    for user_id in viewers["mine"]:
+        dispatcher.send(f"user_notifications_{user_id}", {**bump, "mine": True})
+    for user_id in viewers["other"]:
+        dispatcher.send(f"user_notifications_{user_id}", bump)
+
+
+def _all_clients_viewer_user_ids() -> list:
+    """user.id тех, кому виден весь список клиентов (см. permissions.can_view_all_clients)."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+
+    from apps.core.permissions import MANAGEMENT_ROLES
+    return list(
+        get_user_model().objects.filter(is_active=True).filter(
+            Q(is_superuser=True)
+            | Q(employee__role__in=[*MANAGEMENT_ROLES, "accountant"])
+            | Q(employee__is_owner=True)
+            | Q(employee__department__sees_all_clients=True)
+        ).values_list("id", flat=True)
     )
 
+
+def client_viewer_user_ids(client: Client) -> dict:
+    """user.id сотрудников, видящих клиента: {"mine", "other", "recipients"}.
+
+    mine — клиент в их scope «Мои» (ответственный или исполнитель услуги),
+    other — остальные, кому он виден (отдел этапа услуги, «видят всех»),
+    recipients — работающие с клиентом (notifications.recipients_for_client).
+    Кэш VIEWERS_TTL: при пачке сообщений одного клиента считаем один раз.
+    """
+    def load():
+        from apps.core.models import Employee
+        from apps.notifications.services import recipients_for_client
+        mine = set(Employee.objects.filter(clients=client, is_active=True, user__isnull=False)
+                   .values_list("user_id", flat=True))
+        mine |= set(Employee.objects.filter(assigned_services__client=client, is_active=True,
+                                            user__isnull=False)
+                    .values_list("user_id", flat=True))
+        recipients = set(recipients_for_client(client).filter(user__isnull=False)
+                         .values_list("user_id", flat=True))
+        other = recipients | set(cache.get_or_set(
+            "realtime:viewers:all", _all_clients_viewer_user_ids, VIEWERS_TTL))
+        return {
+            "mine": sorted(mine),
+            "other": sorted(other - mine),
+            "recipients": sorted(recipients),
+        }
+
+    return cache.get_or_set(f"realtime:client_viewers:{client.pk}", load, VIEWERS_TTL)
+
+
 def push_client_toast(client: Client, text: str, level: str = "info"):
     """
-    Показать тост всем сотрудникам, закреплённым за клиентом.
-    Если у клиента нет назначенных сотрудников — рассылаем всем онлайн.
+    Показать тост сотрудникам, работающим с клиентом (recipients_for_client) —
+    в их личные группы. Если таких нет — рассылаем всем онлайн.
     """
     if channel_layer is None:
         return
@@ -100,16 +165,15 @@ def push_client_toast(client: Client, text: str, level: str = "info"):
         },
     )
 
-    has_employees = client.employees.exists()
-
-    if has_employees:
-        async_to_sync(channel_layer.group_send)(
-            f"client_ops_{client.id}",
+    recipients = client_viewer_user_ids(client)["recipients"]
+    for user_id in recipients:
+        dispatcher.send(
+            f"user_notifications_{user_id}",
             {"type": "notify", "html": html},
         )
-    else:
+    if not recipients:
         # Новый клиент без куратора — уведомляем всех сотрудников
-        async_to_sync(channel_layer.group_send)(
+        dispatcher.send(
             "all_employees_notifications",
             {"type": "notify", "html": html},
         )
@@ -128,7 +192,7 @@ def push_message_reactions(msg: Message):
     if channel_layer is None:
         return
 
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"telegram_client_{msg.client_id}",
         {
             "type": "chat_message_reactions",
@@ -151,25 +215,36 @@ def push_messenger_status_update(client: Client):
 
     from apps.crm.models import ClientEmployee
 
-    for ce in ClientEmployee.objects.filter(client=client).select_related('employee__user'):
-        html = render_to_string("crm/partials/messenger_status_oob.html", {
-            "client": client, "status": ce.messenger_status,
-        })
-        async_to_sync(channel_layer.group_send)(
-            f"user_notifications_{ce.employee.user.id}",
-            {"type": "notify", "html": html},
+    # Разметка зависит только от статуса — рендерим по разу на статус.
+    rendered = {}
+    rows = (ClientEmployee.objects.filter(client=client, employee__user__isnull=False)
+            .values_list("employee__user_id", "messenger_status"))
+    for user_id, status in rows:
+        if status not in rendered:
+            rendered[status] = render_to_string("crm/partials/messenger_status_oob.html", {
+                "client": client, "status": status,
+            })
+        dispatcher.send(
+            f"user_notifications_{user_id}",
+            {"type": "notify", "html": rendered[status]},
         )
 
 
-def _notif_badge_html(employee):
-    """OOB-разметка бейджа колокола (число новых уведомлений сотрудника)."""
-    from apps.notifications.models import Notification
-    count = Notification.objects.filter(
-        recipient=employee, status=Notification.STATUS_NEW,
-    ).count()
+@lru_cache(maxsize=256)
+def _badge_html(count: int) -> str:
+    # Разметка зависит только от числа — рендерим по разу на значение.
     return render_to_string("notifications/partials/badge_oob.html", {"count": count})
 
 
+def _notif_badge_html(employee):
+    """OOB-разметка бейджа колокола (число новых уведомлений сотрудника).
+
+    Число — из счётчика в Redis (apps/notifications/counters.py), не COUNT.
+    """
+    from apps.notifications import counters
+    return _badge_html(counters.get(employee.pk))
+
+
 def push_notification(notification):
     """Живое появление уведомления у получателя: обновить бейдж + маркер для JS
     (звук/подтянуть открытый список уведомлений)."""
@@ -179,16 +254,40 @@ def push_notification(notification):
     if not emp.user_id:
         return
     html = _notif_badge_html(emp) + '<div data-notification-new="1" style="display:none"></div>'
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"user_notifications_{emp.user_id}", {"type": "notify", "html": html},
     )
 
 
+def push_notifications(notifications):
+    """push_notification для пачки: по одному бейджу на получателя.
+
+    Счётчики новых — из Redis (холодные — одним запросом к БД), разметка
+    бейджа — по разу на значение счётчика.
+    """
+    if channel_layer is None:
+        return
+    from apps.core.models import Employee
+    from apps.notifications import counters
+
+    emp_ids = {n.recipient_id for n in notifications}
+    users = dict(Employee.objects.filter(pk__in=emp_ids, user__isnull=False)
+                 .values_list("pk", "user_id"))
+    if not users:
+        return
+    counts = counters.get_many(users)
+    for emp_id, user_id in users.items():
+        html = _badge_html(counts[emp_id]) + '<div data-notification-new="1" style="display:none"></div>'
+        dispatcher.send(
+            f"user_notifications_{user_id}", {"type": "notify", "html": html},
+        )
+
+
 def push_notification_badge(employee):
     """Просто пересчитать бейдж у сотрудника (после реакции на уведомление)."""
     if channel_layer is None or not employee.user_id:
         return
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"user_notifications_{employee.user_id}",
         {"type": "notify", "html": _notif_badge_html(employee)},
     )
@@ -202,7 +301,7 @@ def push_message_status(msg: Message):
     if channel_layer is None:
         return
 
-    async_to_sync(channel_layer.group_send)(
+    dispatcher.send(
         f"telegram_client_{msg.client_id}",
         {
             "type": "chat_message_status",
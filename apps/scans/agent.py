@@ -11,8 +11,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from apps.files.models import StoredFile
-from apps.files.s3_utils import upload_file_to_s3
+from apps.files.dedup import store_uploaded_file
 
 from .models import IncomingScan
 
@@ -61,24 +60,19 @@ def agent_intake(request):
     content_type = (upload.content_type or "").lower()
     if not content_type or content_type == "application/octet-stream":
         content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
-    file_bytes = upload.read()
-
     try:
-        bucket, key = upload_file_to_s3(
-            file_bytes, prefix="scans/inbox",
+        stored = store_uploaded_file(
+            upload, prefix="scans/inbox",
             filename=filename, content_type=content_type,
         )
     except Exception:
         return JsonResponse({"error": "storage_failed"}, status=502)
 
-    stored = StoredFile.objects.create(
-        bucket=bucket, key=key, filename=filename,
-        content_type=content_type, size=len(file_bytes),
-    )
+    size = stored.size
     device = (request.POST.get("device") or "")[:255]
     scan = IncomingScan.objects.create(
         stored_file=stored, filename=filename,
-        size=len(file_bytes), content_type=content_type,
+        size=size, content_type=content_type,
         source=IncomingScan.SOURCE_AGENT,
         source_meta=device,
     )
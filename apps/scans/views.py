@@ -12,8 +12,9 @@ from django.views.decorators.http import require_POST
 from apps.core.permissions import can_handle_scans, get_employee
 from apps.crm.models import Client, LegalEntity, Service
 from apps.files.folder_utils import build_tree, create_default_folders, get_or_create_root
-from apps.files.models import ClientFile, ClientFolder, StoredFile
-from apps.files.s3_utils import delete_file_from_s3, upload_file_to_s3
+from apps.files.dedup import store_uploaded_file
+from apps.files.models import ClientFile, ClientFolder
+from apps.files.s3_utils import delete_file_from_s3
 
 from .models import IncomingScan
 
@@ -167,21 +168,16 @@ def manual_upload(request):
             f.content_type or mimetypes.guess_type(f.name)[0]
             or "application/octet-stream"
         )
-        file_bytes = f.read()
         try:
-            bucket, key = upload_file_to_s3(
-                file_bytes, prefix="scans/inbox",
+            stored = store_uploaded_file(
+                f, prefix="scans/inbox",
                 filename=f.name, content_type=content_type,
             )
         except Exception:
             continue
-        stored = StoredFile.objects.create(
-            bucket=bucket, key=key, filename=f.name,
-            content_type=content_type, size=len(file_bytes),
-        )
         IncomingScan.objects.create(
             stored_file=stored, filename=f.name,
-            size=len(file_bytes), content_type=content_type,
+            size=stored.size, content_type=content_type,
             source=IncomingScan.SOURCE_MANUAL, source_meta=meta,
         )
     return render(request, "scans/partials/scan_list.html", _list_ctx(request))
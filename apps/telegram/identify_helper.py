@@ -19,7 +19,6 @@ import asyncio
 import logging
 import os
 
-import requests
 from telethon import TelegramClient
 from telethon.sessions import StringSession
 from telethon.tl.functions.contacts import AddContactRequest, DeleteContactsRequest
@@ -29,42 +28,26 @@ from django.conf import settings
 logger = logging.getLogger("userbot")
 
 
-DADATA_CLEAN_URL = "https://cleaner.dadata.ru/api/v1/clean/name"
-
-
 def _parse_fio_via_dadata(raw: str) -> dict:
     """
-    Отправляет строку в DaData Clean API и возвращает распарсенные
-    surname/name/patronymic + qc (0=уверенно, 1=частично, 2=нет).
+    Отправляет строку в DaData Clean API (через шлюз apps/crm/dadata.py)
+    и возвращает распарсенные surname/name/patronymic + qc
+    (0=уверенно, 1=частично, 2=нет).
     """
-    api_key = getattr(settings, "DADATA_API_KEY", "")
-    secret_key = getattr(settings, "DADATA_SECRET_KEY", "")
-    if not api_key or not secret_key:
+    from apps.crm import dadata
+
+    if not dadata.is_configured("clean/name"):
         return {"ok": False, "error": "DADATA_API_KEY/SECRET_KEY не заданы"}
-    try:
-        resp = requests.post(
-            DADATA_CLEAN_URL,
-            json=[raw],
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "Authorization": f"Token {api_key}",
-                "X-Secret": secret_key,
-            },
-            timeout=10,
-        )
-        resp.raise_for_status()
-        item = resp.json()[0]
-        return {
-            "ok": True,
-            "surname": (item.get("surname") or "").strip(),
-            "name": (item.get("name") or "").strip(),
-            "patronymic": (item.get("patronymic") or "").strip(),
-            "qc": item.get("qc", 2),
-        }
-    except Exception as e:
-        logger.warning(f"DaData parse failed for {raw!r}: {e}")
-        return {"ok": False, "error": str(e)}
+    item = dadata.clean_name(raw)
+    if item is None:
+        return {"ok": False, "error": "DaData не ответила"}
+    return {
+        "ok": True,
+        "surname": (item.get("surname") or "").strip(),
+        "name": (item.get("name") or "").strip(),
+        "patronymic": (item.get("patronymic") or "").strip(),
+        "qc": item.get("qc", 2),
+    }
 
 
 async def _async_identify(telegram_id: int, try_add_contact: bool = True) -> dict:
@@ -0,0 +1,307 @@
+"""Постоянный отправитель исходящих Telegram внутри процесса userbot.
+
+Раньше `send_telegram_message_task` на каждое сообщение поднимал новый
+event loop и новое подключение `TelegramClient` (+ иногда
+``get_dialogs(limit=200)`` для резолва получателя) — секунды на сообщение
+и шторм переподключений при рассылках.
+
+Теперь Celery-задача кладёт задание в Redis-очередь (`enqueue`), а
+`SenderService` в процессе userbot разбирает её тем же подключённым
+клиентом, что слушает входящие:
+
+* задания берутся пачкой (до TELEGRAM_SEND_BATCH_SIZE), сообщения пачки
+  читаются из БД одним запросом;
+* разрезолвленные получатели кэшируются (`EntityCache`);
+* между отправками — минимальная пауза, FloodWait общий для всех
+  процессов (`telegram_sender.note_flood_wait`): задание возвращается в
+  голову очереди и ждёт;
+* результат фиксируется так же, как раньше в задаче
+  (`telegram_sender.apply_send_result` → push_message_status).
+
+Взятые задания лежат в списке «в работе» до завершения — после падения
+процесса `requeue_inflight` возвращает их в очередь (уже отправленные
+отсекаются по Message.is_sent). Пока сервис жив, он держит heartbeat
+(отдельной asyncio-задачей, независимо от цикла отправки); без него
+задача шлёт сама, как раньше (`is_running`), соблюдая тот же FloodWait.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger("userbot")
+
+QUEUE_KEY = "tg:send:queue"
+INFLIGHT_KEY = "tg:send:inflight"
+HEARTBEAT_KEY = "tg:send:heartbeat"
+HEARTBEAT_TTL = 60
+ENTITY_CACHE_SIZE = 5000
+
+
+def _redis():
+    import redis  # noqa: WPS433
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def enqueue(kind: str, **payload) -> None:
+    """Поставить задание отправителю: kind = "message" | "reaction"."""
+    job = {"kind": kind, "queued_at": time.time(), **payload}
+    _redis().rpush(QUEUE_KEY, json.dumps(job))
+
+
+def is_running() -> bool:
+    """Жив ли отправитель в userbot (есть свежий heartbeat)."""
+    try:
+        return bool(_redis().exists(HEARTBEAT_KEY))
+    except Exception:  # noqa: BLE001
+        logger.warning("TG sender: Redis недоступен — шлём напрямую")
+        return False
+
+
+class RateLimiter:
+    """Минимальная пауза между отправками + общий FloodWait аккаунта."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._last = 0.0
+
+    async def wait(self) -> None:
+        from apps.telegram.telegram_sender import flood_wait_remaining
+
+        remaining = await sync_to_async(flood_wait_remaining)()
+        if remaining:
+            logger.info("⏳ TG sender: FloodWait, ждём %.0fs", remaining)
+            await asyncio.sleep(remaining)
+        delay = self._last + self.min_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self._last = time.monotonic()
+
+
+class EntityCache:
+    """LRU telegram_id → input-entity получателя."""
+
+    def __init__(self, size: int = ENTITY_CACHE_SIZE):
+        self.size = size
+        self._items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, client, telegram_id: int, username: str | None = None):
+        from apps.telegram.telegram_sender import _resolve_peer
+
+        peer = self._items.get(telegram_id)
+        if peer is not None:
+            self._items.move_to_end(telegram_id)
+            self.hits += 1
+            return peer
+        self.misses += 1
+        peer = await _resolve_peer(client, telegram_id, username)
+        self._items[telegram_id] = peer
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+        return peer
+
+    def drop(self, telegram_id: int) -> None:
+        self._items.pop(telegram_id, None)
+
+
+def _load_messages(ids) -> dict:
+    from apps.crm.models import Message
+    return {
+        str(pk): m for pk, m in Message.objects.select_related(
+            "client", "file", "reply_to", "employee__user",
+        ).in_bulk(ids).items()
+    }
+
+
+class SenderService:
+    """Цикл разбора очереди исходящих на подключённом клиенте userbot."""
+
+    def __init__(self, client):
+        self.client = client
+        self.limiter = RateLimiter(settings.TELEGRAM_SEND_MIN_INTERVAL_MS / 1000)
+        self.entities = EntityCache()
+        self.batch_size = max(1, settings.TELEGRAM_SEND_BATCH_SIZE)
+        self.sent = 0
+
+    async def run(self) -> None:
+        import redis.asyncio as aioredis  # noqa: WPS433
+
+        r = aioredis.from_url(settings.REDIS_URL)
+        await self.requeue_inflight(r)
+        logger.info("📮 TG sender started (batch=%d)", self.batch_size)
+        heartbeat = asyncio.create_task(self._heartbeat(r))
+        try:
+            await self._loop(r)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, r) -> None:
+        """Heartbeat отдельной задачей: FloodWait-пауза или долгая пачка в
+        цикле разбора не должны его просрочить — иначе Celery подключится
+        к той же сессии вторым клиентом."""
+        while True:
+            try:
+                # Без подключения heartbeat не пишем — Celery отправит сам.
+                if self.client.is_connected():
+                    await r.set(HEARTBEAT_KEY, "ok", ex=HEARTBEAT_TTL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                logger.warning("TG sender heartbeat error: %s", e)
+            await asyncio.sleep(HEARTBEAT_TTL / 3)
+
+    async def _loop(self, r) -> None:
+        while True:
+            try:
+                if not self.client.is_connected():
+                    await asyncio.sleep(5)
+                    continue
+                first = await r.blmove(
+                    QUEUE_KEY, INFLIGHT_KEY, HEARTBEAT_TTL // 3, "LEFT", "RIGHT",
+                )
+                if first is None:
+                    continue
+                raws = [first]
+                while len(raws) < self.batch_size:
+                    raw = await r.lmove(QUEUE_KEY, INFLIGHT_KEY, "LEFT", "RIGHT")
+                    if raw is None:
+                        break
+                    raws.append(raw)
+                await self._process_batch(r, raws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa: BLE001
+                logger.exception("TG sender loop error: %s", e)
+                await asyncio.sleep(5)
+
+    @staticmethod
+    async def requeue_inflight(r) -> None:
+        """Вернуть в голову очереди задания, взятые до падения процесса."""
+        moved = 0
+        while await r.lmove(INFLIGHT_KEY, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+            moved += 1
+        if moved:
+            logger.warning("📮 TG sender: %d незавершённых заданий возвращено в очередь", moved)
+
+    async def _process_batch(self, r, raws: list) -> None:
+        jobs = []
+        for raw in raws:
+            try:
+                jobs.append((raw, json.loads(raw)))
+            except ValueError:
+                logger.error("TG sender: битое задание %r", raw[:200])
+                await r.lrem(INFLIGHT_KEY, 1, raw)
+
+        ids = {job["message_id"] for _, job in jobs if job.get("message_id")}
+        messages = await sync_to_async(_load_messages)(ids)
+        started = time.monotonic()
+
+        for idx, (raw, job) in enumerate(jobs):
+            msg = messages.get(job.get("message_id"))
+            try:
+                if msg is None:
+                    logger.error("TG sender: message %s not found", job.get("message_id"))
+                elif job["kind"] == "reaction":
+                    await self._send_reaction(msg, job["emoji"])
+                elif not await self._send_message(msg):
+                    # FloodWait: это и оставшиеся задания — обратно в голову
+                    # очереди в исходном порядке.
+                    for rest_raw, _ in reversed(jobs[idx:]):
+                        await r.lrem(INFLIGHT_KEY, 1, rest_raw)
+                        await r.lpush(QUEUE_KEY, rest_raw)
+                    return
+            except Exception as e:  # noqa: BLE001
+                logger.exception("TG sender: job %s failed: %s", job, e)
+                if msg is not None and job["kind"] == "message":
+                    await sync_to_async(self._mark_failed)(msg, e)
+            await r.lrem(INFLIGHT_KEY, 1, raw)
+            latency = time.time() - job.get("queued_at", time.time())
+            logger.info(
+                "📤 TG sender: %s %s done in %.2fs from enqueue",
+                job["kind"], job.get("message_id"), latency,
+            )
+
+        logger.info(
+            "📮 TG sender: batch=%d за %.2fs (sent total=%d, peers hit/miss=%d/%d)",
+            len(jobs), time.monotonic() - started, self.sent,
+            self.entities.hits, self.entities.misses,
+        )
+
+    async def _send_message(self, msg) -> bool:
+        """Отправить Message. False — упёрлись в FloodWait, задание повторить."""
+        from apps.telegram.telegram_sender import (
+            apply_send_result, message_send_params, send_telegram_message,
+        )
+
+        if msg.is_sent:
+            return True  # повтор после падения — уже ушло
+        params = await sync_to_async(message_send_params)(msg)
+        telegram_id = params["telegram_id"]
+        try:
+            peer = await self.entities.get(self.client, telegram_id, params.get("username"))
+        except (ValueError, TypeError) as e:
+            await sync_to_async(apply_send_result)(
+                msg, {"success": False, "message_id": None, "error": str(e)},
+            )
+            return True
+
+        await self.limiter.wait()
+        result = await send_telegram_message(**params, client=self.client, peer=peer)
+        if result.get("flood_wait"):
+            return False
+        if not result["success"]:
+            # Протухший access_hash — при следующей отправке резолвим заново.
+            self.entities.drop(telegram_id)
+        else:
+            self.sent += 1
+        await sync_to_async(apply_send_result)(msg, result)
+        return True
+
+    async def _send_reaction(self, msg, emoji: str) -> None:
+        from telethon.errors import FloodWaitError
+        from telethon.tl.functions.messages import SendReactionRequest
+        from telethon.tl.types import ReactionEmoji
+
+        from apps.crm.tasks import _save_reaction_locally
+        from apps.telegram.telegram_sender import note_flood_wait
+
+        if not msg.telegram_message_id or not msg.client.telegram_id:
+            logger.warning("TG sender: no IDs for reaction on %s", msg.id)
+            return
+        peer = await self.entities.get(self.client, msg.client.telegram_id, msg.client.username)
+        await self.limiter.wait()
+        try:
+            await self.client(SendReactionRequest(
+                peer=peer,
+                msg_id=int(msg.telegram_message_id),
+                reaction=[ReactionEmoji(emoticon=emoji)],
+            ))
+        except FloodWaitError as e:
+            # Реакцию не повторяем, но паузу соблюдают все отправки.
+            await sync_to_async(note_flood_wait)(e.seconds)
+            raise
+        # Telegram не шлёт echo для собственных реакций — обновляем БД сами
+        await sync_to_async(_save_reaction_locally)(msg, emoji)
+
+    @staticmethod
+    def _mark_failed(msg, exc) -> None:
+        from apps.realtime.utils import push_message_status
+
+        msg.refresh_from_db(fields=["is_sent", "is_failed"])
+        if msg.is_sent or msg.is_failed:
+            return
+        msg.is_failed = True
+        msg.error_text = (str(exc) or "send failed")[:500]
+        msg.save(update_fields=["is_failed", "error_text"])
+        try:
+            push_message_status(msg)
+        except Exception:  # noqa: BLE001
+            pass
@@ -2,7 +2,10 @@
 
 import logging
 import os
+import time
+
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.sessions import StringSession
 from telethon.tl.types import PeerUser, DocumentAttributeFilename, DocumentAttributeAudio
 from django.conf import settings
@@ -17,7 +20,10 @@ logger = logging.getLogger('userbot')
 async def get_telegram_client():
     """
     Создаёт новый Telegram клиент для текущего event loop.
-    Вызывается при каждой отправке сообщения.
+
+    Запасной путь: штатно исходящие идут через постоянный клиент userbot'а
+    (apps/telegram/sender_service.py), отдельное подключение нужно, только
+    когда userbot не запущен.
     """
     session_string = os.getenv('TELEGRAM_SESSION_STRING', '')
     
@@ -77,6 +83,8 @@ async def send_telegram_message(
     parse_mode: str = 'html',
     reply_to_msg_id: int = None,
     username: str = None,
+    client=None,
+    peer=None,
 ) -> dict:
     """
     Отправка сообщения через userbot с поддержкой медиа
@@ -89,17 +97,22 @@ async def send_telegram_message(
         file_name: Имя файла для отображения
         message_type: Тип сообщения (text, image, video, audio, document, voice)
         parse_mode: Режим парсинга ('html' или 'markdown')
+        client: уже подключённый клиент (sender_service) — тогда он не
+            создаётся и не отключается; peer — уже разрезолвленный получатель.
     
     Returns:
-        dict с полями success, message_id, error
+        dict с полями success, message_id, error (+ flood_wait, секунд,
+        если Telegram попросил подождать)
     """
-    client = None
+    own_client = client is None
     _tmp_path = None
     try:
-        # Создаём новый клиент для текущего event loop
-        client = await get_telegram_client()
+        if own_client:
+            # Создаём новый клиент для текущего event loop
+            client = await get_telegram_client()
 
-        peer = await _resolve_peer(client, telegram_id, username)
+        if peer is None:
+            peer = await _resolve_peer(client, telegram_id, username)
 
         # Отправка текстового сообщения
         if message_type == "text" or (not file_path and not file_bytes):
@@ -230,6 +243,16 @@ async def send_telegram_message(
             'error': None
         }
     
+    except FloodWaitError as e:
+        logger.warning(f"⏳ FloodWait {e.seconds}s on send to {telegram_id}")
+        note_flood_wait(e.seconds)
+        return {
+            'success': False,
+            'message_id': None,
+            'error': str(e),
+            'flood_wait': e.seconds,
+        }
+
     except Exception as e:
         logger.exception(f"❌ Failed to send message to {telegram_id}: {e}")
         return {
@@ -239,7 +262,7 @@ async def send_telegram_message(
         }
     
     finally:
-        if client:
+        if own_client and client:
             try:
                 await client.disconnect()
             except:
@@ -252,6 +275,92 @@ async def send_telegram_message(
                 pass
 
 
+# ─── Общий лимит FloodWait ─────────────────────────────────
+# Один аккаунт userbot'а на все процессы: если Telegram вернул FloodWait,
+# пауза действует и для sender_service, и для запасного пути из Celery.
+
+_FLOOD_KEY = "tg:send:flood_until"
+
+
+def note_flood_wait(seconds: int) -> None:
+    from django.core.cache import cache
+    until = time.time() + int(seconds)
+    cache.set(_FLOOD_KEY, until, timeout=int(seconds) + 5)
+
+
+def flood_wait_remaining() -> float:
+    """Сколько секунд ещё действует FloodWait (0 — можно слать)."""
+    from django.core.cache import cache
+    until = cache.get(_FLOOD_KEY) or 0
+    return max(0.0, until - time.time())
+
+
+# ─── Подготовка и фиксация результата (общие для очереди и Celery) ─────
+
+def message_send_params(message) -> dict:
+    """kwargs для send_telegram_message по Message (файл — из S3)."""
+    params = {
+        'telegram_id': message.client.telegram_id,
+        'text': message.content,
+        'message_type': message.message_type,
+        'username': message.client.username or None,
+    }
+    if message.file:
+        from apps.files.s3_utils import download_file_from_s3
+        params['file_bytes'] = download_file_from_s3(message.file.bucket, message.file.key)
+        params['file_name'] = message.file.filename
+        logger.info(f"📦 Downloaded file {message.file.filename} from S3 for message {message.id}")
+    if message.reply_to_id and message.reply_to and message.reply_to.telegram_message_id:
+        params['reply_to_msg_id'] = int(message.reply_to.telegram_message_id)
+    return params
+
+
+def apply_send_result(message, result: dict) -> None:
+    """Записать результат отправки в Message и оповестить UI.
+
+    Успех: is_sent + telegram_message_id, сводка чата, push_message_status,
+    тост сотруднику, событие в ленте клиента. Провал: is_failed + текст
+    ошибки — иначе сообщение висит ⏳ «отправляется» вечно.
+    """
+    if result['success']:
+        message.is_sent = True
+        message.telegram_message_id = result['message_id']
+        message.sent_at = timezone.now()
+        message.telegram_date = timezone.now()
+        message.save(update_fields=['is_sent', 'telegram_message_id', 'sent_at', 'telegram_date'])
+        logger.info(f"✅ Message {message.id} sent successfully")
+
+        from apps.crm.chat_summary import record_message
+        record_message(message)
+
+        try:
+            from apps.realtime.utils import push_message_status, push_toast
+            push_message_status(message)
+            if message.employee and message.employee.user:
+                push_toast(message.employee.user, "Сообщение отправлено", level="success")
+        except Exception as e:
+            logger.warning(f"Failed to push WS update: {e}")
+
+        try:
+            from apps.crm.event_logger import log_messenger_message
+            log_messenger_message(message.client, message, message.employee)
+        except Exception as e:
+            logger.warning(f"Failed to log messenger event: {e}")
+        return
+
+    logger.error(f"❌ Failed to send message {message.id}: {result['error']}")
+    message.is_failed = True
+    message.error_text = (str(result.get('error') or 'unknown'))[:500]
+    message.save(update_fields=['is_failed', 'error_text'])
+    try:
+        from apps.realtime.utils import push_toast, push_message_status
+        push_message_status(message)
+        if message.employee and message.employee.user:
+            push_toast(message.employee.user, f"Ошибка отправки: {result['error']}", level="error")
+    except Exception as e:
+        logger.warning(f"Failed to push toast: {e}")
+
+
 def create_message_and_store_file(*, client, text=None, file=None, employee=None) -> Message:
     """
     Создаёт Message и при наличии файла:
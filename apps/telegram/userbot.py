@@ -152,6 +152,10 @@ async def import_message_history(telegram_id: int, limit: int = 100):
             exists = await sync_to_async(
                 Message.objects.filter(telegram_message_id=msg.id).exists
             )()
+            if not exists:
+                # Старые сообщения могли уже уехать в MessageArchive.
+                from apps.crm.message_archive import is_archived
+                exists = await sync_to_async(is_archived)(telegram_message_id=msg.id)
             if exists:
                 continue
 
@@ -180,6 +184,9 @@ async def import_message_history(telegram_id: int, limit: int = 100):
             imported_count += 1
 
         logger.info(f"Imported {imported_count} messages for client {telegram_id}")
+        if imported_count:
+            from apps.crm.chat_summary import rebuild
+            await sync_to_async(rebuild)([db_client.pk])
 
     except Exception as e:
         logger.exception(f"Error importing history for {telegram_id}: {e}")
@@ -376,8 +383,7 @@ async def start_userbot():
                     MessageMediaDocument, MessageMediaPhoto,
                     DocumentAttributeAudio, DocumentAttributeFilename,
                 )
-                from apps.files.s3_utils import upload_file_to_s3
-                from apps.files.models import StoredFile
+                from apps.files.dedup import store_bytes
 
                 media = event.message.media
                 if isinstance(media, MessageMediaDocument):
@@ -407,13 +413,9 @@ async def start_userbot():
                             message_type = "document"
                     file_bytes = await client.download_media(event.message, bytes)
                     if file_bytes:
-                        bucket, key = await sync_to_async(upload_file_to_s3)(
-                            file_bytes, prefix="telegram/media", filename=original_filename
-                        )
-                        file_data = await sync_to_async(StoredFile.objects.create)(
-                            bucket=bucket, key=key, filename=original_filename,
+                        file_data = await sync_to_async(store_bytes)(
+                            file_bytes, prefix="telegram/media", filename=original_filename,
                             content_type=doc.mime_type or "application/octet-stream",
-                            size=len(file_bytes),
                         )
                         file_name = original_filename
                 elif isinstance(media, MessageMediaPhoto):
@@ -421,12 +423,9 @@ async def start_userbot():
                     original_filename = "photo.jpg"
                     file_bytes = await client.download_media(event.message, bytes)
                     if file_bytes:
-                        bucket, key = await sync_to_async(upload_file_to_s3)(
-                            file_bytes, prefix="telegram/media", filename=original_filename
-                        )
-                        file_data = await sync_to_async(StoredFile.objects.create)(
-                            bucket=bucket, key=key, filename=original_filename,
-                            content_type="image/jpeg", size=len(file_bytes),
+                        file_data = await sync_to_async(store_bytes)(
+                            file_bytes, prefix="telegram/media", filename=original_filename,
+                            content_type="image/jpeg",
                         )
                         file_name = original_filename
 
@@ -448,6 +447,9 @@ async def start_userbot():
             db_client.last_message_at = timezone.now()
             await sync_to_async(db_client.save)(update_fields=["last_message_at"])
 
+            from apps.crm.chat_summary import record_message
+            await sync_to_async(record_message)(msg)
+
             logger.info(f"📤 Outgoing TG app message saved for client {recipient_id}: {content[:50] or file_name}")
 
             from apps.realtime.utils import push_chat_message
@@ -523,8 +525,7 @@ async def start_userbot():
                     MessageMediaDocument, MessageMediaPhoto,
                     DocumentAttributeAudio, DocumentAttributeFilename
                 )
-                from apps.files.s3_utils import upload_file_to_s3
-                from apps.files.models import StoredFile
+                from apps.files.dedup import store_bytes
 
                 media = event.message.media
 
@@ -562,18 +563,11 @@ async def start_userbot():
                     file_bytes = await client.download_media(event.message, bytes)
 
                     if file_bytes:
-                        bucket, key = await sync_to_async(upload_file_to_s3)(
+                        stored_file = await sync_to_async(store_bytes)(
                             file_bytes,
                             prefix="telegram/media",
-                            filename=original_filename
-                        )
-
-                        stored_file = await sync_to_async(StoredFile.objects.create)(
-                            bucket=bucket,
-                            key=key,
                             filename=original_filename,
                             content_type=doc.mime_type or "application/octet-stream",
-                            size=len(file_bytes)
                         )
 
                         file_data = stored_file
@@ -587,18 +581,11 @@ async def start_userbot():
                     file_bytes = await client.download_media(event.message, bytes)
 
                     if file_bytes:
-                        bucket, key = await sync_to_async(upload_file_to_s3)(
+                        stored_file = await sync_to_async(store_bytes)(
                             file_bytes,
                             prefix="telegram/media",
-                            filename=original_filename
-                        )
-
-                        stored_file = await sync_to_async(StoredFile.objects.create)(
-                            bucket=bucket,
-                            key=key,
                             filename=original_filename,
                             content_type="image/jpeg",
-                            size=len(file_bytes)
                         )
 
                         file_data = stored_file
@@ -639,6 +626,9 @@ async def start_userbot():
 
             logger.info(f"💬 Incoming {message_type} from {telegram_id}: {content[:50] if content else file_name}")
 
+            from apps.crm.chat_summary import record_message
+            await sync_to_async(record_message)(msg)
+
             from apps.crm.event_logger import log_messenger_message
             await sync_to_async(log_messenger_message)(db_client, msg)
 
@@ -746,10 +736,13 @@ async def start_userbot():
     except Exception as e:
         logger.warning(f"Initial catch_up error: {e}")
 
-    # Запускаем heartbeat и подключение параллельно
+    # Запускаем heartbeat, подключение и отправку исходящих параллельно.
+    # Исходящие из CRM идут через этот же клиент (apps/telegram/sender_service.py).
+    from apps.telegram.sender_service import SenderService
     await asyncio.gather(
         heartbeat_loop(),
         keep_connected(),
+        SenderService(client).run(),
     )
 
 
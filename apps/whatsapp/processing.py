@@ -171,8 +171,7 @@ def _download_wa_media_to_s3(url: str, filename: str, wamid: str):
     Best-effort: при ошибке возвращает None — обработка сообщения не падает."""
     try:
         from apps.whatsapp.sender import download_media
-        from apps.files.models import StoredFile
-        from apps.files.s3_utils import upload_file_to_s3
+        from apps.files.dedup import store_bytes
 
         data, ctype, err = download_media(url)
         if err or not data:
@@ -190,13 +189,9 @@ def _download_wa_media_to_s3(url: str, filename: str, wamid: str):
                 }.get(ctype.split(";")[0].strip(), "")
             filename = (wamid or "wa_media")[:60] + ext
 
-        bucket, key = upload_file_to_s3(
+        return store_bytes(
             data, prefix="whatsapp/incoming",
-            filename=filename, content_type=ctype or None,
-        )
-        return StoredFile.objects.create(
-            bucket=bucket, key=key, filename=filename[:255],
-            content_type=(ctype or "")[:255], size=len(data),
+            filename=filename[:255], content_type=(ctype or "")[:255],
             bubble_id=f"wamedia_{wamid}"[:64],
         )
     except Exception:
@@ -272,6 +267,8 @@ def handle_incoming_message(message: dict, contacts: dict):
     )
     logger.info("💬 WA incoming msg %s type=%s for client %s", msg_obj.id, msg_type, client.id)
 
+    from apps.crm.chat_summary import record_message
+    record_message(msg_obj)
     _push(msg_obj)
     try:
         from apps.crm.event_logger import log_messenger_message
@@ -12,6 +12,10 @@ URL-формат: ``{API_BASE}/{INSTANCE_ID}/<method>?token=<API_TOKEN>``.
 Если номер не в allow-list — функция возвращает (False, None, 'test_mode_skip').
 
 Возвращаемый кортеж: ``(ok: bool, wamid: str | None, err: str | None)``.
+
+HTTP — через apps/core/http_client.py: провайдер "whatsapp" (API 1msg,
+отправка не повторяется, если запрос мог дойти) и "whatsapp_media"
+(скачивание входящих файлов с CDN).
 """
 import logging
 import re
@@ -19,10 +23,14 @@ from typing import Optional, Tuple
 
 import requests
 
+from apps.core import http_client
 from apps.whatsapp import config as wa_conf
 
 logger = logging.getLogger("whatsapp")
 
+http_client.register(http_client.Provider("whatsapp", timeout=30))
+http_client.register(http_client.Provider("whatsapp_media", timeout=60))
+
 
 def sanitize_wa_text(text: str) -> str:
     """Привести текст под ограничения 1msg.io: ``body``/``caption`` НЕ может
@@ -51,13 +59,14 @@ def _endpoint(method: str) -> str:
 
 
 def _post(method: str, payload: dict, timeout: int = 30) -> Tuple[bool, dict, Optional[str]]:
-    """Сырая обёртка над requests.post: возвращает (ok, json, err)."""
+    """Сырой POST к 1msg: возвращает (ok, json, err)."""
     if not wa_conf.is_configured():
         return False, {}, "1msg не настроен (INSTANCE_ID/API_TOKEN пусты)"
 
     url = _endpoint(method)
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = http_client.request("whatsapp", "POST", url, endpoint=f"POST {method}",
+                                json=payload, timeout=timeout)
     except requests.RequestException as e:
         logger.exception("WA %s: request failed: %s", method, e)
         return False, {}, f"network: {e}"
@@ -221,7 +230,7 @@ def list_whatsapp_templates() -> Tuple[bool, list, Optional[str]]:
         return False, [], "1msg не настроен"
     url = f"{wa_conf.API_BASE}/{wa_conf.INSTANCE_ID}/templates?token={wa_conf.API_TOKEN}"
     try:
-        r = requests.get(url, timeout=45)
+        r = http_client.request("whatsapp", "GET", url, endpoint="GET templates", timeout=45)
         r.raise_for_status()
         data = r.json()
     except (requests.RequestException, ValueError) as e:
@@ -234,7 +243,8 @@ def download_media(url: str, timeout: int = 60) -> Tuple[Optional[bytes], Option
     """Скачать входящий медиафайл по URL из webhook (1msg отдаёт прямую
     ссылку в поле ``body``). Возвращает ``(bytes, content_type, err)``."""
     try:
-        r = requests.get(url, timeout=timeout, allow_redirects=True)
+        r = http_client.request("whatsapp_media", "GET", url, endpoint="GET media",
+                                timeout=timeout, allow_redirects=True)
         r.raise_for_status()
     except requests.RequestException as e:
         logger.warning("WA download_media: %s — %s", url, e)
@@ -140,6 +140,8 @@ def send_whatsapp_template_task(self, message_id: str):
         msg.sent_at = timezone.now()
         msg.save(update_fields=["whatsapp_message_id", "is_sent", "sent_at"])
         logger.info("WA template task: msg %s sent, wamid=%s", msg.id, wamid)
+        from apps.crm.chat_summary import record_message
+        record_message(msg)
         try:
             from apps.realtime.utils import push_message_status, push_toast
             push_message_status(msg)
@@ -229,6 +231,8 @@ def send_whatsapp_message_task(self, message_id: str):
         msg.sent_at = timezone.now()
         msg.save(update_fields=["whatsapp_message_id", "is_sent", "sent_at"])
         logger.info("WA task: msg %s sent, wamid=%s", msg.id, wamid)
+        from apps.crm.chat_summary import record_message
+        record_message(msg)
 
         try:
             from apps.realtime.utils import push_message_status, push_toast
@@ -51,8 +51,10 @@ def wa_file_proxy(request, file_id):
     Защита: разрешаем только файлы, привязанные к WhatsApp-сообщениям
     созданным в последние 24 часа.
     """
+    from django.http import StreamingHttpResponse
+
     from apps.files.models import StoredFile
-    from apps.files.s3_utils import download_file_from_s3
+    from apps.files.s3_utils import iter_body, open_s3_stream
 
     try:
         f = StoredFile.objects.get(id=file_id)
@@ -78,9 +80,11 @@ def wa_file_proxy(request, file_id):
         _strip_proxy_headers(resp)
         return resp
 
-    data = download_file_from_s3(f.bucket, f.key)
-    resp = HttpResponse(data, content_type=ctype)
-    resp["Content-Length"] = str(len(data))
+    # Стримим тело S3 кусками — видео/документы не грузятся в память воркера.
+    body, length, _ = open_s3_stream(f.bucket, f.key)
+    resp = StreamingHttpResponse(iter_body(body), content_type=ctype)
+    if length is not None:
+        resp["Content-Length"] = str(length)
     _strip_proxy_headers(resp)
     return resp
 
@@ -17,6 +17,12 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=2, minute=0),
         'args': (30,)
     },
+    # Перенос сообщений старше 90 дней в MessageArchive (apps/crm/message_archive.py).
+    # max_batches ограничивает прогон; остаток доедет следующей ночью.
+    'archive-old-messages-daily': {
+        'task': 'apps.crm.tasks.archive_old_messages',
+        'schedule': crontab(hour=2, minute=30),
+    },
     'generate-daily-report': {
         'task': 'apps.crm.tasks.generate_daily_report',
         'schedule': crontab(hour=22, minute=0),
@@ -58,6 +64,21 @@ app.conf.beat_schedule = {
         'task': 'arbitr.kad_monitor_case',
         'schedule': crontab(minute=30, hour='19,23,3,7'),
     },
+    # Скачивание документов дел — download-тик каждого runner'а (очереди
+    # arbitr_dl_<id>). Без назначенного IP / при cooldown / без бюджета IP
+    # тик сразу выходит (apps/arbitr/downloads.py).
+    'arbitr-kad-download-a': {
+        'task': 'arbitr.kad_download_tick_a',
+        'schedule': 30,
+    },
+    'arbitr-kad-download-b': {
+        'task': 'arbitr.kad_download_tick_b',
+        'schedule': 30,
+    },
+    'arbitr-kad-download-c': {
+        'task': 'arbitr.kad_download_tick_c',
+        'schedule': 30,
+    },
     # Опрос выписки р/с ТБанк (входящие платежи → очередь разнесения).
     # Будим ежечасно; внутренний throttle (ACCOUNTING_POLL_MIN_INTERVAL_HOURS,
     # деф. 3ч) сам отсекает лишнее. No-op, если нет кредов / гейт выключен.
@@ -70,6 +91,11 @@ app.conf.beat_schedule = {
         'task': 'notifications.revive_snoozed',
         'schedule': 60,
     },
+    # Сверка счётчиков бейджа уведомлений (Redis) с БД.
+    'notifications-reconcile-badges': {
+        'task': 'notifications.reconcile_badges',
+        'schedule': crontab(minute='*/15'),
+    },
     # Контроль сроков мероприятий процедуры: pending+просрочка → overdue+уведомление.
     'procedure-mark-overdue-milestones': {
         'task': 'procedure.mark_overdue_milestones',
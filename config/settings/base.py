@@ -149,6 +149,9 @@ CHANNEL_LAYERS = {
         "CONFIG": {"hosts": [REDIS_URL]},
     }
 }
+# Окно склейки realtime-событий в пачку (apps/realtime/dispatcher.py), мс.
+# 0 — отправлять каждое событие сразу.
+REALTIME_BATCH_MS = config("REALTIME_BATCH_MS", default=150, cast=int)
 
 # --- Database ---
 DATABASES = {
@@ -196,6 +199,21 @@ AWS_SECRET_ACCESS_KEY = config("AWS_SECRET_ACCESS_KEY")
 AWS_STORAGE_BUCKET_NAME = config("AWS_STORAGE_BUCKET_NAME")
 AWS_S3_REGION_NAME = config("AWS_S3_REGION_NAME", default="us-east-1")
 AWS_S3_BASE_URL = config("AWS_S3_BASE_URL")
+# Потоковая загрузка (apps/files/s3_utils.upload_stream_to_s3): размер части
+# multipart и число частей, которые грузятся параллельно.
+AWS_S3_MULTIPART_PART_SIZE_MB = config("AWS_S3_MULTIPART_PART_SIZE_MB", default=8, cast=int)
+AWS_S3_MULTIPART_CONCURRENCY = config("AWS_S3_MULTIPART_CONCURRENCY", default=4, cast=int)
+# Дедупликация StoredFile по SHA-256 (apps/files/dedup.py): одинаковое
+# содержимое переиспользует уже загруженный объект S3.
+FILES_DEDUP = config("FILES_DEDUP", default=True, cast=bool)
+
+# Массовый импорт Bubble (apps/bubble_import/pipeline.py): потоки выгрузки
+# окон, потоки скачивания файлов при apply, размер пачки apply и раздача
+# пачек по воркерам Celery chord'ом (иначе — внутри full_import_task).
+BUBBLE_IMPORT_FETCH_WORKERS = config("BUBBLE_IMPORT_FETCH_WORKERS", default=4, cast=int)
+BUBBLE_IMPORT_DOWNLOAD_WORKERS = config("BUBBLE_IMPORT_DOWNLOAD_WORKERS", default=8, cast=int)
+BUBBLE_IMPORT_APPLY_CHUNK = config("BUBBLE_IMPORT_APPLY_CHUNK", default=500, cast=int)
+BUBBLE_IMPORT_APPLY_CHORD = config("BUBBLE_IMPORT_APPLY_CHORD", default=False, cast=bool)
 
 # Бакет для бэкапов (опционально, если не задан — используется AWS_STORAGE_BUCKET_NAME)
 AWS_BACKUP_BUCKET_NAME = config("AWS_BACKUP_BUCKET_NAME", default="")
@@ -244,6 +262,11 @@ CELERY_TASK_ROUTES = {
     "arbitr.kad_smart_one_a": {"queue": "arbitr_a"},
     "arbitr.kad_smart_one_b": {"queue": "arbitr_b"},
     "arbitr.kad_smart_one_c": {"queue": "arbitr_c"},
+    # Download-тики тех же runner'ов (тот же IP), но отдельной очередью —
+    # скачивание документов не встаёт в хвост тиков парсинга.
+    "arbitr.kad_download_tick_a": {"queue": "arbitr_dl_a"},
+    "arbitr.kad_download_tick_b": {"queue": "arbitr_dl_b"},
+    "arbitr.kad_download_tick_c": {"queue": "arbitr_dl_c"},
     "arbitr.*": {"queue": "arbitr"},
 }
 
@@ -262,6 +285,9 @@ EFRSB_MONITOR_ENABLED = config("EFRSB_MONITOR_ENABLED", default=False, cast=bool
 # Минимальный интервал синка дела (часы) и поиска должника при «промахе».
 EFRSB_SYNC_INTERVAL_HOURS = config("EFRSB_SYNC_INTERVAL_HOURS", default=4, cast=int)
 EFRSB_SEARCH_RETRY_HOURS = config("EFRSB_SEARCH_RETRY_HOURS", default=24, cast=int)
+# Синк дела инкрементальный (от курсора последней публикации). Раз в N дней —
+# полный проход по окну 31 день: подхватить аннулирования/блокировки старых.
+EFRSB_FULL_RESYNC_DAYS = config("EFRSB_FULL_RESYNC_DAYS", default=1, cast=int)
 # Скачивать ли приложенные к публикациям файлы при синке (S3-трафик).
 EFRSB_DOWNLOAD_FILES = config("EFRSB_DOWNLOAD_FILES", default=False, cast=bool)
 
@@ -272,10 +298,21 @@ TELEGRAM_PHONE = config("TELEGRAM_PHONE", default="")
 # Токен leads-бота (@Sirius_system_bot). Раньше читался только в leads_bot.py
 # через decouple; вынесли в settings — нужен health-монитору для TG-алёртов.
 TELEGRAM_BOT_TOKEN = config("TELEGRAM_BOT_TOKEN", default="")
+# Исходящие через userbot (apps/telegram/sender_service.py): минимальная пауза
+# между отправками и сколько заданий очереди разбирать за один проход.
+TELEGRAM_SEND_MIN_INTERVAL_MS = config("TELEGRAM_SEND_MIN_INTERVAL_MS", default=350, cast=int)
+TELEGRAM_SEND_BATCH_SIZE = config("TELEGRAM_SEND_BATCH_SIZE", default=20, cast=int)
 
 # --- DaData ---
 DADATA_API_KEY = config("DADATA_API_KEY", default="")
 DADATA_SECRET_KEY = config("DADATA_SECRET_KEY", default="")
+# Шлюз DaData (apps/crm/dadata.py): срок жизни кэша ответов (пустые —
+# «не найдено» — живут меньше), лимит запросов/с (у DaData — 30) и число
+# одновременных запросов в пакетных вызовах.
+DADATA_CACHE_TTL_DAYS = config("DADATA_CACHE_TTL_DAYS", default=30, cast=int)
+DADATA_CACHE_EMPTY_TTL_DAYS = config("DADATA_CACHE_EMPTY_TTL_DAYS", default=7, cast=int)
+DADATA_RPS = config("DADATA_RPS", default=20, cast=float)
+DADATA_CONCURRENCY = config("DADATA_CONCURRENCY", default=10, cast=int)
 
 # --- MAX bot ---
 MAX_BOT_TOKEN = config("MAX_BOT_TOKEN", default="")
@@ -291,6 +328,16 @@ MAX_WEBHOOK_SECRET = config("MAX_WEBHOOK_SECRET", default="")
 # этому URL вместо Beget S3 pre-signed (Beget даёт 403 на HEAD).
 PUBLIC_BASE_URL = config("PUBLIC_BASE_URL", default="https://crmsiri.ru")
 
+# --- DOCX → PDF (apps/afd/pdf_utils.py, office_pool.py) ---
+# Тёплых LibreOffice на процесс (0 — разовый soffice на каждый документ, как раньше).
+OFFICE_POOL_SIZE = config("OFFICE_POOL_SIZE", default=2, cast=int)
+# Простаивающий дольше LibreOffice гасится (сотни МБ на экземпляр).
+OFFICE_POOL_IDLE_SECONDS = config("OFFICE_POOL_IDLE_SECONDS", default=600, cast=int)
+# Python с модулем uno (Debian python3-uno) — в нём работает uno_worker.py.
+OFFICE_UNO_PYTHON = config("OFFICE_UNO_PYTHON", default="/usr/bin/python3")
+# Сколько хранить PDF в кэше по хэшу содержимого DOCX.
+OFFICE_PDF_CACHE_TTL = config("OFFICE_PDF_CACHE_TTL", default=7 * 24 * 3600, cast=int)
+
 # --- Arbitr (kad.arbitr.ru) parser ---
 # Куда слать алёрты при капче / других интерактивных ошибках парсера.
 # Пока — один MAX chat_id админа; позже разнесём по Employee.max_chat_id.
@@ -320,6 +367,18 @@ DEVOPS_AGENT_TOKEN_PROD = config("DEVOPS_AGENT_TOKEN_PROD", default="")
 MONITOR_BOT_ALLOWED_CHAT_IDS = config("MONITOR_BOT_ALLOWED_CHAT_IDS", default="")
 # Headless по умолчанию. Для локальной отладки парсера выставить ARBITR_HEADLESS=false.
 ARBITR_HEADLESS = config("ARBITR_HEADLESS", default="true").lower() != "false"
+# Пул тёплых Chrome-сессий runner'а (apps/arbitr/session_pool.py): сессия
+# пересоздаётся после N дел или по возрасту — чтоб не копить память Chrome.
+ARBITR_SESSION_MAX_CASES = config("ARBITR_SESSION_MAX_CASES", default=25, cast=int)
+ARBITR_SESSION_MAX_AGE_MINUTES = config("ARBITR_SESSION_MAX_AGE_MINUTES", default=90, cast=int)
+# Границы адаптивного интервала парсинга дела (apps/arbitr/scheduler.py):
+# активные дела и дела с прошедшим заседанием — не чаще MIN, тихие — не реже MAX.
+ARBITR_PARSE_MIN_HOURS = config("ARBITR_PARSE_MIN_HOURS", default=12, cast=int)
+ARBITR_PARSE_MAX_HOURS = config("ARBITR_PARSE_MAX_HOURS", default=168, cast=int)
+# Очередь скачивания документов (apps/arbitr/downloads.py): документов за
+# download-тик и лимит скачиваний на один outbound IP в час (анти-капча).
+ARBITR_DOWNLOAD_BATCH = config("ARBITR_DOWNLOAD_BATCH", default=10, cast=int)
+ARBITR_DOWNLOAD_PER_IP_HOUR = config("ARBITR_DOWNLOAD_PER_IP_HOUR", default=40, cast=int)
 
 # --- Auth redirects ---
 LOGIN_URL = "/accounts/login/"